@@ -1,4 +1,24 @@
+import asyncio
+import copy
+import json
+
 import pytest
+import tornado.httpserver
+import tornado.testing
+import tornado.web
+
+from jupyterlab_kubeflow_pipelines.server.events import reset_run_events
+from jupyterlab_kubeflow_pipelines.server.hedging import reset_hedging
+from jupyterlab_kubeflow_pipelines.server.jobs import reset_jobs
+from jupyterlab_kubeflow_pipelines.server.mlmd import (
+    EXECUTION_STATES,
+    _field,
+    _fields,
+    grpc_web_frame,
+)
+from jupyterlab_kubeflow_pipelines.server.resilience import reset_breakers
+from jupyterlab_kubeflow_pipelines.server.run_index import reset_run_indexes
+from jupyterlab_kubeflow_pipelines.server.summary import reset_summaries
 
 pytest_plugins = ("pytest_jupyter.jupyter_server", )
 
@@ -6,3 +26,286 @@ pytest_plugins = ("pytest_jupyter.jupyter_server", )
 @pytest.fixture
 def jp_server_config(jp_server_config):
     return {"ServerApp": {"jpserver_extensions": {"jupyterlab_kubeflow_pipelines": True}}}
+
+
+@pytest.fixture(autouse=True)
+def _reset_jobs():
+    """Forget background jobs (and idempotency keys) between tests."""
+    yield
+    reset_jobs()
+
+
+FAKE_RUNS = [
+    {
+        "run_id": f"run-{i}",
+        "display_name": f"Run {i}",
+        "state": "FAILED" if i % 3 == 0 else "SUCCEEDED",
+        "pipeline_spec": {"large": "x" * 100},
+    }
+    for i in range(7)
+]
+
+
+FAKE_ARTIFACT = bytes(range(256)) * 4096
+
+
+class _FakeKfpHandler(tornado.web.RequestHandler):
+    """Echo handler standing in for the `ml-pipeline` API."""
+
+    def initialize(self, requests, runs, pipeline_versions, mlmd_executions):
+        self.requests = requests
+        self.runs = runs
+        self.pipeline_versions = pipeline_versions
+        self.mlmd_executions = mlmd_executions
+
+    def _record(self):
+        self.requests.append(
+            {
+                "method": self.request.method,
+                "path": self.request.path,
+                "query": self.request.query,
+                "headers": dict(self.request.headers),
+                "body": self.request.body,
+            }
+        )
+
+    async def get(self, path):
+        self._record()
+        # `delay` lets tests hold an upstream request open.
+        delay = float(self.get_query_argument("delay", "0"))
+        # `delay_once` only holds the first request for a path+query.
+        if not any(
+            r["path"] == self.request.path and r["query"] == self.request.query
+            for r in self.requests[:-1]
+        ):
+            delay += float(self.get_query_argument("delay_once", "0"))
+        if delay:
+            await asyncio.sleep(delay)
+        # `fail_times=N` answers 503 to the first N requests for a path.
+        fail_times = int(self.get_query_argument("fail_times", "0"))
+        seen = sum(1 for r in self.requests if r["path"] == self.request.path)
+        if seen <= fail_times:
+            self.set_status(503)
+            self.write(json.dumps({"error": "unavailable"}))
+            return
+        if path.startswith("artifacts/"):
+            await self._artifact()
+            return
+        # `redirect=URL` answers 302; `spa=1` serves the shell like an SPA fallback.
+        redirect = self.get_query_argument("redirect", None)
+        if redirect:
+            self.redirect(redirect)
+            return
+        if path.endswith("index.html") or self.get_query_argument("spa", None):
+            self.set_header("Content-Type", "text/html")
+            self.write("<html><head><title>KFP</title></head><body></body></html>")
+            return
+        self.set_header("Content-Type", "application/json")
+        self.set_header("X-Upstream", "fake")
+        if path == "apis/v2beta1/runs":
+            self.write(json.dumps(self._runs_page()))
+            return
+        if path.startswith("apis/v2beta1/runs/"):
+            run_id = path.rsplit("/", 1)[-1]
+            run = next((r for r in self.runs if r["run_id"] == run_id), None)
+            if run is not None:
+                self.write(json.dumps(run))
+                return
+        if path.startswith("apis/v2beta1/pipelines/") and "/versions" in path:
+            self._pipeline_versions(path)
+            return
+        payload = {"path": path, "query": self.request.query}
+        # `pad=N` makes the echo large enough to be compressed.
+        pad = int(self.get_query_argument("pad", "0"))
+        if pad:
+            payload["pad"] = "x" * pad
+        self.write(json.dumps(payload))
+
+    async def _artifact(self):
+        """
+        Serve FAKE_ARTIFACT, honouring a single `Range: bytes=a-b`; `repeat=N`
+        streams it N times instead, pausing `pause` seconds after each copy.
+        """
+        self.set_header("Content-Type", "application/octet-stream")
+        repeat = int(self.get_query_argument("repeat", "0"))
+        pause = float(self.get_query_argument("pause", "0"))
+        if repeat:
+            self.set_header("Content-Length", str(len(FAKE_ARTIFACT) * repeat))
+            for _ in range(repeat):
+                self.write(FAKE_ARTIFACT)
+                await self.flush()
+                await asyncio.sleep(pause)
+            return
+        self.set_header("Accept-Ranges", "bytes")
+        range_header = self.request.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first)
+            end = int(last) if last else len(FAKE_ARTIFACT) - 1
+            self.set_status(206)
+            self.set_header("Content-Range", f"bytes {start}-{end}/{len(FAKE_ARTIFACT)}")
+            self.write(FAKE_ARTIFACT[start : end + 1])
+            return
+        self.write(FAKE_ARTIFACT)
+
+    def _pipeline_versions(self, path):
+        """`pipelines/{id}/versions` (newest first) and `.../versions/{version_id}`."""
+        _, pipeline_id, _, *version_id = path[len("apis/v2beta1/"):].split("/")
+        versions = sorted(
+            (v for v in self.pipeline_versions if v["pipeline_id"] == pipeline_id),
+            key=lambda v: v["created_at"],
+            reverse=True,
+        )
+        if not version_id:
+            self.write(json.dumps({"pipeline_versions": versions[:1]}))
+            return
+        version = next((v for v in versions if v["pipeline_version_id"] == version_id[0]), None)
+        if version is None:
+            self.set_status(404)
+            self.write(json.dumps({"error": "not found"}))
+            return
+        self.write(json.dumps(version))
+
+    def _filtered_runs(self):
+        """Apply `experiment_id`, `IN`/`GREATER_THAN[_EQUALS]` filters and `created_at desc`."""
+        runs = self.runs
+        experiment_id = self.get_query_argument("experiment_id", "")
+        if experiment_id:
+            runs = [r for r in runs if r.get("experiment_id") == experiment_id]
+        raw = self.get_query_argument("filter", "")
+        for predicate in json.loads(raw)["predicates"] if raw else []:
+            if predicate["operation"] == "IN":
+                values = predicate["string_values"]["values"]
+                runs = [r for r in runs if r.get(predicate["key"]) in values]
+            elif predicate["operation"] == "GREATER_THAN":
+                value = predicate["timestamp_value"]
+                runs = [r for r in runs if (r.get(predicate["key"]) or "") > value]
+            elif predicate["operation"] == "GREATER_THAN_EQUALS":
+                value = predicate["timestamp_value"]
+                runs = [r for r in runs if (r.get(predicate["key"]) or "") >= value]
+        if self.get_query_argument("sort_by", "") == "created_at desc":
+            runs = sorted(runs, key=lambda r: r.get("created_at") or "", reverse=True)
+        return runs
+
+    def _runs_page(self):
+        """Page through the fake runs like KFP does with page_size/page_token."""
+        runs = self._filtered_runs()
+        page_size = int(self.get_query_argument("page_size", "2"))
+        start = int(self.get_query_argument("page_token", "0") or 0)
+        page = runs[start : start + page_size]
+        next_start = start + page_size
+        payload = {"runs": page, "total_size": len(runs)}
+        if next_start < len(runs):
+            payload["next_page_token"] = str(next_start)
+        return payload
+
+    def _get_executions(self):
+        """gRPC-Web `GetExecutions` matching `cache_fingerprint = '...'` filters."""
+        (request,) = (v for n, v in _fields(self.request.body[5:]) if n == 1)
+        query = dict(_fields(request)).get(4, b"").decode()
+        states = {name: value for value, name in EXECUTION_STATES.items()}
+        message = b""
+        for execution in self.mlmd_executions:
+            if f"'{execution['fingerprint']}'" not in query:
+                continue
+            # Only executions of the queried pipeline and namespace match.
+            if f"contexts_a.name = '{execution['pipeline']}'" not in query:
+                continue
+            if f"namespace.string_value = '{execution['namespace']}'" not in query:
+                continue
+            value = _field(3, execution["fingerprint"])
+            message += _field(
+                1,
+                _field(1, execution["id"])
+                + _field(3, states[execution["state"]])
+                + _field(5, _field(1, "cache_fingerprint") + _field(2, value))
+                + _field(8, execution["created"])
+                + _field(9, execution["updated"]),
+            )
+        self.set_header("Content-Type", "application/grpc-web+proto")
+        trailer = b"grpc-status:0\r\ngrpc-message:\r\n"
+        self.write(grpc_web_frame(message) + b"\x80" + grpc_web_frame(trailer)[1:])
+
+    def post(self, path):
+        self._record()
+        if path == "ml_metadata.MetadataStoreService/GetExecutions":
+            self._get_executions()
+            return
+        self.set_header("Content-Type", "application/json")
+        if path.startswith("apis/v2beta1/runs/"):
+            # Run operations (`runs/{id}:terminate`, `DELETE runs/{id}`, ...).
+            run_id = path[len("apis/v2beta1/runs/"):].split(":", 1)[0]
+            if not any(r["run_id"] == run_id for r in self.runs):
+                self.set_status(404)
+                self.write(json.dumps({"error_message": f"Run {run_id} not found"}))
+                return
+        self.write(json.dumps({"path": path, "size": len(self.request.body)}))
+
+    delete = post
+
+
+@pytest.fixture
+def fake_kfp(jp_asyncio_loop):
+    """Start a fake KFP API server and yield its endpoint and request log."""
+    requests: list[dict] = []
+    # Tests may change run states or add runs through `fake_kfp["runs"]`.
+    runs = copy.deepcopy(FAKE_RUNS)
+    # Registered pipeline versions, added by tests.
+    pipeline_versions: list[dict] = []
+    # MLMD executions: id, state, fingerprint, pipeline, namespace and
+    # created/updated (ms).
+    mlmd_executions: list[dict] = []
+    app = tornado.web.Application(
+        [
+            (
+                r"/(.*)",
+                _FakeKfpHandler,
+                {
+                    "requests": requests,
+                    "runs": runs,
+                    "pipeline_versions": pipeline_versions,
+                    "mlmd_executions": mlmd_executions,
+                },
+            )
+        ],
+        # Like KFP behind most ingresses, gzip responses when asked to.
+        compress_response=True,
+    )
+    sock, port = tornado.testing.bind_unused_port()
+    server = tornado.httpserver.HTTPServer(app)
+    server.add_sockets([sock])
+    yield {
+        "endpoint": f"http://127.0.0.1:{port}",
+        "requests": requests,
+        "runs": runs,
+        "pipeline_versions": pipeline_versions,
+        "mlmd_executions": mlmd_executions,
+    }
+    server.stop()
+    reset_run_events()
+    reset_breakers()
+    reset_hedging()
+    reset_run_indexes()
+    reset_summaries()
+
+
+@pytest.fixture
+def kfp_configured(jp_asyncio_loop, jp_fetch, fake_kfp):
+    """Point the extension settings at the fake KFP server."""
+    jp_asyncio_loop.run_until_complete(
+        jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "settings",
+            method="POST",
+            body=json.dumps({"endpoint": fake_kfp["endpoint"], "namespace": "team-a"}),
+        )
+    )
+    yield fake_kfp
+    jp_asyncio_loop.run_until_complete(
+        jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "settings",
+            method="POST",
+            body=json.dumps({"endpoint": "", "namespace": ""}),
+        )
+    )
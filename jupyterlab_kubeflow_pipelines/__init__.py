@@ -9,7 +9,7 @@ except ImportError:
     __version__ = "dev"
 from .routes import setup_route_handlers
 from .notebook import KFPClient
-from .preview import display_dag_preview
+from .preview import analyze_dag, display_dag_preview, display_run_dag
 
 
 def _jupyter_labextension_paths():
@@ -41,6 +41,8 @@ def _load_jupyter_server_extension(server_app):
 __all__ = [
     "__version__",
     "KFPClient",
+    "analyze_dag",
     "display_dag_preview",
+    "display_run_dag",
     "setup_route_handlers",
 ]
@@ -0,0 +1,382 @@
+"""
+Predict KFP v2 cache hits before a pipeline is submitted.
+
+The KFP v2 driver fingerprints every container task from its cache key:
+resolved input parameter values, input artifact names, output artifact
+types, output parameter types, image and unresolved command/args. It then
+reuses an earlier execution with the same `cache_fingerprint`. The same
+keys are computed here from the compiled spec and the run arguments, to be
+matched against MLMD executions.
+
+Tasks fed by upstream outputs cannot be fingerprinted before the run: their
+inputs are only known once the producers ran (or were taken from cache).
+They are reported as misses when a producer re-executes, else as unknown.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any
+
+from .preview import _load_pipeline_spec
+
+# MLMD execution states the driver accepts as cache sources.
+CACHEABLE_STATES = frozenset({"COMPLETE", "CACHED"})
+
+
+class _Unknown:
+    """An input value only known at run time."""
+
+    def __init__(self, producers: tuple[str, ...] = ()) -> None:
+        self.producers = producers
+
+
+def _go_number(value: float) -> str:
+    """Format a float64 like Go's encoding/json."""
+    if not math.isfinite(value):
+        raise ValueError(f"Cannot encode {value} in a cache key.")
+    magnitude = abs(value)
+    if value == int(value) and magnitude < 1e21:
+        return str(int(value))
+    if magnitude < 1e-6 or magnitude >= 1e21:
+        return repr(value).replace("e-0", "e-")
+    return format(Decimal(repr(value)), "f")
+
+
+def _go_json(value: Any) -> str:
+    """
+    Encode like `json.Marshal` of a decoded `interface{}` in Go: sorted keys,
+    no whitespace, every number a float64 and `<`, `>`, `&`, U+2028 and
+    U+2029 escaped.
+    """
+    if isinstance(value, bool) or value is None:
+        return json.dumps(value)
+    if isinstance(value, (int, float)):
+        return _go_number(float(value))
+    if isinstance(value, str):
+        text = json.dumps(value, ensure_ascii=False)
+        for char, escaped in (
+            ("<", "\\u003c"),
+            (">", "\\u003e"),
+            ("&", "\\u0026"),
+            ("\u2028", "\\u2028"),
+            ("\u2029", "\\u2029"),
+        ):
+            text = text.replace(char, escaped)
+        return text
+    if isinstance(value, dict):
+        items = sorted(value.items())
+        return "{" + ",".join(f"{_go_json(k)}:{_go_json(v)}" for k, v in items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_go_json(v) for v in value) + "]"
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cache key.")
+
+
+def cache_fingerprint(cache_key: dict) -> str:
+    """sha256 of a cache key in its protojson form, as the KFP driver computes it."""
+    return hashlib.sha256(_go_json(cache_key).encode()).hexdigest()
+
+
+def _cache_key(
+    image: str,
+    cmd_args: list[str],
+    parameter_values: dict[str, Any],
+    component: dict,
+) -> dict:
+    """A `CacheKey` in protojson form (empty fields omitted) for a task without input artifacts."""
+    outputs = component.get("outputDefinitions") or {}
+    key: dict[str, Any] = {}
+    if parameter_values:
+        key["inputParameterValues"] = parameter_values
+    artifacts = {
+        name: {"type": spec.get("artifactType") or {}}
+        for name, spec in (outputs.get("artifacts") or {}).items()
+    }
+    for name, spec in (outputs.get("artifacts") or {}).items():
+        if spec.get("metadata"):
+            artifacts[name]["metadata"] = spec["metadata"]
+    if artifacts:
+        key["outputArtifactsSpec"] = artifacts
+    parameters = {
+        name: spec.get("parameterType") or "PARAMETER_TYPE_ENUM_UNSPECIFIED"
+        for name, spec in (outputs.get("parameters") or {}).items()
+    }
+    if parameters:
+        key["outputParametersSpec"] = parameters
+    container = {}
+    if image:
+        container["image"] = image
+    if cmd_args:
+        container["cmdArgs"] = cmd_args
+    if container:
+        key["containerSpec"] = container
+    return key
+
+
+@dataclass
+class TaskCacheKey:
+    """Fingerprint of one task execution, or why it has none before the run."""
+
+    # `/`-joined task path; loop iterations get an `[i]` suffix.
+    task: str
+    component: str
+    fingerprint: str | None = None
+    reason: str | None = None
+    # Tasks whose outputs feed this one (paths).
+    producers: list[str] = field(default_factory=list)
+    # The task's own `cachingOptions`; a run-level setting overrides it.
+    cache_enabled: bool = True
+
+
+def _resolve_parameter(spec: dict, scope: dict[str, Any], siblings: dict[str, list[str]]):
+    if spec.get("parameterExpressionSelector"):
+        return _Unknown()
+    if "runtimeValue" in spec:
+        return (spec["runtimeValue"] or {}).get("constant")
+    if "componentInputParameter" in spec:
+        return scope.get(spec["componentInputParameter"], _Unknown())
+    if "taskOutputParameter" in spec:
+        producer = (spec["taskOutputParameter"] or {}).get("producerTask", "")
+        return _Unknown(tuple(siblings.get(producer, ())))
+    return _Unknown()
+
+
+def _task_inputs(
+    task: dict, component: dict, scope: dict[str, Any], siblings: dict[str, list[str]]
+) -> tuple[dict[str, Any], list[_Unknown]]:
+    """Resolved parameter values (defaults filled in) and the unknown ones."""
+    values: dict[str, Any] = {}
+    unknown: list[_Unknown] = []
+    for name, spec in ((task.get("inputs") or {}).get("parameters") or {}).items():
+        value = _resolve_parameter(spec or {}, scope, siblings)
+        if isinstance(value, _Unknown):
+            unknown.append(value)
+        else:
+            values[name] = value
+    for name, spec in ((task.get("inputs") or {}).get("artifacts") or {}).items():
+        producer = (spec.get("taskOutputArtifact") or {}).get("producerTask", "")
+        unknown.append(_Unknown(tuple(siblings.get(producer, ()))))
+    definitions = (component.get("inputDefinitions") or {}).get("parameters") or {}
+    for name, definition in definitions.items():
+        if name not in values and "defaultValue" in (definition or {}):
+            values[name] = definition["defaultValue"]
+    return values, unknown
+
+
+def _spec_dict(pipeline: Any) -> dict:
+    spec = _load_pipeline_spec(pipeline)
+    if not isinstance(spec, dict):
+        from google.protobuf import json_format
+
+        spec = json_format.MessageToDict(spec)
+    return spec
+
+
+def pipeline_name(pipeline: Any) -> str | None:
+    """The `pipelineInfo.name` that scopes the KFP cache (its MLMD pipeline context)."""
+    return (_spec_dict(pipeline).get("pipelineInfo") or {}).get("name") or None
+
+
+def task_cache_keys(pipeline: Any, arguments: dict[str, Any] | None = None) -> list[TaskCacheKey]:
+    """
+    Cache fingerprints of the container tasks a run would execute.
+
+    `pipeline` is anything `analyze_dag` accepts; `arguments` are the run's
+    pipeline parameters (defaults apply to the others). `ParallelFor` loops
+    over literal lists yield one entry per iteration.
+    """
+    spec = _spec_dict(pipeline)
+    components = spec.get("components") or {}
+    executors = (spec.get("deploymentSpec") or {}).get("executors") or {}
+    root = spec.get("root") or {}
+
+    scope: dict[str, Any] = {}
+    for name, definition in ((root.get("inputDefinitions") or {}).get("parameters") or {}).items():
+        if "defaultValue" in (definition or {}):
+            scope[name] = definition["defaultValue"]
+    scope.update(arguments or {})
+
+    keys: list[TaskCacheKey] = []
+
+    def visit(tasks: dict, scope: dict[str, Any], path: str, depth: int) -> dict[str, list[str]]:
+        """Visit a DAG; returns the leaf task paths under each of its tasks."""
+        leaves: dict[str, list[str]] = {}
+        # Producers first, so consumers can refer to their leaf paths.
+        for name in _topological(tasks):
+            task = tasks[name] or {}
+            qualified = f"{path}/{name}" if path else name
+            component_name = (task.get("componentRef") or {}).get("name", "")
+            component = components.get(component_name) or {}
+            values, unknown = _task_inputs(task, component, scope, leaves)
+
+            sub_dag = (component.get("dag") or {}).get("tasks")
+            if sub_dag is not None and depth < 32:
+                iterations = [(qualified, values)]
+                iterator = task.get("parameterIterator")
+                if iterator:
+                    # `items.inputParameter` names one of the loop task's inputs.
+                    items = _loop_items(iterator, values)
+                    item_input = iterator.get("itemInput")
+                    if items is None:
+                        iterations = [(qualified, {**values, item_input: _Unknown()})]
+                    else:
+                        iterations = [
+                            (f"{qualified}[{i}]", {**values, item_input: item})
+                            for i, item in enumerate(items)
+                        ]
+                leaves[name] = []
+                for child_path, child_values in iterations:
+                    # Inputs unknown here stay unknown inside the sub-DAG.
+                    child_scope = dict(child_values)
+                    for input_name, input_spec in (
+                        (task.get("inputs") or {}).get("parameters") or {}
+                    ).items():
+                        if input_name not in child_scope:
+                            child_scope[input_name] = _resolve_parameter(
+                                input_spec or {}, scope, leaves
+                            )
+                    child = visit(sub_dag, child_scope, child_path, depth + 1)
+                    leaves[name].extend(p for paths in child.values() for p in paths)
+                continue
+
+            executor = executors.get(component.get("executorLabel", "")) or {}
+            entry = TaskCacheKey(
+                task=qualified,
+                component=component_name,
+                cache_enabled=bool((task.get("cachingOptions") or {}).get("enableCache")),
+            )
+            leaves[name] = [qualified]
+            keys.append(entry)
+            container = executor.get("container")
+            if container is None:
+                entry.reason = "not a container task"
+                continue
+            if unknown:
+                entry.producers = sorted({p for u in unknown for p in u.producers})
+                entry.reason = (
+                    "inputs come from upstream outputs"
+                    if entry.producers
+                    else "inputs are only known at run time"
+                )
+                continue
+            cmd_args = list(container.get("command") or []) + list(container.get("args") or [])
+            entry.fingerprint = cache_fingerprint(
+                _cache_key(container.get("image", ""), cmd_args, values, component)
+            )
+        return leaves
+
+    visit((root.get("dag") or {}).get("tasks") or {}, scope, "", 0)
+    return keys
+
+
+def _loop_items(iterator: dict, inputs: dict[str, Any]) -> list | None:
+    items = iterator.get("items") or {}
+    if "raw" in items:
+        try:
+            value = json.loads(items["raw"])
+        except (TypeError, ValueError):
+            return None
+    else:
+        value = inputs.get(items.get("inputParameter", ""))
+    return value if isinstance(value, list) else None
+
+
+def _topological(tasks: dict) -> list[str]:
+    order: list[str] = []
+    seen: set[str] = set()
+
+    def add(name: str, trail: frozenset[str]) -> None:
+        if name in seen or name in trail or name not in tasks:
+            return
+        for dep in sorted((tasks[name] or {}).get("dependentTasks") or []):
+            add(dep, trail | {name})
+        seen.add(name)
+        order.append(name)
+
+    # Sorted, so the order does not depend on how the YAML was written.
+    for name in sorted(tasks):
+        add(name, frozenset())
+    return order
+
+
+@dataclass(frozen=True)
+class CachedExecution:
+    """An MLMD execution recorded with a cache fingerprint."""
+
+    id: int
+    state: str
+    fingerprint: str
+    # Wall time of the original execution, if recorded.
+    duration_seconds: float | None = None
+
+
+@dataclass(frozen=True)
+class CachePlan:
+    # One entry per task execution: task, component, fingerprint, status
+    # (`hit`, `miss` or `unknown`), reason and the matching execution.
+    tasks: list[dict]
+
+    def counts(self) -> dict[str, int]:
+        counts = {"hit": 0, "miss": 0, "unknown": 0}
+        for task in self.tasks:
+            counts[task["status"]] += 1
+        return counts
+
+    @property
+    def estimated_saving_seconds(self) -> float:
+        return sum(t.get("duration_seconds") or 0.0 for t in self.tasks if t["status"] == "hit")
+
+    def to_dict(self) -> dict:
+        return {
+            "tasks": self.tasks,
+            "counts": self.counts(),
+            "estimated_saving_seconds": round(self.estimated_saving_seconds, 1),
+        }
+
+
+def plan_cache(
+    keys: list[TaskCacheKey],
+    executions: dict[str, CachedExecution],
+    *,
+    enable_caching: bool | None = True,
+) -> CachePlan:
+    """
+    Classify tasks as cache hits or misses given the executions found per
+    fingerprint. A task fed by a task that misses misses as well, since its
+    inputs will be new artifacts or values.
+
+    `enable_caching` is the run's setting (`kfp/submit` always enables it);
+    None honours each task's own caching options.
+    """
+    status: dict[str, str] = {}
+    tasks: list[dict] = []
+    for key in keys:
+        entry: dict[str, Any] = {
+            "task": key.task,
+            "component": key.component,
+            "fingerprint": key.fingerprint,
+            "status": "unknown",
+            "reason": key.reason,
+        }
+        execution = executions.get(key.fingerprint or "")
+        if not (key.cache_enabled if enable_caching is None else enable_caching):
+            entry.update(status="miss", reason="caching disabled")
+        elif key.fingerprint is None:
+            if any(status.get(p) == "miss" for p in key.producers):
+                entry.update(status="miss", reason="an upstream task re-executes")
+        elif execution is not None and execution.state in CACHEABLE_STATES:
+            entry.update(
+                status="hit",
+                reason=None,
+                execution_id=execution.id,
+                duration_seconds=execution.duration_seconds,
+            )
+        else:
+            entry.update(status="miss", reason="no earlier execution with this fingerprint")
+        status[key.task] = entry["status"]
+        tasks.append(entry)
+    return CachePlan(tasks=tasks)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Any
 from urllib.parse import urlparse
 
@@ -14,6 +14,104 @@ class KfpConfig:
 
 _CONFIG_BY_USER: dict[str, KfpConfig] = {}
 
+SERVER_OPTIONS_KEY = "jupyterlab_kubeflow_pipelines"
+
+
+@dataclass(frozen=True)
+class KfpServerOptions:
+    """
+    Operator-level tuning of the server extension.
+
+    Set via Jupyter Server tornado settings, e.g.::
+
+        c.ServerApp.tornado_settings = {
+            "jupyterlab_kubeflow_pipelines": {"proxy_streaming": False},
+        }
+    """
+
+    # Relay proxied KFP API responses chunk by chunk instead of buffering them.
+    proxy_streaming: bool = True
+    # Request bodies larger than this are streamed to the upstream as they arrive.
+    proxy_stream_request_threshold: int = 1024 * 1024
+    # Seconds to cache proxied GET list responses per user; 0 disables the cache.
+    proxy_cache_ttl: float = 0.0
+    proxy_cache_max_entries: int = 256
+    # Larger list responses are passed through without being cached.
+    proxy_cache_max_body: int = 8 * 1024 * 1024
+    # Upper bound of items returned by proxy-aggregate listings.
+    aggregate_max_items: int = 50000
+    aggregate_page_size: int = 200
+    # Concurrent upstream requests per (user, KFP host); 0 disables limiting.
+    upstream_max_concurrency: int = 8
+    # Requests waiting for a slot beyond this are answered with 429 at once.
+    upstream_max_queue: int = 32
+    upstream_queue_timeout: float = 30.0
+    # Retry-After (seconds) sent with limiter 429 responses.
+    upstream_retry_after: int = 1
+    # Attempts (including the first) for idempotent calls failing transiently.
+    upstream_retry_attempts: int = 3
+    upstream_retry_base_delay: float = 0.2
+    upstream_retry_max_delay: float = 2.0
+    upstream_retry_methods: tuple[str, ...] = ("GET", "HEAD")
+    # Consecutive transient failures that open a host's circuit; 0 disables.
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+    # Re-send idempotent reads slower than this latency percentile of their
+    # route (e.g. 95); 0 disables hedging.
+    hedge_percentile: float = 0.0
+    hedge_min_samples: int = 20
+    hedge_min_delay: float = 0.05
+    # Upper bound on hedges per request (0.1 = at most 10% extra requests).
+    hedge_max_rate: float = 0.1
+    # Disk cache for fingerprinted KFP UI bundles; 0 bytes disables it.
+    # Defaults to a directory under the Jupyter runtime dir.
+    ui_asset_cache_dir: str = ""
+    ui_asset_cache_max_bytes: int = 256 * 1024 * 1024
+    # Seconds before a cached asset is revalidated upstream.
+    ui_asset_revalidate_after: float = 24 * 3600
+    # Overall time limit for streamed artifact downloads; 0 means none.
+    ui_download_timeout: float = 0.0
+    # gzip/brotli-encode responses of the extension's endpoints when the
+    # browser accepts it; smaller bodies are sent as-is.
+    compress_responses: bool = True
+    compress_min_length: int = 1024
+    # Relay bodies KFP already compressed without decoding and re-encoding.
+    proxy_compression_passthrough: bool = True
+    # Upper bound on the decoded size of gzip/deflate/br request bodies.
+    request_body_max_decoded: int = 100 * 1024 * 1024
+    # Seconds between upstream polls of a runs/events poller.
+    run_events_poll_interval: float = 5.0
+    # Seconds between SSE keep-alive comments on idle streams.
+    run_events_keepalive: float = 15.0
+    # Runs tracked (and listed per poll) by one poller.
+    run_events_max_runs: int = 1000
+    # Threads running background compile/submit/import jobs.
+    job_max_workers: int = 4
+    # Seconds finished jobs (and their idempotency keys) are kept, and the
+    # most finished jobs kept per user.
+    job_retention: float = 3600.0
+    job_max_retained: int = 100
+    # Largest (decoded) pipeline package accepted by `kfp/packages`, and the
+    # bound on all stored packages before the oldest are evicted.
+    package_max_bytes: int = 64 * 1024 * 1024
+    package_store_max_bytes: int = 1024 * 1024 * 1024
+    # Runs operated on concurrently by one `runs:batch` request, and the most
+    # runs a batch may select by filter.
+    batch_max_concurrency: int = 8
+    batch_max_runs: int = 1000
+    # SQLite run index behind `runs/search` (defaults to a directory under the
+    # Jupyter runtime dir), seconds before a search re-syncs it with KFP, and
+    # the most runs indexed per user and namespace.
+    run_index_dir: str = ""
+    run_index_sync_interval: float = 30.0
+    run_index_max_runs: int = 100000
+    # Seconds between full walks that reconcile deleted and archived runs.
+    run_index_full_sync_interval: float = 3600.0
+    # Seconds an `experiments/{id}/summary` result is reused, and the most
+    # runs per state group it walks.
+    experiment_summary_ttl: float = 15.0
+    experiment_summary_max_runs: int = 10000
+
 
 class _UnsetType:
     pass
@@ -79,6 +177,16 @@ def get_config(handler: Any) -> KfpConfig:
     return cfg
 
 
+def get_server_options(handler: Any) -> KfpServerOptions:
+    return server_options_from_settings(getattr(handler, "settings", None) or {})
+
+
+def server_options_from_settings(settings: dict[str, Any]) -> KfpServerOptions:
+    raw = settings.get(SERVER_OPTIONS_KEY) or {}
+    known = {f.name for f in fields(KfpServerOptions)}
+    return KfpServerOptions(**{k: v for k, v in raw.items() if k in known})
+
+
 def get_public_config(handler: Any) -> dict[str, Any]:
     cfg = get_config(handler)
     return {
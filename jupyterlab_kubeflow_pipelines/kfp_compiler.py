@@ -1,17 +1,43 @@
+import functools
 import importlib.util
 import inspect
 import json
 import os
 import sys
 import tempfile
+import threading
 import traceback
+from collections.abc import Callable
 from urllib.parse import urlparse
 
 from jupyter_server.base.handlers import APIHandler
 from kfp.compiler import Compiler
 from tornado import web
 
-from .config import get_config
+from .config import _user_key, get_config, get_server_options
+from .preview import analyze_dag
+from .server.cache import invalidator
+from .server.compression import request_body
+from .server.jobs import Progress, respond
+from .server.notebooks import (
+    NotebookSource,
+    cached_inspection,
+    load_notebook_source,
+    remember_inspection,
+)
+from .server.packages import compiled_package_dir, stored_package_path
+from .server.resilience import (
+    CircuitOpen,
+    RetryPolicy,
+    breaker_for,
+    call_resilient,
+)
+
+
+# The KFP DSL keeps the pipeline being built in a process-global
+# (`pipeline_context.Pipeline`), so notebook code is executed and pipelines
+# are compiled one at a time, whichever job worker runs them.
+_DSL_LOCK = threading.Lock()
 
 
 def _normalize_kfp_host(endpoint: str) -> str:
@@ -39,54 +65,79 @@ def _normalize_kfp_host(endpoint: str) -> str:
 class KfpCompileHandler(APIHandler):
     """
     Handler to compile KFP pipelines from source code.
-    Receives python source code, executes it, finds pipeline functions,
-    and returns their metadata or compiled YAML.
+    Receives python source code (or the server-side `notebook_path` of a
+    notebook to take the code cells from), executes it, finds pipeline
+    functions, and returns their metadata or compiled YAML.
     """
 
     @web.authenticated
     async def post(self):
+        raw_body = request_body(self)
+        # The contents manager is not thread-safe: load before the job starts.
+        notebook = await self._load_notebook(raw_body)
+        await respond(
+            self, "compile", raw_body, functools.partial(self._compile, raw_body, notebook)
+        )
+
+    async def _load_notebook(self, raw_body: bytes) -> NotebookSource | None:
+        try:
+            notebook_path = json.loads(raw_body).get("notebook_path")
+        except Exception:
+            return None  # Reported by _compile.
+        if not notebook_path:
+            return None
+        return await load_notebook_source(
+            self.contents_manager, notebook_path, user=_user_key(self)
+        )
+
+    def _compile(
+        self, raw_body: bytes, notebook: NotebookSource | None, progress: Progress
+    ) -> tuple[int, dict]:
         try:
-            body = json.loads(self.request.body)
+            body = json.loads(raw_body)
             action = body.get("action", "inspect")  # 'inspect' or 'compile'
-            source_code = body.get("source_code", "")
+            source_code = notebook.source if notebook else body.get("source_code", "")
             pipeline_name = body.get("pipeline_name", None)
 
             if not source_code:
-                self.set_status(400)
-                self.write(json.dumps({"error": "No source_code provided"}))
-                return
+                if notebook:
+                    return 400, {"error": "The notebook has no code cells."}
+                return 400, {"error": "No source_code provided"}
+
+            if action == "inspect" and notebook:
+                # The same code was inspected before: skip executing it again.
+                cached = cached_inspection(notebook.checksum)
+                if cached is not None:
+                    return 200, {**cached, "notebook": notebook.to_dict()}
 
             # Execute the code in a temporary context to find pipelines
-            pipelines = self._find_pipelines(source_code)
+            progress("executing")
+            with _DSL_LOCK:
+                pipelines = self._find_pipelines(source_code)
 
             if not pipelines:
-                self.write(
-                    json.dumps(
-                        {
-                            "pipelines": [],
-                            "error": "No @dsl.pipeline decorated functions found in the provided code.",
-                        }
-                    )
-                )
-                return
+                return 200, {
+                    "pipelines": [],
+                    "error": "No @dsl.pipeline decorated functions found in the provided code.",
+                }
 
             if action == "inspect":
                 # Return list of detected pipelines and their arguments
-                self.write(
-                    json.dumps(
+                inspection = {
+                    "pipelines": [
                         {
-                            "pipelines": [
-                                {
-                                    "name": p["name"],
-                                    "display_name": p["display_name"],
-                                    "description": p["description"],
-                                    "args": p["args"],
-                                }
-                                for p in pipelines
-                            ]
+                            "name": p["name"],
+                            "display_name": p["display_name"],
+                            "description": p["description"],
+                            "args": p["args"],
                         }
-                    )
-                )
+                        for p in pipelines
+                    ]
+                }
+                if notebook:
+                    remember_inspection(notebook.checksum, inspection)
+                    return 200, {**inspection, "notebook": notebook.to_dict()}
+                return 200, inspection
 
             elif action == "compile":
                 if not pipeline_name:
@@ -98,34 +149,37 @@ class KfpCompileHandler(APIHandler):
                     )
 
                 if not target_pipeline:
-                    self.set_status(404)
-                    self.write(
-                        json.dumps({"error": f"Pipeline '{pipeline_name}' not found."})
-                    )
-                    return
+                    return 404, {"error": f"Pipeline '{pipeline_name}' not found."}
 
                 # Compile to YAML
-                with tempfile.NamedTemporaryFile(suffix=".yaml", delete=False) as tmp:
+                progress("compiling")
+                os.makedirs(compiled_package_dir(), exist_ok=True)
+                with tempfile.NamedTemporaryFile(
+                    suffix=".yaml", dir=compiled_package_dir(), delete=False
+                ) as tmp:
                     package_path = tmp.name
 
                 try:
-                    Compiler().compile(
-                        pipeline_func=target_pipeline["func"], package_path=package_path
-                    )
+                    with _DSL_LOCK:
+                        Compiler().compile(
+                            pipeline_func=target_pipeline["func"], package_path=package_path
+                        )
+                        try:
+                            analysis = analyze_dag(target_pipeline["func"]).to_dict()
+                        except (TypeError, ValueError) as e:
+                            self.log.warning(f"Could not analyze pipeline DAG: {e}")
+                            analysis = None
 
                     with open(package_path) as f:
                         yaml_content = f.read()
 
-                    self.write(
-                        json.dumps(
-                            {
-                                "status": "compiled",
-                                "pipeline_name": target_pipeline["name"],
-                                "package_path": package_path,
-                                "yaml": yaml_content,
-                            }
-                        )
-                    )
+                    return 200, {
+                        "status": "compiled",
+                        "pipeline_name": target_pipeline["name"],
+                        "package_path": package_path,
+                        "yaml": yaml_content,
+                        "analysis": analysis,
+                    }
                 except Exception:
                     # Cleanup on error
                     if os.path.exists(package_path):
@@ -134,10 +188,8 @@ class KfpCompileHandler(APIHandler):
 
         except Exception as e:
             self.log.error(f"Compilation error: {traceback.format_exc()}")
-            self.set_status(500)
-            self.write(
-                json.dumps({"error": str(e), "traceback": traceback.format_exc()})
-            )
+            return 500, {"error": str(e), "traceback": traceback.format_exc()}
+        return 200, {}
 
     def _sanitize_source_code(self, source_code: str) -> str:
         """
@@ -272,36 +324,52 @@ class KfpSubmitHandler(APIHandler):
 
     @web.authenticated
     async def post(self):
+        raw_body = request_body(self)
+        work = functools.partial(
+            self._submit,
+            raw_body,
+            get_config(self),
+            get_server_options(self),
+            invalidator(_user_key(self), "runs"),
+        )
+        await respond(self, "submit", raw_body, work)
+
+    def _submit(
+        self,
+        raw_body: bytes,
+        cfg,
+        options,
+        invalidate_runs: Callable[[], None],
+        progress: Progress,
+    ) -> tuple[int, dict]:
         try:
-            body = json.loads(self.request.body)
+            body = json.loads(raw_body)
             pipeline_package_path = body.get("package_path")  # Path to local YAML
             pipeline_yaml = body.get("pipeline_yaml")  # Or direct YAML content
+            package_id = body.get("package_id")  # Or a package from kfp/packages
             run_name = body.get("run_name", "Notebook Run")
             experiment_id = body.get("experiment_id", None)
             params = body.get("params", {})
 
-            cfg = get_config(self)
             if not cfg.endpoint:
-                self.set_status(400)
-                self.write(
-                    json.dumps(
-                        {
-                            "error": "KFP endpoint is not configured. Set it in the extension settings first."
-                        }
-                    )
-                )
-                return
+                return 400, {
+                    "error": "KFP endpoint is not configured. Set it in the extension settings first."
+                }
 
-            if not pipeline_yaml and not pipeline_package_path:
-                self.set_status(400)
-                self.write(
-                    json.dumps({"error": "No pipeline_yaml or package_path provided"})
-                )
-                return
+            if not pipeline_yaml and not pipeline_package_path and not package_id:
+                return 400, {
+                    "error": "No pipeline_yaml, package_id or package_path provided"
+                }
 
             # Ensure we have a file to submit
             local_file = None
-            if pipeline_yaml:
+            # Stored packages are handed to the SDK as-is and kept for reuse.
+            stored_file = None
+            if package_id:
+                stored_file = local_file = stored_package_path(package_id)
+                if local_file is None:
+                    return 404, {"error": f"Unknown or evicted package_id: {package_id}"}
+            elif pipeline_yaml:
                 import tempfile
 
                 with tempfile.NamedTemporaryFile(
@@ -313,11 +381,7 @@ class KfpSubmitHandler(APIHandler):
                 local_file = pipeline_package_path
 
             if not os.path.exists(local_file):
-                self.set_status(400)
-                self.write(
-                    json.dumps({"error": f"Pipeline file not found: {local_file}"})
-                )
-                return
+                return 400, {"error": f"Pipeline file not found: {local_file}"}
 
             # Initialize KFP Client
             # Note: We need to handle auth. For now assuming Bearer token if provided.
@@ -326,9 +390,7 @@ class KfpSubmitHandler(APIHandler):
             try:
                 host = _normalize_kfp_host(cfg.endpoint)
             except ValueError as e:
-                self.set_status(400)
-                self.write(json.dumps({"error": str(e)}))
-                return
+                return 400, {"error": str(e)}
 
             client_args = {"host": host}
             if cfg.token:
@@ -344,19 +406,15 @@ class KfpSubmitHandler(APIHandler):
             try:
                 client = kfp.Client(**client_args)
             except Exception as e:
-                self.set_status(502)
-                self.write(
-                    json.dumps(
-                        {
-                            "error": "Failed to connect to Kubeflow Pipelines.",
-                            "detail": str(e),
-                            "endpoint": cfg.endpoint,
-                            "normalized_host": host,
-                        }
-                    )
-                )
-                return
-
+                return 502, {
+                    "error": "Failed to connect to Kubeflow Pipelines.",
+                    "detail": str(e),
+                    "endpoint": cfg.endpoint,
+                    "normalized_host": host,
+                }
+
+            breaker = breaker_for(host, options)
+            policy = RetryPolicy.from_options(options)
             try:
                 # Submit run
                 # usage: create_run_from_pipeline_package(pipeline_file, arguments, run_name, experiment_name/id...)
@@ -364,40 +422,51 @@ class KfpSubmitHandler(APIHandler):
                 experiment_name = None
                 if experiment_id:
                     try:
-                        exp = client.get_experiment(experiment_id=experiment_id)
+                        exp = call_resilient(
+                            lambda: client.get_experiment(experiment_id=experiment_id),
+                            idempotent=True,
+                            breaker=breaker,
+                            policy=policy,
+                        )
                         experiment_name = exp.name
+                    except CircuitOpen:
+                        raise
                     except Exception:
                         pass  # Fallback to default or let client handle it
 
-                run_result = client.create_run_from_pipeline_package(
-                    pipeline_file=local_file,
-                    arguments=params,
-                    run_name=run_name,
-                    experiment_name=experiment_name,
-                    enable_caching=True,
+                # Creating a run is not idempotent: never retried, but still
+                # counted by (and failing fast on) the circuit breaker.
+                progress("creating_run")
+                run_result = call_resilient(
+                    lambda: client.create_run_from_pipeline_package(
+                        pipeline_file=local_file,
+                        arguments=params,
+                        run_name=run_name,
+                        experiment_name=experiment_name,
+                        enable_caching=True,
+                    ),
+                    idempotent=False,
+                    breaker=breaker,
+                    policy=policy,
                 )
+                invalidate_runs()
 
-                self.write(
-                    json.dumps(
-                        {
-                            "run_id": run_result.run_id,
-                            "run_name": run_name,
-                            "url": f"{host}/#/runs/details/{run_result.run_id}",
-                        }
-                    )
-                )
+                return 200, {
+                    "run_id": run_result.run_id,
+                    "run_name": run_name,
+                    "url": f"{host}/#/runs/details/{run_result.run_id}",
+                }
 
             finally:
                 # Cleanup temp file
-                if local_file and os.path.exists(local_file):
+                if local_file and local_file != stored_file and os.path.exists(local_file):
                     try:
                         os.unlink(local_file)
                     except Exception:
                         pass
 
+        except CircuitOpen:
+            raise
         except Exception as e:
             self.log.error(f"Submission error: {traceback.format_exc()}")
-            self.set_status(500)
-            self.write(
-                json.dumps({"error": str(e), "traceback": traceback.format_exc()})
-            )
+            return 500, {"error": str(e), "traceback": traceback.format_exc()}
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import functools
 import json
 import os
 import tempfile
+from collections.abc import Callable
 
 from jupyter_server.base.handlers import APIHandler
 from tornado import web
 
-from .config import get_config
+from .config import _user_key, get_config, get_server_options
 from .kfp_compiler import _normalize_kfp_host
+from .server.cache import invalidator
+from .server.compression import request_body
+from .server.jobs import Progress, respond
+from .server.packages import stored_package_path
+from .server.resilience import RetryPolicy, breaker_for, call_resilient
 
 
 def _find_pipeline_id_by_name(
@@ -50,38 +57,53 @@ class KfpImportPipelineHandler(APIHandler):
 
     @web.authenticated
     async def post(self):
+        raw_body = request_body(self)
+        work = functools.partial(
+            self._import,
+            raw_body,
+            get_config(self),
+            get_server_options(self),
+            invalidator(_user_key(self), "pipelines"),
+        )
+        await respond(self, "import", raw_body, work)
+
+    def _import(
+        self,
+        raw_body: bytes,
+        cfg,
+        options,
+        invalidate_pipelines: Callable[[], None],
+        progress: Progress,
+    ) -> tuple[int, dict]:
         try:
-            body = json.loads(self.request.body or b"{}")
+            body = json.loads(raw_body or b"{}")
         except Exception:
-            self.set_status(400)
-            self.write(json.dumps({"error": "Invalid JSON body"}))
-            return
+            return 400, {"error": "Invalid JSON body"}
 
         pipeline_yaml = (body.get("pipeline_yaml") or "").strip()
+        package_id = (body.get("package_id") or "").strip()
         pipeline_name = (body.get("pipeline_name") or "").strip()
         description = (body.get("description") or "").strip() or None
 
-        if not pipeline_yaml:
-            self.set_status(400)
-            self.write(json.dumps({"error": "pipeline_yaml is required"}))
-            return
+        if not pipeline_yaml and not package_id:
+            return 400, {"error": "pipeline_yaml or package_id is required"}
         if not pipeline_name:
-            self.set_status(400)
-            self.write(json.dumps({"error": "pipeline_name is required"}))
-            return
+            return 400, {"error": "pipeline_name is required"}
 
-        cfg = get_config(self)
         if not cfg.endpoint:
-            self.set_status(400)
-            self.write(json.dumps({"error": "KFP endpoint is not configured"}))
-            return
+            return 400, {"error": "KFP endpoint is not configured"}
+
+        # Stored packages are handed to the SDK as-is and kept for reuse.
+        package_file = None
+        if package_id:
+            package_file = stored_package_path(package_id)
+            if package_file is None:
+                return 404, {"error": f"Unknown or evicted package_id: {package_id}"}
 
         try:
             host = _normalize_kfp_host(cfg.endpoint)
         except ValueError as e:
-            self.set_status(400)
-            self.write(json.dumps({"error": str(e)}))
-            return
+            return 400, {"error": str(e)}
 
         import kfp
 
@@ -92,49 +114,44 @@ class KfpImportPipelineHandler(APIHandler):
         try:
             client = kfp.Client(**client_args)
         except Exception as e:
-            self.set_status(502)
-            self.write(
-                json.dumps(
-                    {
-                        "error": "Failed to connect to Kubeflow Pipelines.",
-                        "detail": str(e),
-                        "endpoint": cfg.endpoint,
-                        "normalized_host": host,
-                    }
-                )
-            )
-            return
+            return 502, {
+                "error": "Failed to connect to Kubeflow Pipelines.",
+                "detail": str(e),
+                "endpoint": cfg.endpoint,
+                "normalized_host": host,
+            }
 
         namespace = cfg.namespace or None
         existing_id = _find_pipeline_id_by_name(
             client, pipeline_name=pipeline_name, namespace=namespace
         )
         if existing_id:
-            self.set_status(409)
-            self.write(
-                json.dumps(
-                    {
-                        "error": "A pipeline with this name already exists.",
-                        "pipeline_id": existing_id,
-                        "pipeline_name": pipeline_name,
-                    }
-                )
-            )
-            return
+            return 409, {
+                "error": "A pipeline with this name already exists.",
+                "pipeline_id": existing_id,
+                "pipeline_name": pipeline_name,
+            }
 
         tmp_path = None
         try:
-            with tempfile.NamedTemporaryFile(
-                suffix=".yaml", delete=False, mode="w", encoding="utf-8"
-            ) as tmp:
-                tmp.write(pipeline_yaml)
-                tmp_path = tmp.name
-
-            pipeline = client.upload_pipeline(
-                pipeline_package_path=tmp_path,
-                pipeline_name=pipeline_name,
-                description=description,
-                namespace=namespace,
+            if package_file is None:
+                with tempfile.NamedTemporaryFile(
+                    suffix=".yaml", delete=False, mode="w", encoding="utf-8"
+                ) as tmp:
+                    tmp.write(pipeline_yaml)
+                    package_file = tmp_path = tmp.name
+
+            progress("uploading")
+            pipeline = call_resilient(
+                lambda: client.upload_pipeline(
+                    pipeline_package_path=package_file,
+                    pipeline_name=pipeline_name,
+                    description=description,
+                    namespace=namespace,
+                ),
+                idempotent=False,
+                breaker=breaker_for(host, options),
+                policy=RetryPolicy.from_options(options),
             )
         finally:
             if tmp_path and os.path.exists(tmp_path):
@@ -143,13 +160,10 @@ class KfpImportPipelineHandler(APIHandler):
                 except Exception:
                     pass
 
+        invalidate_pipelines()
         pipeline_id = getattr(pipeline, "pipeline_id", None)
-        self.write(
-            json.dumps(
-                {
-                    "pipeline_id": pipeline_id,
-                    "pipeline_name": pipeline_name,
-                    "url": f"{host}/#/pipelines/details/{pipeline_id}",
-                }
-            )
-        )
+        return 200, {
+            "pipeline_id": pipeline_id,
+            "pipeline_name": pipeline_name,
+            "url": f"{host}/#/pipelines/details/{pipeline_id}",
+        }
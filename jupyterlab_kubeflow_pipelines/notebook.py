@@ -3,7 +3,8 @@ from __future__ import annotations
 import json
 import os
 import tempfile
-from collections.abc import Mapping
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Any
@@ -432,6 +433,83 @@ class KFPClient:
             run_name=run_name or pipeline_name,
         )
 
+    def _runs_matching(
+        self, run_filter: Mapping[str, Any] | str, experiment_id: str | None
+    ) -> list[str]:
+        if not isinstance(run_filter, str):
+            run_filter = json.dumps(run_filter)
+        run_ids: list[str] = []
+        page_token = ""
+        while True:
+            resp = self._client.list_runs(
+                page_token=page_token,
+                page_size=100,
+                experiment_id=experiment_id,
+                namespace=self.namespace,
+                filter=run_filter,
+            )
+            run_ids.extend(r.run_id for r in getattr(resp, "runs", None) or [])
+            page_token = getattr(resp, "next_page_token", "") or ""
+            if not page_token:
+                return run_ids
+
+    def bulk(
+        self,
+        operation: str,
+        run_ids: Iterable[str] | None = None,
+        *,
+        filter: Mapping[str, Any] | str | None = None,
+        experiment_id: str | None = None,
+        max_workers: int = 8,
+    ) -> list[dict[str, Any]]:
+        """
+        Apply `operation` ("terminate", "retry", "archive" or "delete") to many runs.
+
+        Pass `run_ids`, or a KFP list `filter` (predicates dict or its JSON),
+        optionally within `experiment_id`. Runs are processed concurrently by
+        `max_workers` threads sharing the SDK's connection pool, and a failing
+        run does not stop the others. Returns one outcome per run, in order.
+        """
+        calls = {
+            "terminate": self._client.terminate_run,
+            "archive": self._client.archive_run,
+            "delete": self._client.delete_run,
+            # The SDK has no public wrapper for retrying a run; use its
+            # generated run service client when this SDK version has one.
+            "retry": getattr(
+                getattr(self._client, "_run_api", None), "run_service_retry_run", None
+            ),
+        }
+        if operation not in calls:
+            raise ValueError(
+                f"operation must be one of: {', '.join(sorted(calls))}."
+            )
+        if calls[operation] is None:
+            raise RuntimeError(
+                "This kfp SDK version cannot retry runs; upgrade kfp to 2.x."
+            )
+        if (run_ids is None) == (filter is None):
+            raise ValueError("Provide run_ids or filter.")
+        if filter is not None:
+            run_ids = self._runs_matching(filter, experiment_id)
+        call = calls[operation]
+
+        def apply(run_id: str) -> dict[str, Any]:
+            try:
+                call(run_id=run_id)
+            except Exception as e:
+                return {
+                    "run_id": run_id,
+                    "ok": False,
+                    "status": getattr(e, "status", None),
+                    "error": getattr(e, "reason", None) or str(e),
+                }
+            return {"run_id": run_id, "ok": True}
+
+        unique_ids = list(dict.fromkeys(run_ids or []))
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            return list(pool.map(apply, unique_ids))
+
     def _display_card(
         self,
         *,
@@ -1,12 +1,108 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import Any
 
+import numpy as np
+import yaml
+
+from .preview_store import store_preview
+
+MERMAID_MIME = "application/vnd.jupyterlab-kubeflow-pipelines.mermaid+json"
+# A compact preview: reference to a payload kept by the server extension.
+DAG_REF_MIME = "application/vnd.jupyterlab-kubeflow-pipelines.dag-ref+json"
+
+# Level-of-detail defaults of the DAG preview.
+PREVIEW_MAX_DEPTH = 3
+PREVIEW_GROUP_THRESHOLD = 4
+PREVIEW_MAX_NODES = 250
+
+# Node styles per KFP runtime state; every class is always defined so the
+# renderer can restyle nodes in place when their state changes.
+RUN_STATE_STYLES = {
+    "PENDING": "fill:#fff8e1,stroke:#f9a825",
+    "RUNNING": "fill:#e3f2fd,stroke:#1e88e5,stroke-width:2px",
+    "SUCCEEDED": "fill:#e8f5e9,stroke:#43a047",
+    "SKIPPED": "fill:#f5f5f5,stroke:#9e9e9e,stroke-dasharray:4 2",
+    "FAILED": "fill:#ffebee,stroke:#e53935,stroke-width:2px",
+    "CANCELING": "fill:#fbe9e7,stroke:#ff7043",
+    "CANCELED": "fill:#eeeeee,stroke:#757575",
+    "PAUSED": "fill:#ede7f6,stroke:#7e57c2",
+    "RUNTIME_STATE_UNSPECIFIED": "fill:#ffffff,stroke:#bdbdbd",
+}
+# When several executions map to one node (retries, loop iterations), the
+# first state in this order wins.
+_STATE_PRECEDENCE = (
+    "FAILED",
+    "CANCELING",
+    "RUNNING",
+    "PENDING",
+    "PAUSED",
+    "CANCELED",
+    "SUCCEEDED",
+    "SKIPPED",
+    "RUNTIME_STATE_UNSPECIFIED",
+)
+_TERMINAL_RUN_STATES = frozenset({"SUCCEEDED", "SKIPPED", "FAILED", "CANCELED"})
+
 
 @dataclass(frozen=True)
 class DagPreview:
     mermaid: str
+    # sha256 of the pipeline spec the preview was built from.
+    digest: str = ""
+    # Nodes drawn (subgraphs included) and executor tasks they stand for.
+    node_count: int = 0
+    task_count: int = 0
+    # Detail was reduced to fit the node budget / nodes were left out.
+    collapsed: bool = False
+    truncated: bool = False
+
+
+@dataclass(frozen=True)
+class RunDag:
+    """A run's DAG with the state of each task node."""
+
+    run_id: str | None
+    state: str | None
+    mermaid: str
+    # Identifies the graph structure; equal ids differ only in node states.
+    graph_id: str
+    node_states: dict[str, str]
+
+    def to_payload(self, *, title: str | None = None, previous: RunDag | None = None) -> dict:
+        """Mime payload; `changed` lists only the nodes that differ from `previous`."""
+        changed = (
+            diff_node_states(previous.node_states, self.node_states)
+            if previous is not None and previous.graph_id == self.graph_id
+            else dict(self.node_states)
+        )
+        return {
+            "title": title,
+            "mermaid": self.mermaid,
+            "graph_id": self.graph_id,
+            "run_id": self.run_id,
+            "run_state": self.state,
+            "states": self.node_states,
+            "changed": changed,
+        }
+
+
+def _field(obj: Any, name: str, camel: str | None = None) -> Any:
+    """Read a pipeline spec field from a protobuf message or its JSON dict."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(camel or name, obj.get(name))
+    return getattr(obj, name, None)
 
 
 def _safe_mermaid_id(value: str) -> str:
@@ -17,36 +113,149 @@ def _mermaid_escape_label(value: str) -> str:
     return value.replace("\\", "\\\\").replace('"', '\\"')
 
 
-def build_dag_preview(pipeline_func: Any) -> DagPreview:
+def build_dag_preview(
+    pipeline_func: Any,
+    *,
+    max_depth: int = PREVIEW_MAX_DEPTH,
+    group_threshold: int = PREVIEW_GROUP_THRESHOLD,
+    max_nodes: int = PREVIEW_MAX_NODES,
+) -> DagPreview:
     """
     Build a Mermaid DAG preview from a KFP v2 pipeline function.
 
-    This uses the in-memory `pipeline_spec` generated by the KFP DSL.
+    `pipeline_func` is a `@dsl.pipeline` function (its in-memory
+    `pipeline_spec` is used) or a compiled pipeline: YAML text, a path to
+    a package or a spec dict. Previews are cached by spec digest.
+
+    Sub-DAGs (`dsl.ParallelFor`, `dsl.Condition`, nested pipelines) are drawn
+    as subgraphs down to `max_depth` levels and collapsed below. At least
+    `group_threshold` sibling uses of one component with the same inputs are
+    drawn as one node. The preview never exceeds `max_nodes` nodes.
     """
+    pipeline_spec = _load_pipeline_spec(pipeline_func)
+    digest = _spec_digest(pipeline_spec)
+    key = (digest, max_depth, group_threshold, max_nodes)
+    cached = _cache_get(_PREVIEW_CACHE, key)
+    if cached is not None:
+        return cached
+
+    plan = _plan_preview(
+        pipeline_spec,
+        max_depth=max_depth,
+        group_threshold=group_threshold,
+        max_nodes=max_nodes,
+    )
+    preview = DagPreview(
+        mermaid="\n".join(plan.lines()) + "\n",
+        digest=digest,
+        node_count=plan.node_count,
+        task_count=plan.task_count,
+        collapsed=plan.collapsed,
+        truncated=plan.truncated,
+    )
+    _cache_put(_PREVIEW_CACHE, key, preview)
+    return preview
+
+
+def _pipeline_spec(pipeline_func: Any) -> Any:
     pipeline_spec = getattr(pipeline_func, "pipeline_spec", None)
     if pipeline_spec is None:
         raise TypeError(
             "Expected a @dsl.pipeline function (GraphComponent) with pipeline_spec."
         )
+    return pipeline_spec
+
+
+def _load_pipeline_spec(pipeline: Any, *, text_only: bool = False) -> Any:
+    """
+    Pipeline spec of a pipeline function, a compiled pipeline (YAML text or
+    file path) or a spec dict (also a pipeline version's `pipeline_spec`).
+    With `text_only`, strings are always parsed as YAML and never opened as
+    paths, for text sent by a client.
+    """
+    if hasattr(pipeline, "pipeline_spec") and not isinstance(pipeline, dict):
+        return _pipeline_spec(pipeline)
+    if not text_only and (
+        isinstance(pipeline, os.PathLike)
+        or (isinstance(pipeline, str) and "\n" not in pipeline and os.path.isfile(pipeline))
+    ):
+        with open(pipeline, encoding="utf-8") as f:
+            pipeline = f.read()
+    if isinstance(pipeline, (str, bytes)):
+        # Compiled packages may carry a platform spec as a second document.
+        try:
+            documents = list(yaml.safe_load_all(pipeline))
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid pipeline YAML: {e}") from e
+        pipeline = next(
+            (d for d in documents if isinstance(d, dict) and ("root" in d or "pipeline_spec" in d)),
+            None,
+        )
+    if isinstance(pipeline, dict):
+        if "root" not in pipeline and isinstance(pipeline.get("pipeline_spec"), dict):
+            pipeline = pipeline["pipeline_spec"]
+        if "root" in pipeline:
+            return pipeline
+        raise ValueError("Pipeline spec has no root DAG.")
+    raise TypeError(
+        "Expected a @dsl.pipeline function, compiled pipeline YAML, a path or a spec dict."
+    )
+
+
+_PREVIEW_CACHE_SIZE = 16
+# (spec digest, level of detail) -> preview / layout of that spec.
+_PREVIEW_CACHE: OrderedDict[tuple, DagPreview] = OrderedDict()
+_LAYOUT_CACHE: OrderedDict[tuple, DagLayout] = OrderedDict()
+# spec digest -> analysis of that spec.
+_ANALYSIS_CACHE: OrderedDict[str, DagAnalysis] = OrderedDict()
+# The server builds previews on executor threads.
+_CACHE_LOCK = threading.Lock()
 
-    root = getattr(pipeline_spec, "root", None)
-    dag = getattr(root, "dag", None) if root is not None else None
-    tasks = getattr(dag, "tasks", None) if dag is not None else None
+
+def _cache_get(cache: OrderedDict, key) -> Any:
+    with _CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key, value) -> None:
+    with _CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _PREVIEW_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _spec_digest(pipeline_spec: Any) -> str:
+    """sha256 of a pipeline spec, equal for the proto and its JSON dict."""
+    if not isinstance(pipeline_spec, dict):
+        from google.protobuf import json_format
+
+        pipeline_spec = json_format.MessageToDict(pipeline_spec)
+    canonical = json.dumps(pipeline_spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _root_tasks(pipeline_spec: Any) -> Any:
+    tasks = _field(_field(_field(pipeline_spec, "root"), "dag"), "tasks")
     if tasks is None:
         raise ValueError("Pipeline spec has no root.dag.tasks to render.")
+    return tasks
+
+
+def _task_label(task_name: str, task: Any) -> str:
+    return _field(_field(task, "task_info", "taskInfo"), "name") or task_name
 
+
+def _mermaid_graph(tasks: Any) -> list[str]:
     lines: list[str] = ["graph TD"]
 
     for task_name, task in tasks.items():
         node_id = _safe_mermaid_id(task_name)
-        task_info = getattr(task, "task_info", None)
-        label = getattr(task_info, "name", None) if task_info is not None else None
-        label = label or task_name
-
-        component_ref = getattr(task, "component_ref", None)
-        component_name = (
-            getattr(component_ref, "name", None) if component_ref is not None else None
-        )
+        label = _task_label(task_name, task)
+        component_name = _field(_field(task, "component_ref", "componentRef"), "name")
         if component_name:
             display = f"{label}\\n({component_name})"
         else:
@@ -56,22 +265,888 @@ def build_dag_preview(pipeline_func: Any) -> DagPreview:
 
     for task_name, task in tasks.items():
         node_id = _safe_mermaid_id(task_name)
-        dependent_tasks = getattr(task, "dependent_tasks", None) or []
+        dependent_tasks = _field(task, "dependent_tasks", "dependentTasks") or []
         for dep in dependent_tasks:
             lines.append(f"  {_safe_mermaid_id(dep)} --> {node_id}")
 
-    return DagPreview(mermaid="\n".join(lines) + "\n")
+    return lines
+
+
+_KIND_LABELS = {"loop": "ParallelFor", "condition": "Condition", "pipeline": "sub-pipeline"}
+
+
+@dataclass
+class _DagNode:
+    """A task of a (sub-)DAG; `children` is set when it runs a sub-DAG."""
+
+    name: str
+    label: str
+    component: str | None
+    kind: str
+    dependencies: list[str]
+    children: list[_DagNode] | None = None
+    # Executor tasks this node stands for.
+    size: int = 1
+    # ParallelFor item count (None unless a literal list) and parallelism limit.
+    iterations: int | None = None
+    parallelism: int = 0
+
+
+@dataclass
+class _Box:
+    """A visible preview node; subgraphs carry their own boxes and edges."""
+
+    id: str
+    label: str
+    children: list[_Box] | None = None
+    edges: list[tuple[str, str]] | None = None
+
+    @property
+    def count(self) -> int:
+        return 1 + sum(c.count for c in self.children or ())
+
+
+@dataclass
+class _PreviewPlan:
+    boxes: list[_Box]
+    edges: list[tuple[str, str]]
+    task_count: int
+    collapsed: bool = False
+    truncated: bool = False
+
+    @property
+    def node_count(self) -> int:
+        return sum(b.count for b in self.boxes)
+
+    def lines(self) -> Iterator[str]:
+        yield "graph TD"
+        yield from _box_lines(self.boxes, self.edges, "  ")
+
+
+def _has(obj: Any, name: str, camel: str) -> bool:
+    if isinstance(obj, dict):
+        return bool(obj.get(camel) or obj.get(name))
+    try:
+        return obj.HasField(name)
+    except (AttributeError, ValueError):
+        return bool(getattr(obj, name, None))
+
+
+def _dag_nodes(
+    pipeline_spec: Any, tasks: Any, seen: frozenset[str] = frozenset()
+) -> list[_DagNode]:
+    """Resolve tasks, recursing into sub-DAGs from `pipeline_spec.components`."""
+    components = _field(pipeline_spec, "components") or {}
+    nodes: list[_DagNode] = []
+    for name, task in tasks.items():
+        component = _field(_field(task, "component_ref", "componentRef"), "name")
+        sub_tasks = None
+        if component and component in components and component not in seen:
+            sub_tasks = _field(_field(components[component], "dag"), "tasks")
+        if _has(task, "parameter_iterator", "parameterIterator") or _has(
+            task, "artifact_iterator", "artifactIterator"
+        ):
+            kind = "loop"
+        elif _field(_field(task, "trigger_policy", "triggerPolicy"), "condition"):
+            kind = "condition"
+        elif sub_tasks:
+            kind = "pipeline"
+        else:
+            kind = "task"
+        node = _DagNode(
+            name=name,
+            label=_task_label(name, task),
+            component=component,
+            kind=kind,
+            dependencies=list(_field(task, "dependent_tasks", "dependentTasks") or []),
+        )
+        if kind == "loop":
+            items = _field(_field(task, "parameter_iterator", "parameterIterator"), "items")
+            node.iterations = _literal_item_count(_field(items, "raw"))
+            policy = _field(task, "iterator_policy", "iteratorPolicy")
+            node.parallelism = int(_field(policy, "parallelism_limit", "parallelismLimit") or 0)
+        if sub_tasks:
+            node.children = _dag_nodes(pipeline_spec, sub_tasks, seen | {component})
+            node.size = sum(c.size for c in node.children)
+        nodes.append(node)
+    return nodes
+
+
+def _tasks_note(count: int) -> str:
+    return f"{count} task" if count == 1 else f"{count} tasks"
+
+
+def _base_name(value: str | None) -> str:
+    """`train-12` -> `train`: the DSL numbers repeated uses of a component."""
+    return re.sub(r"-\d+$", "", value or "")
+
+
+def _plan_scope(
+    nodes: list[_DagNode], prefix: str, depth: int, max_depth: int, threshold: int
+) -> tuple[list[_Box], list[tuple[str, str]], bool]:
+    """Boxes and edges of one DAG scope; the flag tells if detail was dropped."""
+    collapsed = False
+    groups: dict[tuple, list[_DagNode]] = {}
+    for node in nodes:
+        key = (node.kind, _base_name(node.component), tuple(sorted(node.dependencies)))
+        groups.setdefault(key, []).append(node)
+
+    def box_id(name: str) -> str:
+        safe = _safe_mermaid_id(name)
+        return f"{prefix}__{safe}" if prefix else safe
+
+    box_of: dict[str, str] = {}
+    boxes: list[_Box] = []
+    emitted: set[tuple] = set()
+    for node in nodes:
+        key = (node.kind, _base_name(node.component), tuple(sorted(node.dependencies)))
+        members = groups[key]
+        if len(members) >= max(2, threshold):
+            # Fan-out siblings (same component, same inputs) become one node.
+            collapsed = True
+            gid = box_id(members[0].name) + "_group"
+            box_of[node.name] = gid
+            if key not in emitted:
+                emitted.add(key)
+                size = sum(m.size for m in members)
+                label = f"{_base_name(members[0].label)} ×{len(members)}"
+                if members[0].component:
+                    label += f"\\n({_base_name(members[0].component)}, {_tasks_note(size)})"
+                boxes.append(_Box(gid, label))
+            continue
+
+        bid = box_of[node.name] = box_id(node.name)
+        kind = _KIND_LABELS.get(node.kind)
+        if node.children is not None and depth < max_depth:
+            children, edges, sub_collapsed = _plan_scope(
+                node.children, bid, depth + 1, max_depth, threshold
+            )
+            collapsed = collapsed or sub_collapsed
+            boxes.append(_Box(bid, f"{node.label} ({kind})", children, edges))
+        elif node.children is not None:
+            collapsed = True
+            boxes.append(_Box(bid, f"{node.label}\\n({kind}, {_tasks_note(node.size)})"))
+        elif node.component:
+            boxes.append(_Box(bid, f"{node.label}\\n({node.component})"))
+        else:
+            boxes.append(_Box(bid, node.label))
+
+    # Insertion-ordered set: grouped siblings share their edges.
+    edges: dict[tuple[str, str], None] = {}
+    for node in nodes:
+        for dep in node.dependencies:
+            src, dst = box_of.get(dep), box_of[node.name]
+            if src is not None and src != dst:
+                edges[(src, dst)] = None
+    return boxes, list(edges), collapsed
+
+
+def _truncate(plan: _PreviewPlan, max_nodes: int) -> _PreviewPlan:
+    """Keep the first `max_nodes - 1` top-level boxes in dependency order."""
+    ids = [b.id for b in plan.boxes]
+    indegree = {i: 0 for i in ids}
+    successors: dict[str, list[str]] = {i: [] for i in ids}
+    for src, dst in plan.edges:
+        indegree[dst] += 1
+        successors[src].append(dst)
+    ready = deque(i for i in ids if indegree[i] == 0)
+    order: dict[str, None] = {}
+    while ready:
+        current = ready.popleft()
+        order[current] = None
+        for dst in successors[current]:
+            indegree[dst] -= 1
+            if indegree[dst] == 0:
+                ready.append(dst)
+    # Boxes on a cycle never become ready; they go last.
+    order.update((i, None) for i in ids if i not in order)
+
+    kept: set[str] = set()
+    used = 1
+    by_id = {b.id: b for b in plan.boxes}
+    for box_id in order:
+        box = by_id[box_id]
+        if used + box.count > max_nodes:
+            continue
+        kept.add(box_id)
+        used += box.count
+    hidden = len(ids) - len(kept)
+    boxes = [b for b in plan.boxes if b.id in kept]
+    boxes.append(_Box("more_nodes", f"… {hidden} more nodes"))
+    edges = [e for e in plan.edges if e[0] in kept and e[1] in kept]
+    return _PreviewPlan(boxes, edges, plan.task_count, collapsed=True, truncated=True)
+
+
+def _plan_preview(
+    pipeline_spec: Any, *, max_depth: int, group_threshold: int, max_nodes: int
+) -> _PreviewPlan:
+    """
+    Pick the most detailed rendering that fits in `max_nodes`.
+
+    Detail is reduced step by step: first fan-out siblings are grouped more
+    eagerly, then sub-DAGs are collapsed level by level; as a last resort
+    top-level nodes are dropped behind a "more nodes" placeholder.
+    """
+    nodes = _dag_nodes(pipeline_spec, _root_tasks(pipeline_spec))
+    task_count = sum(n.size for n in nodes)
+    plan = None
+    for depth in range(max(0, max_depth), -1, -1):
+        for threshold in dict.fromkeys((group_threshold, 2)):
+            boxes, edges, collapsed = _plan_scope(nodes, "", 0, depth, threshold)
+            plan = _PreviewPlan(
+                boxes, edges, task_count, collapsed=collapsed or depth < max_depth
+            )
+            if plan.node_count <= max_nodes:
+                return plan
+    assert plan is not None
+    return _truncate(plan, max(2, max_nodes))
+
+
+def _box_lines(boxes: list[_Box], edges: list[tuple[str, str]], indent: str) -> Iterator[str]:
+    for box in boxes:
+        label = _mermaid_escape_label(box.label)
+        if box.children is None:
+            yield f'{indent}{box.id}["{label}"]'
+            continue
+        yield f'{indent}subgraph {box.id}["{label}"]'
+        yield from _box_lines(box.children, box.edges or [], indent + "  ")
+        yield f"{indent}end"
+    for src, dst in edges:
+        yield f"{indent}{src} --> {dst}"
+
+
+def iter_dag_preview_lines(
+    pipeline_spec: Any,
+    *,
+    max_depth: int = PREVIEW_MAX_DEPTH,
+    group_threshold: int = PREVIEW_GROUP_THRESHOLD,
+    max_nodes: int = PREVIEW_MAX_NODES,
+) -> Iterator[str]:
+    """Yield the Mermaid lines of a pipeline spec's preview one by one."""
+    plan = _plan_preview(
+        pipeline_spec,
+        max_depth=max_depth,
+        group_threshold=group_threshold,
+        max_nodes=max_nodes,
+    )
+    return plan.lines()
+
+
+DAG_LAYOUT_MIME = "application/vnd.jupyterlab-kubeflow-pipelines.dag-layout+json"
+
+# Node budget of laid-out previews; Mermaid struggles far below it.
+PREVIEW_LAYOUT_MAX_NODES = 5000
+# Geometry in px; the renderer draws exactly these boxes.
+LAYOUT_NODE_HEIGHT = 40
+LAYOUT_NODE_GAP = 24
+LAYOUT_RANK_GAP = 48
+LAYOUT_GROUP_PADDING = 12
+LAYOUT_GROUP_LABEL = 20
+LAYOUT_MARGIN = 16
+# Barycenter sweeps (down + up) and coordinate refinement passes.
+_LAYOUT_ORDER_SWEEPS = 8
+_LAYOUT_ALIGN_PASSES = 4
+
+
+@dataclass(frozen=True)
+class DagLayout:
+    """A laid-out DAG preview; `payload` is the `DAG_LAYOUT_MIME` document."""
+
+    digest: str
+    payload: dict
+    node_count: int
+    task_count: int
+
+    def to_payload(self, *, title: str | None = None) -> dict:
+        return {"title": title, **self.payload}
+
+
+def _label_width(label: str) -> int:
+    longest = max(len(line) for line in label.split("\n"))
+    return int(min(280, max(60, 7 * longest + 24)))
+
+
+def _flatten_plan(plan: _PreviewPlan):
+    """
+    Leaf boxes, leaf-to-leaf edges and subgraph memberships of a plan.
+
+    An edge into (out of) a subgraph is attached to the subgraph's entry
+    (exit) leaves, i.e. its children without inner predecessors (successors).
+    """
+    leaves: list[_Box] = []
+    entries: dict[str, list[str]] = {}
+    exits: dict[str, list[str]] = {}
+    groups: list[tuple[_Box, list[str]]] = []
+    scopes: list[list[tuple[str, str]]] = [plan.edges]
+
+    def visit(box: _Box) -> list[str]:
+        if not box.children:
+            leaves.append(box)
+            entries[box.id] = exits[box.id] = [box.id]
+            return [box.id]
+        index = len(groups)
+        groups.append((box, []))
+        members = [leaf for child in box.children for leaf in visit(child)]
+        groups[index] = (box, members)
+        inner = box.edges or []
+        scopes.append(inner)
+        has_in = {dst for _, dst in inner}
+        has_out = {src for src, _ in inner}
+        entries[box.id] = [
+            leaf for c in box.children if c.id not in has_in for leaf in entries[c.id]
+        ]
+        exits[box.id] = [
+            leaf for c in box.children if c.id not in has_out for leaf in exits[c.id]
+        ]
+        return members
+
+    for box in plan.boxes:
+        visit(box)
+    edges = list(
+        dict.fromkeys(
+            (a, b)
+            for scope in scopes
+            for src, dst in scope
+            for a in exits[src]
+            for b in entries[dst]
+            if a != b
+        )
+    )
+    return leaves, edges, groups
+
 
+def _rank(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Longest-path layering: every node sits one rank below its deepest parent."""
+    rank = np.zeros(n, dtype=np.int64)
+    for _ in range(n):
+        relaxed = rank.copy()
+        np.maximum.at(relaxed, dst, rank[src] + 1)
+        if np.array_equal(relaxed, rank):
+            break
+        rank = relaxed
+    return rank
 
-def display_dag_preview(pipeline_func: Any, *, title: str | None = None) -> None:
+
+def _by_rank(keys: np.ndarray, ranks: int) -> list[np.ndarray]:
+    """Indices into `keys` grouped by value (0 .. ranks - 1), ascending within a group."""
+    order = np.argsort(keys, kind="stable")
+    bounds = np.searchsorted(keys[order], np.arange(ranks + 1))
+    return [order[bounds[r] : bounds[r + 1]] for r in range(ranks)]
+
+
+def _neighbour_means(
+    layer: np.ndarray,
+    slot: np.ndarray,
+    edges: np.ndarray,
+    fixed: np.ndarray,
+    free: np.ndarray,
+    value: np.ndarray,
+) -> np.ndarray:
+    """
+    Mean `value` of each `layer` node's neighbours over `edges` (the indices
+    of the edges whose `free` end is in the layer); the node's own value when
+    it has none. `slot` maps a node to its index in `layer`.
+    """
+    local = slot[free[edges]]
+    weights = np.bincount(local, weights=value[fixed[edges]], minlength=len(layer))
+    counts = np.bincount(local, minlength=len(layer))
+    return np.where(counts > 0, weights / np.maximum(counts, 1), value[layer])
+
+
+def _crossings(
+    pos: np.ndarray, src: np.ndarray, dst: np.ndarray, edges_by_rank: list[np.ndarray]
+) -> int:
+    total = 0
+    for e in edges_by_rank:
+        a, b = pos[src[e]], pos[dst[e]]
+        total += int(np.sum((a[:, None] < a[None, :]) & (b[:, None] > b[None, :])))
+    return total
+
+
+def _order(
+    rank: np.ndarray, src: np.ndarray, dst: np.ndarray
+) -> np.ndarray:
+    """Crossing-reduced positions within each rank (barycenter heuristic)."""
+    n = len(rank)
+    ranks = int(rank.max()) + 1
+    # Nodes and edges are grouped by rank once, so a sweep is linear in the
+    # size of the graph rather than in ranks times edges.
+    layers = _by_rank(rank, ranks)
+    into = _by_rank(rank[dst], ranks)
+    out_of = _by_rank(rank[src], ranks)
+    pos = np.zeros(n)
+    slot = np.zeros(n, dtype=np.int64)
+    for layer in layers:
+        pos[layer] = slot[layer] = np.arange(len(layer))
+    best, best_crossings = pos.copy(), _crossings(pos, src, dst, out_of)
+
+    def sweep(order_ranks, fixed, free, edges_by_rank) -> None:
+        for r in order_ranks:
+            layer = layers[r]
+            bary = _neighbour_means(layer, slot, edges_by_rank[r], fixed, free, pos)
+            ordered = layer[np.lexsort((pos[layer], bary))]
+            pos[ordered] = np.arange(len(ordered))
+
+    for _ in range(_LAYOUT_ORDER_SWEEPS):
+        if best_crossings == 0:
+            break
+        sweep(range(1, ranks), src, dst, into)
+        sweep(range(ranks - 2, -1, -1), dst, src, out_of)
+        crossings = _crossings(pos, src, dst, out_of)
+        if crossings < best_crossings:
+            best, best_crossings = pos.copy(), crossings
+    return best
+
+
+def _coordinates(
+    rank: np.ndarray, pos: np.ndarray, width: np.ndarray, src: np.ndarray, dst: np.ndarray
+) -> np.ndarray:
+    """
+    Horizontal centers: nodes are pulled towards the mean of their neighbours
+    while keeping `LAYOUT_NODE_GAP` between boxes of a rank.
+    """
+    n = len(rank)
+    ranks = int(rank.max()) + 1
+    layers = [layer[np.argsort(pos[layer])] for layer in _by_rank(rank, ranks)]
+    into = _by_rank(rank[dst], ranks)
+    out_of = _by_rank(rank[src], ranks)
+    slot = np.zeros(n, dtype=np.int64)
+    for layer in layers:
+        slot[layer] = np.arange(len(layer))
+    x = np.zeros(n)
+    # Minimal offset of each node from the first one of its rank.
+    offset = np.zeros(n)
+    for layer in layers:
+        w = width[layer]
+        steps = (w[:-1] + w[1:]) / 2 + LAYOUT_NODE_GAP
+        offset[layer] = np.concatenate(([0.0], np.cumsum(steps)))
+        x[layer] = offset[layer] - offset[layer][-1] / 2
+
+    def align(order_ranks, fixed, free, edges_by_rank) -> None:
+        for r in order_ranks:
+            layer = layers[r]
+            desired = _neighbour_means(layer, slot, edges_by_rank[r], fixed, free, x)
+            c = offset[layer]
+            # Closest placements at or right of / at or left of `desired` that
+            # keep the gaps; their mean keeps the gaps as well.
+            right = c + np.maximum.accumulate(desired - c)
+            left = c + np.minimum.accumulate((desired - c)[::-1])[::-1]
+            x[layer] = (right + left) / 2
+
+    for _ in range(_LAYOUT_ALIGN_PASSES):
+        align(range(1, ranks), src, dst, into)
+        align(range(ranks - 2, -1, -1), dst, src, out_of)
+    return x
+
+
+def _layout_plan(plan: _PreviewPlan) -> dict:
+    leaves, leaf_edges, groups = _flatten_plan(plan)
+    index = {box.id: i for i, box in enumerate(leaves)}
+    n_real = len(leaves)
+    labels = [box.label.replace("\\n", "\n") for box in leaves]
+    if n_real == 0:
+        return {
+            "width": 0,
+            "height": 0,
+            "node_height": LAYOUT_NODE_HEIGHT,
+            "nodes": [],
+            "edges": [],
+            "groups": [],
+        }
+
+    src = np.array([index[a] for a, _ in leaf_edges], dtype=np.int64)
+    dst = np.array([index[b] for _, b in leaf_edges], dtype=np.int64)
+    rank = _rank(n_real, src, dst)
+
+    # Edges spanning several ranks run through one dummy node per rank.
+    ranks = list(rank)
+    seg_src: list[int] = []
+    seg_dst: list[int] = []
+    chains: list[list[int]] = []
+    for a, b in zip(src.tolist(), dst.tolist()):
+        chain = [a]
+        for r in range(ranks[a] + 1, ranks[b]):
+            chain.append(len(ranks))
+            ranks.append(r)
+        chain.append(b)
+        chains.append(chain)
+        seg_src.extend(chain[:-1])
+        seg_dst.extend(chain[1:])
+    rank = np.array(ranks, dtype=np.int64)
+    seg_src_arr = np.array(seg_src, dtype=np.int64)
+    seg_dst_arr = np.array(seg_dst, dtype=np.int64)
+    # Upward edges (only possible in a malformed, cyclic spec) are not
+    # layered; leave them out of ordering and alignment.
+    forward = rank[seg_src_arr] < rank[seg_dst_arr]
+    seg_src_arr, seg_dst_arr = seg_src_arr[forward], seg_dst_arr[forward]
+
+    width = np.zeros(len(rank))
+    width[:n_real] = [_label_width(label) for label in labels]
+    pos = _order(rank, seg_src_arr, seg_dst_arr)
+    x = _coordinates(rank, pos, width, seg_src_arr, seg_dst_arr)
+    x += LAYOUT_MARGIN - float(np.min(x - width / 2))
+    y = LAYOUT_MARGIN + rank * (LAYOUT_NODE_HEIGHT + LAYOUT_RANK_GAP) + LAYOUT_NODE_HEIGHT / 2
+
+    half = LAYOUT_NODE_HEIGHT / 2
+    nodes = [
+        [box.id, labels[i], round(x[i]), round(y[i]), int(width[i])]
+        for i, box in enumerate(leaves)
+    ]
+    edges = []
+    for chain in chains:
+        a, b = chain[0], chain[-1]
+        points = [round(x[a]), round(y[a] + half)]
+        for d in chain[1:-1]:
+            points += [round(x[d]), round(y[d])]
+        points += [round(x[b]), round(y[b] - half)]
+        edges.append([a, b, points])
+
+    # Subgraph frames, innermost first so they can be enclosed by their parents.
+    frames: dict[str, list[float]] = {}
+    for box, members in reversed(groups):
+        ids = [index[m] for m in members]
+        x0 = float(np.min(x[ids] - width[ids] / 2))
+        x1 = float(np.max(x[ids] + width[ids] / 2))
+        y0 = float(np.min(y[ids])) - half
+        y1 = float(np.max(y[ids])) + half
+        for child in box.children or ():
+            if child.id in frames:
+                cx0, cy0, cx1, cy1 = frames[child.id]
+                x0, y0, x1, y1 = min(x0, cx0), min(y0, cy0), max(x1, cx1), max(y1, cy1)
+        frames[box.id] = [
+            x0 - LAYOUT_GROUP_PADDING,
+            y0 - LAYOUT_GROUP_PADDING - LAYOUT_GROUP_LABEL,
+            x1 + LAYOUT_GROUP_PADDING,
+            y1 + LAYOUT_GROUP_PADDING,
+        ]
+    frame_list = [
+        [box.id, box.label.replace("\\n", "\n"), *(round(v) for v in frames[box.id])]
+        for box, _ in groups
+    ]
+    # Frames may reach above the first rank; shift everything below the margin.
+    top = min([LAYOUT_MARGIN] + [f[3] for f in frame_list])
+    left = min([LAYOUT_MARGIN] + [f[2] for f in frame_list])
+    dx, dy = LAYOUT_MARGIN - left, LAYOUT_MARGIN - top
+    if dx or dy:
+        for node in nodes:
+            node[2] += dx
+            node[3] += dy
+        for edge in edges:
+            edge[2] = [v + (dx if i % 2 == 0 else dy) for i, v in enumerate(edge[2])]
+        for frame in frame_list:
+            frame[2:] = [frame[2] + dx, frame[3] + dy, frame[4] + dx, frame[5] + dy]
+
+    right = max([n[2] + n[4] / 2 for n in nodes] + [f[4] for f in frame_list])
+    bottom = max([n[3] + half for n in nodes] + [f[5] for f in frame_list])
+    return {
+        "width": int(right + LAYOUT_MARGIN),
+        "height": int(bottom + LAYOUT_MARGIN),
+        "node_height": LAYOUT_NODE_HEIGHT,
+        "nodes": nodes,
+        "edges": edges,
+        "groups": frame_list,
+    }
+
+
+def build_dag_layout(
+    pipeline_func: Any,
+    *,
+    max_depth: int = PREVIEW_MAX_DEPTH,
+    group_threshold: int = PREVIEW_GROUP_THRESHOLD,
+    max_nodes: int = PREVIEW_LAYOUT_MAX_NODES,
+) -> DagLayout:
+    """
+    Lay out a pipeline's DAG preview server-side (layered, Sugiyama-style).
+
+    The graph is the one `build_dag_preview` would draw with the same
+    level-of-detail keywords. Nodes are ranked by longest path, ordered per
+    rank to reduce edge crossings and given coordinates, so the frontend only
+    has to draw them. Results are cached by spec digest.
+    """
+    pipeline_spec = _load_pipeline_spec(pipeline_func)
+    digest = _spec_digest(pipeline_spec)
+    key = (digest, max_depth, group_threshold, max_nodes)
+    cached = _cache_get(_LAYOUT_CACHE, key)
+    if cached is not None:
+        return cached
+
+    plan = _plan_preview(
+        pipeline_spec,
+        max_depth=max_depth,
+        group_threshold=group_threshold,
+        max_nodes=max_nodes,
+    )
+    payload = {
+        "digest": digest,
+        **_layout_plan(plan),
+        "node_count": plan.node_count,
+        "task_count": plan.task_count,
+        "collapsed": plan.collapsed,
+        "truncated": plan.truncated,
+    }
+    layout = DagLayout(
+        digest=digest,
+        payload=payload,
+        node_count=plan.node_count,
+        task_count=plan.task_count,
+    )
+    _cache_put(_LAYOUT_CACHE, key, layout)
+    return layout
+
+
+@dataclass(frozen=True)
+class DagAnalysis:
+    """
+    Shape of a pipeline's executor DAG, sub-DAGs expanded.
+
+    Estimates are upper bounds: conditional branches count as taken, and
+    `ParallelFor` loops over literal item lists count each item (capped by
+    `parallelism` for concurrency). Loops over pipeline inputs or task
+    outputs are listed with multiplicity `None` and counted once.
+    """
+
+    # Executor tasks in the spec, and runs of them including loop iterations.
+    task_count: int
+    execution_count: int
+    # Concurrent executions per topological level (longest-path layering).
+    level_widths: list[int]
+    # Longest dependency chain, as `/`-joined task paths.
+    critical_path: list[str]
+    # ParallelFor task path -> iterations (None when not known before the run).
+    loops: dict[str, int | None]
+
+    @property
+    def max_width(self) -> int:
+        return max(self.level_widths, default=0)
+
+    @property
+    def critical_path_length(self) -> int:
+        return len(self.critical_path)
+
+    def summary(self) -> str:
+        text = (
+            f"{self.task_count} tasks, {self.execution_count} executions; "
+            f"critical path {self.critical_path_length}; max width {self.max_width}"
+        )
+        dynamic = sum(1 for v in self.loops.values() if v is None)
+        if dynamic:
+            text += f" ({dynamic} dynamic loop{'s' if dynamic > 1 else ''} counted once)"
+        return text
+
+    def to_dict(self) -> dict:
+        return {
+            "task_count": self.task_count,
+            "execution_count": self.execution_count,
+            "level_widths": self.level_widths,
+            "max_width": self.max_width,
+            "critical_path": self.critical_path,
+            "critical_path_length": self.critical_path_length,
+            "loops": self.loops,
+            "summary": self.summary(),
+        }
+
+
+def _literal_item_count(raw: Any) -> int | None:
+    """Number of items of a `ParallelFor` over a literal list (JSON in `raw`)."""
+    if not raw:
+        return None
+    try:
+        items = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return len(items) if isinstance(items, list) else None
+
+
+def _executor_graph(nodes: list[_DagNode]):
+    """
+    Executor tasks with total and concurrent multiplicities, and the edges
+    between them; dependencies on a sub-DAG bind to its exit tasks and
+    dependencies of a sub-DAG to its entry tasks.
+    """
+    names: list[str] = []
+    total: list[int] = []
+    concurrent: list[int] = []
+    edges: list[tuple[int, int]] = []
+    loops: dict[str, int | None] = {}
+
+    def visit(scope: list[_DagNode], path: str, times: int, width: int):
+        entries: dict[str, list[int]] = {}
+        exits: dict[str, list[int]] = {}
+        for node in scope:
+            qualified = f"{path}/{node.name}" if path else node.name
+            if node.children is None:
+                entries[node.name] = exits[node.name] = [len(names)]
+                names.append(qualified)
+                total.append(times)
+                concurrent.append(width)
+                continue
+            node_times, node_width = times, width
+            if node.kind == "loop":
+                loops[qualified] = node.iterations
+                count = node.iterations or 1
+                node_times *= count
+                node_width *= min(count, node.parallelism) if node.parallelism else count
+            entries[node.name], exits[node.name] = visit(
+                node.children, qualified, node_times, node_width
+            )
+        has_in: set[str] = set()
+        has_out: set[str] = set()
+        for node in scope:
+            for dep in node.dependencies:
+                if dep not in exits:
+                    continue
+                has_in.add(node.name)
+                has_out.add(dep)
+                edges.extend((a, b) for a in exits[dep] for b in entries[node.name])
+        return (
+            [i for n in scope if n.name not in has_in for i in entries[n.name]],
+            [i for n in scope if n.name not in has_out for i in exits[n.name]],
+        )
+
+    visit(nodes, "", 1, 1)
+    return names, total, concurrent, edges, loops
+
+
+def analyze_dag(pipeline: Any) -> DagAnalysis:
+    """
+    Fan-out and depth of a pipeline before it is submitted.
+
+    `pipeline` is a `@dsl.pipeline` function, a compiled pipeline (YAML text
+    or file path) or its pipeline spec dict. The widest level tells how many
+    pods may run at once; the critical path how many tasks run one after
+    another at least.
+    """
+    pipeline_spec = _load_pipeline_spec(pipeline)
+    digest = _spec_digest(pipeline_spec)
+    cached = _cache_get(_ANALYSIS_CACHE, digest)
+    if cached is not None:
+        return cached
+
+    nodes = _dag_nodes(pipeline_spec, _root_tasks(pipeline_spec))
+    names, total, concurrent, edges, loops = _executor_graph(nodes)
+    if not names:
+        return DagAnalysis(0, 0, [], [], loops)
+
+    n = len(names)
+    src = np.array([a for a, _ in edges], dtype=np.int64)
+    dst = np.array([b for _, b in edges], dtype=np.int64)
+    rank = _rank(n, src, dst)
+    widths = np.bincount(rank, weights=np.array(concurrent, dtype=np.float64))
+
+    # Walk back from the deepest task through parents one level up.
+    parent = np.full(n, -1, dtype=np.int64)
+    tight = rank[src] + 1 == rank[dst]
+    parent[dst[tight]] = src[tight]
+    path = [int(np.argmax(rank))]
+    while parent[path[-1]] >= 0 and len(path) <= n:
+        path.append(int(parent[path[-1]]))
+
+    analysis = DagAnalysis(
+        task_count=n,
+        execution_count=int(sum(total)),
+        level_widths=[int(w) for w in widths],
+        critical_path=[names[i] for i in reversed(path)],
+        loops=loops,
+    )
+    _cache_put(_ANALYSIS_CACHE, digest, analysis)
+    return analysis
+
+
+def _merge_state(current: str | None, state: str) -> str:
+    if current is None:
+        return state
+    rank = {s: i for i, s in enumerate(_STATE_PRECEDENCE)}
+    last = len(_STATE_PRECEDENCE)
+    return state if rank.get(state, last) < rank.get(current, last) else current
+
+
+def build_run_dag(run: dict[str, Any]) -> RunDag:
+    """
+    Join a run's compiled DAG with its `run_details.task_details` states.
+
+    `run` is a KFP v2beta1 run as returned by the REST API (or the SDK's
+    `to_dict()`), including `pipeline_spec`. Tasks are matched to DAG nodes
+    by display name; nodes without an execution yet are `PENDING`.
+    """
+    pipeline_spec = run.get("pipeline_spec")
+    if not pipeline_spec:
+        raise ValueError("Run has no pipeline_spec (runs of pipeline versions need it fetched).")
+    tasks = _root_tasks(pipeline_spec)
+    lines = _mermaid_graph(tasks)
+    graph_id = hashlib.sha256("\n".join(lines).encode()).hexdigest()[:16]
+
+    by_name: dict[str, str] = {}
+    for name, task in tasks.items():
+        by_name[name] = name
+        by_name.setdefault(_task_label(name, task), name)
+
+    task_details = (run.get("run_details") or {}).get("task_details") or []
+    states: dict[str, str] = {}
+    for detail in task_details:
+        task_name = by_name.get(detail.get("display_name") or "")
+        if task_name is None:
+            continue
+        node_id = _safe_mermaid_id(task_name)
+        state = detail.get("state") or "RUNTIME_STATE_UNSPECIFIED"
+        states[node_id] = _merge_state(states.get(node_id), state)
+    node_states = {
+        _safe_mermaid_id(name): states.get(_safe_mermaid_id(name), "PENDING")
+        for name in tasks.keys()
+    }
+
+    for state, style in RUN_STATE_STYLES.items():
+        lines.append(f"  classDef {_state_class(state)} {style}")
+    grouped: dict[str, list[str]] = {}
+    for node_id, state in node_states.items():
+        grouped.setdefault(state, []).append(node_id)
+    for state, node_ids in grouped.items():
+        lines.append(f"  class {','.join(node_ids)} {_state_class(state)}")
+
+    return RunDag(
+        run_id=run.get("run_id"),
+        state=run.get("state"),
+        mermaid="\n".join(lines) + "\n",
+        graph_id=graph_id,
+        node_states=node_states,
+    )
+
+
+def _state_class(state: str) -> str:
+    return f"kfp_{state.lower()}"
+
+
+def diff_node_states(old: dict[str, str], new: dict[str, str]) -> dict[str, str]:
+    """Nodes whose state changed (or appeared) between two snapshots."""
+    return {node: state for node, state in new.items() if old.get(node) != state}
+
+
+def display_dag_preview(
+    pipeline_func: Any,
+    *,
+    title: str | None = None,
+    layout: bool | None = None,
+    compact: bool = False,
+    max_depth: int = PREVIEW_MAX_DEPTH,
+    group_threshold: int = PREVIEW_GROUP_THRESHOLD,
+    max_nodes: int = PREVIEW_MAX_NODES,
+) -> None:
     """
     Render a pipeline DAG preview inside a notebook cell.
 
     Emits a custom mimetype that the JupyterLab extension can render using the
-    bundled Mermaid dependency.
-    """
-    preview = build_dag_preview(pipeline_func)
+    bundled Mermaid dependency. `pipeline_func` may also be a compiled
+    pipeline (YAML text, package path or spec dict). The level-of-detail
+    keywords are those of `build_dag_preview`. A summary of `analyze_dag`
+    (fan-out, critical path) is shown with the graph.
 
+    With `layout=True` the graph is laid out server-side (`build_dag_layout`)
+    and the extension only draws it; by default that happens when the
+    full-detail graph has more than `max_nodes` nodes, instead of collapsing
+    it for Mermaid. With `compact=True` the graph is kept out of the notebook:
+    it is stored once by the server extension (see `preview_store`) and the
+    output only holds a reference and the summary, fetched when scrolled into
+    view.
+    """
     try:
         from IPython.display import display
     except ImportError:
@@ -79,6 +1154,93 @@ def display_dag_preview(pipeline_func: Any, *, title: str | None = None) -> None
             "IPython is required to display a DAG preview in a notebook."
         )
 
-    mime = "application/vnd.jupyterlab-kubeflow-pipelines.mermaid+json"
-    payload = {"title": title, "mermaid": preview.mermaid}
-    display({mime: payload, "text/plain": preview.mermaid}, raw=True)
+    summary = analyze_dag(pipeline_func).summary()
+    detail = {"max_depth": max_depth, "group_threshold": group_threshold}
+    if layout is None:
+        # Planning is cheap; only lay the graph out when Mermaid would have
+        # to collapse it.
+        plan = _plan_preview(
+            _load_pipeline_spec(pipeline_func), max_nodes=PREVIEW_LAYOUT_MAX_NODES, **detail
+        )
+        layout = plan.node_count > max_nodes
+    if layout:
+        dag_layout = build_dag_layout(pipeline_func, **detail)
+        mime = DAG_LAYOUT_MIME
+        payload = {**dag_layout.to_payload(title=title), "summary": summary}
+        node_count = dag_layout.node_count
+        text = f"Pipeline DAG: {node_count} nodes; {summary}"
+    else:
+        preview = build_dag_preview(pipeline_func, max_nodes=max_nodes, **detail)
+        mime = MERMAID_MIME
+        payload = {"title": title, "mermaid": preview.mermaid, "summary": summary}
+        node_count = preview.node_count
+        text = preview.mermaid
+
+    if compact:
+        reference = {
+            "ref": store_preview({"mime": mime, "payload": payload}),
+            "title": title,
+            "summary": summary,
+            "node_count": node_count,
+        }
+        text = f"Pipeline DAG: {node_count} nodes; {summary}"
+        display({DAG_REF_MIME: reference, "text/plain": text}, raw=True)
+        return
+    display({mime: payload, "text/plain": text}, raw=True)
+
+
+def _run_dict(run: Any) -> dict[str, Any]:
+    if isinstance(run, dict):
+        return run
+    if hasattr(run, "to_dict"):
+        return run.to_dict()
+    raise TypeError("Expected a KFP run (dict or SDK model).")
+
+
+def display_run_dag(
+    run: Any,
+    *,
+    title: str | None = None,
+    poll_interval: float = 5,
+    timeout: float | None = None,
+) -> RunDag:
+    """
+    Render a run's DAG with live task states inside a notebook cell.
+
+    `run` is a `Run` created through `KFPClient` (refreshed until it
+    finishes) or a KFP run dict/SDK model (rendered once). Refreshes go
+    through one display handle and are only sent when some node changed;
+    they list the changed nodes so the renderer restyles just those.
+    """
+    try:
+        from IPython.display import display
+    except ImportError:
+        raise RuntimeError("IPython is required to display a run DAG in a notebook.")
+
+    client = getattr(run, "_kfp_client", None)
+    run_id = getattr(run, "run_id", None)
+    if client is None and hasattr(run, "_kfp_client"):
+        raise RuntimeError(
+            "display_run_dag() needs a Run created via KFPClient.create_run_from_*()."
+        )
+
+    def fetch() -> RunDag:
+        return build_run_dag(_run_dict(client.get_run(run_id) if client else run))
+
+    def bundle(dag: RunDag, previous: RunDag | None) -> dict:
+        payload = dag.to_payload(title=title or dag.run_id, previous=previous)
+        return {MERMAID_MIME: payload, "text/plain": dag.mermaid}
+
+    dag = fetch()
+    handle = display(bundle(dag, None), raw=True, display_id=True)
+    start = time.monotonic()
+    while client is not None and dag.state not in _TERMINAL_RUN_STATES:
+        if timeout is not None and time.monotonic() - start >= timeout:
+            break
+        time.sleep(max(0.1, poll_interval))
+        previous, dag = dag, fetch()
+        if dag.graph_id != previous.graph_id or diff_node_states(
+            previous.node_states, dag.node_states
+        ):
+            handle.update(bundle(dag, previous), raw=True)
+    return dag
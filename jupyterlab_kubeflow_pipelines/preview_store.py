@@ -0,0 +1,91 @@
+"""
+Content-addressed store for compact DAG preview payloads.
+
+Compact previews keep the graph out of the notebook: the kernel writes the
+gzip-compressed payload here once, keyed by the sha256 of its JSON, and the
+output only references that digest. The server extension serves the stored
+bytes from `/jupyterlab-kubeflow-pipelines/previews/{digest}`. Kernel and
+server share the Jupyter runtime directory, so no other coordination is
+needed. The oldest payloads are evicted beyond `PREVIEW_STORE_MAX_BYTES`.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from jupyter_core.paths import jupyter_runtime_dir
+
+PREVIEW_STORE_MAX_BYTES = 256 * 1024 * 1024
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def preview_store_dir() -> str:
+    return os.path.join(jupyter_runtime_dir(), "jupyterlab_kubeflow_pipelines", "previews")
+
+
+def is_preview_digest(value: str) -> bool:
+    return bool(_DIGEST.match(value))
+
+
+def _payload_path(directory: str, digest: str) -> str:
+    return os.path.join(directory, f"{digest}.json.gz")
+
+
+def store_preview(payload: dict, *, directory: str | None = None) -> str:
+    """Store a preview payload (once) and return its digest."""
+    directory = directory or preview_store_dir()
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    path = _payload_path(directory, digest)
+    if os.path.exists(path):
+        # Refresh the access time so eviction keeps previews still in use.
+        os.utime(path)
+        return digest
+
+    os.makedirs(directory, exist_ok=True)
+    # Write atomically so the server never serves a partial payload.
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        # mtime=0 keeps the compressed bytes a function of the payload.
+        f.write(gzip.compress(body, mtime=0))
+    os.replace(tmp, path)
+    _evict(directory)
+    return digest
+
+
+def read_preview(digest: str, *, directory: str | None = None) -> bytes | None:
+    """The gzip-compressed payload stored under `digest`, if still present."""
+    if not is_preview_digest(digest):
+        return None
+    try:
+        with open(_payload_path(directory or preview_store_dir(), digest), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _evict(directory: str, max_bytes: int = PREVIEW_STORE_MAX_BYTES) -> None:
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json.gz"):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -133,6 +133,21 @@ class Run:
 
             time.sleep(max(0.1, poll_interval))
 
+    def display_dag(
+        self, *, poll_interval: float = 5, timeout: float | None = None
+    ) -> dict[str, Any]:
+        """
+        Show the run's DAG with live task states, refreshed until it completes.
+
+        Only nodes whose state changed are restyled on each refresh.
+        """
+        from .preview import display_run_dag
+
+        dag = display_run_dag(
+            self, title=self.label, poll_interval=poll_interval, timeout=timeout
+        )
+        return {"run_id": self.run_id, "state": dag.state, "tasks": dag.node_states}
+
     def terminate(self) -> None:
         """
         Ask the JupyterLab extension to terminate the run.
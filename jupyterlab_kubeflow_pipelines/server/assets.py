@@ -0,0 +1,221 @@
+"""
+Disk cache for fingerprinted KFP UI static assets.
+
+The KFP frontend ships content-hashed bundles (`static/js/main.<hash>.js`,
+`static/css/main.<hash>.css`, ...). Their content never changes for a given
+URL, so they are stored on disk once per upstream endpoint and served with
+long-lived `immutable` cache headers. Entries are revalidated upstream with
+their ETag after `ui_asset_revalidate_after` seconds and evicted
+least-recently-used beyond `ui_asset_cache_max_bytes`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+
+from jupyter_core.paths import jupyter_runtime_dir
+
+# `name.<hex hash>[.chunk].<ext>` as emitted by the KFP UI's webpack build.
+_FINGERPRINTED = re.compile(
+    r"(^|/)[^/]+\.[0-9a-f]{8,}(\.chunk)?\."
+    r"(js|css|map|svg|png|jpe?g|gif|ico|woff2?|ttf|eot)$"
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def is_fingerprinted_asset(path: str) -> bool:
+    return bool(_FINGERPRINTED.search(path.split("?", 1)[0]))
+
+
+def default_asset_cache_dir() -> str:
+    return os.path.join(jupyter_runtime_dir(), "jupyterlab_kubeflow_pipelines", "ui-assets")
+
+
+@dataclass(frozen=True)
+class AssetEntry:
+    key: str
+    path: str
+    # Strong validator served to browsers (derived from the body).
+    etag: str
+    content_type: str
+    size: int
+    stored_at: float
+    # Validator for revalidating upstream, if KFP sent one.
+    upstream_etag: str | None = None
+
+
+async def _in_executor(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+class StaticAssetCache:
+    """
+    LRU of asset bodies on disk, with metadata kept next to each body.
+
+    The index lives in memory and is only touched on the event loop; file
+    reads, writes and the initial directory scan run on the default executor.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, AssetEntry] | None = None
+        self._loading: asyncio.Future | None = None
+        self._total = 0
+
+    @staticmethod
+    def key(endpoint: str, path: str) -> str:
+        return hashlib.sha256(f"{endpoint}\n{path.lstrip('/')}".encode()).hexdigest()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.body")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _scan(self) -> list[AssetEntry]:
+        """Entries found on disk, oldest access first."""
+        entries: list[tuple[float, AssetEntry]] = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(self.directory, name)
+                try:
+                    with open(meta_path, encoding="utf-8") as f:
+                        entry = AssetEntry(**json.load(f))
+                    accessed = os.stat(self._body_path(entry.key)).st_atime
+                except (OSError, TypeError, ValueError):
+                    continue
+                entries.append((accessed, entry))
+        entries.sort(key=lambda item: item[0])
+        return [entry for _, entry in entries]
+
+    async def _index(self) -> OrderedDict[str, AssetEntry]:
+        """Load the index from disk on first use; concurrent callers share it."""
+        if self._entries is not None:
+            return self._entries
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(_in_executor(self._scan))
+        scanned = await asyncio.shield(self._loading)
+        if self._entries is None:
+            self._entries = OrderedDict((e.key, e) for e in scanned)
+            self._total = sum(e.size for e in self._entries.values())
+        return self._entries
+
+    async def get(self, key: str) -> AssetEntry | None:
+        entries = await self._index()
+        entry = entries.get(key)
+        if entry is not None:
+            entries.move_to_end(key)
+        return entry
+
+    def _read_body(self, key: str) -> bytes:
+        with open(self._body_path(key), "rb") as f:
+            return f.read()
+
+    async def read(self, entry: AssetEntry) -> bytes | None:
+        try:
+            return await _in_executor(self._read_body, entry.key)
+        except OSError:
+            await self.discard(entry.key)
+            return None
+
+    async def touch(self, entry: AssetEntry) -> AssetEntry:
+        """Mark an entry as freshly revalidated."""
+        refreshed = replace(entry, stored_at=time.time())
+        await _in_executor(self._write_meta, refreshed)
+        entries = await self._index()
+        if entry.key in entries:
+            entries[entry.key] = refreshed
+        return refreshed
+
+    def _write_files(self, entry: AssetEntry, body: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Write atomically so a concurrent reader never sees a partial body.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp, self._body_path(entry.key))
+        self._write_meta(entry)
+
+    async def put(
+        self,
+        key: str,
+        *,
+        path: str,
+        content_type: str,
+        body: bytes,
+        upstream_etag: str | None = None,
+    ) -> AssetEntry | None:
+        """Store an asset body; returns None if it can never fit the cache."""
+        if len(body) > self.max_bytes:
+            return None
+        entries = await self._index()
+        self._forget(key)
+        entry = AssetEntry(
+            key=key,
+            path=path,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            content_type=content_type,
+            size=len(body),
+            stored_at=time.time(),
+            upstream_etag=upstream_etag,
+        )
+        await _in_executor(self._write_files, entry, body)
+        self._forget(key)
+        entries[key] = entry
+        self._total += entry.size
+        await self._evict()
+        return entry
+
+    def _forget(self, key: str) -> None:
+        entry = (self._entries or {}).pop(key, None)
+        if entry is not None:
+            self._total -= entry.size
+
+    def _unlink(self, key: str) -> None:
+        for file_path in (self._body_path(key), self._meta_path(key)):
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                pass
+
+    async def discard(self, key: str) -> None:
+        await self._index()
+        self._forget(key)
+        await _in_executor(self._unlink, key)
+
+    def _write_meta(self, entry: AssetEntry) -> None:
+        with open(self._meta_path(entry.key), "w", encoding="utf-8") as f:
+            json.dump(asdict(entry), f)
+
+    async def _evict(self) -> None:
+        entries = await self._index()
+        evicted = []
+        while self._total > self.max_bytes and entries:
+            oldest = next(iter(entries))
+            self._forget(oldest)
+            evicted.append(oldest)
+        for key in evicted:
+            await _in_executor(self._unlink, key)
+
+
+_ASSET_CACHES: dict[str, StaticAssetCache] = {}
+
+
+def asset_cache(directory: str, max_bytes: int) -> StaticAssetCache:
+    cache = _ASSET_CACHES.get(directory)
+    if cache is None:
+        cache = _ASSET_CACHES[directory] = StaticAssetCache(directory, max_bytes)
+    cache.max_bytes = max_bytes
+    return cache
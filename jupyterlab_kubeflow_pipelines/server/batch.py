@@ -0,0 +1,162 @@
+"""
+Bulk run operations (`runs:batch`).
+
+Cleaning up a sweep used to take one browser round trip per run. A batch
+names its runs directly or by a KFP list `filter` (resolved server-side by
+walking the run list) and applies one operation to each of them over the
+shared upstream client, at most `batch_max_concurrency` at a time and
+within the user's upstream limiter lane. Outcomes are yielded as the runs
+finish, so the handler can stream them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Iterable
+from typing import Any
+from urllib.parse import quote
+
+from ..config import KfpServerOptions
+from .limits import UpstreamBusy, upstream_limiter
+from .listing import walk_list
+from .resilience import CircuitOpen, RetryPolicy, breaker_for, fetch_resilient
+from .upstream import upstream_client
+
+# Operation -> (HTTP method, v2beta1 path template).
+BATCH_OPERATIONS: dict[str, tuple[str, str]] = {
+    "terminate": ("POST", "runs/{run_id}:terminate"),
+    "retry": ("POST", "runs/{run_id}:retry"),
+    "archive": ("POST", "runs/{run_id}:archive"),
+    "delete": ("DELETE", "runs/{run_id}"),
+}
+
+
+def _error_message(body: bytes | None, code: int) -> str:
+    try:
+        payload = json.loads(body or b"")
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        message = payload.get("error_message") or payload.get("message") or payload.get("error")
+        if message:
+            return str(message)
+    return f"KFP answered HTTP {code}."
+
+
+async def resolve_run_ids(
+    *,
+    endpoint: str,
+    filter: str,
+    experiment_id: str | None,
+    user: str,
+    headers: dict[str, str],
+    namespace: str | None,
+    options: KfpServerOptions,
+) -> tuple[list[str], bool]:
+    """IDs of the runs matching a list `filter`, and whether they were cut off."""
+    params = [("filter", filter)]
+    if experiment_id:
+        params.append(("experiment_id", experiment_id))
+    run_ids: list[str] = []
+    truncated = False
+    async for page in walk_list(
+        endpoint=endpoint,
+        resource="runs",
+        options=options,
+        params=params,
+        headers=headers,
+        namespace=namespace,
+        page_size=options.aggregate_page_size,
+        limit=options.batch_max_runs,
+        user=user,
+    ):
+        run_ids.extend(run["run_id"] for run in page.items if run.get("run_id"))
+        truncated = bool(page.next_page_token) and len(run_ids) >= options.batch_max_runs
+    return run_ids, truncated
+
+
+async def _apply(
+    *,
+    endpoint: str,
+    operation: str,
+    run_id: str,
+    user: str,
+    headers: dict[str, str],
+    options: KfpServerOptions,
+) -> dict[str, Any]:
+    method, template = BATCH_OPERATIONS[operation]
+    url = f"{endpoint}/apis/v2beta1/{template.format(run_id=quote(run_id, safe=''))}"
+    client = upstream_client()
+    outcome: dict[str, Any] = {"run_id": run_id, "operation": operation}
+    try:
+        async with upstream_limiter().slot(
+            user=user,
+            url=url,
+            max_concurrency=options.upstream_max_concurrency,
+            max_queue=options.upstream_max_queue,
+            queue_timeout=options.upstream_queue_timeout,
+            retry_after=options.upstream_retry_after,
+        ):
+            response = await fetch_resilient(
+                lambda final: client.fetch(
+                    url,
+                    method=method,
+                    headers=headers,
+                    body=b"{}" if method == "POST" else None,
+                    raise_error=False,
+                ),
+                method=method,
+                breaker=breaker_for(url, options),
+                policy=RetryPolicy.from_options(options),
+            )
+    except CircuitOpen as e:
+        return {**outcome, "ok": False, "status": 503, "error": str(e)}
+    except UpstreamBusy as e:
+        return {**outcome, "ok": False, "status": 429, "error": str(e)}
+    except Exception as e:
+        # Connection errors: report them for this run and go on with the rest.
+        return {**outcome, "ok": False, "status": 502, "error": str(e)}
+
+    outcome["status"] = response.code
+    outcome["ok"] = response.code < 400
+    if not outcome["ok"]:
+        outcome["error"] = _error_message(response.body, response.code)
+    return outcome
+
+
+async def run_batch(
+    *,
+    endpoint: str,
+    operation: str,
+    run_ids: Iterable[str],
+    user: str,
+    headers: dict[str, str],
+    options: KfpServerOptions,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Apply `operation` to each run and yield the outcomes in completion order.
+
+    At most `batch_max_concurrency` runs are in flight. Closing the iterator
+    early cancels the operations not yet finished.
+    """
+    semaphore = asyncio.Semaphore(max(1, options.batch_max_concurrency))
+
+    async def apply(run_id: str) -> dict[str, Any]:
+        async with semaphore:
+            return await _apply(
+                endpoint=endpoint,
+                operation=operation,
+                run_id=run_id,
+                user=user,
+                headers=headers,
+                options=options,
+            )
+
+    tasks = [asyncio.ensure_future(apply(run_id)) for run_id in dict.fromkeys(run_ids)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,187 @@
+"""
+Short-lived response cache for proxied KFP list endpoints.
+
+The sidebar, the embedded KFP UI and several browser tabs tend to request the
+same run/experiment/pipeline list pages in bursts. Entries are partitioned per
+user, live for a few seconds, and are revalidated with ETag/Last-Modified when
+the upstream provides them. Concurrent identical requests share one upstream
+call, and mutations invalidate the affected resource.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, replace
+
+from tornado.httpclient import HTTPResponse
+
+from .upstream import SKIPPED_RESPONSE_HEADERS
+
+CacheKey = tuple[str, str, str, str, str]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    code: int
+    headers: tuple[tuple[str, str], ...]
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+
+    @classmethod
+    def from_response(cls, response: HTTPResponse) -> CachedResponse:
+        headers = tuple(
+            (h, v)
+            for h, v in response.headers.get_all()
+            if h.lower() not in SKIPPED_RESPONSE_HEADERS
+        )
+        return cls(
+            code=response.code,
+            headers=headers,
+            body=response.body or b"",
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            stored_at=time.monotonic(),
+        )
+
+    def validators(self) -> dict[str, str]:
+        """Conditional request headers for revalidating this entry upstream."""
+        headers: dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def resource_of(path: str) -> str:
+    """Top-level KFP resource a proxied path belongs to (e.g. `runs`)."""
+    head = path.lstrip("/").split("/", 1)[0]
+    return head.split(":", 1)[0]
+
+
+def _is_cacheable(response: HTTPResponse, *, max_body: int) -> bool:
+    if response.code != 200:
+        return False
+    if len(response.body or b"") > max_body:
+        return False
+    cache_control = (response.headers.get("Cache-Control") or "").lower()
+    return "no-store" not in cache_control
+
+
+class ProxyResponseCache:
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[CacheKey, CachedResponse] = OrderedDict()
+        self._inflight: dict[CacheKey, asyncio.Future] = {}
+        self._generation: dict[str, int] = {}
+
+    @staticmethod
+    def key(*, user: str, endpoint: str, method: str, path: str, query: str) -> CacheKey:
+        return (user, endpoint, method, path.lstrip("/"), query)
+
+    def peek(self, key: CacheKey) -> CachedResponse | None:
+        return self._entries.get(key)
+
+    def invalidate(self, user: str, path: str) -> int:
+        """Drop cached entries of `user` for the resource `path` belongs to."""
+        self._generation[user] = self._generation.get(user, 0) + 1
+        resource = resource_of(path)
+        stale = [
+            k for k in self._entries if k[0] == user and resource_of(k[3]) == resource
+        ]
+        for k in stale:
+            del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generation.clear()
+
+    def _store(self, key: CacheKey, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(
+        self,
+        key: CacheKey,
+        *,
+        ttl: float,
+        max_body: int,
+        fetch: Callable[[dict[str, str]], Awaitable[HTTPResponse]],
+        refresh: bool = False,
+    ) -> tuple[CachedResponse, str]:
+        """
+        Return a cached response, or fetch it once for all concurrent callers.
+
+        `fetch` receives conditional headers for revalidation. The second item
+        of the result describes how the response was obtained:
+        HIT, COALESCED, REVALIDATED or MISS.
+        """
+        entry = self._entries.get(key)
+        if not refresh and entry is not None and time.monotonic() - entry.stored_at < ttl:
+            self._entries.move_to_end(key)
+            return entry, "HIT"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), "COALESCED"
+
+        user = key[0]
+        generation = self._generation.get(user, 0)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await fetch(entry.validators() if entry is not None else {})
+            if response.code == 304 and entry is not None:
+                result = replace(entry, stored_at=time.monotonic())
+                status = "REVALIDATED"
+            else:
+                result = CachedResponse.from_response(response)
+                status = "MISS"
+
+            # A mutation while this request was in flight makes the result
+            # potentially stale; hand it to the waiting callers but don't keep it.
+            if self._generation.get(user, 0) == generation and (
+                status == "REVALIDATED" or _is_cacheable(response, max_body=max_body)
+            ):
+                self._store(key, result)
+            future.set_result(result)
+            return result, status
+        except asyncio.CancelledError:
+            future.set_exception(
+                ConnectionAbortedError("Shared upstream request was cancelled.")
+            )
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so lone failures don't log "never retrieved".
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+_RESPONSE_CACHE = ProxyResponseCache()
+
+
+def response_cache() -> ProxyResponseCache:
+    return _RESPONSE_CACHE
+
+
+def invalidator(user: str, path: str) -> Callable[[], None]:
+    """
+    Return a callable that invalidates `path` for `user` from any thread.
+
+    The cache is only touched on the IOLoop this is created on, so job work
+    (which runs on worker threads) can invalidate after a mutation.
+    """
+    loop = asyncio.get_running_loop()
+    return lambda: loop.call_soon_threadsafe(response_cache().invalidate, user, path)
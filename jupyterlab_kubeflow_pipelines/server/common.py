@@ -1,8 +1,26 @@
 from __future__ import annotations
 
-from ..config import normalize_endpoint
+import re
 from urllib.parse import parse_qsl, urlencode, urlparse
 
+from ..config import normalize_endpoint
+
+LIST_PATHS = frozenset(
+    {
+        "apis/v1beta1/experiments",
+        "apis/v1beta1/runs",
+        "apis/v1beta1/jobs",
+        "apis/v1beta1/pipelines",
+        "apis/v1beta1/pipeline_versions",
+        "apis/v2beta1/experiments",
+        "apis/v2beta1/runs",
+        "apis/v2beta1/jobs",
+        "apis/v2beta1/pipelines",
+        "apis/v2beta1/pipeline_versions",
+    }
+)
+_VERSION_LIST_PATH = re.compile(r"^apis/v2beta1/pipelines/[^/]+/versions$")
+
 
 def base_kfp_endpoint(endpoint: str | None) -> str:
     normalized = normalize_endpoint(endpoint)
@@ -58,19 +76,7 @@ def ensure_namespace_query(
         return query
 
     normalized_path = path.lstrip("/").rstrip("/")
-    list_paths = {
-        "apis/v1beta1/experiments",
-        "apis/v1beta1/runs",
-        "apis/v1beta1/jobs",
-        "apis/v1beta1/pipelines",
-        "apis/v1beta1/pipeline_versions",
-        "apis/v2beta1/experiments",
-        "apis/v2beta1/runs",
-        "apis/v2beta1/jobs",
-        "apis/v2beta1/pipelines",
-        "apis/v2beta1/pipeline_versions",
-    }
-    if normalized_path not in list_paths:
+    if normalized_path not in LIST_PATHS:
         return query
 
     params = parse_qsl(query, keep_blank_values=True)
@@ -87,3 +93,11 @@ def ensure_namespace_query(
         rewritten.append(("namespace", ns))
 
     return urlencode(rewritten)
+
+
+def is_list_path(path: str) -> bool:
+    """Whether `path` is a KFP list endpoint (including pipeline versions)."""
+    normalized_path = path.lstrip("/").rstrip("/")
+    return normalized_path in LIST_PATHS or bool(
+        _VERSION_LIST_PATH.match(normalized_path)
+    )
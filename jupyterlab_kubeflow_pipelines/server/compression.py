@@ -0,0 +1,226 @@
+"""
+Content negotiation for the extension's responses and request bodies.
+
+Proxied KFP listings, UI bundles and compiled pipeline YAML are large and
+compress well, yet reach the browser over JupyterHub ingress links that are
+often slow. `CompressionTransform` gzip- or brotli-encodes responses under
+the extension's URL prefixes when the browser accepts it; brotli is only
+offered when the optional `brotli` package is installed. Bodies that already
+carry a `Content-Encoding` (e.g. compressed upstream bodies passed through
+as-is) are left untouched.
+
+Clients may also send `Content-Encoding: gzip` (or `deflate`/`br`) request
+bodies; `request_body` decodes them with a bound on the decoded size.
+"""
+
+from __future__ import annotations
+
+import zlib
+from collections.abc import Iterable
+
+from tornado import httputil, web
+
+from ..config import server_options_from_settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+GZIP_LEVEL = 6
+# On-the-fly brotli: quality 11 is far too slow for proxied bodies.
+BROTLI_QUALITY = 4
+
+_COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/javascript",
+        "application/json",
+        "application/x-javascript",
+        "application/x-yaml",
+        "application/xml",
+        "application/yaml",
+        "image/svg+xml",
+    }
+)
+# Statuses whose body must not (or cannot usefully) be re-encoded.
+_UNENCODED_STATUSES = frozenset({204, 206, 304})
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Response encodings we can produce, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _encoding_weights(accept_encoding: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    """Whether an `Accept-Encoding` header allows `coding`."""
+    weights = _encoding_weights(accept_encoding)
+    return weights.get(coding, weights.get("*", 0.0)) > 0
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick a response encoding from an `Accept-Encoding` header, if any."""
+    weights = _encoding_weights(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in available_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        # Some ingresses hold back compressed event streams.
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class _Encoder:
+    """Incremental encoder; every chunk is flushed so streamed bodies keep flowing."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, chunk: bytes, finishing: bool) -> bytes:
+        if self.encoding == "br":
+            data = self._brotli.process(chunk) if chunk else b""
+            return data + (self._brotli.finish() if finishing else self._brotli.flush())
+        data = self._gzip.compress(chunk)
+        return data + self._gzip.flush(zlib.Z_FINISH if finishing else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionTransform(web.OutputTransform):
+    """
+    Encode responses under `prefixes` per the request's `Accept-Encoding`.
+
+    Modelled on tornado's `GZipContentEncoding`, which Jupyter Server does
+    not enable. Register it with `functools.partial` to bind the application
+    settings and the URL prefixes.
+    """
+
+    def __init__(
+        self,
+        request: httputil.HTTPServerRequest,
+        *,
+        settings: dict,
+        prefixes: Iterable[str],
+    ) -> None:
+        super().__init__(request)
+        options = server_options_from_settings(settings)
+        self._min_length = options.compress_min_length
+        self._encoding: str | None = None
+        if options.compress_responses and request.path.startswith(tuple(prefixes)):
+            self._encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        self._encoder: _Encoder | None = None
+
+    def transform_first_chunk(
+        self,
+        status_code: int,
+        headers: httputil.HTTPHeaders,
+        chunk: bytes,
+        finishing: bool,
+    ) -> tuple[int, httputil.HTTPHeaders, bytes]:
+        if self._encoding is None:
+            return status_code, headers, chunk
+        if not is_compressible(headers.get("Content-Type", "")):
+            return status_code, headers, chunk
+
+        vary = headers.get("Vary", "")
+        if "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+        if (
+            status_code in _UNENCODED_STATUSES
+            or "Content-Encoding" in headers
+            or (finishing and len(chunk) < self._min_length)
+        ):
+            return status_code, headers, chunk
+
+        self._encoder = _Encoder(self._encoding)
+        headers["Content-Encoding"] = self._encoding
+        chunk = self._encoder.encode(chunk, finishing)
+        if "Content-Length" in headers:
+            if finishing:
+                headers["Content-Length"] = str(len(chunk))
+            else:
+                # Streamed bodies go out chunked once encoded.
+                del headers["Content-Length"]
+        return status_code, headers, chunk
+
+    def transform_chunk(self, chunk: bytes, finishing: bool) -> bytes:
+        if self._encoder is None:
+            return chunk
+        return self._encoder.encode(chunk, finishing)
+
+
+def decode_body(body: bytes, content_encoding: str | None, *, max_size: int) -> bytes:
+    """
+    Decode a request body sent with `Content-Encoding`.
+
+    Raises `web.HTTPError` 415 for unsupported codings, 400 for corrupt data
+    and 413 when the decoded body would exceed `max_size` bytes.
+    """
+    coding = (content_encoding or "").strip().lower()
+    if coding in {"", "identity"}:
+        return body
+
+    if coding in {"gzip", "x-gzip", "deflate"}:
+        # zlib stops at `max_length`, so a small bomb cannot expand in memory.
+        wbits = 16 + zlib.MAX_WBITS if coding != "deflate" else zlib.MAX_WBITS
+        decoder = zlib.decompressobj(wbits)
+        try:
+            decoded = decoder.decompress(body, max_size + 1)
+        except zlib.error as e:
+            raise web.HTTPError(400, f"Invalid {coding} request body: {e}") from e
+        if len(decoded) <= max_size and not decoder.eof:
+            raise web.HTTPError(400, f"Truncated {coding} request body.")
+    elif coding == "br" and brotli is not None:
+        try:
+            decoded = brotli.decompress(body)
+        except brotli.error as e:
+            raise web.HTTPError(400, f"Invalid br request body: {e}") from e
+    else:
+        raise web.HTTPError(415, f"Unsupported request Content-Encoding: {coding}")
+
+    if len(decoded) > max_size:
+        raise web.HTTPError(
+            413, f"Decoded request body exceeds {max_size} bytes."
+        )
+    return decoded
+
+
+def request_body(handler, body: bytes | None = None) -> bytes:
+    """Body of the handler's request (or `body`), decoded per its Content-Encoding."""
+    options = server_options_from_settings(handler.settings)
+    return decode_body(
+        handler.request.body if body is None else body,
+        handler.request.headers.get("Content-Encoding"),
+        max_size=options.request_body_max_decoded,
+    )
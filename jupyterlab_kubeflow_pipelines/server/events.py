@@ -0,0 +1,403 @@
+"""
+Run-status events fanned out from one upstream poller per user and namespace.
+
+Run tabs, the sidebar and notebooks used to poll `runs/{id}` and run lists
+on their own, so upstream load grew with the number of open views. A
+`RunStatusPoller` polls KFP for a (user, endpoint, namespace) on behalf of
+every subscriber and pushes state changes to them; `KfpRunEventsHandler`
+relays them as Server-Sent Events.
+
+Each poll lists the runs that are still active (`state` filter) and the runs
+created since the previous poll (`created_at` filter; v2beta1 runs carry no
+`updated_at`). Tracked runs that left the active list are fetched one by one
+to learn their final state. A poller starts with its first subscriber and
+stops with its last.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict, deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import quote
+
+from ..config import KfpConfig, KfpServerOptions
+from .limits import upstream_host, upstream_limiter
+from .listing import UpstreamListError, fetch_upstream_get, walk_list
+from .metrics import RUN_EVENT_POLLERS, RUN_EVENT_SUBSCRIBERS
+
+log = logging.getLogger(__name__)
+
+ACTIVE_STATES = frozenset(
+    {"RUNTIME_STATE_UNSPECIFIED", "PENDING", "RUNNING", "PAUSED", "CANCELING"}
+)
+# Events a subscriber may fall behind by before its stream is closed; the
+# browser then reconnects with `Last-Event-ID` and catches up from `_recent`.
+SUBSCRIBER_QUEUE_SIZE = 256
+REPLAY_EVENTS = 512
+# Runs that left the active list and are fetched individually per poll.
+MAX_RUN_FETCHES_PER_POLL = 20
+
+PollerKey = tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class RunEvent:
+    id: int
+    kind: str
+    data: dict[str, Any]
+
+    def encode(self) -> bytes:
+        """The event in `text/event-stream` framing."""
+        return (
+            f"id: {self.id}\nevent: {self.kind}\ndata: {json.dumps(self.data)}\n\n"
+        ).encode()
+
+
+def _summarize(run: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "run_id": run.get("run_id"),
+        "display_name": run.get("display_name"),
+        "experiment_id": run.get("experiment_id"),
+        "state": run.get("state") or "RUNTIME_STATE_UNSPECIFIED",
+        "created_at": run.get("created_at"),
+        "finished_at": run.get("finished_at"),
+    }
+
+
+def _filter(predicate: dict[str, Any]) -> str:
+    return json.dumps({"predicates": [predicate]})
+
+
+class Subscription:
+    """One SSE stream's view of a poller; `None` in the queue ends the stream."""
+
+    def __init__(self, poller: RunStatusPoller, run_ids: frozenset[str]) -> None:
+        self.poller = poller
+        self.run_ids = run_ids
+        self.queue: asyncio.Queue[RunEvent | None] = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.needs_snapshot = True
+        self.closed = False
+
+    def wants(self, run_id: str | None) -> bool:
+        # Events not about a single run (e.g. errors) go to everyone.
+        return not self.run_ids or run_id is None or run_id in self.run_ids
+
+    def offer(self, event: RunEvent) -> None:
+        if self.closed:
+            return
+        if self.queue.qsize() >= SUBSCRIBER_QUEUE_SIZE - 1:
+            # Too slow: end the stream and let the client resume.
+            self.close()
+            return
+        self.queue.put_nowait(event)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+        self.poller.unsubscribe(self)
+
+
+class RunStatusPoller:
+    def __init__(
+        self,
+        key: PollerKey,
+        *,
+        config: KfpConfig,
+        endpoint: str,
+        namespace: str,
+        options: KfpServerOptions,
+    ) -> None:
+        self.key = key
+        self.endpoint = endpoint
+        self.namespace = namespace
+        self.options = options
+        # The user's live config, so a refreshed token is picked up.
+        self._config = config
+        self._runs: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._watermark: str | None = None
+        self._subscribers: set[Subscription] = set()
+        self._recent: deque[RunEvent] = deque(maxlen=REPLAY_EVENTS)
+        self._seq = 0
+        self._ready = False
+        self._failing = False
+        self._task: asyncio.Task | None = None
+        self.polls = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(
+        self, run_ids: Iterable[str] = (), last_event_id: str | None = None
+    ) -> Subscription:
+        sub = Subscription(self, frozenset(run_ids))
+        self._subscribers.add(sub)
+        RUN_EVENT_SUBSCRIBERS.labels(upstream_host(self.endpoint)).inc()
+        if self._replay(sub, last_event_id):
+            sub.needs_snapshot = False
+        elif self._ready and not (sub.run_ids - self._runs.keys()):
+            self._send_snapshot(sub)
+        if self._task is None:
+            RUN_EVENT_POLLERS.labels(upstream_host(self.endpoint)).inc()
+            self._task = asyncio.ensure_future(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        if sub not in self._subscribers:
+            return
+        self._subscribers.discard(sub)
+        RUN_EVENT_SUBSCRIBERS.labels(upstream_host(self.endpoint)).dec()
+        if not self._subscribers:
+            self.stop()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            RUN_EVENT_POLLERS.labels(upstream_host(self.endpoint)).dec()
+        for sub in list(self._subscribers):
+            sub.close()
+        run_event_hub().discard(self)
+
+    def _replay(self, sub: Subscription, last_event_id: str | None) -> bool:
+        """Queue the events a reconnecting client missed, if still buffered."""
+        try:
+            last = int(last_event_id or "")
+        except ValueError:
+            return False
+        if not self._recent or last < self._recent[0].id - 1 or last > self._seq:
+            return False
+        for event in self._recent:
+            if event.id > last and sub.wants(event.data.get("run_id")):
+                sub.offer(event)
+        return True
+
+    def _next_event(self, kind: str, data: dict[str, Any]) -> RunEvent:
+        self._seq += 1
+        return RunEvent(self._seq, kind, data)
+
+    def _send_snapshot(self, sub: Subscription) -> None:
+        runs = [r for rid, r in self._runs.items() if sub.wants(rid)]
+        sub.offer(RunEvent(self._seq, "snapshot", {"namespace": self.namespace, "runs": runs}))
+        sub.needs_snapshot = False
+
+    def _publish(self, kind: str, data: dict[str, Any]) -> None:
+        event = self._next_event(kind, data)
+        self._recent.append(event)
+        for sub in list(self._subscribers):
+            if sub.wants(data.get("run_id")):
+                sub.offer(event)
+
+    def _headers(self) -> dict[str, str]:
+        token = self._config.token
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def _list(self, params: list[tuple[str, str]], limit: int) -> list[dict[str, Any]]:
+        runs: list[dict[str, Any]] = []
+        async for page in walk_list(
+            endpoint=self.endpoint,
+            resource="runs",
+            options=self.options,
+            params=params,
+            headers=self._headers(),
+            namespace=self.namespace,
+            page_size=min(200, max(1, limit)),
+            limit=limit,
+        ):
+            runs.extend(page.items)
+        return runs
+
+    async def _get_run(self, run_id: str) -> dict[str, Any] | None:
+        response = await fetch_upstream_get(
+            f"{self.endpoint}/apis/v2beta1/runs/{quote(run_id, safe='')}",
+            headers=self._headers(),
+            options=self.options,
+        )
+        if response.code == 404:
+            return None
+        if response.code != 200:
+            raise UpstreamListError(response.code, response.body or b"")
+        return json.loads(response.body or b"{}")
+
+    async def poll_once(self) -> None:
+        """Fetch changed runs and publish their state transitions."""
+        max_runs = self.options.run_events_max_runs
+        seen: dict[str, dict[str, Any]] = {}
+        active = await self._list(
+            [
+                (
+                    "filter",
+                    _filter(
+                        {
+                            "key": "state",
+                            "operation": "IN",
+                            "string_values": {"values": sorted(ACTIVE_STATES)},
+                        }
+                    ),
+                )
+            ],
+            max_runs,
+        )
+        if self._watermark is None:
+            # Only the newest run matters here: it sets the watermark.
+            created = await self._list([("sort_by", "created_at desc")], 1)
+            new_ids: set[str] = set()
+        else:
+            created = await self._list(
+                [
+                    (
+                        "filter",
+                        _filter(
+                            {
+                                "key": "created_at",
+                                "operation": "GREATER_THAN",
+                                "timestamp_value": self._watermark,
+                            }
+                        ),
+                    )
+                ],
+                max_runs,
+            )
+            new_ids = {r["run_id"] for r in created if r.get("run_id")}
+        for run in (*active, *created):
+            if run.get("run_id"):
+                seen[run["run_id"]] = run
+
+        pinned = set().union(*(s.run_ids for s in self._subscribers))
+        stale = [
+            rid
+            for rid, run in self._runs.items()
+            if rid not in seen and run["state"] in ACTIVE_STATES
+        ]
+        stale += [rid for rid in pinned if rid not in seen and rid not in self._runs]
+        for rid in stale[:MAX_RUN_FETCHES_PER_POLL]:
+            run = await self._get_run(rid)
+            if run is not None:
+                seen[rid] = run
+
+        for rid, run in seen.items():
+            summary = _summarize(run)
+            previous = self._runs.get(rid)
+            self._runs[rid] = summary
+            self._runs.move_to_end(rid)
+            # Runs first seen through a pinned lookup are not news.
+            changed = (
+                previous["state"] != summary["state"]
+                if previous is not None
+                else rid in new_ids
+            )
+            if self._ready and changed:
+                self._publish(
+                    "run",
+                    {
+                        **summary,
+                        "namespace": self.namespace,
+                        "previous_state": previous["state"] if previous else None,
+                    },
+                )
+            created_at = summary["created_at"]
+            if created_at and (self._watermark is None or created_at > self._watermark):
+                self._watermark = created_at
+        # Forget the least recently changed finished runs beyond the bound.
+        for rid in [r for r, s in self._runs.items() if s["state"] not in ACTIVE_STATES]:
+            if len(self._runs) <= max_runs:
+                break
+            if rid not in pinned:
+                del self._runs[rid]
+
+        self._ready = True
+        self.polls += 1
+        for sub in list(self._subscribers):
+            if sub.needs_snapshot:
+                self._send_snapshot(sub)
+
+    async def _run(self) -> None:
+        while True:
+            options = self.options
+            try:
+                async with upstream_limiter().slot(
+                    user=self.key[0],
+                    url=self.endpoint,
+                    max_concurrency=options.upstream_max_concurrency,
+                    max_queue=options.upstream_max_queue,
+                    queue_timeout=options.upstream_queue_timeout,
+                    retry_after=options.upstream_retry_after,
+                ):
+                    await self.poll_once()
+            except Exception as e:
+                if not self._failing:
+                    log.warning("Run event poll for %s failed: %s", self.key[1:], e)
+                    self._publish("error", {"namespace": self.namespace, "error": str(e)})
+                self._failing = True
+            else:
+                self._failing = False
+            await asyncio.sleep(max(0.1, options.run_events_poll_interval))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "namespace": self.namespace,
+            "subscribers": self.subscribers,
+            "tracked_runs": len(self._runs),
+            "polls": self.polls,
+            "last_event_id": self._seq,
+            "failing": self._failing,
+        }
+
+
+class RunEventHub:
+    """Registry of pollers keyed by (user, endpoint, namespace)."""
+
+    def __init__(self) -> None:
+        self._pollers: dict[PollerKey, RunStatusPoller] = {}
+
+    def subscribe(
+        self,
+        *,
+        user: str,
+        config: KfpConfig,
+        endpoint: str,
+        namespace: str,
+        options: KfpServerOptions,
+        run_ids: Iterable[str] = (),
+        last_event_id: str | None = None,
+    ) -> Subscription:
+        key = (user, endpoint, namespace)
+        poller = self._pollers.get(key)
+        if poller is None:
+            poller = self._pollers[key] = RunStatusPoller(
+                key, config=config, endpoint=endpoint, namespace=namespace, options=options
+            )
+        poller.options = options
+        return poller.subscribe(run_ids, last_event_id)
+
+    def discard(self, poller: RunStatusPoller) -> None:
+        if self._pollers.get(poller.key) is poller:
+            del self._pollers[poller.key]
+
+    def snapshot(self, user: str) -> list[dict[str, Any]]:
+        return [p.snapshot() for key, p in self._pollers.items() if key[0] == user]
+
+    def close(self) -> None:
+        for poller in list(self._pollers.values()):
+            poller.stop()
+
+
+_RUN_EVENT_HUB = RunEventHub()
+
+
+def run_event_hub() -> RunEventHub:
+    return _RUN_EVENT_HUB
+
+
+def reset_run_events() -> None:
+    _RUN_EVENT_HUB.close()
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
+from .aggregate import KfpAggregateHandler
+from .cache_plan import KfpCachePlanHandler
 from .debug import KfpDebugHandler
+from .experiments import KfpExperimentSummaryHandler
+from .jobs import KfpJobEventsHandler, KfpJobHandler, KfpJobsHandler
+from .packages import KfpPackageUploadHandler
+from .preview import KfpPipelinePreviewHandler, KfpPreviewPayloadHandler
 from .proxy_api import KfpProxyHandler
 from .proxy_ui import (
     KfpUIPathRewriteScriptHandler,
@@ -8,17 +14,34 @@ from .proxy_ui import (
     KfpUIProxyHandler,
 )
 from .runs import (
+    KfpRunBatchHandler,
+    KfpRunDagHandler,
+    KfpRunEventsHandler,
     KfpRunHandler,
+    KfpRunSearchHandler,
     KfpRunTerminateHandler,
 )
 from .settings import KfpSettingsHandler
 
 __all__ = [
+    "KfpAggregateHandler",
+    "KfpCachePlanHandler",
     "KfpDebugHandler",
+    "KfpExperimentSummaryHandler",
+    "KfpJobEventsHandler",
+    "KfpJobHandler",
+    "KfpJobsHandler",
+    "KfpPackageUploadHandler",
+    "KfpPipelinePreviewHandler",
+    "KfpPreviewPayloadHandler",
     "KfpProxyHandler",
     "KfpUIPathRewriteScriptHandler",
     "KfpRootFallbackProxyHandler",
+    "KfpRunBatchHandler",
+    "KfpRunDagHandler",
+    "KfpRunEventsHandler",
     "KfpRunHandler",
+    "KfpRunSearchHandler",
     "KfpRunTerminateHandler",
     "KfpSettingsHandler",
     "KfpUIProxyHandler",
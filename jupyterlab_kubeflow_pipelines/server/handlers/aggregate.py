@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+
+from ...config import _user_key, get_config, get_server_options
+from ..common import base_kfp_endpoint
+from ..limits import UpstreamBusy, write_busy
+from ..listing import LIST_RESOURCES, UpstreamListError, walk_list
+from ..projection import FieldProjection
+from ..resilience import CircuitOpen, write_circuit_open
+from ..upstream import forward_request_headers
+
+# Query parameters consumed here rather than forwarded to KFP.
+_RESERVED_PARAMS = {"limit", "fields", "where", "format"}
+
+
+def _parse_where(values: list[str]) -> list[tuple[list[str], str]]:
+    """Parse `where=field.path=value` clauses (all must match)."""
+    clauses: list[tuple[list[str], str]] = []
+    for value in values:
+        field, sep, expected = value.partition("=")
+        if not sep or not field.strip():
+            raise ValueError(f"Invalid where clause {value!r}; expected field=value.")
+        clauses.append((field.strip().split("."), expected))
+    return clauses
+
+
+def _lookup(item: Any, path: list[str]) -> Any:
+    for part in path:
+        if not isinstance(item, dict):
+            return None
+        item = item.get(part)
+    return item
+
+
+def _matches(item: dict[str, Any], clauses: list[tuple[list[str], str]]) -> bool:
+    for path, expected in clauses:
+        value = _lookup(item, path)
+        if value is None or str(value) != expected:
+            return False
+    return True
+
+
+class KfpAggregateHandler(APIHandler):
+    """
+    Walk all pages of a KFP list endpoint server-side and return one response.
+
+    Query parameters other than the ones below are forwarded to KFP on every
+    page (e.g. `filter`, `sort_by`, `experiment_id`, `namespace`):
+
+    - `limit`: maximum number of items (capped by `aggregate_max_items`).
+    - `where`: `field.path=value` clause applied server-side; repeatable.
+    - `fields`: comma-separated item paths to keep (see `FieldProjection`);
+      applied to each item as its page arrives.
+    - `format=ndjson`: stream one item per line, followed by a
+      `{"summary": {...}}` line.
+    """
+
+    @web.authenticated
+    async def get(self, resource: str) -> None:
+        if resource not in LIST_RESOURCES:
+            self.set_status(404)
+            self.finish(json.dumps({"error": f"Unsupported resource: {resource}"}))
+            return
+
+        cfg = get_config(self)
+        options = get_server_options(self)
+        try:
+            kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+            limit = int(self.get_query_argument("limit", str(options.aggregate_max_items)))
+            clauses = _parse_where(self.get_query_arguments("where"))
+        except ValueError as e:
+            self.set_status(400)
+            self.finish(json.dumps({"error": str(e)}))
+            return
+        limit = max(0, min(limit, options.aggregate_max_items))
+
+        projection = FieldProjection.parse(self.get_query_argument("fields", ""))
+        stream = self.get_query_argument("format", "json") == "ndjson"
+        params = [
+            (k, v.decode("utf-8"))
+            for k, values in self.request.query_arguments.items()
+            if k not in _RESERVED_PARAMS
+            for v in values
+        ]
+        headers = forward_request_headers(self.request.headers.get_all(), token=cfg.token)
+
+        items_key = LIST_RESOURCES[resource]
+        collected: list[dict[str, Any]] = []
+        count = 0
+        pages = 0
+        truncated = False
+        next_page_token = ""
+        total_size = None
+        if stream:
+            self.set_header("Content-Type", "application/x-ndjson")
+
+        try:
+            async for page in walk_list(
+                endpoint=kfp_endpoint,
+                resource=resource,
+                options=options,
+                params=params,
+                headers=headers,
+                namespace=cfg.namespace,
+                page_size=options.aggregate_page_size,
+                user=_user_key(self),
+            ):
+                pages += 1
+                next_page_token = page.next_page_token
+                if total_size is None:
+                    total_size = page.total_size
+
+                matched = [i for i in page.items if _matches(i, clauses)]
+                if len(matched) > limit - count:
+                    matched = matched[: limit - count]
+                    truncated = True
+                if projection is not None:
+                    matched = projection.apply(matched)
+                count += len(matched)
+
+                if stream:
+                    self.write("".join(json.dumps(i) + "\n" for i in matched))
+                    await self.flush()
+                else:
+                    collected.extend(matched)
+
+                if count >= limit:
+                    break
+        except (UpstreamListError, CircuitOpen, UpstreamBusy) as e:
+            if stream and pages:
+                code = getattr(e, "code", 503 if isinstance(e, CircuitOpen) else 429)
+                self.write(json.dumps({"error": str(e), "status_code": code}) + "\n")
+                self.finish(set_content_type="application/x-ndjson")
+                return
+            if isinstance(e, CircuitOpen):
+                write_circuit_open(self, e)
+                return
+            if isinstance(e, UpstreamBusy):
+                write_busy(self, e)
+                return
+            self.set_status(e.code if e.code >= 400 else 502)
+            self.finish(json.dumps({"error": str(e), "status_code": e.code}))
+            return
+
+        summary = {
+            "count": count,
+            "pages": pages,
+            "total_size": total_size,
+            "truncated": truncated or bool(next_page_token),
+            "next_page_token": next_page_token,
+        }
+        if stream:
+            self.write(json.dumps({"summary": summary}) + "\n")
+            self.finish(set_content_type="application/x-ndjson")
+            return
+
+        self.finish(json.dumps({items_key: collected, **summary}))
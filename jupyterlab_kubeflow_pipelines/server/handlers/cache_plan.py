@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any
+
+from tornado import web
+
+from ...cache_plan import pipeline_name, plan_cache, task_cache_keys
+from ...config import get_config, get_server_options
+from ...preview import _load_pipeline_spec
+from ..common import base_kfp_ui_endpoint
+from ..compression import request_body
+from ..mlmd import MlmdError, find_executions
+from ..resilience import CircuitOpen, write_circuit_open
+from .preview import PipelineSpecHandler
+
+
+def _parse_pipeline_yaml(text: str) -> dict:
+    return _load_pipeline_spec(text, text_only=True)
+
+
+def _cache_keys(spec: dict, params: dict[str, Any]) -> tuple[list, str | None]:
+    return task_cache_keys(spec, params), pipeline_name(spec)
+
+
+class KfpCachePlanHandler(PipelineSpecHandler):
+    """
+    Cache pre-flight: which tasks of a run would be taken from the KFP cache.
+
+    Takes the same pipeline sources as `kfp/submit` (`pipeline_yaml` or
+    `package_path`) or a registered version (`pipeline_id`, `version_id`),
+    plus the run `params` and `enable_caching` (null honours per-task
+    options). Task fingerprints are computed from the spec and looked up in
+    MLMD among the executions of the same pipeline and namespace; the
+    response lists each task as `hit`, `miss` or `unknown` with the compute
+    time cache hits would save.
+    """
+
+    @web.authenticated
+    async def post(self) -> None:
+        try:
+            body = json.loads(request_body(self) or b"{}")
+        except ValueError:
+            raise web.HTTPError(400, "Request body must be JSON.")
+        if not isinstance(body, dict):
+            raise web.HTTPError(400, "Request body must be a JSON object.")
+        params = body.get("params") or {}
+        if not isinstance(params, dict):
+            raise web.HTTPError(400, "params must be an object.")
+        # Like `kfp/submit`, which runs with caching enabled.
+        enable_caching = body.get("enable_caching", True)
+
+        loop = asyncio.get_running_loop()
+        if body.get("pipeline_yaml"):
+            try:
+                spec = await loop.run_in_executor(
+                    None, _parse_pipeline_yaml, str(body["pipeline_yaml"])
+                )
+            except (TypeError, ValueError) as e:
+                raise web.HTTPError(422, str(e))
+        else:
+            spec = await self.pipeline_spec(
+                body.get("package_path"), body.get("pipeline_id"), body.get("version_id")
+            )
+            if spec is None:
+                return
+
+        try:
+            keys, name = await loop.run_in_executor(None, _cache_keys, spec, params)
+        except (TypeError, ValueError) as e:
+            self.set_status(422)
+            self.write(json.dumps({"error": str(e)}))
+            return
+
+        cfg = get_config(self)
+        try:
+            ui_endpoint = base_kfp_ui_endpoint(cfg.endpoint)
+        except ValueError as e:
+            raise web.HTTPError(400, str(e))
+        try:
+            executions = await find_executions(
+                ui_endpoint,
+                (key.fingerprint for key in keys if key.fingerprint),
+                token=cfg.token,
+                options=get_server_options(self),
+                pipeline_name=name,
+                namespace=cfg.namespace,
+            )
+        except CircuitOpen as e:
+            write_circuit_open(self, e)
+            return
+        except MlmdError as e:
+            self.set_status(502)
+            self.write(json.dumps({"error": str(e)}))
+            return
+
+        plan = plan_cache(keys, executions, enable_caching=enable_caching)
+        self.write(json.dumps(plan.to_dict()))
@@ -7,7 +7,10 @@ import tornado.httpclient
 from jupyter_server.base.handlers import APIHandler
 from tornado import web
 
-from ...config import get_config, get_public_config
+from ...config import _user_key, get_config, get_public_config
+from ..events import run_event_hub
+from ..limits import upstream_limiter
+from ..resilience import breaker_states
 
 
 class KfpDebugHandler(APIHandler):
@@ -29,6 +32,9 @@ class KfpDebugHandler(APIHandler):
         result: dict[str, object] = {
             "config": get_public_config(self),
             "test_endpoint": endpoint_to_test,
+            "upstream_limits": upstream_limiter().snapshot(_user_key(self)),
+            "circuit_breakers": breaker_states(),
+            "run_event_pollers": run_event_hub().snapshot(_user_key(self)),
         }
 
         try:
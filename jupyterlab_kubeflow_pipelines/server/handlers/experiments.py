@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+
+from ...config import _user_key, get_config, get_server_options
+from ..common import base_kfp_endpoint
+from ..limits import UpstreamBusy, write_busy
+from ..listing import UpstreamListError
+from ..resilience import CircuitOpen, write_circuit_open
+from ..summary import experiment_summary
+
+
+class KfpExperimentSummaryHandler(APIHandler):
+    """
+    Aggregates of an experiment's runs for the sidebar dashboard: runs per
+    state, duration percentiles, failure rate over `buckets` time buckets
+    (default 24) and the components failing in the most runs.
+    """
+
+    @web.authenticated
+    async def get(self, experiment_id: str) -> None:
+        cfg = get_config(self)
+        options = get_server_options(self)
+        try:
+            kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+            buckets = int(self.get_query_argument("buckets", "24"))
+            if not 1 <= buckets <= 200:
+                raise ValueError("buckets must be between 1 and 200.")
+        except ValueError as e:
+            self.set_status(400)
+            self.finish(json.dumps({"error": str(e)}))
+            return
+
+        headers: dict[str, str] = {}
+        if cfg.token:
+            headers["Authorization"] = f"Bearer {cfg.token}"
+        try:
+            summary = await experiment_summary(
+                endpoint=kfp_endpoint,
+                experiment_id=experiment_id,
+                user=_user_key(self),
+                headers=headers,
+                namespace=self.get_query_argument("namespace", None) or cfg.namespace,
+                options=options,
+                buckets=buckets,
+            )
+        except CircuitOpen as e:
+            write_circuit_open(self, e)
+            return
+        except UpstreamBusy as e:
+            write_busy(self, e)
+            return
+        except UpstreamListError as e:
+            self.set_status(e.code if e.code >= 400 else 502)
+            self.finish(json.dumps({"error": str(e), "status_code": e.code}))
+            return
+        self.finish(json.dumps(summary))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+from tornado.iostream import StreamClosedError
+
+from ...config import _user_key, get_server_options
+from ..jobs import Job, job_registry, write_job
+
+
+def _job_or_404(handler: APIHandler, job_id: str) -> Job:
+    job = job_registry().get(_user_key(handler), job_id)
+    if job is None:
+        raise web.HTTPError(404, f"Job {job_id} not found or expired.")
+    return job
+
+
+class KfpJobsHandler(APIHandler):
+    """The user's retained jobs, oldest first, without their results."""
+
+    @web.authenticated
+    def get(self) -> None:
+        jobs = job_registry().list(_user_key(self))
+        self.write(json.dumps({"jobs": [job.to_dict(with_result=False) for job in jobs]}))
+
+
+class KfpJobHandler(APIHandler):
+    """A job's state, stages and, once finished, its result."""
+
+    @web.authenticated
+    def get(self, job_id: str) -> None:
+        write_job(self, _job_or_404(self, job_id))
+
+
+class KfpJobEventsHandler(APIHandler):
+    """
+    Server-Sent Events of a job: one `stage` event per stage, then `done`
+    with the result, after which the stream ends. Reconnecting clients get
+    the events after `Last-Event-ID`.
+    """
+
+    @web.authenticated
+    async def get(self, job_id: str) -> None:
+        job = _job_or_404(self, job_id)
+        options = get_server_options(self)
+        try:
+            last_event_id = int(self.request.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            last_event_id = 0
+
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        # Keep nginx-style ingresses from buffering the stream.
+        self.set_header("X-Accel-Buffering", "no")
+        try:
+            self.write("retry: 1000\n\n")
+            await self.flush()
+            while True:
+                for event in job.events_after(last_event_id):
+                    self.write(event.encode())
+                    last_event_id = event.id
+                await self.flush()
+                if job.finished:
+                    break
+                if not await job.wait_for_event(last_event_id, options.run_events_keepalive):
+                    self.write(": keepalive\n\n")
+        except StreamClosedError:
+            pass
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+
+from ...config import get_server_options
+from ..packages import BodyDecoder, MultipartFile, PackageWriter
+
+# Room for multipart delimiters and part headers around the package.
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+@web.stream_request_body
+class KfpPackageUploadHandler(APIHandler):
+    """
+    Upload a pipeline package into the package store (`kfp/packages`).
+
+    The body is the package itself (`?filename=` optional) or a
+    `multipart/form-data` form with it as a file part, optionally gzip- or
+    deflate-encoded. It is hashed and written to disk as it arrives, then
+    checked to be a compiled pipeline spec (422 otherwise); the response's
+    `package_id` can then be passed to `kfp/submit` and `kfp/pipelines/import`
+    instead of the YAML.
+    """
+
+    async def prepare(self) -> None:
+        await super().prepare()
+        self._writer: PackageWriter | None = None
+        self._multipart: MultipartFile | None = None
+        self._error: web.HTTPError | None = None
+        if self.request.method != "POST":
+            return
+
+        # The body is consumed before the verb method runs, so enforce
+        # authentication here rather than relying on the decorator.
+        if self.current_user is None:
+            raise web.HTTPError(403)
+
+        options = get_server_options(self)
+        limit = options.package_max_bytes + _MULTIPART_OVERHEAD
+        length = self.request.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > limit:
+            raise web.HTTPError(
+                413, f"Pipeline package exceeds {options.package_max_bytes} bytes."
+            )
+        # Tornado's default bound is far above what a package may be.
+        self.request.connection.set_max_body_size(limit)
+
+        self._decoder = BodyDecoder(self.request.headers.get("Content-Encoding"))
+        content_type = self.request.headers.get("Content-Type", "")
+        self._writer = PackageWriter(max_bytes=options.package_max_bytes)
+        if content_type.lower().startswith("multipart/form-data"):
+            try:
+                self._multipart = MultipartFile.from_content_type(
+                    content_type, self._writer.write
+                )
+            except web.HTTPError:
+                self._writer.abort()
+                raise
+
+    def data_received(self, chunk: bytes) -> None:
+        if self._writer is None or self._error is not None:
+            return
+        try:
+            for piece in self._decoder.feed(chunk):
+                if self._multipart is not None:
+                    self._multipart.feed(piece)
+                else:
+                    self._writer.write(piece)
+        except web.HTTPError as e:
+            # Drain the rest of the body; the error is reported by `post`.
+            self._error = e
+            self._writer.abort()
+
+    def on_finish(self) -> None:
+        if self._writer is not None:
+            self._writer.abort()
+
+    @web.authenticated
+    async def post(self) -> None:
+        if self._error is not None:
+            raise self._error
+        assert self._writer is not None
+        self._decoder.close()
+        filename = self.get_query_argument("filename", None)
+        if self._multipart is not None:
+            self._multipart.close()
+            filename = self._multipart.filename or filename
+        if self._writer.size == 0:
+            raise web.HTTPError(400, "The pipeline package is empty.")
+
+        options = get_server_options(self)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.validate)
+        package_id, _ = await loop.run_in_executor(
+            None,
+            functools.partial(
+                self._writer.commit, max_store_bytes=options.package_store_max_bytes
+            ),
+        )
+        self.finish(
+            json.dumps(
+                {
+                    "package_id": package_id,
+                    "size": self._writer.size,
+                    "filename": filename,
+                }
+            )
+        )
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import os
+from collections import OrderedDict
+from urllib.parse import quote
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+
+from ...config import _user_key, get_config
+from ...preview import (
+    _load_pipeline_spec,
+    analyze_dag,
+    build_dag_layout,
+    build_dag_preview,
+)
+from ...preview_store import read_preview
+from ..common import base_kfp_endpoint
+from ..compression import accepts_encoding
+from ..packages import compiled_package_dir, package_store_dir
+from .runs import fetch_kfp
+
+_SPEC_MEMO_MAX_ENTRIES = 32
+# Parsed specs of immutable sources: (user, endpoint, pipeline, version) for
+# registered versions, (path, mtime, size) for packages on disk.
+_SPEC_MEMO: OrderedDict[tuple, dict] = OrderedDict()
+
+_DETAIL_ARGUMENTS = ("max_depth", "group_threshold", "max_nodes")
+
+
+def _memo_put(key: tuple, spec: dict) -> None:
+    _SPEC_MEMO[key] = spec
+    _SPEC_MEMO.move_to_end(key)
+    while len(_SPEC_MEMO) > _SPEC_MEMO_MAX_ENTRIES:
+        _SPEC_MEMO.popitem(last=False)
+
+
+def _is_within(path: str, root: str) -> bool:
+    root = os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def _render_preview(spec: dict, output_format: str, detail: dict) -> dict:
+    if output_format == "layout":
+        payload = build_dag_layout(spec, **detail).to_payload()
+    else:
+        preview = build_dag_preview(spec, **detail)
+        payload = {
+            "digest": preview.digest,
+            "mermaid": preview.mermaid,
+            "node_count": preview.node_count,
+            "task_count": preview.task_count,
+            "collapsed": preview.collapsed,
+            "truncated": preview.truncated,
+        }
+    payload["analysis"] = analyze_dag(spec).to_dict()
+    return payload
+
+
+class PipelineSpecHandler(APIHandler):
+    """
+    Base for handlers working on a compiled pipeline spec: a package on the
+    server (relative to the server root, written by `kfp/compile` or uploaded
+    to `kfp/packages`) or a registered pipeline version (latest when no
+    version is given). Packages are read and parsed on the default executor.
+    """
+
+    async def pipeline_spec(
+        self,
+        package_path: str | None,
+        pipeline_id: str | None,
+        version_id: str | None = None,
+    ) -> dict | None:
+        """The spec, or None once an upstream error has been written."""
+        if package_path:
+            return await self._package_spec(package_path)
+        if pipeline_id:
+            return await self._version_spec(pipeline_id, version_id)
+        raise web.HTTPError(400, "Pass package_path or pipeline_id.")
+
+    async def _package_spec(self, package_path: str) -> dict:
+        root = self.contents_manager.root_dir
+        path = os.path.realpath(os.path.join(root, os.path.expanduser(package_path)))
+        allowed = (root, compiled_package_dir(), package_store_dir())
+        if not any(_is_within(path, directory) for directory in allowed):
+            raise web.HTTPError(
+                403, "package_path must be under the server root or a compiled package."
+            )
+        loop = asyncio.get_running_loop()
+        try:
+            stat = await loop.run_in_executor(None, os.stat, path)
+        except OSError:
+            raise web.HTTPError(404, f"Pipeline package not found: {package_path}")
+
+        key = ("package", path, stat.st_mtime_ns, stat.st_size)
+        spec = _SPEC_MEMO.get(key)
+        if spec is None:
+            try:
+                spec = await loop.run_in_executor(None, _load_pipeline_spec, path)
+            except ValueError as e:
+                raise web.HTTPError(422, str(e))
+            _memo_put(key, spec)
+        return spec
+
+    async def _version_spec(self, pipeline_id: str, version_id: str | None) -> dict | None:
+        cfg = get_config(self)
+        try:
+            kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+        except ValueError as e:
+            raise web.HTTPError(400, str(e))
+
+        versions_path = f"apis/v2beta1/pipelines/{quote(pipeline_id, safe='')}/versions"
+        if version_id is None:
+            response = await fetch_kfp(
+                self, f"{versions_path}?page_size=1&sort_by=created_at%20desc"
+            )
+            if response is None or not self._relay_error(response):
+                return None
+            versions = json.loads(response.body).get("pipeline_versions") or []
+            if not versions:
+                raise web.HTTPError(404, f"Pipeline {pipeline_id} has no versions.")
+            version = versions[0]
+        else:
+            key = ("version", _user_key(self), kfp_endpoint, pipeline_id, version_id)
+            spec = _SPEC_MEMO.get(key)
+            if spec is not None:
+                _SPEC_MEMO.move_to_end(key)
+                return spec
+            response = await fetch_kfp(self, f"{versions_path}/{quote(version_id, safe='')}")
+            if response is None or not self._relay_error(response):
+                return None
+            version = json.loads(response.body)
+
+        spec = version.get("pipeline_spec")
+        if not isinstance(spec, dict):
+            raise web.HTTPError(422, "Pipeline version has no pipeline_spec.")
+        # Versions are immutable once registered.
+        version_id = version.get("pipeline_version_id") or version_id
+        if version_id:
+            _memo_put(("version", _user_key(self), kfp_endpoint, pipeline_id, version_id), spec)
+        return spec
+
+    def _relay_error(self, response) -> bool:
+        """Relay a KFP error response; True when the response is usable."""
+        if response.code == 200:
+            return True
+        self.set_status(response.code)
+        self.write(response.body)
+        return False
+
+
+class KfpPipelinePreviewHandler(PipelineSpecHandler):
+    """
+    DAG preview of a compiled pipeline, without running notebook code.
+
+    The pipeline is either a package on the server (`package_path`, e.g. as
+    returned by `kfp/compile`) or a registered pipeline version
+    (`pipeline_id`, optional `version_id`). `format=layout` returns the
+    server-side layout instead of Mermaid. Previews are cached per spec
+    digest and responses carry an ETag.
+    """
+
+    @web.authenticated
+    async def get(self) -> None:
+        try:
+            detail = {
+                name: int(self.get_query_argument(name))
+                for name in _DETAIL_ARGUMENTS
+                if self.get_query_argument(name, None) is not None
+            }
+        except ValueError:
+            raise web.HTTPError(400, f"{', '.join(_DETAIL_ARGUMENTS)} must be integers.")
+        output_format = self.get_query_argument("format", "mermaid")
+        if output_format not in {"mermaid", "layout"}:
+            raise web.HTTPError(400, "format must be 'mermaid' or 'layout'.")
+
+        spec = await self.pipeline_spec(
+            self.get_query_argument("package_path", None),
+            self.get_query_argument("pipeline_id", None),
+            self.get_query_argument("version_id", None),
+        )
+        if spec is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            payload = await loop.run_in_executor(
+                None, _render_preview, spec, output_format, detail
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            self.set_status(422)
+            self.write(json.dumps({"error": str(e)}))
+            return
+        self.write(json.dumps(payload))
+
+
+class KfpPreviewPayloadHandler(APIHandler):
+    """
+    Serve a compact preview's payload from the preview store.
+
+    Payloads are content-addressed, so they are cached by the browser for
+    good. The stored gzip bytes are sent as they are when accepted.
+    """
+
+    @web.authenticated
+    def get(self, digest: str) -> None:
+        body = read_preview(digest)
+        if body is None:
+            raise web.HTTPError(404, "Preview payload not found; re-run the cell.")
+        self.set_header("Content-Type", "application/json")
+        self.set_header("Cache-Control", "private, max-age=31536000, immutable")
+        self.set_header("Vary", "Accept-Encoding")
+        if accepts_encoding(self.request.headers.get("Accept-Encoding", ""), "gzip"):
+            self.set_header("Content-Encoding", "gzip")
+        else:
+            body = gzip.decompress(body)
+        self.finish(body)
@@ -1,35 +1,146 @@
 from __future__ import annotations
 
+import asyncio
 import json
+from urllib.parse import parse_qsl, urlencode
 
-import tornado.httpclient
 from jupyter_server.base.handlers import APIHandler
 from tornado import web
 
-from ...config import get_config
-from ..common import base_kfp_endpoint, ensure_namespace_query
+from ...config import KfpServerOptions, _user_key, get_config, get_server_options
+from ..cache import response_cache
+from ..compression import request_body
+from ..common import base_kfp_endpoint, ensure_namespace_query, is_list_path
+from ..hedging import hedged_fetch
+from ..limits import UpstreamBusy, upstream_slot, write_busy
+from ..projection import (
+    BufferedProjector,
+    FieldProjection,
+    StreamingListProjector,
+    project_body,
+)
+from ..resilience import (
+    RETRYABLE_STATUSES,
+    CircuitOpen,
+    RetryPolicy,
+    breaker_for,
+    fetch_resilient,
+    write_circuit_open,
+)
+from ..upstream import (
+    RequestBodyPipe,
+    ResponseRelay,
+    apply_upstream_headers,
+    forward_request_headers,
+    streaming_client,
+    upstream_client,
+)
 
+_BODY_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 
+
+def _list_items_key(path: str) -> str | None:
+    """Key holding the items of a v2beta1 list response, if `path` lists."""
+    normalized = path.strip("/")
+    if not is_list_path(f"apis/v2beta1/{normalized}"):
+        return None
+    last = normalized.rsplit("/", 1)[-1]
+    return "pipeline_versions" if last == "versions" else last
+
+
+@web.stream_request_body
 class KfpProxyHandler(APIHandler):
-    """Transparent proxy to KFP v2beta1 API (namespaced under /proxy/...)."""
+    """
+    Transparent proxy to KFP v2beta1 API (namespaced under /proxy/...).
+
+    Responses are relayed to the browser as they arrive (status and headers
+    first). Request bodies above `proxy_stream_request_threshold` are streamed
+    upstream while the browser is still sending them; smaller bodies are
+    collected and forwarded in one piece.
+
+    GET requests accept `fields=` (see `projection.FieldProjection`) to keep
+    only the given paths. On list endpoints the paths are relative to each
+    item and paging metadata is kept; items are projected as they stream in.
+
+    Compressed upstream bodies are relayed still encoded (unless projected);
+    compressed request bodies are collected and decoded before forwarding.
+    """
+
+    async def prepare(self) -> None:
+        await super().prepare()
+        self._body_chunks: list[bytes] = []
+        self._body_pipe: RequestBodyPipe | None = None
+        self._upstream: asyncio.Future | None = None
+
+        method = self.request.method or "GET"
+        if method not in _BODY_METHODS or not self._wants_streamed_body():
+            return
+
+        # The upstream request starts before the HTTP verb method runs, so
+        # enforce authentication here rather than relying on the decorator.
+        if self.current_user is None:
+            raise web.HTTPError(403)
+
+        self._body_pipe = RequestBodyPipe()
+        path = self.path_args[0] if self.path_args else ""
+        self._upstream = asyncio.ensure_future(
+            self._proxy(method=method, path=path, body_producer=self._body_pipe.produce)
+        )
+        # Once the upstream exchange is over, stop accepting body chunks.
+        self._upstream.add_done_callback(lambda _: self._body_pipe.abort())
+
+    def _wants_streamed_body(self) -> bool:
+        options = get_server_options(self)
+        encoding = self.request.headers.get("Content-Encoding", "identity")
+        if encoding.strip().lower() != "identity":
+            return False
+        length = self.request.headers.get("Content-Length")
+        if length is None:
+            return "chunked" in self.request.headers.get("Transfer-Encoding", "").lower()
+        try:
+            return int(length) > options.proxy_stream_request_threshold
+        except ValueError:
+            return False
+
+    async def data_received(self, chunk: bytes) -> None:
+        if self._body_pipe is None:
+            self._body_chunks.append(chunk)
+            return
+        await self._body_pipe.feed(chunk)
+
+    def on_connection_close(self) -> None:
+        if self._body_pipe is not None:
+            self._body_pipe.abort()
+        super().on_connection_close()
 
     def get_kfp_url(self, path: str) -> str:
         cfg = get_config(self)
         return f"{base_kfp_endpoint(cfg.endpoint)}/apis/v2beta1/{path}"
 
-    async def _proxy(self, *, method: str, path: str) -> None:
+    def _write_error(self, status: int, message: str) -> None:
+        self.set_status(status)
+        self.finish(json.dumps({"error": message}))
+
+    async def _proxy(self, *, method: str, path: str, body_producer=None) -> None:
         self.log.info(f"KFP Proxy {method}: {path}")
         try:
             kfp_url = self.get_kfp_url(path)
         except ValueError as e:
-            self.set_status(400)
-            self.write(json.dumps({"error": str(e)}))
+            self._write_error(400, str(e))
             return
 
         cfg = get_config(self)
+        query = self.request.query or ""
+        projection = None
+        if method == "GET" and "fields" in self.request.query_arguments:
+            projection = FieldProjection.parse(self.get_query_argument("fields"))
+            query = urlencode(
+                [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k != "fields"]
+            )
+        items_key = _list_items_key(path)
         effective_query = ensure_namespace_query(
             path=f"apis/v2beta1/{path.lstrip('/')}",
-            query=self.request.query or "",
+            query=query,
             namespace=cfg.namespace,
         )
         if effective_query:
@@ -37,64 +148,298 @@ class KfpProxyHandler(APIHandler):
 
         # Pass through all client headers except hop-by-hop ones and Host to
         # mimic the original axios behavior and keep Dex/IAP/gRPC-Web happy.
-        hop_by_hop = {
-            "host",
-            "connection",
-            "keep-alive",
-            "proxy-authenticate",
-            "proxy-authorization",
-            "te",
-            "trailers",
-            "transfer-encoding",
-            "upgrade",
-        }
-        headers: dict[str, str] = {
-            h: v for h, v in self.request.headers.items() if h.lower() not in hop_by_hop
-        }
-
-        if cfg.token:
-            headers["Authorization"] = f"Bearer {cfg.token}"
+        headers = forward_request_headers(self.request.headers.get_all(), token=cfg.token)
 
         body = None
         allow_nonstandard_methods = False
-        if method in {"POST", "PUT", "PATCH"}:
-            body = self.request.body or b""
+        if body_producer is not None:
+            allow_nonstandard_methods = method == "DELETE"
+        elif method in {"POST", "PUT", "PATCH"}:
+            body = request_body(self, b"".join(self._body_chunks))
         elif method == "DELETE":
             # Tornado disallows body for DELETE unless allow_nonstandard_methods=True.
             # KFP v2beta1 delete endpoints don't require a body, so omit it by default.
-            if self.request.body:
-                body = self.request.body
+            if self._body_chunks:
+                body = request_body(self, b"".join(self._body_chunks))
                 allow_nonstandard_methods = True
+        self._body_chunks = []
+        if body is not None:
+            # The body is forwarded decoded; the client sets its length.
+            for h in [h for h in headers if h.lower() in {"content-encoding", "content-length"}]:
+                del headers[h]
+
+        options = get_server_options(self)
+        if (
+            method == "GET"
+            and options.proxy_cache_ttl > 0
+            and is_list_path(f"apis/v2beta1/{path}")
+        ):
+            await self._proxy_cached(
+                kfp_url=kfp_url,
+                path=path,
+                query=effective_query,
+                headers=headers,
+                options=options,
+                projection=projection,
+                items_key=items_key,
+            )
+            return
 
-        client = tornado.httpclient.AsyncHTTPClient()
-        response = await client.fetch(
-            kfp_url,
+        fetch_kwargs = dict(
             method=method,
             body=body,
+            body_producer=body_producer,
             headers=headers,
             raise_error=False,
+            # Redirects are relayed to the browser as-is, like the UI proxy does.
+            follow_redirects=False,
             allow_nonstandard_methods=allow_nonstandard_methods,
+            # Projection needs the decoded body; otherwise pass it through.
+            decompress_response=(
+                projection is not None or not options.proxy_compression_passthrough
+            ),
         )
-        self.set_status(response.code)
-        self.write(response.body)
+        try:
+            async with upstream_slot(self, kfp_url):
+                await self._forward(
+                    kfp_url=kfp_url,
+                    method=method,
+                    path=path,
+                    fetch_kwargs=fetch_kwargs,
+                    options=options,
+                    projection=projection,
+                    items_key=items_key,
+                )
+        except UpstreamBusy as e:
+            write_busy(self, e)
+
+    async def _forward(
+        self,
+        *,
+        kfp_url: str,
+        method: str,
+        path: str,
+        fetch_kwargs: dict,
+        options: KfpServerOptions,
+        projection: FieldProjection | None,
+        items_key: str | None,
+    ) -> None:
+        breaker = breaker_for(kfp_url, options)
+        policy = RetryPolicy.from_options(options)
+
+        # Hedging picks a winner after the fact, so hedged reads are buffered.
+        hedged = method == "GET" and options.hedge_percentile > 0
+        if not options.proxy_streaming or hedged:
+
+            def fetch_once():
+                return upstream_client().fetch(kfp_url, **fetch_kwargs)
+
+            try:
+                response = await fetch_resilient(
+                    lambda final: (
+                        hedged_fetch(fetch_once, url=kfp_url, options=options)
+                        if hedged
+                        else fetch_once()
+                    ),
+                    method=method,
+                    breaker=breaker,
+                    policy=policy,
+                )
+            except CircuitOpen as e:
+                write_circuit_open(self, e)
+                return
+            except Exception as e:
+                self._write_error(502, str(e))
+                return
+            self._after_upstream(method=method, path=path, code=response.code)
+            body = response.body
+            projected = projection is not None and response.code == 200
+            if projected:
+                body = project_body(body, projection, items_key=items_key)
+            apply_upstream_headers(
+                self,
+                response.code,
+                response.reason,
+                response.headers,
+                skip=("content-length", "etag") if projected else (),
+            )
+            self.finish(body)
+            return
+
+        def body_filter(code: int, upstream_headers):
+            content_type = upstream_headers.get("Content-Type", "")
+            if projection is None or code != 200 or "json" not in content_type:
+                return None
+            if items_key is not None:
+                return StreamingListProjector(items_key, projection)
+            return BufferedProjector(projection)
+
+        relay = ResponseRelay(self)
+
+        def attempt(final: bool):
+            nonlocal relay
+            # Transient statuses are swallowed while a retry may follow.
+            relay = ResponseRelay(
+                self,
+                body_filter=body_filter,
+                discard=None if final else RETRYABLE_STATUSES.__contains__,
+                decompress_response=fetch_kwargs["decompress_response"],
+            )
+            return streaming_client().fetch(
+                kfp_url,
+                header_callback=relay.header_callback,
+                streaming_callback=relay.streaming_callback,
+                **fetch_kwargs,
+            )
+
+        try:
+            await fetch_resilient(
+                attempt,
+                method=method,
+                breaker=breaker,
+                policy=policy,
+                can_retry=lambda: not relay.headers_sent,
+            )
+        except CircuitOpen as e:
+            write_circuit_open(self, e)
+            return
+        except Exception as e:
+            if not relay.headers_sent:
+                # No upstream response at all (connection refused, timeout, ...).
+                self._write_error(502, str(e))
+                return
+            # Headers are already out; close the connection so the browser
+            # sees a truncated body rather than a complete-looking one.
+            self.log.warning(f"KFP Proxy {method} {path} aborted mid-body: {e}")
+            self.request.connection.stream.close()
+            return
+        try:
+            relay.close()
+        except ValueError as e:
+            self.log.warning(f"KFP Proxy {method} {path} could not project body: {e}")
+            self.request.connection.stream.close()
+            return
+        self._after_upstream(method=method, path=path, code=relay.code)
         self.finish()
 
+    def _after_upstream(self, *, method: str, path: str, code: int | None) -> None:
+        # Successful mutations make cached listings of that resource stale.
+        if method != "GET" and code is not None and code < 400:
+            response_cache().invalidate(_user_key(self), path)
+
+    async def _proxy_cached(
+        self,
+        *,
+        kfp_url: str,
+        path: str,
+        query: str,
+        headers: dict[str, str],
+        options: KfpServerOptions,
+        projection: FieldProjection | None = None,
+        items_key: str | None = None,
+    ) -> None:
+        """Serve a list GET from the per-user cache, sharing in-flight fetches."""
+        cfg = get_config(self)
+        cache = response_cache()
+        cache.max_entries = options.proxy_cache_max_entries
+        key = cache.key(
+            user=_user_key(self),
+            endpoint=cfg.endpoint or "",
+            method="GET",
+            path=path,
+            query=query,
+        )
+        # Conditional headers are answered from the cache, not forwarded.
+        upstream_headers = {
+            h: v
+            for h, v in headers.items()
+            if h.lower() not in {"if-none-match", "if-modified-since"}
+        }
+        refresh = "no-cache" in self.request.headers.get("Cache-Control", "").lower()
+
+        async def fetch(conditional: dict[str, str]):
+            # Cache hits and coalesced callers don't take an upstream slot.
+            async with upstream_slot(self, kfp_url):
+                return await fetch_resilient(
+                    lambda final: hedged_fetch(
+                        lambda: upstream_client().fetch(
+                            kfp_url,
+                            method="GET",
+                            headers={**upstream_headers, **conditional},
+                            raise_error=False,
+                        ),
+                        url=kfp_url,
+                        options=options,
+                    ),
+                    method="GET",
+                    breaker=breaker_for(kfp_url, options),
+                    policy=RetryPolicy.from_options(options),
+                )
+
+        try:
+            entry, status = await cache.get_or_fetch(
+                key,
+                ttl=options.proxy_cache_ttl,
+                max_body=options.proxy_cache_max_body,
+                fetch=fetch,
+                refresh=refresh,
+            )
+        except UpstreamBusy as e:
+            write_busy(self, e)
+            return
+        except CircuitOpen as e:
+            write_circuit_open(self, e)
+            return
+        except Exception as e:
+            self._write_error(502, str(e))
+            return
+
+        self.set_header("X-Kfp-Proxy-Cache", status)
+        if projection is not None and entry.code == 200:
+            # The projected representation does not match upstream validators.
+            self.set_status(entry.code)
+            for h, v in entry.headers:
+                if h.lower() not in {"etag", "last-modified"}:
+                    self.set_header(h, v)
+            self.finish(project_body(entry.body, projection, items_key=items_key))
+            return
+
+        if_none_match = self.request.headers.get("If-None-Match")
+        if entry.code == 200 and entry.etag and if_none_match == entry.etag:
+            self.set_status(304)
+            self.finish()
+            return
+
+        self.set_status(entry.code)
+        for h, v in entry.headers:
+            self.set_header(h, v)
+        self.finish(entry.body)
+
+    async def _proxy_request(self, method: str, path: str) -> None:
+        if self._upstream is None:
+            await self._proxy(method=method, path=path)
+            return
+
+        assert self._body_pipe is not None
+        await self._body_pipe.finish()
+        await self._upstream
+
     @web.authenticated
     async def get(self, path: str) -> None:
-        await self._proxy(method="GET", path=path)
+        await self._proxy_request("GET", path)
 
     @web.authenticated
     async def post(self, path: str) -> None:
-        await self._proxy(method="POST", path=path)
+        await self._proxy_request("POST", path)
 
     @web.authenticated
     async def delete(self, path: str) -> None:
-        await self._proxy(method="DELETE", path=path)
+        await self._proxy_request("DELETE", path)
 
     @web.authenticated
     async def put(self, path: str) -> None:
-        await self._proxy(method="PUT", path=path)
+        await self._proxy_request("PUT", path)
 
     @web.authenticated
     async def patch(self, path: str) -> None:
-        await self._proxy(method="PATCH", path=path)
+        await self._proxy_request("PATCH", path)
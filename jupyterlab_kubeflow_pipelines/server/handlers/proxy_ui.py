@@ -1,21 +1,168 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
 import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
 
 import tornado.httpclient
 from jupyter_server.base.handlers import JupyterHandler
 from jupyter_server.utils import url_path_join
 from tornado import web
 
-from ...config import get_config
+from ...config import get_config, get_server_options
+from ..assets import (
+    IMMUTABLE_CACHE_CONTROL,
+    asset_cache,
+    default_asset_cache_dir,
+    is_fingerprinted_asset,
+)
 from ..common import base_kfp_ui_endpoint, ensure_namespace_query
+from ..limits import UpstreamBusy, upstream_slot, write_busy
+from ..resilience import (
+    RETRYABLE_STATUSES,
+    CircuitOpen,
+    RetryPolicy,
+    breaker_for,
+    fetch_resilient,
+    write_circuit_open,
+)
+from ..upstream import (
+    HOP_BY_HOP_HEADERS,
+    SKIPPED_RESPONSE_HEADERS,
+    ResponseRelay,
+    streaming_client,
+)
 
 BRIDGE_COOKIE_NAME = "jlkfp-bridge-auth"
 BRIDGE_COOKIE_TTL_SECONDS = 600
 _RUNTIME_REWRITER_SENTINEL = "__KFP_PATH_REWRITE_INSTALLED__"
 _RUNTIME_REWRITER_SCRIPT_ID = "jlkfp-path-rewrite"
 _RUNTIME_REWRITER_SCRIPT_PATH = "_jlkfp_path_rewrite.js"
+# Paths the KFP UI uses for API calls; their responses must never be cached.
+_API_PREFIXES = ("apis/", "ml_metadata", "system/", "k8s/")
+
+
+def _rewrite_location(location: str, kfp_endpoint: str, base_proxy_url: str) -> str:
+    """Map an upstream redirect target back under /<base_url>/kfp-ui."""
+    if location.startswith(kfp_endpoint):
+        return location.replace(kfp_endpoint, base_proxy_url.rstrip("/"), 1)
+    if location.startswith("/"):
+        return url_path_join(base_proxy_url, location)
+    return location
+
+
+def _is_streamed_download(path: str, headers) -> bool:
+    """Artifact downloads and range requests are relayed without buffering."""
+    return path.lstrip("/").startswith("artifacts/") or "Range" in headers
+
+
+def _is_shell_path(path: str) -> bool:
+    return path.lstrip("/") in {"", "index.html"}
+
+
+def _is_shell_or_api(path: str, content_type: str) -> bool:
+    normalized = path.lstrip("/")
+    return (
+        _is_shell_path(path)
+        or "text/html" in content_type.lower()
+        or normalized.startswith(_API_PREFIXES)
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _path_rewrite_script(base_proxy_url: str) -> tuple[bytes, str]:
+    """Build the runtime rewriter for `base_proxy_url` once; returns (body, ETag)."""
+    # Keep this script ES5-ish; KFP UI may be served to older browsers.
+    script = (
+        "(function(){"
+        f"if(window.{_RUNTIME_REWRITER_SENTINEL})return;"
+        f"window.{_RUNTIME_REWRITER_SENTINEL}=true;"
+        "var base='';"
+        "try{"
+        "var cs=document.currentScript;"
+        "if(cs){base=cs.getAttribute('data-base')||'';}"
+        "}catch(e){}"
+        "if(!base){"
+        "try{"
+        "var p=window.location.pathname||'';"
+        "var idx=p.indexOf('/kfp-ui');"
+        "if(idx>=0){base=p.substring(0,idx+7);}"
+        "}catch(e){}"
+        "}"
+        f"if(!base){{base={json.dumps(base_proxy_url)};}}"
+        "if(base.charAt(base.length-1)==='/'){base=base.slice(0,-1);}"
+        "var prefixes=['/ml_metadata.MetadataStoreService/','/system/',"
+        "'/apis/v1beta1/','/apis/v2beta1/','/k8s/'];"
+        "function needsRewrite(path){"
+        "for(var i=0;i<prefixes.length;i++){if(path.indexOf(prefixes[i])===0){return true;}}"
+        "return false;"
+        "}"
+        "function rewriteUrl(url){"
+        "if(typeof url!=='string'){return url;}"
+        "if(url.indexOf(base+'/')===0){return url;}"
+        "if(needsRewrite(url)){return base+url;}"
+        "try{"
+        "var parsed=new URL(url,window.location.href);"
+        "if(parsed.origin===window.location.origin&&parsed.pathname.indexOf(base+'/')===0){"
+        "return parsed.pathname+(parsed.search||'')+(parsed.hash||'');"
+        "}"
+        "if(parsed.origin===window.location.origin&&needsRewrite(parsed.pathname)){"
+        "return base+parsed.pathname+(parsed.search||'')+(parsed.hash||'');"
+        "}"
+        "}catch(e){}"
+        "return url;"
+        "}"
+        "if(window.fetch){"
+        "var _fetch=window.fetch;"
+        "window.fetch=function(input,init){"
+        "if(typeof input==='string'){return _fetch.call(this,rewriteUrl(input),init);}"
+        "if(input&&typeof input.url==='string'){"
+        "var newUrl=rewriteUrl(input.url);"
+        "if(newUrl!==input.url){input=new Request(newUrl,input);}"
+        "}"
+        "return _fetch.call(this,input,init);"
+        "};"
+        "}"
+        "if(window.XMLHttpRequest&&window.XMLHttpRequest.prototype){"
+        "var _open=window.XMLHttpRequest.prototype.open;"
+        "window.XMLHttpRequest.prototype.open=function(method,url){"
+        "var args=Array.prototype.slice.call(arguments);"
+        "if(args.length>1){args[1]=rewriteUrl(String(url));}"
+        "return _open.apply(this,args);"
+        "};"
+        "}"
+        "})();"
+    )
+    body = script.encode("utf-8")
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+@dataclass(frozen=True)
+class _ShellEntry:
+    upstream_etag: str
+    content_type: str
+    body: bytes
+    rewritten: bool
+
+
+_MEMO_MAX_ENTRIES = 32
+# (base_url, upstream URL) -> last served shell and its upstream validator, so
+# repeat loads only cost a conditional request.
+_SHELL_MEMO: OrderedDict[tuple[str, str], _ShellEntry] = OrderedDict()
+# (base proxy URL, sha256 of upstream HTML) -> rewritten HTML, or None when
+# the document needs no rewrite.
+_REWRITE_MEMO: OrderedDict[tuple[str, str], bytes | None] = OrderedDict()
+
+
+def _memo_put(memo: OrderedDict, key, value) -> None:
+    memo[key] = value
+    memo.move_to_end(key)
+    while len(memo) > _MEMO_MAX_ENTRIES:
+        memo.popitem(last=False)
 
 
 class KfpUIPathRewriteScriptHandler(JupyterHandler):
@@ -33,73 +180,16 @@ class KfpUIPathRewriteScriptHandler(JupyterHandler):
         base_proxy_url = url_path_join(self.settings.get("base_url", "/"), "kfp-ui").rstrip(
             "/"
         )
+        body, etag = _path_rewrite_script(base_proxy_url)
 
         self.set_header("Content-Type", "application/javascript")
-        self.set_header("Cache-Control", "no-store, max-age=0")
-        self.set_header("Pragma", "no-cache")
-        self.set_header("Expires", "0")
-
-        # Keep this script ES5-ish; KFP UI may be served to older browsers.
-        script = (
-            "(function(){"
-            f"if(window.{_RUNTIME_REWRITER_SENTINEL})return;"
-            f"window.{_RUNTIME_REWRITER_SENTINEL}=true;"
-            "var base='';"
-            "try{"
-            "var cs=document.currentScript;"
-            "if(cs){base=cs.getAttribute('data-base')||'';}"
-            "}catch(e){}"
-            "if(!base){"
-            "try{"
-            "var p=window.location.pathname||'';"
-            "var idx=p.indexOf('/kfp-ui');"
-            "if(idx>=0){base=p.substring(0,idx+7);}"
-            "}catch(e){}"
-            "}"
-            f"if(!base){{base={json.dumps(base_proxy_url)};}}"
-            "if(base.charAt(base.length-1)==='/'){base=base.slice(0,-1);}"
-            "var prefixes=['/ml_metadata.MetadataStoreService/','/system/','/apis/v1beta1/','/apis/v2beta1/','/k8s/'];"
-            "function needsRewrite(path){"
-            "for(var i=0;i<prefixes.length;i++){if(path.indexOf(prefixes[i])===0){return true;}}"
-            "return false;"
-            "}"
-            "function rewriteUrl(url){"
-            "if(typeof url!=='string'){return url;}"
-            "if(url.indexOf(base+'/')===0){return url;}"
-            "if(needsRewrite(url)){return base+url;}"
-            "try{"
-            "var parsed=new URL(url,window.location.href);"
-            "if(parsed.origin===window.location.origin&&parsed.pathname.indexOf(base+'/')===0){"
-            "return parsed.pathname+(parsed.search||'')+(parsed.hash||'');"
-            "}"
-            "if(parsed.origin===window.location.origin&&needsRewrite(parsed.pathname)){"
-            "return base+parsed.pathname+(parsed.search||'')+(parsed.hash||'');"
-            "}"
-            "}catch(e){}"
-            "return url;"
-            "}"
-            "if(window.fetch){"
-            "var _fetch=window.fetch;"
-            "window.fetch=function(input,init){"
-            "if(typeof input==='string'){return _fetch.call(this,rewriteUrl(input),init);}"
-            "if(input&&typeof input.url==='string'){"
-            "var newUrl=rewriteUrl(input.url);"
-            "if(newUrl!==input.url){input=new Request(newUrl,input);}"
-            "}"
-            "return _fetch.call(this,input,init);"
-            "};"
-            "}"
-            "if(window.XMLHttpRequest&&window.XMLHttpRequest.prototype){"
-            "var _open=window.XMLHttpRequest.prototype.open;"
-            "window.XMLHttpRequest.prototype.open=function(method,url){"
-            "var args=Array.prototype.slice.call(arguments);"
-            "if(args.length>1){args[1]=rewriteUrl(String(url));}"
-            "return _open.apply(this,args);"
-            "};"
-            "}"
-            "})();"
-        )
-        self.write(script)
+        # Revalidate on every load, but let the browser keep its copy.
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("ETag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+        self.write(body)
 
 
 class KfpUIProxyHandler(JupyterHandler):
@@ -203,6 +293,11 @@ class KfpUIProxyHandler(JupyterHandler):
         if not (is_shell_document and is_html):
             return body
 
+        memo_key = (base_proxy_url, hashlib.sha256(body).hexdigest())
+        if memo_key in _REWRITE_MEMO:
+            cached = _REWRITE_MEMO[memo_key]
+            return body if cached is None else cached
+
         try:
             html = body.decode("utf-8")
         except UnicodeDecodeError:
@@ -212,10 +307,13 @@ class KfpUIProxyHandler(JupyterHandler):
             html=html, base_proxy_url=base_proxy_url
         )
         if rewritten == html:
+            _memo_put(_REWRITE_MEMO, memo_key, None)
             return body
 
         self.log.info("KFP UI rewrite applied for %s", path)
-        return rewritten.encode("utf-8")
+        result = rewritten.encode("utf-8")
+        _memo_put(_REWRITE_MEMO, memo_key, result)
+        return result
 
     def _inject_runtime_path_rewriter(self, *, html: str, base_proxy_url: str) -> str:
         if _RUNTIME_REWRITER_SCRIPT_ID in html or _RUNTIME_REWRITER_SENTINEL in html:
@@ -235,6 +333,269 @@ class KfpUIProxyHandler(JupyterHandler):
             return html.replace("<body>", "<body>" + script, 1)
         return script + html
 
+    def _upstream_headers(self, cfg) -> dict[str, str]:
+        hop_by_hop = {
+            "host",
+            "connection",
+            "keep-alive",
+            "proxy-authenticate",
+            "proxy-authorization",
+            "te",
+            "trailers",
+            "transfer-encoding",
+            "upgrade",
+        }
+        headers: dict[str, str] = {
+            h: v for h, v in self.request.headers.items() if h.lower() not in hop_by_hop
+        }
+
+        if cfg.token:
+            headers["Authorization"] = f"Bearer {cfg.token}"
+        return headers
+
+    async def _fetch_upstream(
+        self,
+        kfp_url: str,
+        *,
+        headers: dict[str, str],
+        body: bytes | None = None,
+        allow_nonstandard_methods: bool = False,
+        decompress_response: bool = True,
+    ) -> tornado.httpclient.HTTPResponse:
+        client = tornado.httpclient.AsyncHTTPClient()
+        options = get_server_options(self)
+        async with upstream_slot(self, kfp_url):
+            return await fetch_resilient(
+                lambda final: client.fetch(
+                    kfp_url,
+                    method=self.request.method,
+                    headers=headers,
+                    body=body,
+                    raise_error=False,
+                    follow_redirects=False,
+                    decompress_response=decompress_response,
+                    allow_nonstandard_methods=allow_nonstandard_methods,
+                    connect_timeout=15.0,
+                    request_timeout=60.0,
+                ),
+                method=self.request.method or "GET",
+                breaker=breaker_for(kfp_url, options),
+                policy=RetryPolicy.from_options(options),
+            )
+
+    async def _proxy_static_asset(
+        self, *, path: str, kfp_url: str, kfp_endpoint: str, headers: dict[str, str]
+    ) -> None:
+        """Serve a fingerprinted KFP UI asset from the disk cache."""
+        options = get_server_options(self)
+        cache = asset_cache(
+            options.ui_asset_cache_dir or default_asset_cache_dir(),
+            options.ui_asset_cache_max_bytes,
+        )
+        key = cache.key(kfp_endpoint, path)
+        entry = await cache.get(key)
+        status = "HIT"
+        fetched: bytes | None = None
+
+        if entry is None or time.time() - entry.stored_at >= options.ui_asset_revalidate_after:
+            # Browser validators refer to our ETag, not the upstream one.
+            upstream_headers = {
+                h: v
+                for h, v in headers.items()
+                if h.lower() not in {"if-none-match", "if-modified-since"}
+            }
+            if entry is not None and entry.upstream_etag:
+                upstream_headers["If-None-Match"] = entry.upstream_etag
+            # Unless KFP answers usefully, a cached copy is served stale
+            # rather than failing an immutable asset.
+            status = "STALE"
+            try:
+                response = await self._fetch_upstream(kfp_url, headers=upstream_headers)
+            except (UpstreamBusy, CircuitOpen, tornado.httpclient.HTTPClientError, OSError):
+                if entry is None:
+                    raise
+                response = None
+
+            if response is None or (response.code >= 500 and entry is not None):
+                pass
+            elif response.code == 304 and entry is not None:
+                entry = await cache.touch(entry)
+                status = "REVALIDATED"
+            elif response.code == 200 and "html" not in response.headers.get(
+                "Content-Type", ""
+            ).lower():
+                content_type = response.headers.get("Content-Type", "")
+                fetched = response.body
+                entry = await cache.put(
+                    key,
+                    path=path,
+                    content_type=content_type,
+                    body=response.body,
+                    upstream_etag=response.headers.get("ETag"),
+                )
+                if entry is None:
+                    # Larger than the whole cache: pass it through.
+                    self._write_asset(
+                        body=response.body, content_type=content_type, etag=None, status="BYPASS"
+                    )
+                    return
+                status = "MISS"
+            else:
+                # Errors, redirects and the SPA's HTML fallback are relayed
+                # as they came and never cached.
+                if response.code == 404 and entry is not None:
+                    await cache.discard(key)
+                self._relay_uncached_asset(response, kfp_endpoint=kfp_endpoint)
+                return
+
+        body = await cache.read(entry)
+        if body is None:
+            # The file vanished underneath us (and was dropped). Pass through
+            # what was just fetched, or fetch once more; that store is a MISS.
+            if fetched is not None:
+                self._write_asset(
+                    body=fetched, content_type=entry.content_type, etag=None, status="BYPASS"
+                )
+                return
+            await self._proxy_static_asset(
+                path=path, kfp_url=kfp_url, kfp_endpoint=kfp_endpoint, headers=headers
+            )
+            return
+        if self.request.headers.get("If-None-Match") == entry.etag:
+            self.set_status(304)
+            self._set_asset_headers(content_type=None, etag=entry.etag, status=status)
+            return
+        self._write_asset(
+            body=body, content_type=entry.content_type, etag=entry.etag, status=status
+        )
+
+    def _relay_uncached_asset(
+        self, response: tornado.httpclient.HTTPResponse, *, kfp_endpoint: str
+    ) -> None:
+        base_proxy_url = url_path_join(self.settings.get("base_url", "/"), "kfp-ui")
+        self.set_status(response.code, response.reason or None)
+        for h, v in response.headers.get_all():
+            l_h = h.lower()
+            if l_h in SKIPPED_RESPONSE_HEADERS or l_h in HOP_BY_HOP_HEADERS:
+                continue
+            if l_h == "location":
+                v = _rewrite_location(v, kfp_endpoint, base_proxy_url)
+            self.set_header(h, v)
+        self.set_header("X-Frame-Options", "SAMEORIGIN")
+        self.set_header("Content-Security-Policy", "frame-ancestors 'self'")
+        self.set_header("Cache-Control", "no-store, max-age=0")
+        self.write(response.body or b"")
+
+    async def _proxy_download(
+        self, *, path: str, kfp_url: str, kfp_endpoint: str, headers: dict[str, str]
+    ) -> None:
+        """
+        Relay an artifact download chunk by chunk with flow control.
+
+        The body is passed through still encoded so `Range`/`If-Range`,
+        `Content-Range` and `Content-Length` keep referring to the same bytes,
+        and 206 responses reach the browser unchanged. There is no overall
+        time limit unless `ui_download_timeout` is set, so the user's upstream
+        slot is given back once the headers are relayed: stalled downloads do
+        not use up the limiter lane.
+        """
+        options = get_server_options(self)
+        base_proxy_url = url_path_join(self.settings.get("base_url", "/"), "kfp-ui")
+        release_slot: Callable[[], None] = lambda: None
+
+        def apply_headers(code: int, reason: str, upstream_headers) -> None:
+            self.set_status(code, reason or None)
+            for h, v in upstream_headers.get_all():
+                l_h = h.lower()
+                if l_h in HOP_BY_HOP_HEADERS or l_h in {"set-cookie", "server"}:
+                    continue
+                if l_h == "location":
+                    v = _rewrite_location(v, kfp_endpoint, base_proxy_url)
+                self.set_header(h, v)
+            self.set_header("X-Frame-Options", "SAMEORIGIN")
+            self.set_header("Content-Security-Policy", "frame-ancestors 'self'")
+            if "Cache-Control" not in upstream_headers:
+                self.set_header("Cache-Control", "no-store, max-age=0")
+            # Past this point the request is not retried; only the body is left.
+            release_slot()
+
+        relay = ResponseRelay(self, apply_headers=apply_headers)
+
+        def attempt(final: bool):
+            nonlocal relay
+            relay = ResponseRelay(
+                self,
+                apply_headers=apply_headers,
+                discard=None if final else RETRYABLE_STATUSES.__contains__,
+            )
+            return streaming_client().fetch(
+                kfp_url,
+                method=self.request.method,
+                headers=headers,
+                header_callback=relay.header_callback,
+                streaming_callback=relay.streaming_callback,
+                raise_error=False,
+                follow_redirects=False,
+                decompress_response=False,
+                connect_timeout=15.0,
+                # 0 disables the limit; None would mean Tornado's 20s default
+                # (and is rejected by the simple client).
+                request_timeout=max(0.0, options.ui_download_timeout),
+            )
+
+        try:
+            async with upstream_slot(self, kfp_url) as release_slot:
+                await fetch_resilient(
+                    attempt,
+                    method=self.request.method or "GET",
+                    breaker=breaker_for(kfp_url, options),
+                    policy=RetryPolicy.from_options(options),
+                    can_retry=lambda: not relay.headers_sent,
+                )
+        except (UpstreamBusy, CircuitOpen):
+            raise
+        except Exception as e:
+            if not relay.headers_sent:
+                raise
+            # Part of the body is out; close so the browser can resume.
+            self.log.warning(f"KFP UI download {path} aborted mid-body: {e}")
+            self.request.connection.stream.close()
+            return
+        self.log.info(
+            f"KFP UI download {path}: {relay.code}, {relay.bytes_relayed} bytes relayed"
+        )
+
+    def _write_memoized_shell(self, entry: _ShellEntry) -> None:
+        """Serve the shell from memory after upstream confirmed it is unchanged."""
+        self.set_status(200)
+        self.set_header("Content-Type", entry.content_type or "text/html")
+        self.set_header("X-Frame-Options", "SAMEORIGIN")
+        self.set_header("Content-Security-Policy", "frame-ancestors 'self'")
+        self.set_header("Cache-Control", "no-store, max-age=0")
+        self.set_header("Pragma", "no-cache")
+        self.set_header("Expires", "0")
+        self.set_header("X-Kfp-Ui-Shell-Cache", "HIT")
+        if entry.rewritten:
+            self.set_header("X-Kfp-Ui-Rewrite", "1")
+        self.write(entry.body)
+
+    def _set_asset_headers(
+        self, *, content_type: str | None, etag: str | None, status: str
+    ) -> None:
+        self.set_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        self.set_header("X-Kfp-Ui-Asset-Cache", status)
+        self.set_header("X-Frame-Options", "SAMEORIGIN")
+        if etag:
+            self.set_header("ETag", etag)
+        if content_type:
+            self.set_header("Content-Type", content_type)
+
+    def _write_asset(
+        self, *, body: bytes, content_type: str, etag: str | None, status: str
+    ) -> None:
+        self._set_asset_headers(content_type=content_type, etag=etag, status=status)
+        self.write(body)
+
     async def _proxy(self, path: str) -> None:
         cfg = get_config(self)
         try:
@@ -255,26 +616,42 @@ class KfpUIProxyHandler(JupyterHandler):
             kfp_url += f"?{effective_query}"
 
         self.log.info(f"KFP Proxy Request: {self.request.method} {path} -> {kfp_url}")
-        client = tornado.httpclient.AsyncHTTPClient()
 
         try:
-            hop_by_hop = {
-                "host",
-                "connection",
-                "keep-alive",
-                "proxy-authenticate",
-                "proxy-authorization",
-                "te",
-                "trailers",
-                "transfer-encoding",
-                "upgrade",
-            }
-            headers: dict[str, str] = {
-                h: v for h, v in self.request.headers.items() if h.lower() not in hop_by_hop
-            }
+            headers = self._upstream_headers(cfg)
+
+            if (
+                self.request.method == "GET"
+                and is_fingerprinted_asset(path)
+                and get_server_options(self).ui_asset_cache_max_bytes > 0
+            ):
+                await self._proxy_static_asset(
+                    path=path, kfp_url=kfp_url, kfp_endpoint=kfp_endpoint, headers=headers
+                )
+                return
 
-            if cfg.token:
-                headers["Authorization"] = f"Bearer {cfg.token}"
+            if self.request.method in {"GET", "HEAD"} and _is_streamed_download(
+                path, self.request.headers
+            ):
+                await self._proxy_download(
+                    path=path, kfp_url=kfp_url, kfp_endpoint=kfp_endpoint, headers=headers
+                )
+                return
+
+            shell_key = None
+            shell_memo = None
+            if self.request.method == "GET" and _is_shell_path(path):
+                shell_key = (self.settings.get("base_url", "/"), kfp_url)
+                shell_memo = _SHELL_MEMO.get(shell_key)
+                # Browser validators refer to the rewritten document, not
+                # to upstream's; revalidate our memoized copy instead.
+                headers = {
+                    h: v
+                    for h, v in headers.items()
+                    if h.lower() not in {"if-none-match", "if-modified-since"}
+                }
+                if shell_memo is not None:
+                    headers["If-None-Match"] = shell_memo.upstream_etag
 
             request_body = None
             allow_nonstandard_methods = False
@@ -284,20 +661,25 @@ class KfpUIProxyHandler(JupyterHandler):
                 request_body = self.request.body
                 allow_nonstandard_methods = True
 
-            response = await client.fetch(
+            # Only the shell document is rewritten; other bodies KFP already
+            # compressed are relayed without decoding them.
+            passthrough = (
+                get_server_options(self).proxy_compression_passthrough
+                and not _is_shell_path(path)
+            )
+            response = await self._fetch_upstream(
                 kfp_url,
-                method=self.request.method,
                 headers=headers,
                 body=request_body,
-                raise_error=False,
-                follow_redirects=False,
-                decompress_response=True,
                 allow_nonstandard_methods=allow_nonstandard_methods,
-                connect_timeout=15.0,
-                request_timeout=60.0,
+                decompress_response=not passthrough,
             )
 
             self.log.info(f"KFP Proxy Response: {response.code} for {path}")
+            if shell_memo is not None and response.code == 304:
+                self._write_memoized_shell(shell_memo)
+                return
+
             self.set_status(response.code)
 
             base_proxy_url = url_path_join(self.settings.get("base_url", "/"), "kfp-ui")
@@ -305,6 +687,9 @@ class KfpUIProxyHandler(JupyterHandler):
 
             for h, v in response.headers.items():
                 l_h = h.lower()
+                if l_h == "content-encoding" and passthrough:
+                    self.set_header(h, v)
+                    continue
                 if l_h in {
                     "content-length",
                     "content-encoding",
@@ -316,23 +701,22 @@ class KfpUIProxyHandler(JupyterHandler):
                     continue
 
                 if l_h == "location":
-                    orig_loc = v
-                    if orig_loc.startswith(kfp_endpoint):
-                        new_loc = orig_loc.replace(kfp_endpoint, base_proxy_url.rstrip("/"), 1)
-                    elif orig_loc.startswith("/"):
-                        new_loc = url_path_join(base_proxy_url, orig_loc)
-                    else:
-                        new_loc = orig_loc
-                    self.set_header("Location", new_loc)
+                    self.set_header(
+                        "Location", _rewrite_location(v, kfp_endpoint, base_proxy_url)
+                    )
                     continue
 
                 self.set_header(h, v)
 
             self.set_header("X-Frame-Options", "SAMEORIGIN")
             self.set_header("Content-Security-Policy", "frame-ancestors 'self'")
-            self.set_header("Cache-Control", "no-store, max-age=0")
-            self.set_header("Pragma", "no-cache")
-            self.set_header("Expires", "0")
+            if _is_shell_or_api(path, response_content_type):
+                self.set_header("Cache-Control", "no-store, max-age=0")
+                self.set_header("Pragma", "no-cache")
+                self.set_header("Expires", "0")
+            elif "Cache-Control" not in response.headers:
+                # Unversioned assets may change with a KFP upgrade.
+                self.set_header("Cache-Control", "no-cache")
 
             if path.endswith(".js"):
                 self.set_header("Content-Type", "application/javascript")
@@ -346,10 +730,27 @@ class KfpUIProxyHandler(JupyterHandler):
                     body=response.body,
                     base_proxy_url=base_proxy_url,
                 )
-                if rewritten_body is not response.body:
+                rewritten = rewritten_body is not response.body
+                if rewritten:
                     self.set_header("X-Kfp-Ui-Rewrite", "1")
+                upstream_etag = response.headers.get("ETag")
+                if shell_key is not None and response.code == 200 and upstream_etag:
+                    _memo_put(
+                        _SHELL_MEMO,
+                        shell_key,
+                        _ShellEntry(
+                            upstream_etag=upstream_etag,
+                            content_type=response_content_type,
+                            body=rewritten_body,
+                            rewritten=rewritten,
+                        ),
+                    )
                 self.write(rewritten_body)
 
+        except UpstreamBusy as e:
+            write_busy(self, e)
+        except CircuitOpen as e:
+            write_circuit_open(self, e)
         except tornado.httpclient.HTTPClientError as e:
             self.log.error(f"UI Proxy HTTPClientError at {path}: {e}", exc_info=True)
             self.set_status(502)
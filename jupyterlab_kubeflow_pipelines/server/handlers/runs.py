@@ -1,18 +1,109 @@
 from __future__ import annotations
 
+import asyncio
 import json
+from typing import Any
 
 import tornado.httpclient
 from jupyter_server.base.handlers import APIHandler
 from tornado import web
+from tornado.iostream import StreamClosedError
 
-from ...config import get_config
+from ...config import _user_key, get_config, get_server_options
+from ...preview import build_run_dag
+from ..batch import BATCH_OPERATIONS, resolve_run_ids, run_batch
+from ..cache import response_cache
+from ..compression import request_body
 from ..common import base_kfp_endpoint
+from ..events import Subscription, run_event_hub
+from ..hedging import hedged_fetch
+from ..limits import UpstreamBusy, write_busy
+from ..listing import UpstreamListError
+from ..resilience import (
+    CircuitOpen,
+    RetryPolicy,
+    breaker_for,
+    fetch_resilient,
+    write_circuit_open,
+)
+from ..run_index import run_indexes
+
+
+async def fetch_kfp(handler: APIHandler, api_path: str):
+    """GET `api_path` from KFP; writes the error response and returns None on failure."""
+    cfg = get_config(handler)
+    try:
+        kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+    except ValueError as e:
+        handler.set_status(400)
+        handler.write(json.dumps({"error": str(e)}))
+        return None
+
+    url = f"{kfp_endpoint}/{api_path}"
+    headers: dict[str, str] = {}
+    if cfg.token:
+        headers["Authorization"] = f"Bearer {cfg.token}"
+
+    client = tornado.httpclient.AsyncHTTPClient()
+    options = get_server_options(handler)
+    try:
+        return await fetch_resilient(
+            lambda final: hedged_fetch(
+                lambda: client.fetch(url, method="GET", headers=headers, raise_error=False),
+                url=url,
+                options=options,
+            ),
+            method="GET",
+            breaker=breaker_for(url, options),
+            policy=RetryPolicy.from_options(options),
+        )
+    except CircuitOpen as e:
+        write_circuit_open(handler, e)
+        return None
+
+
+async def _fetch_run(handler: APIHandler, run_id: str):
+    return await fetch_kfp(handler, f"apis/v2beta1/runs/{run_id}")
 
 
 class KfpRunHandler(APIHandler):
     @web.authenticated
     async def get(self, run_id: str) -> None:
+        response = await _fetch_run(self, run_id)
+        if response is None:
+            return
+        self.set_status(response.code)
+        self.write(response.body)
+
+
+class KfpRunDagHandler(APIHandler):
+    """
+    A run's DAG as Mermaid, with task nodes classed by their current state.
+
+    Responses carry an ETag, so clients polling an unchanged run get `304`.
+    """
+
+    @web.authenticated
+    async def get(self, run_id: str) -> None:
+        response = await _fetch_run(self, run_id)
+        if response is None:
+            return
+        if response.code != 200:
+            self.set_status(response.code)
+            self.write(response.body)
+            return
+        try:
+            dag = build_run_dag(json.loads(response.body))
+        except (ValueError, TypeError, AttributeError) as e:
+            self.set_status(422)
+            self.write(json.dumps({"error": str(e)}))
+            return
+        self.write(json.dumps(dag.to_payload()))
+
+
+class KfpRunTerminateHandler(APIHandler):
+    @web.authenticated
+    async def post(self, run_id: str) -> None:
         cfg = get_config(self)
         try:
             kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
@@ -21,38 +112,266 @@ class KfpRunHandler(APIHandler):
             self.write(json.dumps({"error": str(e)}))
             return
 
-        url = f"{kfp_endpoint}/apis/v2beta1/runs/{run_id}"
-        headers: dict[str, str] = {}
+        url = f"{kfp_endpoint}/apis/v2beta1/runs/{run_id}:terminate"
+        headers: dict[str, str] = {"Content-Type": "application/json"}
         if cfg.token:
             headers["Authorization"] = f"Bearer {cfg.token}"
 
         client = tornado.httpclient.AsyncHTTPClient()
-        response = await client.fetch(
-            url, method="GET", headers=headers, raise_error=False
-        )
+        options = get_server_options(self)
+        try:
+            response = await fetch_resilient(
+                lambda final: client.fetch(
+                    url, method="POST", headers=headers, body=b"{}", raise_error=False
+                ),
+                method="POST",
+                breaker=breaker_for(url, options),
+                policy=RetryPolicy.from_options(options),
+            )
+        except CircuitOpen as e:
+            write_circuit_open(self, e)
+            return
+        if response.code < 400:
+            response_cache().invalidate(_user_key(self), "runs")
         self.set_status(response.code)
-        self.write(response.body)
+        self.write(response.body or json.dumps({"status": "ok", "run_id": run_id}))
 
 
-class KfpRunTerminateHandler(APIHandler):
+class KfpRunBatchHandler(APIHandler):
+    """
+    Apply one operation (`terminate`, `retry`, `archive` or `delete`) to many
+    runs: `{"operation": ..., "run_ids": [...]}`, or `"filter"` (a KFP list
+    filter, as JSON text or object) with an optional `"experiment_id"`
+    instead of `run_ids`.
+
+    The response is NDJSON: one outcome per run as it finishes, then a
+    `{"summary": {...}}` line.
+    """
+
     @web.authenticated
-    async def post(self, run_id: str) -> None:
+    async def post(self) -> None:
         cfg = get_config(self)
+        options = get_server_options(self)
         try:
             kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+            body = json.loads(request_body(self) or b"{}")
+            operation, run_ids, run_filter = self._parse(body, options.batch_max_runs)
         except ValueError as e:
             self.set_status(400)
-            self.write(json.dumps({"error": str(e)}))
+            self.finish(json.dumps({"error": str(e)}))
             return
 
-        url = f"{kfp_endpoint}/apis/v2beta1/runs/{run_id}:terminate"
         headers: dict[str, str] = {"Content-Type": "application/json"}
         if cfg.token:
             headers["Authorization"] = f"Bearer {cfg.token}"
+        truncated = False
+        if run_filter is not None:
+            try:
+                run_ids, truncated = await resolve_run_ids(
+                    endpoint=kfp_endpoint,
+                    filter=run_filter,
+                    experiment_id=body.get("experiment_id") or None,
+                    user=_user_key(self),
+                    headers=headers,
+                    namespace=cfg.namespace,
+                    options=options,
+                )
+            except CircuitOpen as e:
+                write_circuit_open(self, e)
+                return
+            except UpstreamBusy as e:
+                write_busy(self, e)
+                return
+            except UpstreamListError as e:
+                self.set_status(e.code if e.code >= 400 else 502)
+                self.finish(json.dumps({"error": str(e), "status_code": e.code}))
+                return
 
-        client = tornado.httpclient.AsyncHTTPClient()
-        response = await client.fetch(
-            url, method="POST", headers=headers, body=b"{}", raise_error=False
+        self.set_header("Content-Type", "application/x-ndjson")
+        # Keep nginx-style ingresses from buffering the stream.
+        self.set_header("X-Accel-Buffering", "no")
+        succeeded = failed = 0
+        outcomes = run_batch(
+            endpoint=kfp_endpoint,
+            operation=operation,
+            run_ids=run_ids,
+            user=_user_key(self),
+            headers=headers,
+            options=options,
         )
-        self.set_status(response.code)
-        self.write(response.body or json.dumps({"status": "ok", "run_id": run_id}))
+        try:
+            async for outcome in outcomes:
+                if outcome["ok"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                self.write(json.dumps(outcome) + "\n")
+                await self.flush()
+        except StreamClosedError:
+            return
+        finally:
+            await outcomes.aclose()
+            if succeeded:
+                response_cache().invalidate(_user_key(self), "runs")
+
+        summary = {
+            "operation": operation,
+            "total": succeeded + failed,
+            "succeeded": succeeded,
+            "failed": failed,
+            "truncated": truncated,
+        }
+        self.finish(json.dumps({"summary": summary}) + "\n")
+
+    @staticmethod
+    def _parse(body: Any, max_runs: int) -> tuple[str, list[str], str | None]:
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object.")
+        operation = body.get("operation")
+        if operation not in BATCH_OPERATIONS:
+            raise ValueError(
+                f"operation must be one of: {', '.join(sorted(BATCH_OPERATIONS))}."
+            )
+        run_ids = body.get("run_ids")
+        run_filter = body.get("filter")
+        if (run_ids is None) == (run_filter is None):
+            raise ValueError("Pass either run_ids or filter.")
+        if run_filter is not None:
+            if isinstance(run_filter, dict):
+                run_filter = json.dumps(run_filter)
+            if not isinstance(run_filter, str) or not run_filter.strip():
+                raise ValueError("filter must be a KFP filter object or its JSON text.")
+            return operation, [], run_filter
+        if not isinstance(run_ids, list) or not all(
+            isinstance(run_id, str) and run_id for run_id in run_ids
+        ):
+            raise ValueError("run_ids must be a list of run IDs.")
+        if len(run_ids) > max_runs:
+            raise ValueError(f"At most {max_runs} runs per batch.")
+        return operation, run_ids, None
+
+
+class KfpRunSearchHandler(APIHandler):
+    """
+    Search runs in the local run index: `q` (words matched as prefixes of
+    run names and parameter names and values), `state=` (repeatable),
+    `experiment_id` and `limit`.
+
+    The index is synced with KFP first when it is older than
+    `run_index_sync_interval`. If KFP cannot be reached, results from an
+    earlier sync are returned with `"stale": true`.
+    """
+
+    @web.authenticated
+    async def get(self) -> None:
+        cfg = get_config(self)
+        try:
+            kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+            limit = int(self.get_query_argument("limit", "50"))
+        except ValueError as e:
+            self.set_status(400)
+            self.write(json.dumps({"error": str(e)}))
+            return
+
+        options = get_server_options(self)
+        index = run_indexes().get(
+            user=_user_key(self),
+            endpoint=kfp_endpoint,
+            namespace=self.get_query_argument("namespace", None) or cfg.namespace or "",
+            options=options,
+        )
+        stale = False
+        try:
+            await index.ensure_synced(token=cfg.token, options=options)
+        except Exception as e:
+            if index.synced_at is None:
+                if isinstance(e, CircuitOpen):
+                    write_circuit_open(self, e)
+                elif isinstance(e, UpstreamBusy):
+                    write_busy(self, e)
+                else:
+                    code = e.code if isinstance(e, UpstreamListError) else 502
+                    self.set_status(code if code >= 400 else 502)
+                    self.write(json.dumps({"error": str(e)}))
+                return
+            stale = True
+
+        runs = index.search(
+            text=self.get_query_argument("q", ""),
+            states=self.get_query_arguments("state"),
+            experiment_id=self.get_query_argument("experiment_id", None),
+            limit=min(max(limit, 0), 1000),
+        )
+        payload = {
+            "runs": runs,
+            "count": len(runs),
+            "total_indexed": index.size,
+            "synced_at": index.synced_at,
+        }
+        if stale:
+            payload.update(stale=True, sync_error=index.sync_error)
+        self.write(json.dumps(payload))
+
+
+class KfpRunEventsHandler(APIHandler):
+    """
+    Server-Sent Events stream of run state changes in a namespace.
+
+    The first event is a `snapshot` of the tracked runs, followed by one
+    `run` event per state transition and `error` events when polling KFP
+    starts failing. `run_id=` (repeatable) narrows the stream to those runs;
+    reconnecting clients resume from `Last-Event-ID` when possible.
+    """
+
+    _subscription: Subscription | None = None
+
+    @web.authenticated
+    async def get(self) -> None:
+        cfg = get_config(self)
+        try:
+            kfp_endpoint = base_kfp_endpoint(cfg.endpoint)
+        except ValueError as e:
+            self.set_status(400)
+            self.write(json.dumps({"error": str(e)}))
+            return
+
+        options = get_server_options(self)
+        namespace = self.get_query_argument("namespace", None) or cfg.namespace
+        sub = self._subscription = run_event_hub().subscribe(
+            user=_user_key(self),
+            config=cfg,
+            endpoint=kfp_endpoint,
+            namespace=namespace,
+            options=options,
+            run_ids=self.get_query_arguments("run_id"),
+            last_event_id=self.request.headers.get("Last-Event-ID"),
+        )
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        # Keep nginx-style ingresses from buffering the stream.
+        self.set_header("X-Accel-Buffering", "no")
+        try:
+            self.write(f"retry: {int(options.run_events_poll_interval * 1000)}\n\n")
+            await self.flush()
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        sub.queue.get(), options.run_events_keepalive
+                    )
+                except asyncio.TimeoutError:
+                    self.write(": keepalive\n\n")
+                    await self.flush()
+                    continue
+                if event is None:
+                    break
+                self.write(event.encode())
+                await self.flush()
+        except StreamClosedError:
+            pass
+        finally:
+            sub.close()
+
+    def on_connection_close(self) -> None:
+        if self._subscription is not None:
+            self._subscription.close()
+        super().on_connection_close()
@@ -0,0 +1,196 @@
+"""
+Hedged requests for idempotent KFP reads.
+
+`ml-pipeline` replicas can show heavy tail latency (e.g. during MySQL
+contention) while most requests are fast. With hedging enabled, a read that
+has not answered within the `hedge_percentile` of recently observed latency
+for its route is sent a second time and the first response wins. The window
+samples the first attempt only, so won hedges do not drag the percentile
+down: a primary beaten by its hedge is left to finish in the background and
+its full latency is recorded then. Hedges are paid for from a per-host
+budget that earns `hedge_max_rate` tokens per request, so at most that
+fraction of requests is ever duplicated.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+from urllib.parse import urlsplit
+
+from ..config import KfpServerOptions
+from .limits import upstream_host
+from .metrics import HEDGE_SENT_TOTAL, HEDGE_SKIPPED_TOTAL, HEDGE_WON_TOTAL
+
+T = TypeVar("T")
+
+LATENCY_WINDOW = 256
+# Hedge tokens a host can save up, bounding bursts of hedges.
+HEDGE_BUDGET_BURST = 10.0
+
+
+def route_of(url: str) -> str:
+    """
+    Latency bucket of a KFP API URL: host plus path with IDs collapsed.
+
+    v2beta1 paths alternate collection and ID segments
+    (`runs/{id}`, `pipelines/{id}/versions/{id}`); `:verb` suffixes are kept.
+    """
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    try:
+        start = segments.index("apis") + 2
+    except ValueError:
+        start = 0
+    templated = segments[:start]
+    for i, segment in enumerate(segments[start:]):
+        if i % 2 == 0:
+            templated.append(segment)
+        else:
+            _, sep, verb = segment.partition(":")
+            templated.append("{id}" + (sep + verb if sep else ""))
+    return f"{parts.netloc}/{'/'.join(templated)}"
+
+
+class LatencyTracker:
+    """Sliding window of response latencies per route."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+
+    def observe(self, route: str, seconds: float) -> None:
+        samples = self._samples.get(route)
+        if samples is None:
+            samples = self._samples[route] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, route: str, p: float, *, min_samples: int) -> float | None:
+        samples = self._samples.get(route)
+        if not samples or len(samples) < max(1, min_samples):
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def clear(self) -> None:
+        self._samples.clear()
+
+
+class HedgeBudget:
+    """Token bucket: every request earns `rate` tokens, a hedge spends one."""
+
+    def __init__(self, burst: float = HEDGE_BUDGET_BURST) -> None:
+        self.burst = burst
+        self._tokens = 0.0
+
+    def earn(self, rate: float) -> None:
+        self._tokens = min(self.burst, self._tokens + max(0.0, rate))
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+_LATENCY = LatencyTracker()
+_BUDGETS: dict[str, HedgeBudget] = {}
+
+
+def latency_tracker() -> LatencyTracker:
+    return _LATENCY
+
+
+def _budget(host: str) -> HedgeBudget:
+    budget = _BUDGETS.get(host)
+    if budget is None:
+        budget = _BUDGETS[host] = HedgeBudget()
+    return budget
+
+
+def reset_hedging() -> None:
+    _LATENCY.clear()
+    _BUDGETS.clear()
+
+
+async def hedged_fetch(
+    fetch: Callable[[], Awaitable[T]], *, url: str, options: KfpServerOptions
+) -> T:
+    """
+    Run `fetch` for an idempotent read, hedging it when it is slow.
+
+    `fetch` must be safe to call twice. Only call this for GET/HEAD requests
+    whose response is buffered, since the winner is picked after the fact.
+    """
+    if options.hedge_percentile <= 0:
+        return await fetch()
+
+    host = upstream_host(url)
+    route = route_of(url)
+    tracker = latency_tracker()
+    budget = _budget(host)
+    budget.earn(options.hedge_max_rate)
+    delay = tracker.percentile(
+        route, options.hedge_percentile, min_samples=options.hedge_min_samples
+    )
+
+    async def timed() -> tuple[T, float]:
+        start = time.monotonic()
+        result = await fetch()
+        return result, time.monotonic() - start
+
+    primary = asyncio.ensure_future(timed())
+    tasks = [primary]
+    hedge_won = False
+
+    def sample_primary(task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is None:
+            tracker.observe(route, task.result()[1])
+
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(
+                {primary}, timeout=max(delay, options.hedge_min_delay)
+            )
+            if not done:
+                if budget.try_spend():
+                    HEDGE_SENT_TOTAL.labels(host).inc()
+                    tasks.append(asyncio.ensure_future(timed()))
+                else:
+                    HEDGE_SKIPPED_TOTAL.labels(host).inc()
+
+        pending = set(tasks)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the primary when both finished in the same tick.
+            for task in sorted(done, key=tasks.index):
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                result, elapsed = task.result()
+                if task is primary:
+                    tracker.observe(route, elapsed)
+                else:
+                    HEDGE_WON_TOTAL.labels(host).inc()
+                    # Only the primary's latency is sampled: a winning hedge
+                    # is the fast tail and would pull the percentile down.
+                    hedge_won = True
+                return result
+        assert error is not None
+        raise error
+    finally:
+        for task in tasks:
+            if task is primary and hedge_won and not task.done():
+                # Bounded by the fetch's own timeout; sampled when it ends.
+                primary.add_done_callback(sample_primary)
+            elif not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Mark retrieved so a losing failure is not logged.
+                task.exception()
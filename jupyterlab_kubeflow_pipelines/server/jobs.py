@@ -0,0 +1,326 @@
+"""
+Background jobs for long compile, submit and import requests.
+
+`kfp/compile`, `kfp/submit` and `kfp/pipelines/import` run notebook code and
+blocking `kfp.Client` calls that can take minutes on slow clusters, longer
+than many ingresses keep a request open. With `Prefer: respond-async` they
+answer 202 at once with a job; the work runs on a worker thread and reports
+its stages (`executing`, `compiling`, `uploading`, `creating_run`). Clients
+poll `jobs/{id}` or follow `jobs/{id}/events` (Server-Sent Events) until the
+job is done; the result is the response the synchronous call would give.
+
+An `Idempotency-Key` header deduplicates requests per user and endpoint: a
+retried request gets the original job instead of, say, a second run. This
+also applies to synchronous requests, which then wait for the shared job.
+Finished jobs, and their keys, are kept for `job_retention` seconds and at
+most `job_max_retained` per user.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
+from tornado import web
+
+from ..config import KfpServerOptions, _user_key, get_server_options
+from .resilience import CircuitOpen, write_circuit_open
+
+log = logging.getLogger(__name__)
+
+# Reports the stage a job entered; callable from the worker thread.
+Progress = Callable[[str], None]
+# Does a job's work and returns the HTTP status and JSON payload.
+Work = Callable[[Progress], tuple[int, dict]]
+
+FINISHED_STATES = frozenset({"succeeded", "failed"})
+
+
+@dataclass(frozen=True)
+class JobEvent:
+    id: int
+    kind: str
+    data: dict[str, Any]
+
+    def encode(self) -> bytes:
+        """The event in `text/event-stream` framing."""
+        return (
+            f"id: {self.id}\nevent: {self.kind}\ndata: {json.dumps(self.data)}\n\n"
+        ).encode()
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    user: str
+    idempotency_key: str | None = None
+    # sha256 of the request body, to spot keys reused for other requests.
+    request_digest: str = ""
+    state: str = "pending"
+    stage: str | None = None
+    stages: list[dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    status: int | None = None
+    result: dict | None = None
+    events: list[JobEvent] = field(default_factory=list)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def to_dict(self, *, with_result: bool = True) -> dict[str, Any]:
+        payload = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "stage": self.stage,
+            "stages": self.stages,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "status": self.status,
+        }
+        if with_result:
+            payload["result"] = self.result
+        return payload
+
+    def _publish(self, kind: str) -> None:
+        self.events.append(JobEvent(len(self.events) + 1, kind, self.to_dict()))
+        # Wake every waiter, then arm a fresh event for the next change.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def advance(self, stage: str) -> None:
+        if self.finished:
+            return
+        self.state = "running"
+        self.stage = stage
+        self.stages.append({"stage": stage, "at": time.time()})
+        self._publish("stage")
+
+    def finish(self, status: int, result: dict) -> None:
+        self.state = "succeeded" if status < 400 else "failed"
+        self.status = status
+        self.result = result
+        self.finished_at = time.time()
+        self._publish("done")
+
+    async def wait_for_event(self, after: int, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for an event newer than `after`."""
+        while len(self.events) <= after:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def events_after(self, last_event_id: int) -> list[JobEvent]:
+        return self.events[max(0, last_event_id) :]
+
+
+def _run_work(work: Work, progress: Progress) -> tuple[int, dict]:
+    try:
+        return work(progress)
+    except CircuitOpen as e:
+        return 503, {"error": str(e), "retry_after": e.retry_after}
+    except Exception as e:
+        log.error("Background job failed: %s", traceback.format_exc())
+        return 500, {"error": str(e), "traceback": traceback.format_exc()}
+
+
+class JobRegistry:
+    """Jobs by ID, with the idempotency keys of the jobs still retained."""
+
+    def __init__(self) -> None:
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._keys: dict[tuple[str, str, str], str] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._tasks: set[asyncio.Future] = set()
+
+    def get(self, user: str, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.user == user else None
+
+    def list(self, user: str) -> list[Job]:
+        return [job for job in self._jobs.values() if job.user == user]
+
+    def start(
+        self,
+        *,
+        user: str,
+        kind: str,
+        request_body: bytes,
+        idempotency_key: str | None,
+        work: Work,
+        options: KfpServerOptions,
+    ) -> tuple[Job, bool]:
+        """
+        Start `work` on a worker thread, or return the job already started
+        under `idempotency_key`. The flag tells whether the job is new.
+        """
+        self._prune(options)
+        digest = hashlib.sha256(request_body).hexdigest()
+        if idempotency_key:
+            existing = self._jobs.get(self._keys.get((user, kind, idempotency_key), ""))
+            if existing is not None:
+                if existing.request_digest != digest:
+                    raise web.HTTPError(
+                        422, "Idempotency-Key was already used for a different request."
+                    )
+                return existing, False
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            user=user,
+            idempotency_key=idempotency_key,
+            request_digest=digest,
+        )
+        self._jobs[job.id] = job
+        if idempotency_key:
+            self._keys[(user, kind, idempotency_key)] = job.id
+
+        executor = self._executor_for(options)
+        loop = asyncio.get_running_loop()
+
+        def progress(stage: str) -> None:
+            loop.call_soon_threadsafe(job.advance, stage)
+
+        async def run() -> None:
+            status, result = await loop.run_in_executor(executor, _run_work, work, progress)
+            job.finish(status, result)
+
+        task = asyncio.ensure_future(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job, True
+
+    async def run_inline(self, work: Work, options: KfpServerOptions) -> tuple[int, dict]:
+        """
+        Run `work` on a worker thread without recording a job. Work blocks
+        (SDK calls, compiler locks), so it never runs on the IOLoop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor_for(options), work, lambda stage: None
+        )
+
+    def _executor_for(self, options: KfpServerOptions) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, options.job_max_workers), thread_name_prefix="kfp-job"
+            )
+        return self._executor
+
+    def _prune(self, options: KfpServerOptions) -> None:
+        now = time.time()
+        finished_per_user: dict[str, int] = {}
+        # Newest first, so the oldest finished jobs go over the bound.
+        for job in reversed(list(self._jobs.values())):
+            if not job.finished:
+                continue
+            count = finished_per_user[job.user] = finished_per_user.get(job.user, 0) + 1
+            if now - (job.finished_at or now) > options.job_retention or (
+                count > options.job_max_retained
+            ):
+                self._discard(job)
+
+    def _discard(self, job: Job) -> None:
+        self._jobs.pop(job.id, None)
+        if job.idempotency_key:
+            key = (job.user, job.kind, job.idempotency_key)
+            if self._keys.get(key) == job.id:
+                del self._keys[key]
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        self._jobs.clear()
+        self._keys.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_JOB_REGISTRY = JobRegistry()
+
+
+def job_registry() -> JobRegistry:
+    return _JOB_REGISTRY
+
+
+def reset_jobs() -> None:
+    _JOB_REGISTRY.close()
+
+
+def wants_async(handler) -> bool:
+    """Whether the request asks for a job (`Prefer: respond-async`)."""
+    prefer = handler.request.headers.get("Prefer", "")
+    return any(
+        token.strip().split("=", 1)[0].strip().lower() == "respond-async"
+        for part in prefer.split(",")
+        for token in part.split(";")[:1]
+    )
+
+
+def write_job(handler, job: Job, *, status: int = 200) -> None:
+    handler.set_status(status)
+    handler.set_header("Content-Type", "application/json")
+    handler.finish(json.dumps(job.to_dict()))
+
+
+async def respond(handler, kind: str, request_body: bytes, work: Work) -> None:
+    """
+    Answer a compile/submit/import request.
+
+    Without `Prefer: respond-async` or an `Idempotency-Key` the request
+    waits for the work without a job being recorded, as before. Otherwise it
+    runs as a job: async requests get 202 and the job, synchronous ones wait
+    for the job and get its result. Either way the work runs on the job
+    executor, never on the IOLoop.
+    """
+    idempotency_key = handler.request.headers.get("Idempotency-Key") or None
+    asynchronous = wants_async(handler)
+    if not asynchronous and idempotency_key is None:
+        try:
+            status, payload = await job_registry().run_inline(
+                work, get_server_options(handler)
+            )
+        except CircuitOpen as e:
+            write_circuit_open(handler, e)
+            return
+        handler.set_status(status)
+        handler.write(json.dumps(payload))
+        return
+
+    job, _ = job_registry().start(
+        user=_user_key(handler),
+        kind=kind,
+        request_body=request_body,
+        idempotency_key=idempotency_key,
+        work=work,
+        options=get_server_options(handler),
+    )
+    if asynchronous:
+        handler.set_header("Preference-Applied", "respond-async")
+        handler.set_header("Location", f"jobs/{job.id}")
+        write_job(handler, job, status=202)
+        return
+    while not job.finished:
+        await job.wait_for_event(len(job.events), 3600.0)
+    if job.status == 503 and "retry_after" in (job.result or {}):
+        handler.set_header("Retry-After", str(job.result["retry_after"]))
+    handler.set_status(job.status or 500)
+    handler.write(json.dumps(job.result))
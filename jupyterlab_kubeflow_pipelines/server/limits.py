@@ -0,0 +1,191 @@
+"""
+Per-user concurrency limits for requests forwarded to KFP.
+
+Every (user, upstream host) pair gets a lane with a fixed number of
+concurrent upstream requests and a bounded FIFO wait queue. When the queue
+is full, or a request waits too long, `UpstreamBusy` is raised so the
+handler can answer 429 with `Retry-After` immediately instead of piling more
+work onto `ml-pipeline`. One noisy session therefore only delays itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from ..config import _user_key, get_server_options
+from .metrics import (
+    UPSTREAM_ACTIVE_REQUESTS,
+    UPSTREAM_QUEUED_REQUESTS,
+    UPSTREAM_REJECTED_TOTAL,
+)
+
+LaneKey = tuple[str, str]
+
+
+class UpstreamBusy(Exception):
+    """No upstream slot is available for this user right now."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Too many concurrent KFP requests ({reason}).")
+
+
+def upstream_host(url: str) -> str:
+    """`host[:port]` of an upstream URL, used as the limiter/metrics label."""
+    return urlsplit(url).netloc or url
+
+
+@dataclass
+class _Lane:
+    active: int = 0
+    waiters: deque[asyncio.Future] = field(default_factory=deque)
+
+
+class UpstreamLimiter:
+    def __init__(self) -> None:
+        self._lanes: dict[LaneKey, _Lane] = {}
+
+    def snapshot(self, user: str | None = None) -> list[dict[str, object]]:
+        """Active/queued counts per lane, optionally for one user only."""
+        return [
+            {"user": u, "upstream": host, "active": lane.active, "queued": len(lane.waiters)}
+            for (u, host), lane in self._lanes.items()
+            if user is None or u == user
+        ]
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        *,
+        user: str,
+        url: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ) -> AsyncIterator[Callable[[], None]]:
+        """
+        Hold one upstream slot of `user` for `url`'s host while in the block.
+
+        The block gets a function that gives the slot back early, e.g. once a
+        long download is under way. `max_concurrency <= 0` disables limiting.
+        """
+        if max_concurrency <= 0:
+            yield lambda: None
+            return
+
+        host = upstream_host(url)
+        key = (user, host)
+        await self._acquire(
+            key,
+            max_concurrency=max_concurrency,
+            max_queue=max_queue,
+            queue_timeout=queue_timeout,
+            retry_after=retry_after,
+        )
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release(key)
+
+        try:
+            yield release
+        finally:
+            release()
+
+    async def _acquire(
+        self,
+        key: LaneKey,
+        *,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ) -> None:
+        host = key[1]
+        lane = self._lanes.setdefault(key, _Lane())
+        if lane.active < max_concurrency and not lane.waiters:
+            lane.active += 1
+            UPSTREAM_ACTIVE_REQUESTS.labels(host).inc()
+            return
+
+        if len(lane.waiters) >= max_queue:
+            UPSTREAM_REJECTED_TOTAL.labels(host, "queue_full").inc()
+            self._discard_if_idle(key)
+            raise UpstreamBusy("queue full", retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        UPSTREAM_QUEUED_REQUESTS.labels(host).inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self._release(key)
+            else:
+                waiter.cancel()
+                lane.waiters.remove(waiter)
+                UPSTREAM_QUEUED_REQUESTS.labels(host).dec()
+                self._discard_if_idle(key)
+            if isinstance(e, asyncio.TimeoutError):
+                UPSTREAM_REJECTED_TOTAL.labels(host, "queue_timeout").inc()
+                raise UpstreamBusy("queue timeout", retry_after) from None
+            raise
+
+    def _release(self, key: LaneKey) -> None:
+        host = key[1]
+        lane = self._lanes[key]
+        while lane.waiters:
+            waiter = lane.waiters.popleft()
+            UPSTREAM_QUEUED_REQUESTS.labels(host).dec()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter (FIFO).
+                waiter.set_result(None)
+                return
+        lane.active -= 1
+        UPSTREAM_ACTIVE_REQUESTS.labels(host).dec()
+        self._discard_if_idle(key)
+
+    def _discard_if_idle(self, key: LaneKey) -> None:
+        lane = self._lanes.get(key)
+        if lane is not None and lane.active == 0 and not lane.waiters:
+            del self._lanes[key]
+
+
+_UPSTREAM_LIMITER = UpstreamLimiter()
+
+
+def upstream_limiter() -> UpstreamLimiter:
+    return _UPSTREAM_LIMITER
+
+
+def upstream_slot(handler, url: str):
+    """`UpstreamLimiter.slot` for the handler's user, tuned by server options."""
+    options = get_server_options(handler)
+    return upstream_limiter().slot(
+        user=_user_key(handler),
+        url=url,
+        max_concurrency=options.upstream_max_concurrency,
+        max_queue=options.upstream_max_queue,
+        queue_timeout=options.upstream_queue_timeout,
+        retry_after=options.upstream_retry_after,
+    )
+
+
+def write_busy(handler, busy: UpstreamBusy) -> None:
+    """Answer 429 with `Retry-After` for a request the limiter turned away."""
+    handler.set_status(429)
+    handler.set_header("Retry-After", str(busy.retry_after))
+    handler.set_header("Content-Type", "application/json")
+    handler.finish(json.dumps({"error": str(busy), "retry_after": busy.retry_after}))
@@ -0,0 +1,142 @@
+"""
+Server-side paging over KFP v2beta1 list endpoints.
+
+Walking `next_page_token` from the browser costs one browser -> server -> KFP
+round trip per page. These helpers walk the pages inside the server over the
+shared upstream client instead. Every page is a GET through the upstream
+host's circuit breaker and retry policy (see `resilience`), like the proxy's
+own reads.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator, Iterable
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlencode
+
+from tornado.httpclient import HTTPResponse
+
+from ..config import KfpServerOptions
+from .common import ensure_namespace_query
+from .limits import upstream_limiter
+from .resilience import RetryPolicy, breaker_for, fetch_resilient
+from .upstream import upstream_client
+
+# URL path segment -> key holding the items in the v2beta1 list response.
+LIST_RESOURCES = {
+    "runs": "runs",
+    "experiments": "experiments",
+    "pipelines": "pipelines",
+}
+
+
+class UpstreamListError(Exception):
+    """A list page could not be fetched from KFP."""
+
+    def __init__(self, code: int, body: bytes | str) -> None:
+        self.code = code
+        self.body = body.decode("utf-8", "replace") if isinstance(body, bytes) else body
+        super().__init__(f"KFP list request failed with HTTP {code}: {self.body[:200]}")
+
+
+@dataclass(frozen=True)
+class ListPage:
+    items: list[dict[str, Any]]
+    next_page_token: str
+    total_size: int | None
+
+
+async def fetch_upstream_get(
+    url: str, *, headers: dict[str, str] | None, options: KfpServerOptions
+) -> HTTPResponse:
+    """GET `url` with retries, through the circuit breaker of its host."""
+    client = upstream_client()
+    return await fetch_resilient(
+        lambda final: client.fetch(
+            url, method="GET", headers=dict(headers or {}), raise_error=False
+        ),
+        method="GET",
+        breaker=breaker_for(url, options),
+        policy=RetryPolicy.from_options(options),
+    )
+
+
+def _page_slot(user: str | None, url: str, options: KfpServerOptions):
+    if user is None:
+        return nullcontext()
+    return upstream_limiter().slot(
+        user=user,
+        url=url,
+        max_concurrency=options.upstream_max_concurrency,
+        max_queue=options.upstream_max_queue,
+        queue_timeout=options.upstream_queue_timeout,
+        retry_after=options.upstream_retry_after,
+    )
+
+
+async def walk_list(
+    *,
+    endpoint: str,
+    resource: str,
+    options: KfpServerOptions,
+    params: Iterable[tuple[str, str]] = (),
+    headers: dict[str, str] | None = None,
+    namespace: str | None = None,
+    page_size: int = 200,
+    limit: int | None = None,
+    user: str | None = None,
+) -> AsyncIterator[ListPage]:
+    """
+    Yield list pages for `resource` until exhausted or `limit` items are seen.
+
+    `params` are passed to every page request (filter, sort_by,
+    experiment_id, ...); paging parameters are managed here. The final page
+    is cut to `limit`, in which case its `next_page_token` is still the
+    upstream one so callers can report truncation.
+
+    With `user` set, each page request takes a slot of the upstream limiter
+    (callers already holding one for the whole walk leave it unset). Raises
+    `CircuitOpen` and `UpstreamBusy` like the proxy handlers see them.
+    """
+    items_key = LIST_RESOURCES[resource]
+    path = f"apis/v2beta1/{resource}"
+    base_params = [
+        (k, v) for k, v in params if k not in {"page_token", "page_size"}
+    ]
+    page_token = ""
+    seen = 0
+
+    while True:
+        page_params = [*base_params, ("page_size", str(page_size))]
+        if page_token:
+            page_params.append(("page_token", page_token))
+        query = ensure_namespace_query(
+            path=path, query=urlencode(page_params), namespace=namespace
+        )
+        url = f"{endpoint}/{path}?{query}"
+        async with _page_slot(user, url, options):
+            response = await fetch_upstream_get(url, headers=headers, options=options)
+        if response.code != 200:
+            raise UpstreamListError(response.code, response.body or b"")
+
+        try:
+            payload = json.loads(response.body or b"{}")
+        except json.JSONDecodeError as e:
+            raise UpstreamListError(502, f"Invalid JSON from KFP: {e}") from e
+
+        items = payload.get(items_key) or []
+        page_token = payload.get("next_page_token") or ""
+        if limit is not None and seen + len(items) > limit:
+            items = items[: max(0, limit - seen)]
+        seen += len(items)
+        yield ListPage(
+            items=items,
+            next_page_token=page_token,
+            total_size=payload.get("total_size"),
+        )
+
+        if not page_token or (limit is not None and seen >= limit):
+            return
@@ -0,0 +1,53 @@
+"""
+Prometheus metrics for upstream KFP traffic.
+
+They are registered in the default registry, so Jupyter Server exposes them
+on its `/metrics` endpoint next to its own. Labels are limited to the
+upstream host to keep cardinality bounded; per-user figures are reported by
+the debug endpoint instead.
+"""
+
+from __future__ import annotations
+
+from prometheus_client import Counter, Gauge
+
+UPSTREAM_ACTIVE_REQUESTS = Gauge(
+    "jupyterlab_kfp_upstream_active_requests",
+    "Proxied requests currently holding an upstream concurrency slot",
+    ["upstream"],
+)
+UPSTREAM_QUEUED_REQUESTS = Gauge(
+    "jupyterlab_kfp_upstream_queued_requests",
+    "Proxied requests waiting for an upstream concurrency slot",
+    ["upstream"],
+)
+UPSTREAM_REJECTED_TOTAL = Counter(
+    "jupyterlab_kfp_upstream_rejected_total",
+    "Proxied requests answered with 429 by the upstream concurrency limiter",
+    ["upstream", "reason"],
+)
+HEDGE_SENT_TOTAL = Counter(
+    "jupyterlab_kfp_hedged_requests_total",
+    "Second (hedged) upstream requests sent for slow idempotent reads",
+    ["upstream"],
+)
+HEDGE_WON_TOTAL = Counter(
+    "jupyterlab_kfp_hedged_requests_won_total",
+    "Hedged upstream requests that answered before the original",
+    ["upstream"],
+)
+HEDGE_SKIPPED_TOTAL = Counter(
+    "jupyterlab_kfp_hedged_requests_skipped_total",
+    "Hedges not sent because the per-host hedge budget was exhausted",
+    ["upstream"],
+)
+RUN_EVENT_POLLERS = Gauge(
+    "jupyterlab_kfp_run_event_pollers",
+    "Upstream run-status pollers serving runs/events subscribers",
+    ["upstream"],
+)
+RUN_EVENT_SUBSCRIBERS = Gauge(
+    "jupyterlab_kfp_run_event_subscribers",
+    "Open runs/events streams",
+    ["upstream"],
+)
@@ -0,0 +1,286 @@
+"""
+Minimal gRPC-Web client for the ML Metadata store behind the KFP UI.
+
+The KFP UI talks to MLMD through its `/ml_metadata.MetadataStoreService/`
+gRPC-Web route, the same route the UI proxy relays. Only
+`GetExecutions` is needed here (to look up executions by cache
+fingerprint), so its few messages are encoded by hand instead of pulling in
+`ml-metadata` and its generated protos.
+
+Like the KFP driver, which only reuses executions of the same pipeline in
+the same namespace, lookups are scoped to the pipeline's `system.Pipeline`
+context and the executions' `namespace` property.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Iterable
+
+import tornado.httpclient
+
+from ..cache_plan import CachedExecution
+from .resilience import RetryPolicy, breaker_for, fetch_resilient
+
+GET_EXECUTIONS_PATH = "ml_metadata.MetadataStoreService/GetExecutions"
+# Fingerprints per filter query; keeps the query well under URL/SQL limits.
+FINGERPRINTS_PER_QUERY = 25
+PAGE_SIZE = 100
+
+# `Execution.State` enum values.
+EXECUTION_STATES = {
+    0: "UNKNOWN",
+    1: "NEW",
+    2: "RUNNING",
+    3: "COMPLETE",
+    4: "FAILED",
+    5: "CACHED",
+    6: "CANCELED",
+}
+
+_VARINT, _FIXED64, _LENGTH_DELIMITED, _FIXED32 = 0, 1, 2, 5
+
+
+class MlmdError(Exception):
+    """MLMD answered with a non-OK gRPC status or an unreadable message."""
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    value &= (1 << 64) - 1
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number: int, value: int | bytes | str) -> bytes:
+    if isinstance(value, int):
+        return _varint(number << 3 | _VARINT) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return _varint(number << 3 | _LENGTH_DELIMITED) + _varint(len(value)) + value
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        if pos >= len(data):
+            raise MlmdError("Truncated varint in MLMD response.")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(data: bytes):
+    """Yield `(number, value)`; varints as ints, length-delimited as bytes."""
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == _VARINT:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == _LENGTH_DELIMITED:
+            size, pos = _read_varint(data, pos)
+            value, pos = data[pos : pos + size], pos + size
+        elif wire_type == _FIXED64:
+            value, pos = data[pos : pos + 8], pos + 8
+        elif wire_type == _FIXED32:
+            value, pos = data[pos : pos + 4], pos + 4
+        else:
+            raise MlmdError(f"Unsupported wire type {wire_type} in MLMD response.")
+        yield number, value
+
+
+def encode_get_executions_request(filter_query: str, page_token: str = "") -> bytes:
+    """`GetExecutionsRequest` with `ListOperationOptions`."""
+    options = _field(1, PAGE_SIZE) + _field(4, filter_query)
+    if page_token:
+        options += _field(3, page_token)
+    return _field(1, options)
+
+
+def _decode_execution(data: bytes) -> CachedExecution | None:
+    execution_id, state, fingerprint = 0, 0, ""
+    created = updated = 0
+    for number, value in _fields(data):
+        if number == 1:
+            execution_id = value
+        elif number == 3:
+            state = value
+        elif number == 5:
+            entry = dict(_fields(value))
+            if entry.get(1) == b"cache_fingerprint":
+                fingerprint = dict(_fields(entry.get(2, b""))).get(3, b"").decode()
+        elif number == 8:
+            created = value
+        elif number == 9:
+            updated = value
+    if not fingerprint:
+        return None
+    duration = (updated - created) / 1000 if created and updated >= created else None
+    return CachedExecution(
+        id=execution_id,
+        state=EXECUTION_STATES.get(state, "UNKNOWN"),
+        fingerprint=fingerprint,
+        duration_seconds=duration,
+    )
+
+
+def decode_get_executions_response(data: bytes) -> tuple[list[CachedExecution], str]:
+    """Executions carrying a cache fingerprint, and the next page token."""
+    executions: list[CachedExecution] = []
+    page_token = ""
+    for number, value in _fields(data):
+        if number == 1:
+            execution = _decode_execution(value)
+            if execution is not None:
+                executions.append(execution)
+        elif number == 2:
+            page_token = value.decode()
+    return executions, page_token
+
+
+def grpc_web_frame(message: bytes) -> bytes:
+    return b"\x00" + struct.pack(">I", len(message)) + message
+
+
+def parse_grpc_web_response(body: bytes, headers=None) -> bytes:
+    """The message of a unary gRPC-Web response; raises `MlmdError` on errors."""
+    message = b""
+    trailers: dict[str, str] = {}
+    if headers is not None and "grpc-status" in headers:
+        trailers["grpc-status"] = headers.get("grpc-status", "")
+        trailers["grpc-message"] = headers.get("grpc-message", "")
+    pos = 0
+    while pos + 5 <= len(body):
+        flag = body[pos]
+        (size,) = struct.unpack(">I", body[pos + 1 : pos + 5])
+        payload = body[pos + 5 : pos + 5 + size]
+        pos += 5 + size
+        if flag & 0x80:
+            for line in payload.decode("utf-8", "replace").split("\r\n"):
+                name, _, value = line.partition(":")
+                if name:
+                    trailers[name.strip().lower()] = value.strip()
+        else:
+            message = payload
+    status = trailers.get("grpc-status", "0")
+    if status != "0":
+        raise MlmdError(
+            f"MLMD GetExecutions failed (grpc-status {status}): "
+            f"{trailers.get('grpc-message', '')}".rstrip(": ")
+        )
+    return message
+
+
+def _string_literal(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def fingerprint_queries(
+    fingerprints: Iterable[str],
+    *,
+    pipeline_name: str | None = None,
+    namespace: str | None = None,
+) -> list[str]:
+    """
+    Filter queries matching executions by `cache_fingerprint`, in chunks,
+    restricted to the executions of `pipeline_name` in `namespace` when given.
+    """
+    scope = ""
+    if pipeline_name:
+        scope += (
+            " AND contexts_a.type = 'system.Pipeline'"
+            f" AND contexts_a.name = {_string_literal(pipeline_name)}"
+        )
+    if namespace:
+        scope += f" AND custom_properties.namespace.string_value = {_string_literal(namespace)}"
+    unique = sorted(set(fingerprints))
+    queries = []
+    for start in range(0, len(unique), FINGERPRINTS_PER_QUERY):
+        chunk = unique[start : start + FINGERPRINTS_PER_QUERY]
+        # Fingerprints are hex digests, so quoting needs no escaping.
+        matches = " OR ".join(
+            f"custom_properties.cache_fingerprint.string_value = '{fp}'" for fp in chunk
+        )
+        queries.append(f"({matches}){scope}" if scope else matches)
+    return queries
+
+
+def pick_cached_executions(
+    executions: Iterable[CachedExecution],
+) -> dict[str, CachedExecution]:
+    """
+    One execution per fingerprint: the latest that ran to completion (its
+    duration is what a cache hit saves), else the latest cached or other one.
+    """
+    rank = {"COMPLETE": 2, "CACHED": 1}
+    picked: dict[str, CachedExecution] = {}
+    for execution in executions:
+        current = picked.get(execution.fingerprint)
+        if current is None or (rank.get(execution.state, 0), execution.id) > (
+            rank.get(current.state, 0),
+            current.id,
+        ):
+            picked[execution.fingerprint] = execution
+    return picked
+
+
+async def find_executions(
+    ui_endpoint: str,
+    fingerprints: Iterable[str],
+    *,
+    token: str | None,
+    options,
+    pipeline_name: str | None = None,
+    namespace: str | None = None,
+) -> dict[str, CachedExecution]:
+    """
+    Executions of `pipeline_name` in `namespace` recorded with any of
+    `fingerprints`, one per fingerprint (see `pick_cached_executions`).
+    Raises `MlmdError`, or `CircuitOpen` when the endpoint is failing.
+    """
+    url = f"{ui_endpoint.rstrip('/')}/{GET_EXECUTIONS_PATH}"
+    headers = {
+        "Content-Type": "application/grpc-web+proto",
+        "Accept": "application/grpc-web+proto",
+        "X-Grpc-Web": "1",
+    }
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    client = tornado.httpclient.AsyncHTTPClient()
+
+    found: list[CachedExecution] = []
+    for query in fingerprint_queries(
+        fingerprints, pipeline_name=pipeline_name, namespace=namespace
+    ):
+        page_token = ""
+        while True:
+            body = grpc_web_frame(encode_get_executions_request(query, page_token))
+            # GetExecutions only reads, so it is retried like a GET.
+            response = await fetch_resilient(
+                lambda final: client.fetch(
+                    url, method="POST", headers=headers, body=body, raise_error=False
+                ),
+                method="GET",
+                breaker=breaker_for(url, options),
+                policy=RetryPolicy.from_options(options),
+            )
+            if response.code != 200:
+                raise MlmdError(f"MLMD GetExecutions failed with HTTP {response.code}.")
+            executions, page_token = decode_get_executions_response(
+                parse_grpc_web_response(response.body, response.headers)
+            )
+            found.extend(executions)
+            if not page_token:
+                break
+    return pick_cached_executions(found)
@@ -0,0 +1,136 @@
+"""
+Code of notebooks compiled by path (`kfp/compile` with `notebook_path`).
+
+The notebook is read through the contents manager, so any contents backend
+works and the browser no longer uploads the concatenated source on every
+dialog open. Code cells are extracted once per notebook revision: a
+notebook with an unchanged `last_modified`, or an unchanged contents hash
+after a touch or a no-op save, is not parsed again. The sha256 of the
+extracted code keys cached `inspect` results, so notebooks whose code did
+not change are not re-executed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any
+
+from jupyter_server.utils import ensure_async
+
+_MEMO_MAX_ENTRIES = 64
+
+
+@dataclass(frozen=True)
+class NotebookSource:
+    path: str
+    last_modified: str
+    # Contents hash reported by the contents manager, when it supports one.
+    file_hash: str | None
+    # sha256 of the extracted code.
+    checksum: str
+    source: str
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "last_modified": self.last_modified,
+            "checksum": self.checksum,
+        }
+
+
+# Keyed by (user, path); only touched on the event loop.
+_SOURCES: OrderedDict[tuple[str, str], NotebookSource] = OrderedDict()
+# Inspection payloads by code checksum; filled from job worker threads.
+_INSPECTIONS: OrderedDict[str, dict] = OrderedDict()
+_INSPECTIONS_LOCK = threading.Lock()
+
+
+def _put(memo: OrderedDict, key, value) -> None:
+    memo[key] = value
+    memo.move_to_end(key)
+    while len(memo) > _MEMO_MAX_ENTRIES:
+        memo.popitem(last=False)
+
+
+def extract_code(notebook: dict) -> str:
+    """The notebook's code cells, joined the way the frontend joins them."""
+    parts = []
+    for cell in notebook.get("cells") or []:
+        if cell.get("cell_type") != "code":
+            continue
+        source = cell.get("source") or ""
+        parts.append(f"{''.join(source) if isinstance(source, list) else source}\n\n")
+    return "".join(parts)
+
+
+async def _get_hashed(contents_manager, path: str, *, content: bool) -> dict:
+    try:
+        return await ensure_async(
+            contents_manager.get(
+                path, content=content, type="notebook", require_hash=True
+            )
+        )
+    except TypeError:
+        # Contents managers predating `require_hash`.
+        return await ensure_async(
+            contents_manager.get(path, content=content, type="notebook")
+        )
+
+
+async def load_notebook_source(contents_manager, path: str, *, user: str) -> NotebookSource:
+    """
+    The code of the notebook at `path` (relative to the server root).
+
+    Contents manager errors (404 for missing files, 400 for non-notebooks)
+    propagate as `web.HTTPError`.
+    """
+    key = (user, path)
+    cached = _SOURCES.get(key)
+    if cached is not None:
+        model = await ensure_async(
+            contents_manager.get(path, content=False, type="notebook")
+        )
+        last_modified = str(model.get("last_modified"))
+        if cached.last_modified != last_modified and cached.file_hash is not None:
+            # Saved without changes, or copied back: compare contents hashes.
+            model = await _get_hashed(contents_manager, path, content=False)
+            if model.get("hash") == cached.file_hash:
+                cached = replace(cached, last_modified=last_modified)
+                _SOURCES[key] = cached
+        if cached.last_modified == last_modified:
+            _SOURCES.move_to_end(key)
+            return cached
+
+    model = await _get_hashed(contents_manager, path, content=True)
+    code = extract_code(model.get("content") or {})
+    source = NotebookSource(
+        path=path,
+        last_modified=str(model.get("last_modified")),
+        file_hash=model.get("hash"),
+        checksum=hashlib.sha256(code.encode()).hexdigest(),
+        source=code,
+    )
+    _put(_SOURCES, key, source)
+    return source
+
+
+def cached_inspection(checksum: str) -> dict | None:
+    with _INSPECTIONS_LOCK:
+        payload = _INSPECTIONS.get(checksum)
+        if payload is not None:
+            _INSPECTIONS.move_to_end(checksum)
+        return payload
+
+
+def remember_inspection(checksum: str, payload: dict) -> None:
+    with _INSPECTIONS_LOCK:
+        _put(_INSPECTIONS, checksum, payload)
+
+
+def reset_notebook_sources() -> None:
+    _SOURCES.clear()
+    with _INSPECTIONS_LOCK:
+        _INSPECTIONS.clear()
@@ -0,0 +1,273 @@
+"""
+Content-addressed store for uploaded pipeline packages.
+
+`kfp/packages` streams a package (raw YAML, or the file part of a
+`multipart/form-data` body; optionally gzip-encoded) straight into this
+store. Chunks are hashed as they are written, so a multi-MB spec is never
+held in memory, and `kfp/submit` and `kfp/pipelines/import` then hand the
+stored file to the KFP SDK by `package_id` (its sha256). Before a package
+is committed it is parsed once to check that it is a compiled pipeline spec.
+The oldest packages are evicted beyond `package_store_max_bytes`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+import zlib
+from collections.abc import Callable, Iterator
+from email.message import Message
+from email.utils import collapse_rfc2231_value
+
+import yaml
+from jupyter_core.paths import jupyter_runtime_dir
+from tornado import httputil, web
+
+_PACKAGE_ID = re.compile(r"^[0-9a-f]{64}$")
+# Bound on the header block of one multipart part.
+_MAX_PART_HEADERS = 16 * 1024
+# Form fields taken as the package when no part carries a filename.
+_PACKAGE_FIELDS = frozenset({"package", "file", "pipeline_package"})
+
+
+def package_store_dir() -> str:
+    return os.path.join(jupyter_runtime_dir(), "jupyterlab_kubeflow_pipelines", "packages")
+
+
+def compiled_package_dir() -> str:
+    """Where `kfp/compile` writes the packages it returns a `package_path` for."""
+    return os.path.join(jupyter_runtime_dir(), "jupyterlab_kubeflow_pipelines", "compiled")
+
+
+def _header_params(value: str) -> dict[str, str]:
+    """Parameters of a `Content-Type`-style header value (`; key=value`)."""
+    message = Message()
+    message["Content-Type"] = value
+    params = message.get_params() or []
+    return {key.lower(): collapse_rfc2231_value(v) for key, v in params[1:]}
+
+
+def validate_package(path: str) -> None:
+    """
+    Raise `web.HTTPError` 422 unless `path` holds a compiled pipeline spec:
+    YAML (or JSON) whose first document has a `root` and a `pipelineInfo`
+    or `components` section.
+    """
+    try:
+        with open(path, "rb") as f:
+            spec = next(iter(yaml.safe_load_all(f)), None)
+    except yaml.YAMLError as e:
+        raise web.HTTPError(422, f"The pipeline package is not valid YAML: {e}") from e
+    if not (
+        isinstance(spec, dict)
+        and "root" in spec
+        and ("pipelineInfo" in spec or "components" in spec)
+    ):
+        raise web.HTTPError(
+            422, "The package is not a compiled KFP pipeline (no pipelineInfo and root)."
+        )
+
+
+def stored_package_path(package_id: str, *, directory: str | None = None) -> str | None:
+    """Path of a stored package, if `package_id` is valid and still stored."""
+    if not _PACKAGE_ID.match(package_id or ""):
+        return None
+    path = os.path.join(directory or package_store_dir(), f"{package_id}.yaml")
+    return path if os.path.isfile(path) else None
+
+
+class PackageWriter:
+    """
+    Write a package to the store chunk by chunk while hashing it.
+
+    Raises `web.HTTPError` 413 once more than `max_bytes` were written.
+    `commit` moves the file to its content address; `abort` discards it.
+    """
+
+    def __init__(self, *, max_bytes: int, directory: str | None = None) -> None:
+        self.directory = directory or package_store_dir()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            self.abort()
+            raise web.HTTPError(413, f"Pipeline package exceeds {self.max_bytes} bytes.")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def validate(self) -> None:
+        """Check the written package with `validate_package`."""
+        self._file.close()
+        validate_package(self._tmp)
+
+    def commit(self, *, max_store_bytes: int) -> tuple[str, str]:
+        """Store the file under its sha256; returns `(package_id, path)`."""
+        self._file.close()
+        package_id = self._hash.hexdigest()
+        path = os.path.join(self.directory, f"{package_id}.yaml")
+        if os.path.exists(path):
+            os.unlink(self._tmp)
+            # Refresh the mtime so eviction keeps packages still in use.
+            os.utime(path)
+        else:
+            os.replace(self._tmp, path)
+        _evict(self.directory, max_store_bytes, keep=path)
+        return package_id, path
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.unlink(self._tmp)
+        except FileNotFoundError:
+            pass
+
+
+def _evict(directory: str, max_bytes: int, *, keep: str) -> None:
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".yaml"):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class BodyDecoder:
+    """
+    Incremental counterpart of `compression.decode_body` for streamed bodies.
+
+    `feed` yields the decoded bytes of a chunk in bounded pieces, so a small
+    gzip bomb never expands in memory; the size limit itself is enforced by
+    whoever consumes the pieces.
+    """
+
+    _PIECE = 64 * 1024
+
+    def __init__(self, content_encoding: str | None) -> None:
+        self.coding = (content_encoding or "").strip().lower()
+        if self.coding in {"", "identity"}:
+            self._decoder = None
+        elif self.coding in {"gzip", "x-gzip", "deflate"}:
+            wbits = 16 + zlib.MAX_WBITS if self.coding != "deflate" else zlib.MAX_WBITS
+            self._decoder = zlib.decompressobj(wbits)
+        else:
+            raise web.HTTPError(415, f"Unsupported request Content-Encoding: {self.coding}")
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        if self._decoder is None:
+            yield chunk
+            return
+        try:
+            while chunk:
+                yield self._decoder.decompress(chunk, self._PIECE)
+                chunk = self._decoder.unconsumed_tail
+        except zlib.error as e:
+            raise web.HTTPError(400, f"Invalid {self.coding} request body: {e}") from e
+
+    def close(self) -> None:
+        if self._decoder is not None and not self._decoder.eof:
+            raise web.HTTPError(400, f"Truncated {self.coding} request body.")
+
+
+class MultipartFile:
+    """
+    Stream the package part out of a `multipart/form-data` body.
+
+    The first part with a filename (or named `package`/`file`) is passed to
+    `write` as it arrives; other parts are skipped. Only a delimiter's
+    worth of bytes is buffered between chunks.
+    """
+
+    def __init__(self, boundary: str, write: Callable[[bytes], None]) -> None:
+        self._delimiter = b"\r\n--" + boundary.encode("latin-1")
+        # The opening delimiter has no leading CRLF; the preamble is skipped.
+        self._buffer = b"\r\n"
+        self._state = "skip"
+        self._write = write
+        self.found = False
+        self.filename: str | None = None
+
+    @classmethod
+    def from_content_type(
+        cls, content_type: str, write: Callable[[bytes], None]
+    ) -> MultipartFile:
+        boundary = _header_params(content_type).get("boundary", "").strip('"')
+        if not boundary:
+            raise web.HTTPError(400, "multipart/form-data without a boundary.")
+        return cls(boundary, write)
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        while self._state != "done":
+            if self._state == "delimited":
+                if len(self._buffer) < 2:
+                    return
+                if self._buffer.startswith(b"--"):
+                    self._state, self._buffer = "done", b""
+                    return
+                if not self._buffer.startswith(b"\r\n"):
+                    raise web.HTTPError(400, "Malformed multipart body.")
+                self._buffer = self._buffer[2:]
+                self._state = "headers"
+            elif self._state == "headers":
+                end = self._buffer.find(b"\r\n\r\n")
+                if end < 0:
+                    if len(self._buffer) > _MAX_PART_HEADERS:
+                        raise web.HTTPError(400, "Multipart part headers are too large.")
+                    return
+                headers = httputil.HTTPHeaders.parse(self._buffer[:end].decode("latin-1"))
+                self._buffer = self._buffer[end + 4 :]
+                params = _header_params(headers.get("Content-Disposition", ""))
+                wanted = not self.found and (
+                    "filename" in params or params.get("name") in _PACKAGE_FIELDS
+                )
+                if wanted:
+                    self.found = True
+                    self.filename = params.get("filename")
+                self._state = "file" if wanted else "skip"
+            else:
+                end = self._buffer.find(self._delimiter)
+                if end < 0:
+                    # Keep what could be the start of a split delimiter.
+                    keep = len(self._delimiter) - 1
+                    if len(self._buffer) > keep:
+                        if self._state == "file":
+                            self._write(self._buffer[:-keep])
+                        self._buffer = self._buffer[-keep:]
+                    return
+                if self._state == "file":
+                    self._write(self._buffer[:end])
+                self._buffer = self._buffer[end + len(self._delimiter) :]
+                self._state = "delimited"
+
+    def close(self) -> None:
+        if self._state != "done":
+            raise web.HTTPError(400, "Truncated multipart body.")
+        if not self.found:
+            raise web.HTTPError(400, "The multipart body has no package file part.")
+
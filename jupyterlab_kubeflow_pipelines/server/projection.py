@@ -0,0 +1,246 @@
+"""
+Field projection for proxied KFP JSON payloads.
+
+v2beta1 run and pipeline listings carry full `pipeline_spec`,
+`runtime_config` and `run_details` blobs, while most callers only need IDs,
+names, states and timestamps. A `fields=` spec such as
+`run_id,display_name,state,run_details.task_details.state` keeps only those
+paths. Lists are traversed transparently.
+
+`StreamingListProjector` applies a projection to the items of a list response
+while it is still being received, holding at most one item in memory.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any
+
+_WHITESPACE = " \t\n\r"
+
+# Marks a leaf of the projection tree: keep the whole value.
+_KEEP = None
+
+
+class FieldProjection:
+    """A compiled `fields=` selector."""
+
+    def __init__(self, tree: dict[str, Any]) -> None:
+        self._tree = tree
+
+    @classmethod
+    def parse(cls, spec: str | None) -> FieldProjection | None:
+        """Compile a comma-separated list of dotted paths; None if empty."""
+        tree: dict[str, Any] = {}
+        for raw in (spec or "").split(","):
+            parts = [p.strip() for p in raw.strip().split(".")]
+            if not parts or not all(parts):
+                continue
+            node = tree
+            for part in parts[:-1]:
+                child = node.get(part, {})
+                if child is _KEEP:
+                    # A shorter path already keeps the whole subtree.
+                    break
+                node = node.setdefault(part, child)
+            else:
+                node[parts[-1]] = _KEEP
+        return cls(tree) if tree else None
+
+    def apply(self, value: Any) -> Any:
+        return _apply(self._tree, value)
+
+
+def _apply(tree: dict[str, Any], value: Any) -> Any:
+    if isinstance(value, list):
+        return [_apply(tree, v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    projected: dict[str, Any] = {}
+    for key, subtree in tree.items():
+        if key not in value:
+            continue
+        projected[key] = value[key] if subtree is _KEEP else _apply(subtree, value[key])
+    return projected
+
+
+def project_list_payload(
+    payload: Any, *, items_key: str, projection: FieldProjection
+) -> Any:
+    """Project the items of a list response, keeping paging metadata."""
+    if not isinstance(payload, dict):
+        return payload
+    projected = dict(payload)
+    if isinstance(projected.get(items_key), list):
+        projected[items_key] = projection.apply(projected[items_key])
+    return projected
+
+
+class BufferedProjector:
+    """Collect a whole JSON document and project it on `close`."""
+
+    def __init__(self, projection: FieldProjection) -> None:
+        self._projection = projection
+        self._chunks: list[bytes] = []
+
+    def feed(self, chunk: bytes) -> bytes:
+        self._chunks.append(chunk)
+        return b""
+
+    def close(self) -> bytes:
+        body = b"".join(self._chunks)
+        self._chunks = []
+        return project_body(body, self._projection)
+
+
+def project_body(
+    body: bytes, projection: FieldProjection, *, items_key: str | None = None
+) -> bytes:
+    """Project a complete JSON body; non-JSON bodies are returned unchanged."""
+    try:
+        payload = json.loads(body or b"null")
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return body
+    if items_key is not None:
+        payload = project_list_payload(payload, items_key=items_key, projection=projection)
+    else:
+        payload = projection.apply(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+class StreamingListProjector:
+    """
+    Incrementally project `{"<items_key>": [...], ...}` JSON documents.
+
+    Feed raw body chunks and write out whatever `feed` returns. Items of
+    `items_key` are decoded one at a time, projected and re-encoded; other
+    top-level members (paging metadata) are passed through unchanged.
+    """
+
+    def __init__(self, items_key: str, projection: FieldProjection) -> None:
+        self._items_key = items_key
+        self._projection = projection
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        # Buffer length to wait for before retrying an incomplete value, so
+        # large values are not re-parsed on every small chunk.
+        self._retry_len = 0
+        self._state = "start"
+        self._key: str | None = None
+        self._first_member = True
+        self._first_item = True
+
+    def feed(self, chunk: bytes) -> bytes:
+        self._buf += self._text.decode(chunk)
+        return self._drain(final=False).encode("utf-8")
+
+    def close(self) -> bytes:
+        self._buf += self._text.decode(b"", final=True)
+        out = self._drain(final=True)
+        if self._state != "done":
+            raise ValueError("Truncated or unsupported JSON list document.")
+        return out.encode("utf-8")
+
+    def _skip_ws(self) -> bool:
+        while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buf)
+
+    def _decode_value(self, final: bool) -> tuple[bool, Any]:
+        if not final and len(self._buf) < self._retry_len:
+            return False, None
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError("Invalid JSON in list document.") from None
+            self._retry_len = len(self._buf) + max(len(self._buf) - self._pos, 1)
+            return False, None
+        # A bare number at the end of the buffer may still be growing;
+        # require the following delimiter before accepting it.
+        probe = end
+        while probe < len(self._buf) and self._buf[probe] in _WHITESPACE:
+            probe += 1
+        if probe >= len(self._buf) and not final:
+            return False, None
+        self._pos = end
+        self._retry_len = 0
+        return True, value
+
+    def _expect(self, char: str) -> None:
+        if self._buf[self._pos] != char:
+            raise ValueError(f"Expected {char!r} in list document.")
+        self._pos += 1
+
+    def _drain(self, *, final: bool) -> str:
+        out: list[str] = []
+        while self._state != "done" and self._skip_ws():
+            if not self._step(out, final):
+                break
+        # Keep only the unconsumed tail.
+        self._buf = self._buf[self._pos :]
+        if self._retry_len:
+            self._retry_len -= self._pos
+        self._pos = 0
+        return "".join(out)
+
+    def _step(self, out: list[str], final: bool) -> bool:
+        char = self._buf[self._pos]
+        state = self._state
+
+        if state == "start":
+            self._expect("{")
+            out.append("{")
+            self._state = "member"
+        elif state == "member":
+            if char == "}":
+                self._pos += 1
+                out.append("}")
+                self._state = "done"
+                return True
+            if char == ",":
+                self._pos += 1
+                return True
+            ok, key = self._decode_value(final)
+            if not ok:
+                return False
+            if not isinstance(key, str):
+                raise ValueError("Expected an object key in list document.")
+            self._key = key
+            self._state = "colon"
+        elif state == "colon":
+            self._expect(":")
+            self._state = "value"
+        elif state == "value":
+            prefix = "" if self._first_member else ","
+            if self._key == self._items_key and char == "[":
+                self._pos += 1
+                out.append(f"{prefix}{json.dumps(self._key)}:[")
+                self._first_member = False
+                self._state = "item"
+                return True
+            ok, value = self._decode_value(final)
+            if not ok:
+                return False
+            out.append(f"{prefix}{json.dumps(self._key)}:{json.dumps(value)}")
+            self._first_member = False
+            self._state = "member"
+        elif state == "item":
+            if char == "]":
+                self._pos += 1
+                out.append("]")
+                self._state = "member"
+                return True
+            if char == ",":
+                self._pos += 1
+                return True
+            ok, item = self._decode_value(final)
+            if not ok:
+                return False
+            prefix = "" if self._first_item else ","
+            out.append(prefix + json.dumps(self._projection.apply(item)))
+            self._first_item = False
+        return True
@@ -0,0 +1,297 @@
+"""
+Retries and circuit breaking for calls to KFP.
+
+When `ml-pipeline` restarts or its ingress hiccups, every caller fails at
+once and browsers retry in a storm. Calls made through this module
+
+- are retried with full-jitter exponential backoff, but only when the method
+  is idempotent (GET/HEAD by default) and the failure is transient
+  (connection errors, 502/503/504);
+- go through a per-upstream-host circuit breaker. After
+  `breaker_failure_threshold` consecutive transient failures the breaker
+  opens and calls fail fast with `CircuitOpen` for `breaker_reset_timeout`
+  seconds. One probe is then let through (half-open); its outcome closes
+  or re-opens the breaker.
+
+Both the proxy handlers (async, tornado client) and the SDK handlers (sync,
+`kfp.Client`) share the same breakers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from ..config import KfpServerOptions
+from .limits import upstream_host
+
+T = TypeVar("T")
+
+# Upstream statuses that indicate KFP (or its ingress) is unavailable.
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Calls to an upstream host are being failed fast."""
+
+    def __init__(self, host: str, retry_after: float) -> None:
+        self.host = host
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"KFP at {host} is unavailable (circuit open); retry in {self.retry_after}s."
+        )
+
+
+class CircuitBreaker:
+    def __init__(
+        self, host: str, *, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # SDK calls may run in worker threads.
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_error: str | None = None
+        self._times_opened = 0
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def before_call(self) -> None:
+        """Raise `CircuitOpen` unless a call may go upstream now."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._state = HALF_OPEN
+                self._probing = True
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            raise CircuitOpen(self.host, remaining)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self._failures += 1
+            self._last_error = error
+            if self._state == HALF_OPEN or (
+                self.failure_threshold > 0 and self._failures >= self.failure_threshold
+            ):
+                if self._state != OPEN:
+                    self._times_opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def record_abandoned(self) -> None:
+        """The call ended without a verdict (e.g. cancelled); free the probe."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            open_for = (
+                max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+                if state == OPEN
+                else 0.0
+            )
+            return {
+                "upstream": self.host,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._times_opened,
+                "retry_in_seconds": round(open_for, 3),
+                "last_error": self._last_error,
+            }
+
+
+_BREAKERS: dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker_for(url: str, options: KfpServerOptions) -> CircuitBreaker:
+    """Shared breaker of `url`'s upstream host, tuned by server options."""
+    host = upstream_host(url)
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(host)
+        if breaker is None:
+            breaker = _BREAKERS[host] = CircuitBreaker(host)
+    breaker.failure_threshold = options.breaker_failure_threshold
+    breaker.reset_timeout = options.breaker_reset_timeout
+    return breaker
+
+
+def breaker_states() -> list[dict[str, Any]]:
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return [b.snapshot() for b in breakers]
+
+
+def reset_breakers() -> None:
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+    methods: frozenset[str] = frozenset({"GET", "HEAD"})
+
+    @classmethod
+    def from_options(cls, options: KfpServerOptions) -> RetryPolicy:
+        return cls(
+            attempts=options.upstream_retry_attempts,
+            base_delay=options.upstream_retry_base_delay,
+            max_delay=options.upstream_retry_max_delay,
+            methods=frozenset(m.upper() for m in options.upstream_retry_methods),
+        )
+
+    def attempts_for(self, method: str) -> int:
+        return max(1, self.attempts) if method.upper() in self.methods else 1
+
+    def delay(self, retry: int) -> float:
+        """Full-jitter exponential backoff before retry number `retry` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+async def fetch_resilient(
+    fetch: Callable[[bool], Awaitable[T]],
+    *,
+    method: str,
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    can_retry: Callable[[], bool] | None = None,
+) -> T:
+    """
+    Run an upstream HTTP call with retries and circuit breaking.
+
+    `fetch(final)` performs one attempt and returns a response with `.code`
+    (tornado's `raise_error=False` style). `final` tells it no retry follows,
+    so a transient status must be delivered as-is. `can_retry` lets callers
+    veto a retry after a failed attempt, e.g. once bytes reached the client.
+    """
+    attempts = policy.attempts_for(method)
+    for attempt in range(attempts):
+        final = attempt == attempts - 1
+        breaker.before_call()
+        try:
+            response = await fetch(final)
+        except (asyncio.CancelledError, ConnectionAbortedError):
+            # Cancelled, or the browser gave up on its request body.
+            breaker.record_abandoned()
+            raise
+        except Exception as e:
+            breaker.record_failure(f"{type(e).__name__}: {e}")
+            if final or (can_retry is not None and not can_retry()):
+                raise
+        else:
+            code = getattr(response, "code", None)
+            if code not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+            breaker.record_failure(f"HTTP {code}")
+            if final:
+                return response
+        await asyncio.sleep(policy.delay(attempt))
+    raise AssertionError("unreachable")
+
+
+def _is_transient(exc: BaseException) -> bool:
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUSES
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import urllib3
+    except ImportError:  # pragma: no cover
+        return False
+    return isinstance(exc, urllib3.exceptions.HTTPError)
+
+
+def call_resilient(
+    func: Callable[[], T],
+    *,
+    idempotent: bool,
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+) -> T:
+    """
+    Synchronous counterpart of `fetch_resilient` for `kfp.Client` calls.
+
+    The call and the backoff between attempts block the calling thread, so
+    this must only run on worker threads (e.g. the job executor); calling it
+    from a thread with a running event loop raises `RuntimeError`.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError(
+            "call_resilient() blocks; run it on a worker thread, not on the event loop"
+        )
+    attempts = max(1, policy.attempts) if idempotent else 1
+    for attempt in range(attempts):
+        breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if not _is_transient(e):
+                # KFP answered (4xx, validation error, ...): it is up.
+                breaker.record_success()
+                raise
+            breaker.record_failure(f"{type(e).__name__}: {e}")
+            if attempt == attempts - 1:
+                raise
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+        else:
+            breaker.record_success()
+            return result
+        time.sleep(policy.delay(attempt))
+    raise AssertionError("unreachable")
+
+
+def write_circuit_open(handler, error: CircuitOpen) -> None:
+    """Answer 503 with `Retry-After` while a breaker is open."""
+    handler.set_status(503)
+    handler.set_header("Retry-After", str(error.retry_after))
+    handler.set_header("Content-Type", "application/json")
+    handler.finish(
+        json.dumps({"error": str(error), "retry_after": error.retry_after})
+    )
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import functools
+
 from jupyter_server.utils import url_path_join
 
 from ..kfp_compiler import (
@@ -7,11 +9,25 @@ from ..kfp_compiler import (
     KfpSubmitHandler,
 )
 from ..kfp_pipelines import KfpImportPipelineHandler
+from .compression import CompressionTransform
 from .handlers import (
+    KfpAggregateHandler,
+    KfpCachePlanHandler,
     KfpDebugHandler,
+    KfpExperimentSummaryHandler,
+    KfpJobEventsHandler,
+    KfpJobHandler,
+    KfpJobsHandler,
+    KfpPackageUploadHandler,
+    KfpPipelinePreviewHandler,
+    KfpPreviewPayloadHandler,
     KfpProxyHandler,
     KfpRootFallbackProxyHandler,
+    KfpRunBatchHandler,
+    KfpRunDagHandler,
+    KfpRunEventsHandler,
     KfpRunHandler,
+    KfpRunSearchHandler,
     KfpRunTerminateHandler,
     KfpSettingsHandler,
     KfpUIProxyHandler,
@@ -26,20 +42,57 @@ def setup_handlers(web_app) -> None:
     api_proxy_route = url_path_join(
         base_url, "jupyterlab-kubeflow-pipelines", "proxy", "(.*)"
     )
+    aggregate_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "proxy-aggregate", "([^/]+)"
+    )
     compile_route = url_path_join(
         base_url, "jupyterlab-kubeflow-pipelines", "kfp", "compile"
     )
     submit_route = url_path_join(
         base_url, "jupyterlab-kubeflow-pipelines", "kfp", "submit"
     )
+    preview_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "kfp", "preview"
+    )
+    cache_plan_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "kfp", "cache-plan"
+    )
+    preview_payload_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "previews", "([0-9a-f]{64})"
+    )
+    packages_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "kfp", "packages"
+    )
     import_pipeline_route = url_path_join(
         base_url, "jupyterlab-kubeflow-pipelines", "kfp", "pipelines", "import"
     )
+    jobs_route = url_path_join(base_url, "jupyterlab-kubeflow-pipelines", "jobs")
+    job_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "jobs", "([0-9a-f]{32})"
+    )
+    job_events_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "jobs", "([0-9a-f]{32})", "events"
+    )
     kfp_ui_rewrite_script_route = url_path_join(base_url, "kfp-ui", "_jlkfp_path_rewrite.js")
     kfp_ui_route = url_path_join(base_url, "kfp-ui", "(.*)")
     settings_route = url_path_join(
         base_url, "jupyterlab-kubeflow-pipelines", "settings"
     )
+    experiment_summary_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "experiments", "([^/]+)", "summary"
+    )
+    run_events_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "runs", "events"
+    )
+    run_batch_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "runs:batch"
+    )
+    run_search_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "runs", "search"
+    )
+    run_dag_route = url_path_join(
+        base_url, "jupyterlab-kubeflow-pipelines", "runs", "([^/]+)", "dag"
+    )
     run_route = url_path_join(base_url, "jupyterlab-kubeflow-pipelines", "runs", "(.*)")
     run_terminate_route = url_path_join(
         base_url, "jupyterlab-kubeflow-pipelines", "runs", "(.*):terminate"
@@ -49,12 +102,25 @@ def setup_handlers(web_app) -> None:
     handlers = [
         (settings_route, KfpSettingsHandler),
         (api_proxy_route, KfpProxyHandler),
+        (aggregate_route, KfpAggregateHandler),
         (kfp_ui_rewrite_script_route, KfpUIPathRewriteScriptHandler),
         (kfp_ui_route, KfpUIProxyHandler),
         (compile_route, KfpCompileHandler),
         (submit_route, KfpSubmitHandler),
+        (packages_route, KfpPackageUploadHandler),
         (import_pipeline_route, KfpImportPipelineHandler),
+        (preview_route, KfpPipelinePreviewHandler),
+        (preview_payload_route, KfpPreviewPayloadHandler),
+        (cache_plan_route, KfpCachePlanHandler),
+        (jobs_route, KfpJobsHandler),
+        (job_route, KfpJobHandler),
+        (job_events_route, KfpJobEventsHandler),
+        (experiment_summary_route, KfpExperimentSummaryHandler),
         (run_terminate_route, KfpRunTerminateHandler),
+        (run_batch_route, KfpRunBatchHandler),
+        (run_events_route, KfpRunEventsHandler),
+        (run_search_route, KfpRunSearchHandler),
+        (run_dag_route, KfpRunDagHandler),
         (run_route, KfpRunHandler),
         (debug_route, KfpDebugHandler),
     ]
@@ -74,3 +140,13 @@ def setup_handlers(web_app) -> None:
     )
 
     web_app.add_handlers(host_pattern, handlers)
+    web_app.add_transform(
+        functools.partial(
+            CompressionTransform,
+            settings=web_app.settings,
+            prefixes=(
+                url_path_join(base_url, "jupyterlab-kubeflow-pipelines") + "/",
+                url_path_join(base_url, "kfp-ui") + "/",
+            ),
+        )
+    )
@@ -0,0 +1,422 @@
+"""
+Per-user SQLite index of run metadata behind `runs/search`.
+
+Searching a busy namespace by paging `list_runs` through `ml-pipeline` is
+slow once there are tens of thousands of runs. Each (user, endpoint,
+namespace) instead gets a SQLite database under `run_index_dir` with the
+runs' IDs, names, states, timestamps, parameters and experiments, and an
+FTS5 table over names and parameter names and values. Searches sync the
+index when it is older than `run_index_sync_interval`, then only query
+SQLite.
+
+The first sync walks every run (up to `run_index_max_runs`); until such a
+full walk completes, the next sync starts it over. Later syncs are
+incremental. v2beta1 runs carry no `updated_at`, so, like the run-events
+poller, a sync lists the runs created at or after the newest indexed
+`created_at` (which has second precision) and the runs still active, then
+fetches indexed active runs that left the active list to learn their final
+state (dropping runs that are gone). Finished runs that are later deleted,
+archived or restored are reconciled by a full walk every
+`run_index_full_sync_interval`. Each row's `updated_at` is the latest of its
+creation, state changes and finish.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Iterable
+from typing import Any
+from urllib.parse import quote
+
+from jupyter_core.paths import jupyter_runtime_dir
+
+from ..config import KfpServerOptions
+from .events import ACTIVE_STATES
+from .limits import upstream_limiter
+from .listing import UpstreamListError, fetch_upstream_get, walk_list
+
+# Indexed active runs that left the active list, fetched one by one per sync.
+MAX_RUN_FETCHES_PER_SYNC = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    display_name TEXT,
+    state TEXT,
+    experiment_id TEXT,
+    storage_state TEXT,
+    created_at TEXT,
+    finished_at TEXT,
+    updated_at TEXT,
+    parameters TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_updated ON runs (updated_at);
+CREATE INDEX IF NOT EXISTS runs_by_state ON runs (state, updated_at);
+CREATE INDEX IF NOT EXISTS runs_by_experiment ON runs (experiment_id, updated_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5 (display_name, parameters);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_COLUMNS = (
+    "run_id",
+    "display_name",
+    "state",
+    "experiment_id",
+    "storage_state",
+    "created_at",
+    "finished_at",
+    "updated_at",
+)
+
+
+def default_run_index_dir() -> str:
+    return os.path.join(jupyter_runtime_dir(), "jupyterlab_kubeflow_pipelines", "run-index")
+
+
+def _filter(predicate: dict[str, Any]) -> str:
+    return json.dumps({"predicates": [predicate]})
+
+
+def _parameters(run: dict[str, Any]) -> dict[str, Any]:
+    runtime_config = run.get("runtime_config") or {}
+    parameters = runtime_config.get("parameters") or {}
+    return parameters if isinstance(parameters, dict) else {}
+
+
+def _updated_at(run: dict[str, Any]) -> str | None:
+    times = [run.get("created_at"), run.get("finished_at")]
+    times += [s.get("update_time") for s in run.get("state_history") or []]
+    return max((t for t in times if t), default=None)
+
+
+def _fts_parameters(parameters: dict[str, Any]) -> str:
+    return " ".join(
+        f"{name} {value if isinstance(value, str) else json.dumps(value)}"
+        for name, value in parameters.items()
+    )
+
+
+def fts_query(text: str) -> str:
+    """
+    An FTS5 query matching rows that contain every word of `text` as a
+    prefix, with FTS5 syntax in `text` taken literally.
+    """
+    terms = []
+    for word in text.split():
+        terms.append('"' + word.replace('"', '""') + '"*')
+    return " ".join(terms)
+
+
+class RunIndex:
+    """The run index of one (user, endpoint, namespace)."""
+
+    def __init__(self, path: str, *, user: str, endpoint: str, namespace: str) -> None:
+        self.path = path
+        self.user = user
+        self.endpoint = endpoint
+        self.namespace = namespace
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._sync_task: asyncio.Future | None = None
+        self.sync_error: str | None = None
+
+    def close(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+        self._db.close()
+
+    def _meta(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    @property
+    def synced_at(self) -> float | None:
+        value = self._meta("synced_at")
+        return float(value) if value else None
+
+    @property
+    def size(self) -> int:
+        return self._db.execute("SELECT count(*) FROM runs").fetchone()[0]
+
+    def upsert(self, runs: Iterable[dict[str, Any]]) -> None:
+        """Insert or update runs in one transaction."""
+        with self._db:
+            for run in runs:
+                run_id = run.get("run_id")
+                if not run_id:
+                    continue
+                parameters = _parameters(run)
+                values = {
+                    "run_id": run_id,
+                    "display_name": run.get("display_name"),
+                    "state": run.get("state") or "RUNTIME_STATE_UNSPECIFIED",
+                    "experiment_id": run.get("experiment_id"),
+                    "storage_state": run.get("storage_state"),
+                    "created_at": run.get("created_at"),
+                    "finished_at": run.get("finished_at"),
+                    "updated_at": _updated_at(run),
+                }
+                # An upsert (not REPLACE) keeps the rowid the FTS row refers to.
+                rowid = self._db.execute(
+                    f"INSERT INTO runs ({', '.join(_COLUMNS)}, parameters)"
+                    f" VALUES ({', '.join('?' * len(_COLUMNS))}, ?)"
+                    " ON CONFLICT (run_id) DO UPDATE SET "
+                    + ", ".join(f"{c} = excluded.{c}" for c in (*_COLUMNS[1:], "parameters"))
+                    + " RETURNING rowid",
+                    (*values.values(), json.dumps(parameters)),
+                ).fetchone()[0]
+                self._db.execute("DELETE FROM runs_fts WHERE rowid = ?", (rowid,))
+                self._db.execute(
+                    "INSERT INTO runs_fts (rowid, display_name, parameters) VALUES (?, ?, ?)",
+                    (rowid, values["display_name"] or "", _fts_parameters(parameters)),
+                )
+
+    def delete(self, run_id: str) -> None:
+        with self._db:
+            row = self._db.execute(
+                "DELETE FROM runs WHERE run_id = ? RETURNING rowid", (run_id,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM runs_fts WHERE rowid = ?", (row[0],))
+
+    def search(
+        self,
+        *,
+        text: str = "",
+        states: Iterable[str] = (),
+        experiment_id: str | None = None,
+        limit: int = 50,
+    ) -> list[dict[str, Any]]:
+        """Matching runs, best text matches (else most recently updated) first."""
+        columns = ", ".join(f"runs.{c}" for c in (*_COLUMNS, "parameters"))
+        where: list[str] = []
+        args: list[Any] = []
+        query = fts_query(text)
+        if query:
+            sql = f"SELECT {columns} FROM runs_fts JOIN runs ON runs.rowid = runs_fts.rowid"
+            where.append("runs_fts MATCH ?")
+            args.append(query)
+            order = "bm25(runs_fts), runs.updated_at DESC"
+        else:
+            sql = f"SELECT {columns} FROM runs"
+            order = "runs.updated_at DESC"
+        states = list(states)
+        if states:
+            where.append(f"runs.state IN ({', '.join('?' * len(states))})")
+            args.extend(states)
+        if experiment_id:
+            where.append("runs.experiment_id = ?")
+            args.append(experiment_id)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        args.append(max(0, limit))
+        return [
+            {**{c: row[c] for c in _COLUMNS}, "parameters": json.loads(row["parameters"])}
+            for row in self._db.execute(sql, args)
+        ]
+
+    def _active_run_ids(self, exclude: set[str]) -> list[str]:
+        rows = self._db.execute(
+            f"SELECT run_id FROM runs WHERE state IN ({', '.join('?' * len(ACTIVE_STATES))})"
+            " ORDER BY updated_at",
+            sorted(ACTIVE_STATES),
+        )
+        return [r[0] for r in rows if r[0] not in exclude]
+
+    async def _walk(
+        self,
+        params: list[tuple[str, str]],
+        headers: dict[str, str],
+        options: KfpServerOptions,
+    ) -> tuple[set[str], bool]:
+        """
+        Index the listed runs page by page; returns their IDs and whether
+        the listing was walked to its end (not cut at `run_index_max_runs`).
+        """
+        seen: set[str] = set()
+        complete = True
+        async for page in walk_list(
+            endpoint=self.endpoint,
+            resource="runs",
+            options=options,
+            params=params,
+            headers=headers,
+            namespace=self.namespace,
+            page_size=options.aggregate_page_size,
+            limit=options.run_index_max_runs,
+        ):
+            self.upsert(page.items)
+            seen.update(r["run_id"] for r in page.items if r.get("run_id"))
+            complete = not page.next_page_token
+        return seen, complete
+
+    def _sweep(self, seen: set[str]) -> None:
+        """Drop the indexed runs a complete walk did not list."""
+        rows = self._db.execute("SELECT run_id FROM runs").fetchall()
+        for (run_id,) in rows:
+            if run_id not in seen:
+                self.delete(run_id)
+
+    async def _fetch_run(
+        self, run_id: str, headers: dict[str, str], options: KfpServerOptions
+    ) -> dict | None:
+        response = await fetch_upstream_get(
+            f"{self.endpoint}/apis/v2beta1/runs/{quote(run_id, safe='')}",
+            headers=headers,
+            options=options,
+        )
+        if response.code == 404:
+            return None
+        if response.code != 200:
+            raise UpstreamListError(response.code, response.body or b"")
+        return json.loads(response.body or b"{}")
+
+    async def sync_once(self, *, token: str | None, options: KfpServerOptions) -> None:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        watermark = self._meta("watermark")
+        full_synced_at = float(self._meta("full_synced_at") or 0)
+        if (
+            watermark is None
+            or time.time() - full_synced_at >= options.run_index_full_sync_interval
+        ):
+            seen, complete = await self._walk(
+                [("sort_by", "created_at desc")], headers, options
+            )
+            if complete:
+                self._sweep(seen)
+            with self._db:
+                self._set_meta("full_synced_at", str(time.time()))
+        else:
+            seen, _ = await self._walk(
+                [
+                    (
+                        "filter",
+                        _filter(
+                            {
+                                "key": "created_at",
+                                "operation": "GREATER_THAN_EQUALS",
+                                "timestamp_value": watermark,
+                            }
+                        ),
+                    )
+                ],
+                headers,
+                options,
+            )
+            active, _ = await self._walk(
+                [
+                    (
+                        "filter",
+                        _filter(
+                            {
+                                "key": "state",
+                                "operation": "IN",
+                                "string_values": {"values": sorted(ACTIVE_STATES)},
+                            }
+                        ),
+                    )
+                ],
+                headers,
+                options,
+            )
+            seen |= active
+            for run_id in self._active_run_ids(seen)[:MAX_RUN_FETCHES_PER_SYNC]:
+                run = await self._fetch_run(run_id, headers, options)
+                if run is None:
+                    self.delete(run_id)
+                else:
+                    self.upsert([run])
+        # Only advanced once a sync succeeded, so a walk that failed part way
+        # is not mistaken for a complete one.
+        (newest,) = self._db.execute("SELECT max(created_at) FROM runs").fetchone()
+        with self._db:
+            if newest is not None:
+                self._set_meta("watermark", newest)
+            self._set_meta("synced_at", str(time.time()))
+
+    async def _sync(self, token: str | None, options: KfpServerOptions) -> None:
+        # Every request goes through the host's breaker; the limiter slot is
+        # held for the whole sync.
+        try:
+            async with upstream_limiter().slot(
+                user=self.user,
+                url=self.endpoint,
+                max_concurrency=options.upstream_max_concurrency,
+                max_queue=options.upstream_max_queue,
+                queue_timeout=options.upstream_queue_timeout,
+                retry_after=options.upstream_retry_after,
+            ):
+                await self.sync_once(token=token, options=options)
+        except Exception as e:
+            self.sync_error = str(e)
+            raise
+        else:
+            self.sync_error = None
+
+    async def ensure_synced(self, *, token: str | None, options: KfpServerOptions) -> None:
+        """
+        Sync if the index is older than `run_index_sync_interval`; concurrent
+        callers share one sync. Errors propagate, so callers can decide
+        whether stale results will do.
+        """
+        synced_at = self.synced_at
+        if synced_at is not None and time.time() - synced_at < options.run_index_sync_interval:
+            return
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.ensure_future(self._sync(token, options))
+        await asyncio.shield(self._sync_task)
+
+
+class RunIndexRegistry:
+    """Open run indexes keyed by (user, endpoint, namespace)."""
+
+    def __init__(self) -> None:
+        self._indexes: dict[tuple[str, str, str], RunIndex] = {}
+
+    def get(
+        self, *, user: str, endpoint: str, namespace: str, options: KfpServerOptions
+    ) -> RunIndex:
+        key = (user, endpoint, namespace)
+        index = self._indexes.get(key)
+        if index is None:
+            name = hashlib.sha256("\n".join(key).encode()).hexdigest()[:32]
+            directory = options.run_index_dir or default_run_index_dir()
+            index = self._indexes[key] = RunIndex(
+                os.path.join(directory, f"{name}.sqlite"),
+                user=user,
+                endpoint=endpoint,
+                namespace=namespace,
+            )
+        return index
+
+    def close(self) -> None:
+        for index in self._indexes.values():
+            index.close()
+        self._indexes.clear()
+
+
+_RUN_INDEXES = RunIndexRegistry()
+
+
+def run_indexes() -> RunIndexRegistry:
+    return _RUN_INDEXES
+
+
+def reset_run_indexes() -> None:
+    _RUN_INDEXES.close()
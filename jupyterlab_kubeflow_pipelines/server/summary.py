@@ -0,0 +1,224 @@
+"""
+Experiment dashboard numbers (`experiments/{id}/summary`).
+
+The sidebar used to load every run of an experiment into the browser to
+count them. The server now walks the runs itself and returns only the
+aggregates: runs per state, run duration percentiles, the failure rate over
+time buckets and the components failing in the most runs.
+
+KFP page tokens are sequential, so a single listing cannot be fetched in
+parallel. The walk is split by `state` filter instead: one listing per
+terminal state plus one for the active states, run concurrently within the
+user's upstream limiter lane (each page takes a slot). Timestamps, states and failing components are
+collected into NumPy arrays and reduced without per-run Python loops.
+Results are cached for `experiment_summary_ttl` seconds; concurrent requests
+for the same summary share one walk.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from ..config import KfpServerOptions
+from .events import ACTIVE_STATES
+from .listing import walk_list
+
+# One listing per group; together they cover every v2beta1 run state.
+_STATE_GROUPS = (
+    ("SUCCEEDED",),
+    ("FAILED",),
+    ("CANCELED",),
+    ("SKIPPED",),
+    tuple(sorted(ACTIVE_STATES)),
+)
+_PERCENTILES = (50, 90, 95, 99)
+_TOP_COMPONENTS = 10
+_MEMO_MAX_ENTRIES = 64
+
+# (user, endpoint, namespace, experiment_id, buckets) -> (expires, summary task)
+_SUMMARIES: OrderedDict[tuple, tuple[float, asyncio.Future]] = OrderedDict()
+
+
+def _state_filter(states: tuple[str, ...]) -> str:
+    return json.dumps(
+        {
+            "predicates": [
+                {"key": "state", "operation": "IN", "string_values": {"values": list(states)}}
+            ]
+        }
+    )
+
+
+def _timestamps(values: list[str | None]) -> np.ndarray:
+    """RFC 3339 UTC timestamps as epoch seconds; NaN when unset."""
+    parsed = np.array(
+        [v.rstrip("Z") if v else "NaT" for v in values], dtype="datetime64[ms]"
+    )
+    seconds = parsed.astype(np.int64) / 1000.0
+    # KFP reports unset timestamps as the epoch.
+    return np.where(np.isnat(parsed) | (seconds <= 0), np.nan, seconds)
+
+
+def _failed_components(run: dict[str, Any]) -> set[str]:
+    """Names of the failed leaf tasks (components, not DAGs) of a run."""
+    details = run.get("run_details") or {}
+    return {
+        task.get("display_name") or "(unnamed)"
+        for task in details.get("task_details") or []
+        if task.get("state") == "FAILED" and not task.get("child_tasks")
+    }
+
+
+def summarize_runs(runs: list[dict[str, Any]], *, buckets: int) -> dict[str, Any]:
+    """The summary numbers of `runs` (full v2beta1 run objects)."""
+    states = np.array([r.get("state") or "RUNTIME_STATE_UNSPECIFIED" for r in runs], dtype=str)
+    created = _timestamps([r.get("created_at") for r in runs])
+    finished = _timestamps([r.get("finished_at") for r in runs])
+    failed = states == "FAILED"
+    terminal = ~np.isin(states, list(ACTIVE_STATES))
+
+    names, counts = np.unique(states, return_counts=True)
+    summary: dict[str, Any] = {
+        "total": len(runs),
+        "states": {str(n): int(c) for n, c in zip(names, counts)},
+    }
+
+    durations = (finished - created)[terminal]
+    durations = durations[~np.isnan(durations)]
+    duration: dict[str, Any] = {"count": int(durations.size)}
+    if durations.size:
+        values = np.percentile(durations, _PERCENTILES)
+        duration.update({f"p{p}": round(float(v), 3) for p, v in zip(_PERCENTILES, values)})
+        duration.update(
+            mean=round(float(durations.mean()), 3), max=round(float(durations.max()), 3)
+        )
+    summary["duration_seconds"] = duration
+
+    # Failure rate of finished runs, bucketed by creation time.
+    dated = terminal & ~np.isnan(created)
+    rate: dict[str, Any] = {"bucket_seconds": None, "buckets": []}
+    if dated.any():
+        start, end = float(np.nanmin(created[dated])), float(np.nanmax(created[dated]))
+        edges = np.linspace(start, max(end, start + 1.0), buckets + 1)
+        totals, _ = np.histogram(created[dated], bins=edges)
+        failures, _ = np.histogram(created[dated & failed], bins=edges)
+        rates = np.divide(
+            failures, totals, out=np.full(buckets, np.nan), where=totals > 0
+        )
+        rate["bucket_seconds"] = round(float(edges[1] - edges[0]), 3)
+        rate["buckets"] = [
+            {
+                "start": round(float(s), 3),
+                "runs": int(t),
+                "failed": int(f),
+                "rate": None if np.isnan(r) else round(float(r), 4),
+            }
+            for s, t, f, r in zip(edges[:-1], totals, failures, rates)
+        ]
+    summary["failure_rate"] = rate
+
+    components = [name for r in runs for name in _failed_components(r)]
+    top: list[dict[str, Any]] = []
+    if components:
+        names, counts = np.unique(np.array(components, dtype=str), return_counts=True)
+        order = np.lexsort((names, -counts))[:_TOP_COMPONENTS]
+        top = [{"name": str(names[i]), "failed_runs": int(counts[i])} for i in order]
+    summary["top_failing_components"] = top
+    return summary
+
+
+async def collect_runs(
+    *,
+    endpoint: str,
+    experiment_id: str,
+    user: str,
+    headers: dict[str, str],
+    namespace: str | None,
+    options: KfpServerOptions,
+) -> tuple[list[dict[str, Any]], bool]:
+    """All runs of an experiment, and whether any state group was cut off."""
+
+    async def walk(states: tuple[str, ...]) -> tuple[list[dict[str, Any]], bool]:
+        runs: list[dict[str, Any]] = []
+        truncated = False
+        async for page in walk_list(
+            endpoint=endpoint,
+            resource="runs",
+            options=options,
+            params=[("experiment_id", experiment_id), ("filter", _state_filter(states))],
+            headers=headers,
+            namespace=namespace,
+            page_size=options.aggregate_page_size,
+            limit=options.experiment_summary_max_runs,
+            user=user,
+        ):
+            runs.extend(page.items)
+            truncated = bool(page.next_page_token) and (
+                len(runs) >= options.experiment_summary_max_runs
+            )
+        return runs, truncated
+
+    results = await asyncio.gather(*(walk(states) for states in _STATE_GROUPS))
+    return [run for runs, _ in results for run in runs], any(t for _, t in results)
+
+
+async def _summarize(*, experiment_id: str, buckets: int, **kwargs) -> dict[str, Any]:
+    runs, truncated = await collect_runs(experiment_id=experiment_id, **kwargs)
+    return {
+        "experiment_id": experiment_id,
+        **summarize_runs(runs, buckets=buckets),
+        "truncated": truncated,
+        "generated_at": time.time(),
+    }
+
+
+async def experiment_summary(
+    *,
+    endpoint: str,
+    experiment_id: str,
+    user: str,
+    headers: dict[str, str],
+    namespace: str | None,
+    options: KfpServerOptions,
+    buckets: int = 24,
+) -> dict[str, Any]:
+    """The (possibly cached) summary of an experiment's runs."""
+    key = (user, endpoint, namespace, experiment_id, buckets)
+    now = time.monotonic()
+    cached = _SUMMARIES.get(key)
+    if cached is None or cached[0] <= now:
+        task = asyncio.ensure_future(
+            _summarize(
+                endpoint=endpoint,
+                experiment_id=experiment_id,
+                user=user,
+                headers=headers,
+                namespace=namespace,
+                options=options,
+                buckets=buckets,
+            )
+        )
+        cached = _SUMMARIES[key] = (now + options.experiment_summary_ttl, task)
+        while len(_SUMMARIES) > _MEMO_MAX_ENTRIES:
+            _SUMMARIES.popitem(last=False)
+    _SUMMARIES.move_to_end(key)
+    task = cached[1]
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        # Do not cache failures.
+        if _SUMMARIES.get(key, (0, None))[1] is task:
+            del _SUMMARIES[key]
+        raise
+
+
+def reset_summaries() -> None:
+    for _, task in _SUMMARIES.values():
+        task.cancel()
+    _SUMMARIES.clear()
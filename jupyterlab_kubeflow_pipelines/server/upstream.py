@@ -0,0 +1,312 @@
+"""
+Shared upstream HTTP plumbing for the KFP proxies.
+
+The proxies relay potentially large bodies (run lists, pipeline specs,
+artifacts). Instead of buffering whole responses, handlers can relay them
+chunk by chunk through `ResponseRelay`, and stream large request bodies to
+the upstream with `RequestBodyPipe`. Both sides are flow controlled, so the
+memory held per request stays bounded to a few chunks.
+
+Read-side flow control extends Tornado's private `_HTTPConnection`, so the
+Tornado versions it is known to work with are pinned. Should the class be
+missing or look different, the stock client is used without back-pressure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Protocol
+
+from tornado import httputil
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+
+try:
+    from tornado.simple_httpclient import _HTTPConnection
+except ImportError:  # pragma: no cover - depends on the Tornado version
+    _HTTPConnection = None
+
+log = logging.getLogger(__name__)
+
+HOP_BY_HOP_HEADERS = frozenset(
+    {
+        "host",
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailers",
+        "transfer-encoding",
+        "upgrade",
+    }
+)
+
+# Upstream response headers that must not be relayed verbatim to the browser.
+SKIPPED_RESPONSE_HEADERS = frozenset(
+    {
+        "content-length",
+        "content-encoding",
+        "transfer-encoding",
+        "connection",
+        "set-cookie",
+        "server",
+        "x-consumed-content-encoding",
+    }
+)
+
+UPSTREAM_MAX_CLIENTS = 64
+# Tornado caps response bodies at `max_buffer_size` (100 MB), which also cuts
+# off streamed artifact downloads. Streamed bodies are flow controlled and
+# never held in memory, so `streaming_client` does not cap them; the shared
+# client keeps Tornado's limit for everything it buffers.
+STREAMING_MAX_BODY_SIZE = 2**63 - 1
+REQUEST_BODY_PIPE_CHUNKS = 8
+
+
+def forward_request_headers(
+    request_headers: Iterable[tuple[str, str]], *, token: str | None
+) -> dict[str, str]:
+    """
+    Copy client headers for an upstream request.
+
+    Hop-by-hop headers and Host are dropped; everything else is passed through
+    to keep Dex/IAP/gRPC-Web happy. A configured token replaces Authorization.
+    """
+    headers: dict[str, str] = {
+        h: v for h, v in request_headers if h.lower() not in HOP_BY_HOP_HEADERS
+    }
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def _can_flow_control() -> bool:
+    """Whether the Tornado internals `_FlowControlledConnection` relies on exist."""
+    return (
+        _HTTPConnection is not None
+        and callable(getattr(SimpleAsyncHTTPClient, "_connection_class", None))
+        and all(
+            callable(getattr(_HTTPConnection, name, None))
+            for name in ("data_received", "_should_follow_redirect")
+        )
+    )
+
+
+if _can_flow_control():
+
+    class _FlowControlledConnection(_HTTPConnection):  # type: ignore[misc, valid-type]
+        """
+        HTTP connection that honours awaitables returned by `streaming_callback`.
+
+        Tornado's stock connection drops the callback's return value, so a
+        slow browser cannot slow down the upstream read. Returning the
+        awaitable lets the HTTP/1 reader wait for it before reading the next
+        chunk.
+        """
+
+        def data_received(self, chunk: bytes):  # type: ignore[override]
+            if self._should_follow_redirect():
+                return None
+            if self.request.streaming_callback is not None:
+                return self.request.streaming_callback(chunk)
+            self.chunks.append(chunk)
+            return None
+
+    class _UpstreamHTTPClient(SimpleAsyncHTTPClient):
+        def _connection_class(self) -> type:
+            return _FlowControlledConnection
+
+else:  # pragma: no cover - depends on the Tornado version
+    log.warning(
+        "tornado.simple_httpclient internals changed; upstream responses are "
+        "relayed without back-pressure."
+    )
+    _UpstreamHTTPClient = SimpleAsyncHTTPClient
+
+
+class _StreamingHTTPClient(_UpstreamHTTPClient):  # type: ignore[misc, valid-type]
+    """Separate class so Tornado caches it apart from the shared client."""
+
+
+def upstream_client() -> SimpleAsyncHTTPClient:
+    """Return the shared (per IOLoop) HTTP client used for upstream KFP calls."""
+    return _UpstreamHTTPClient(max_clients=UPSTREAM_MAX_CLIENTS)
+
+
+def streaming_client() -> SimpleAsyncHTTPClient:
+    """
+    Return the (per IOLoop) client for downloads relayed with `ResponseRelay`.
+
+    Only use it with a `streaming_callback`: the body size is not capped.
+    """
+    return _StreamingHTTPClient(
+        max_clients=UPSTREAM_MAX_CLIENTS, max_body_size=STREAMING_MAX_BODY_SIZE
+    )
+
+
+class BodyFilter(Protocol):
+    """Incremental body transformation (e.g. field projection)."""
+
+    def feed(self, chunk: bytes) -> bytes: ...
+
+    def close(self) -> bytes: ...
+
+
+class ResponseRelay:
+    """
+    Relay an upstream response to a handler while it is being received.
+
+    Pass `header_callback` and `streaming_callback` to the upstream request.
+    Status and headers are sent to the browser as soon as the upstream header
+    block is complete; body chunks are written and flushed one at a time.
+
+    `body_filter` may return a `BodyFilter` for a given status and header
+    set; the body is then passed through it. Call `close()` once the upstream
+    response is complete to emit what the filter still holds.
+
+    If `discard` returns True for the upstream status, nothing is relayed
+    (`discarded` is set) so the caller can retry the request.
+
+    Set `decompress_response` to what the upstream request uses: the raw
+    header lines seen here still describe the gzip body the HTTP client
+    decodes before handing chunks to `streaming_callback`.
+    """
+
+    def __init__(
+        self,
+        handler,
+        *,
+        apply_headers: Callable[[int, str, httputil.HTTPHeaders], None] | None = None,
+        body_filter: Callable[[int, httputil.HTTPHeaders], BodyFilter | None]
+        | None = None,
+        discard: Callable[[int], bool] | None = None,
+        decompress_response: bool = False,
+    ) -> None:
+        self._handler = handler
+        self._decompress_response = decompress_response
+        self._discard = discard
+        self.discarded = False
+        self._apply_headers = apply_headers or self._default_apply_headers
+        self._body_filter = body_filter
+        self._filter: BodyFilter | None = None
+        self._start_line: httputil.ResponseStartLine | None = None
+        self._headers = httputil.HTTPHeaders()
+        self.headers_sent = False
+        self.bytes_relayed = 0
+
+    @property
+    def code(self) -> int | None:
+        return self._start_line.code if self._start_line is not None else None
+
+    def _default_apply_headers(
+        self, code: int, reason: str, headers: httputil.HTTPHeaders
+    ) -> None:
+        # A filtered body no longer matches the upstream length or validators.
+        skip = ("content-length", "etag") if self._filter is not None else ()
+        if self._decompress_response and headers.get("Content-Encoding") == "gzip":
+            skip += ("content-length", "content-encoding")
+        apply_upstream_headers(self._handler, code, reason, headers, skip=skip)
+
+    def header_callback(self, line: str) -> None:
+        if self._start_line is None:
+            self._start_line = httputil.parse_response_start_line(line.rstrip("\r\n"))
+            return
+        if line != "\r\n":
+            self._headers.parse_line(line)
+            return
+
+        code = self._start_line.code
+        if self._discard is not None and self._discard(code):
+            self.discarded = True
+            return
+        if self._body_filter is not None:
+            self._filter = self._body_filter(code, self._headers)
+        self._apply_headers(code, self._start_line.reason, self._headers)
+        self.headers_sent = True
+        self._handler.flush()
+
+    def streaming_callback(self, chunk: bytes) -> Awaitable[None] | None:
+        if self.discarded:
+            return None
+        self.bytes_relayed += len(chunk)
+        if self._filter is not None:
+            chunk = self._filter.feed(chunk)
+        self._handler.write(chunk)
+        return self._handler.flush()
+
+    def close(self) -> None:
+        """Write whatever the body filter still holds."""
+        if self._filter is not None and not self.discarded:
+            self._handler.write(self._filter.close())
+
+
+def apply_upstream_headers(
+    handler,
+    code: int,
+    reason: str,
+    headers: httputil.HTTPHeaders,
+    *,
+    skip: Iterable[str] = (),
+) -> None:
+    """Copy upstream status and end-to-end headers onto a handler."""
+    skip = {h.lower() for h in skip}
+    skipped = SKIPPED_RESPONSE_HEADERS | skip
+    # Bodies are relayed byte for byte unless the client decoded them, in
+    # which case the upstream length and encoding no longer apply.
+    decoded = "X-Consumed-Content-Encoding" in headers
+    kept = {
+        h for h in ("content-length", "content-encoding") if h not in skip and not decoded
+    }
+    handler.set_status(code, reason or None)
+    for h, v in headers.get_all():
+        l_h = h.lower()
+        if l_h in {"content-length", "content-encoding"}:
+            if l_h in kept:
+                handler.set_header(h, v)
+            continue
+        if l_h in skipped:
+            continue
+        handler.set_header(h, v)
+
+
+class RequestBodyPipe:
+    """
+    Bounded hand-off of request body chunks from the browser to the upstream.
+
+    `feed` is awaited from `data_received`, so a slow upstream pauses reading
+    the client body. `produce` is passed as the upstream `body_producer`.
+    """
+
+    _EOF = b""
+
+    def __init__(self, max_chunks: int = REQUEST_BODY_PIPE_CHUNKS) -> None:
+        self._queue: asyncio.Queue[bytes | None] = asyncio.Queue(max_chunks)
+        self._closed = False
+
+    async def feed(self, chunk: bytes) -> None:
+        if not self._closed and chunk:
+            await self._queue.put(chunk)
+
+    async def finish(self) -> None:
+        if not self._closed:
+            await self._queue.put(self._EOF)
+
+    def abort(self) -> None:
+        """Stop forwarding; the pending upstream request fails."""
+        if self._closed:
+            return
+        self._closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def produce(self, write: Callable[[bytes], Awaitable[None]]) -> None:
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                raise ConnectionAbortedError("Client request body was aborted.")
+            if not chunk:
+                return
+            await write(chunk)
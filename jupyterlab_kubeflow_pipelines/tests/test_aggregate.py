@@ -0,0 +1,65 @@
+import json
+
+from conftest import FAKE_RUNS
+
+
+async def test_aggregate_walks_all_pages(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"aggregate_page_size": 3}
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy-aggregate",
+        "runs",
+        params={"where": "state=FAILED", "fields": "run_id,state"},
+    )
+
+    payload = json.loads(response.body)
+    assert payload["pages"] == 3
+    assert payload["truncated"] is False
+    assert payload["runs"] == [
+        {"run_id": r["run_id"], "state": "FAILED"} for r in FAKE_RUNS if r["state"] == "FAILED"
+    ]
+    assert all("namespace=team-a" in r["query"] for r in kfp_configured["requests"])
+
+
+async def test_aggregate_streams_ndjson_with_limit(jp_fetch, kfp_configured):
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy-aggregate",
+        "runs",
+        params={"format": "ndjson", "limit": "4"},
+    )
+
+    lines = [json.loads(line) for line in response.body.decode().splitlines()]
+    assert [line["run_id"] for line in lines[:-1]] == ["run-0", "run-1", "run-2", "run-3"]
+    assert lines[-1]["summary"]["count"] == 4
+    assert lines[-1]["summary"]["truncated"] is True
+
+
+async def test_aggregate_pages_are_retried_and_fail_fast(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "aggregate_page_size": 3,
+        "upstream_retry_base_delay": 0,
+        "breaker_failure_threshold": 3,
+        "breaker_reset_timeout": 60,
+    }
+    # The first page answers 503 twice before it succeeds.
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "proxy-aggregate", "runs", params={"fail_times": "2"}
+    )
+    assert json.loads(response.body)["count"] == len(FAKE_RUNS)
+
+    failing = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy-aggregate",
+        "runs",
+        params={"fail_times": "100"},
+        raise_error=False,
+    )
+    assert failing.code == 503
+    requests = len(kfp_configured["requests"])
+    # The breaker is open now: no request reaches KFP.
+    again = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "proxy-aggregate", "runs", raise_error=False
+    )
+    assert again.code == 503 and "Retry-After" in again.headers
+    assert len(kfp_configured["requests"]) == requests
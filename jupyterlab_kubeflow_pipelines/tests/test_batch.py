@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def batch(http_server_client, jp_base_url, jp_auth_header):
+    """POST to `runs:batch`; jp_fetch would percent-encode the colon."""
+
+    async def post(body, **kwargs):
+        response = await http_server_client.fetch(
+            f"{jp_base_url}jupyterlab-kubeflow-pipelines/runs:batch",
+            method="POST",
+            body=json.dumps(body),
+            headers=dict(jp_auth_header),
+            **kwargs,
+        )
+        lines = response.body.decode().splitlines()
+        return response, [json.loads(line) for line in lines]
+
+    return post
+
+
+async def test_batch_by_run_ids_streams_outcomes(batch, kfp_configured):
+    response, lines = await batch(
+        {"operation": "terminate", "run_ids": ["run-1", "run-2", "missing", "run-1"]},
+    )
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    *outcomes, last = lines
+    assert last["summary"] == {
+        "operation": "terminate",
+        "total": 3,
+        "succeeded": 2,
+        "failed": 1,
+        "truncated": False,
+    }
+    by_id = {o["run_id"]: o for o in outcomes}
+    assert by_id["run-1"]["ok"] and by_id["run-2"]["status"] == 200
+    assert by_id["missing"] == {
+        "run_id": "missing",
+        "operation": "terminate",
+        "ok": False,
+        "status": 404,
+        "error": "Run missing not found",
+    }
+    posted = sorted(
+        r["path"] for r in kfp_configured["requests"] if r["method"] == "POST"
+    )
+    assert posted == [
+        "/apis/v2beta1/runs/missing:terminate",
+        "/apis/v2beta1/runs/run-1:terminate",
+        "/apis/v2beta1/runs/run-2:terminate",
+    ]
+
+
+async def test_batch_by_filter(batch, kfp_configured):
+    run_filter = {
+        "predicates": [
+            {"key": "state", "operation": "IN", "string_values": {"values": ["FAILED"]}}
+        ]
+    }
+    _, lines = await batch({"operation": "delete", "filter": run_filter})
+    assert lines[-1]["summary"]["succeeded"] == 3
+    deleted = sorted(
+        r["path"] for r in kfp_configured["requests"] if r["method"] == "DELETE"
+    )
+    assert deleted == [f"/apis/v2beta1/runs/run-{i}" for i in (0, 3, 6)]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"operation": "explode", "run_ids": ["run-1"]},
+        {"operation": "retry"},
+        {"operation": "retry", "run_ids": ["run-1"], "filter": "{}"},
+        {"operation": "archive", "run_ids": "run-1"},
+        ["terminate", "run-1"],
+        "terminate",
+    ],
+)
+async def test_batch_rejects_invalid_requests(batch, kfp_configured, body):
+    response, _ = await batch(body, raise_error=False)
+    assert response.code == 400
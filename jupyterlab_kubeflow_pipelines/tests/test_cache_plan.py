@@ -0,0 +1,244 @@
+import hashlib
+import json
+
+import yaml
+
+from jupyterlab_kubeflow_pipelines.cache_plan import (
+    CachedExecution,
+    cache_fingerprint,
+    plan_cache,
+    task_cache_keys,
+)
+
+
+def _container(image):
+    return {"container": {"image": image, "command": ["sh", "-c"], "args": ["run"]}}
+
+
+CACHE_SPEC = {
+    "pipelineInfo": {"name": "cache-demo"},
+    "root": {
+        "inputDefinitions": {
+            "parameters": {
+                "n": {"parameterType": "NUMBER_INTEGER", "defaultValue": 3},
+            }
+        },
+        "dag": {
+            "tasks": {
+                "prepare": {
+                    "taskInfo": {"name": "prepare"},
+                    "componentRef": {"name": "comp-prepare"},
+                    "cachingOptions": {"enableCache": True},
+                    "inputs": {
+                        "parameters": {"n": {"componentInputParameter": "n"}},
+                    },
+                },
+                "train": {
+                    "taskInfo": {"name": "train"},
+                    "componentRef": {"name": "comp-train"},
+                    "dependentTasks": ["prepare"],
+                    "cachingOptions": {"enableCache": True},
+                    "inputs": {
+                        "parameters": {
+                            "data": {
+                                "taskOutputParameter": {
+                                    "producerTask": "prepare",
+                                    "outputParameterKey": "Output",
+                                }
+                            }
+                        }
+                    },
+                },
+                "for-loop-1": {
+                    "taskInfo": {"name": "for-loop-1"},
+                    "componentRef": {"name": "comp-for-loop-1"},
+                    "parameterIterator": {
+                        "items": {"raw": "[1, 2]"},
+                        "itemInput": "pipelinechannel--loop-item-param-0",
+                    },
+                },
+            }
+        },
+    },
+    "components": {
+        "comp-prepare": {
+            "executorLabel": "exec-prepare",
+            "inputDefinitions": {
+                "parameters": {
+                    "n": {"parameterType": "NUMBER_INTEGER"},
+                    "label": {"parameterType": "STRING", "defaultValue": "<all>"},
+                }
+            },
+            "outputDefinitions": {"parameters": {"Output": {"parameterType": "STRING"}}},
+        },
+        "comp-train": {
+            "executorLabel": "exec-train",
+            "outputDefinitions": {
+                "artifacts": {
+                    "model": {
+                        "artifactType": {"schemaTitle": "system.Model", "schemaVersion": "0.0.1"}
+                    }
+                }
+            },
+        },
+        "comp-for-loop-1": {
+            "dag": {
+                "tasks": {
+                    "shard": {
+                        "taskInfo": {"name": "shard"},
+                        "componentRef": {"name": "comp-prepare"},
+                        "cachingOptions": {},
+                        "inputs": {
+                            "parameters": {
+                                "n": {
+                                    "componentInputParameter": "pipelinechannel--loop-item-param-0"
+                                }
+                            }
+                        },
+                    }
+                }
+            }
+        },
+    },
+    "deploymentSpec": {
+        "executors": {
+            "exec-prepare": _container("python:3.11"),
+            "exec-train": _container("trainer:1"),
+        }
+    },
+}
+
+
+def test_cache_fingerprint_uses_go_json_encoding():
+    key = {
+        "inputParameterValues": {"n": 3.0, "label": "<all> & more", "ratio": 1e-7, "x": 0.25},
+        "containerSpec": {"image": "python:3.11", "cmdArgs": ["sh", "-c", "run"]},
+    }
+    expected = (
+        '{"containerSpec":{"cmdArgs":["sh","-c","run"],"image":"python:3.11"},'
+        '"inputParameterValues":{"label":"\\u003call\\u003e \\u0026 more",'
+        '"n":3,"ratio":1e-7,"x":0.25}}'
+    )
+    assert cache_fingerprint(key) == hashlib.sha256(expected.encode()).hexdigest()
+
+
+def test_task_cache_keys_resolve_inputs_and_loops():
+    keys = {key.task: key for key in task_cache_keys(CACHE_SPEC, {"n": 5})}
+    assert list(keys) == ["for-loop-1[0]/shard", "for-loop-1[1]/shard", "prepare", "train"]
+
+    prepare = cache_fingerprint(
+        {
+            "inputParameterValues": {"n": 5, "label": "<all>"},
+            "outputParametersSpec": {"Output": "STRING"},
+            "containerSpec": {"image": "python:3.11", "cmdArgs": ["sh", "-c", "run"]},
+        }
+    )
+    assert keys["prepare"].fingerprint == prepare
+    # The pipeline default applies without an argument.
+    assert task_cache_keys(CACHE_SPEC)[2].fingerprint != prepare
+    assert keys["train"].fingerprint is None
+    assert keys["train"].producers == ["prepare"]
+    shards = {keys["for-loop-1[0]/shard"].fingerprint, keys["for-loop-1[1]/shard"].fingerprint}
+    assert len(shards) == 2 and prepare not in shards
+    assert not keys["for-loop-1[0]/shard"].cache_enabled
+
+
+def test_plan_cache_propagates_misses_downstream():
+    keys = task_cache_keys(CACHE_SPEC, {"n": 5})
+    prepare = keys[2].fingerprint
+    executions = {
+        prepare: CachedExecution(
+            id=7, state="COMPLETE", fingerprint=prepare, duration_seconds=90.0
+        )
+    }
+
+    plan = plan_cache(keys, executions).to_dict()
+    statuses = {task["task"]: task["status"] for task in plan["tasks"]}
+    assert statuses == {
+        "prepare": "hit",
+        "train": "unknown",
+        "for-loop-1[0]/shard": "miss",
+        "for-loop-1[1]/shard": "miss",
+    }
+    assert plan["estimated_saving_seconds"] == 90.0
+
+    statuses = {t["task"]: t["status"] for t in plan_cache(keys, {}).tasks}
+    assert statuses["train"] == "miss"
+    # Per-task options: the shards have caching turned off.
+    per_task = plan_cache(keys, executions, enable_caching=None).tasks
+    assert [t["reason"] for t in per_task][:2] == ["caching disabled"] * 2
+
+
+async def test_cache_plan_endpoint_looks_up_mlmd(jp_fetch, jp_root_dir, kfp_configured):
+    (jp_root_dir / "pipeline.yaml").write_text(yaml.safe_dump(CACHE_SPEC))
+    keys = task_cache_keys(CACHE_SPEC, {"n": 5})
+    prepare, failed = keys[2].fingerprint, keys[0].fingerprint
+    kfp_configured["mlmd_executions"].extend(
+        {
+            "id": id,
+            "state": state,
+            "fingerprint": fp,
+            "pipeline": pipeline,
+            "namespace": namespace,
+            "created": created,
+            "updated": updated,
+        }
+        for id, state, fp, pipeline, namespace, created, updated in (
+            (3, "COMPLETE", prepare, "cache-demo", "team-a", 1_000, 61_000),
+            (9, "CACHED", prepare, "cache-demo", "team-a", 90_000, 90_500),
+            (4, "FAILED", failed, "cache-demo", "team-a", 1_000, 2_000),
+            # Same components, but another pipeline or namespace: the KFP
+            # driver would not reuse these.
+            (5, "COMPLETE", failed, "other-pipeline", "team-a", 1_000, 9_000),
+            (6, "COMPLETE", failed, "cache-demo", "team-b", 1_000, 9_000),
+        )
+    )
+
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "cache-plan",
+        method="POST",
+        body=json.dumps({"package_path": "pipeline.yaml", "params": {"n": 5}}),
+    )
+    plan = json.loads(response.body)
+    assert plan["counts"] == {"hit": 1, "miss": 2, "unknown": 1}
+    assert plan["tasks"][2]["execution_id"] == 3
+    assert plan["estimated_saving_seconds"] == 60.0
+
+    (request,) = [
+        r for r in kfp_configured["requests"] if r["path"].startswith("/ml_metadata.")
+    ]
+    assert request["headers"]["Content-Type"] == "application/grpc-web+proto"
+    assert b"contexts_a.type = 'system.Pipeline' AND contexts_a.name = 'cache-demo'" in (
+        request["body"]
+    )
+
+
+async def test_cache_plan_pipeline_yaml_is_never_a_path(jp_fetch, jp_root_dir, kfp_configured):
+    secret = jp_root_dir / "secret.txt"
+    secret.write_text("token: [s3cr3t")
+    for pipeline_yaml in (str(secret), "/etc/hostname"):
+        response = await jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "kfp",
+            "cache-plan",
+            method="POST",
+            body=json.dumps({"pipeline_yaml": pipeline_yaml}),
+            raise_error=False,
+        )
+        assert response.code == 422
+        assert b"s3cr3t" not in response.body
+
+
+async def test_cache_plan_rejects_non_object_bodies(jp_fetch, kfp_configured):
+    for body in ([], "pipeline_yaml", 3):
+        response = await jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "kfp",
+            "cache-plan",
+            method="POST",
+            body=json.dumps(body),
+            raise_error=False,
+        )
+        assert response.code == 400
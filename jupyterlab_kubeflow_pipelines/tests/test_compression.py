@@ -0,0 +1,122 @@
+import gzip
+import json
+
+import pytest
+
+from jupyterlab_kubeflow_pipelines.server import compression
+
+PIPELINE_SOURCE = """
+from kfp import dsl
+
+@dsl.component
+def say(message: str) -> str:
+    return message
+
+@dsl.pipeline(name="hello")
+def hello(message: str = "hi"):
+    say(message=message)
+"""
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert compression.negotiate_encoding("br, gzip;q=0") is None
+    assert compression.negotiate_encoding("*") == "gzip"
+    assert compression.negotiate_encoding("") is None
+
+
+async def test_proxy_passes_compressed_upstream_body_through(
+    jp_fetch, jp_web_app, kfp_configured
+):
+    # With our own encoding off, a gzip body can only come from upstream.
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"compress_responses": False}
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy",
+        "experiments",
+        params={"pad": "20000"},
+        headers={"Accept-Encoding": "gzip"},
+        decompress_response=False,
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    payload = json.loads(gzip.decompress(response.body))
+    assert payload["path"] == "apis/v2beta1/experiments"
+    assert len(payload["pad"]) == 20000
+    assert kfp_configured["requests"][-1]["headers"]["Accept-Encoding"] == "gzip"
+
+
+async def test_proxy_decodes_gzip_request_body(jp_fetch, kfp_configured):
+    body = json.dumps({"spec": "x" * 50000}).encode()
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy",
+        "pipelines/upload",
+        method="POST",
+        body=gzip.compress(body),
+        headers={"Content-Encoding": "gzip"},
+    )
+
+    assert json.loads(response.body)["size"] == len(body)
+    upstream = kfp_configured["requests"][-1]
+    assert upstream["body"] == body
+    assert "Content-Encoding" not in upstream["headers"]
+
+
+async def test_compile_accepts_gzip_body_and_compresses_yaml(jp_fetch):
+    body = json.dumps({"action": "compile", "source_code": PIPELINE_SOURCE}).encode()
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "compile",
+        method="POST",
+        body=gzip.compress(body),
+        headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "Accept-Encoding": "gzip",
+        },
+        decompress_response=False,
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    payload = json.loads(gzip.decompress(response.body))
+    assert payload["status"] == "compiled"
+    assert "pipelineInfo" in payload["yaml"]
+    assert payload["analysis"]["critical_path"] == ["say"]
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+async def test_compile_prefers_brotli(jp_fetch):
+    body = json.dumps({"action": "compile", "source_code": PIPELINE_SOURCE})
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "compile",
+        method="POST",
+        body=body,
+        headers={"Accept-Encoding": "gzip, br"},
+        decompress_response=False,
+    )
+
+    assert response.headers["Content-Encoding"] == "br"
+    payload = json.loads(compression.brotli.decompress(response.body))
+    assert payload["status"] == "compiled"
+
+
+async def test_gzip_request_body_is_bounded(jp_fetch, jp_web_app):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"request_body_max_decoded": 1024}
+    body = json.dumps({"action": "inspect", "source_code": "#" * 10000}).encode()
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "compile",
+        method="POST",
+        body=gzip.compress(body),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        raise_error=False,
+    )
+
+    assert response.code == 413
@@ -0,0 +1,103 @@
+import json
+from urllib.parse import parse_qs
+
+from jupyterlab_kubeflow_pipelines.server.summary import summarize_runs
+
+
+def _run(i, state, minutes, failed_tasks=()):
+    return {
+        "run_id": f"run-{i}",
+        "state": state,
+        "created_at": f"2026-01-01T00:{i:02d}:00Z",
+        "finished_at": (
+            f"2026-01-01T00:{i + minutes:02d}:00.500Z" if minutes else "1970-01-01T00:00:00Z"
+        ),
+        "run_details": {
+            "task_details": [
+                {"display_name": "pipeline", "state": "FAILED", "child_tasks": [{}]},
+                *({"display_name": name, "state": "FAILED"} for name in failed_tasks),
+                {"display_name": "train", "state": "SUCCEEDED"},
+            ]
+        },
+    }
+
+
+def test_summarize_runs():
+    runs = [
+        _run(0, "SUCCEEDED", 1),
+        _run(1, "FAILED", 2, ["load", "load"]),
+        _run(2, "FAILED", 3, ["load", "eval"]),
+        _run(3, "SUCCEEDED", 4),
+        _run(4, "RUNNING", 0),
+    ]
+    summary = summarize_runs(runs, buckets=2)
+    assert summary["total"] == 5
+    assert summary["states"] == {"FAILED": 2, "RUNNING": 1, "SUCCEEDED": 2}
+    duration = summary["duration_seconds"]
+    assert duration["count"] == 4
+    assert duration["p50"] == 150.5 and duration["max"] == 240.5
+    rate = summary["failure_rate"]
+    assert rate["bucket_seconds"] == 90.0
+    assert [(b["runs"], b["failed"], b["rate"]) for b in rate["buckets"]] == [
+        (2, 1, 0.5),
+        (2, 1, 0.5),
+    ]
+    # Counted once per run; the failed DAG task is not a component.
+    assert summary["top_failing_components"] == [
+        {"name": "load", "failed_runs": 2},
+        {"name": "eval", "failed_runs": 1},
+    ]
+
+    empty = summarize_runs([], buckets=4)
+    assert empty["total"] == 0 and empty["failure_rate"]["buckets"] == []
+    assert empty["duration_seconds"] == {"count": 0}
+
+
+async def test_experiment_summary_endpoint(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"aggregate_page_size": 1}
+    runs = kfp_configured["runs"]
+    runs[:] = [
+        _run(0, "SUCCEEDED", 1),
+        _run(1, "FAILED", 2, ["load"]),
+        _run(2, "RUNNING", 0),
+        {"run_id": "other", "state": "FAILED", "experiment_id": "exp-b"},
+    ]
+    for run in runs[:3]:
+        run["experiment_id"] = "exp-a"
+
+    async def fetch():
+        response = await jp_fetch(
+            "jupyterlab-kubeflow-pipelines", "experiments", "exp-a", "summary"
+        )
+        return json.loads(response.body)
+
+    summary = await fetch()
+    assert summary["experiment_id"] == "exp-a"
+    assert summary["total"] == 3 and summary["truncated"] is False
+    assert summary["states"] == {"FAILED": 1, "RUNNING": 1, "SUCCEEDED": 1}
+    assert summary["top_failing_components"] == [{"name": "load", "failed_runs": 1}]
+    assert len(summary["failure_rate"]["buckets"]) == 24
+
+    listings = [
+        parse_qs(r["query"])
+        for r in kfp_configured["requests"]
+        if r["path"] == "/apis/v2beta1/runs"
+    ]
+    assert all(q["experiment_id"] == ["exp-a"] for q in listings)
+    assert len({q["filter"][0] for q in listings}) == 5
+
+    # Served from the cache until the TTL expires.
+    requests = len(kfp_configured["requests"])
+    runs[2]["state"] = "SUCCEEDED"
+    assert await fetch() == summary
+    assert len(kfp_configured["requests"]) == requests
+
+    bad = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "experiments",
+        "exp-a",
+        "summary",
+        params={"buckets": "0"},
+        raise_error=False,
+    )
+    assert bad.code == 400
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import time
+
+from .test_compression import PIPELINE_SOURCE
+
+ASYNC = {"Prefer": "respond-async", "Content-Type": "application/json"}
+
+
+async def _compile(jp_fetch, body, headers, **kwargs):
+    return await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "compile",
+        method="POST",
+        body=json.dumps(body),
+        # jp_fetch adds its auth header to the dict it is given.
+        headers=dict(headers),
+        **kwargs,
+    )
+
+
+async def test_async_compile_reports_stages_over_sse(jp_fetch):
+    body = {"action": "compile", "source_code": PIPELINE_SOURCE}
+    response = await _compile(jp_fetch, body, ASYNC)
+    assert response.code == 202
+    assert response.headers["Preference-Applied"] == "respond-async"
+    job = json.loads(response.body)
+    assert response.headers["Location"] == f"jobs/{job['job_id']}"
+    assert job["kind"] == "compile" and job["state"] in {"pending", "running"}
+
+    # The stream ends once the job is done.
+    events = await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"], "events")
+    stream = events.body.decode()
+    stages = [
+        json.loads(line[len("data: "):])["stage"]
+        for line in stream.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert stages[:2] == ["executing", "compiling"]
+    assert "event: done" in stream
+
+    polled = await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"])
+    finished = json.loads(polled.body)
+    assert finished["state"] == "succeeded" and finished["status"] == 200
+    assert finished["result"]["status"] == "compiled"
+    assert [s["stage"] for s in finished["stages"]] == ["executing", "compiling"]
+
+
+async def test_idempotency_key_reuses_the_job(jp_fetch):
+    body = {"action": "inspect", "source_code": PIPELINE_SOURCE}
+    headers = {**ASYNC, "Idempotency-Key": "k1"}
+    first = json.loads((await _compile(jp_fetch, body, headers)).body)
+    again = json.loads((await _compile(jp_fetch, body, headers)).body)
+    assert again["job_id"] == first["job_id"]
+
+    # Synchronous retries with the key wait for the same job.
+    sync = await _compile(jp_fetch, body, {"Idempotency-Key": "k1"})
+    assert json.loads(sync.body)["pipelines"][0]["name"] == "hello"
+    listed = await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs")
+    assert [j["job_id"] for j in json.loads(listed.body)["jobs"]] == [first["job_id"]]
+
+    other = await _compile(
+        jp_fetch, {**body, "action": "compile"}, headers, raise_error=False
+    )
+    assert other.code == 422
+
+
+async def test_finished_jobs_are_bounded(jp_fetch, jp_web_app):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"job_max_retained": 1}
+    body = {"action": "inspect", "source_code": PIPELINE_SOURCE}
+    ids = []
+    for key in ("a", "b"):
+        job = json.loads((await _compile(jp_fetch, body, {**ASYNC, "Idempotency-Key": key})).body)
+        await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"], "events")
+        ids.append(job["job_id"])
+    # Starting a third job prunes the oldest finished one, and frees its key.
+    third = json.loads((await _compile(jp_fetch, body, {**ASYNC, "Idempotency-Key": "a"})).body)
+    assert third["job_id"] not in ids
+
+    gone = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "jobs", ids[0], raise_error=False
+    )
+    assert gone.code == 404
+
+
+async def test_concurrent_compile_jobs(jp_fetch):
+    # Each pipeline body takes a while to build, so unserialized jobs would
+    # overlap inside the DSL's process-global pipeline context.
+    slow = PIPELINE_SOURCE.replace(
+        "    say(message=message)", "    time.sleep(0.3)\n    say(message=message)"
+    )
+    jobs = []
+    for name in ("first", "second"):
+        source = "import time\n" + slow.replace('name="hello"', f'name="{name}"')
+        body = {"action": "compile", "source_code": source}
+        jobs.append(json.loads((await _compile(jp_fetch, body, ASYNC)).body))
+
+    for job, name in zip(jobs, ("first", "second")):
+        await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"], "events")
+        polled = await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"])
+        result = json.loads(polled.body)["result"]
+        assert result["status"] == "compiled", result
+        assert f"name: {name}" in result["yaml"]
+        os.unlink(result["package_path"])
+
+
+async def test_inline_requests_do_not_block_the_ioloop(jp_fetch):
+    slow = "import time\n" + PIPELINE_SOURCE.replace(
+        "    say(message=message)", "    time.sleep(1.0)\n    say(message=message)"
+    )
+    job = json.loads(
+        (await _compile(jp_fetch, {"action": "compile", "source_code": slow}, ASYNC)).body
+    )
+
+    gaps = []
+
+    async def tick():
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.ensure_future(tick())
+    try:
+        # No Prefer or Idempotency-Key: answered without a job.
+        body = {"action": "inspect", "source_code": PIPELINE_SOURCE}
+        inspected = await _compile(jp_fetch, body, {"Content-Type": "application/json"})
+    finally:
+        ticker.cancel()
+    assert inspected.code == 200
+    assert max(gaps) < 0.5
+
+    await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"], "events")
+    polled = await jp_fetch("jupyterlab-kubeflow-pipelines", "jobs", job["job_id"])
+    os.unlink(json.loads(polled.body)["result"]["package_path"])
@@ -0,0 +1,87 @@
+import json
+import os
+
+import nbformat
+import pytest
+
+from jupyterlab_kubeflow_pipelines.kfp_compiler import KfpCompileHandler
+from jupyterlab_kubeflow_pipelines.server.notebooks import reset_notebook_sources
+
+from .test_compression import PIPELINE_SOURCE
+
+
+@pytest.fixture(autouse=True)
+def _reset_notebook_sources():
+    yield
+    reset_notebook_sources()
+
+
+def _write_notebook(path, *sources):
+    notebook = nbformat.v4.new_notebook()
+    notebook.cells = [nbformat.v4.new_markdown_cell("# Pipeline")] + [
+        nbformat.v4.new_code_cell(source) for source in sources
+    ]
+    nbformat.write(notebook, str(path))
+
+
+async def _compile(jp_fetch, **body):
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "compile",
+        method="POST",
+        body=json.dumps(body),
+        raise_error=False,
+    )
+    return response.code, json.loads(response.body)
+
+
+async def test_compile_notebook_by_path(jp_fetch, jp_root_dir, monkeypatch):
+    path = jp_root_dir / "pipeline.ipynb"
+    _write_notebook(path, "%pip install kfp", PIPELINE_SOURCE)
+
+    executed = []
+    find_pipelines = KfpCompileHandler._find_pipelines
+
+    def counting(self, source_code):
+        executed.append(source_code)
+        return find_pipelines(self, source_code)
+
+    monkeypatch.setattr(KfpCompileHandler, "_find_pipelines", counting)
+
+    code, inspected = await _compile(jp_fetch, notebook_path="pipeline.ipynb")
+    assert code == 200
+    assert inspected["pipelines"][0]["name"] == "hello"
+    assert inspected["notebook"]["path"] == "pipeline.ipynb"
+    assert executed == [f"%pip install kfp\n\n{PIPELINE_SOURCE}\n\n"]
+
+    # Unchanged, or merely touched: the cached inspection is reused.
+    _, again = await _compile(jp_fetch, notebook_path="pipeline.ipynb")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    _, touched = await _compile(jp_fetch, notebook_path="pipeline.ipynb")
+    assert again == inspected
+    assert touched["notebook"]["checksum"] == inspected["notebook"]["checksum"]
+    assert len(executed) == 1
+
+    _write_notebook(path, PIPELINE_SOURCE.replace('name="hello"', 'name="greeting"'))
+    _, edited = await _compile(jp_fetch, notebook_path="pipeline.ipynb")
+    assert edited["notebook"]["checksum"] != inspected["notebook"]["checksum"]
+    assert edited["pipelines"][0]["display_name"] == "greeting"
+    assert len(executed) == 2
+
+    code, compiled = await _compile(
+        jp_fetch, notebook_path="pipeline.ipynb", action="compile"
+    )
+    assert code == 200 and compiled["status"] == "compiled"
+    assert "name: greeting" in compiled["yaml"]
+    os.unlink(compiled["package_path"])
+
+
+async def test_compile_notebook_errors(jp_fetch, jp_root_dir):
+    code, _ = await _compile(jp_fetch, notebook_path="missing.ipynb")
+    assert code == 404
+
+    _write_notebook(jp_root_dir / "empty.ipynb")
+    code, body = await _compile(jp_fetch, notebook_path="empty.ipynb")
+    assert code == 400 and body["error"] == "The notebook has no code cells."
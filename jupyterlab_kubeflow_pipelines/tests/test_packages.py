@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import os
+
+from jupyterlab_kubeflow_pipelines.server.packages import (
+    MultipartFile,
+    stored_package_path,
+)
+
+PACKAGE = b"pipelineInfo:\n  name: hello\nroot:\n  dag:\n    tasks: {}\n" * 50
+
+
+def _multipart(boundary: str) -> bytes:
+    return (
+        f"preamble\r\n--{boundary}\r\n"
+        'Content-Disposition: form-data; name="note"\r\n\r\nnot the package\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="package"; filename="hello.yaml"\r\n'
+        "Content-Type: application/yaml\r\n\r\n"
+    ).encode() + PACKAGE + f"\r\n--{boundary}--\r\n".encode()
+
+
+async def _upload(jp_fetch, body, headers, **kwargs):
+    return await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "packages",
+        method="POST",
+        body=body,
+        headers=dict(headers),
+        **kwargs,
+    )
+
+
+def test_multipart_parser_handles_split_delimiters():
+    boundary = "----kfp-boundary"
+    body = _multipart(boundary)
+    for size in (1, 7, 64, len(body)):
+        written = []
+        parser = MultipartFile(boundary, written.append)
+        for i in range(0, len(body), size):
+            parser.feed(body[i : i + size])
+        parser.close()
+        assert b"".join(written) == PACKAGE
+        assert parser.filename == "hello.yaml"
+
+
+async def test_upload_raw_and_multipart_packages(jp_fetch):
+    response = await _upload(
+        jp_fetch,
+        gzip.compress(PACKAGE),
+        {"Content-Type": "application/yaml", "Content-Encoding": "gzip"},
+        params={"filename": "raw.yaml"},
+    )
+    uploaded = json.loads(response.body)
+    assert uploaded["package_id"] == hashlib.sha256(PACKAGE).hexdigest()
+    assert uploaded["size"] == len(PACKAGE) and uploaded["filename"] == "raw.yaml"
+    with open(stored_package_path(uploaded["package_id"]), "rb") as f:
+        assert f.read() == PACKAGE
+
+    boundary = "xYz"
+    response = await _upload(
+        jp_fetch,
+        _multipart(boundary),
+        {"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    again = json.loads(response.body)
+    assert again["package_id"] == uploaded["package_id"]
+    assert again["filename"] == "hello.yaml"
+    # Only the committed package is left in the store.
+    directory = os.path.dirname(stored_package_path(again["package_id"]))
+    assert os.listdir(directory) == [f"{again['package_id']}.yaml"]
+
+
+async def test_upload_size_limits(jp_fetch, jp_web_app):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"package_max_bytes": 1024}
+    headers = {"Content-Type": "application/yaml"}
+    too_long = await _upload(jp_fetch, b"x" * (128 * 1024), headers, raise_error=False)
+    assert too_long.code == 413
+
+    # Within the on-wire bound, but not once decoded.
+    bomb = await _upload(
+        jp_fetch,
+        gzip.compress(b"x" * (1024 * 1024)),
+        {**headers, "Content-Encoding": "gzip"},
+        raise_error=False,
+    )
+    assert bomb.code == 413
+
+    empty = await _upload(jp_fetch, b"", headers, raise_error=False)
+    assert empty.code == 400
+
+
+def test_multipart_header_parameters():
+    parser = MultipartFile.from_content_type(
+        'multipart/form-data; charset=utf-8; boundary="a b;c"', lambda _: None
+    )
+    body = (
+        b'--a b;c\r\nContent-Disposition: form-data; name="file"; filename="x; y.yaml"'
+        b"\r\n\r\n" + PACKAGE + b"\r\n--a b;c--\r\n"
+    )
+    parser.feed(body)
+    parser.close()
+    assert parser.filename == "x; y.yaml"
+
+
+async def test_upload_rejects_non_pipelines(jp_fetch):
+    headers = {"Content-Type": "application/yaml"}
+    not_yaml = b"\x89PNG\r\n\x1a\n\x00\xff"
+    for body in (not_yaml, b"key: [unclosed", b"apiVersion: v1\nkind: Pod\n"):
+        response = await _upload(jp_fetch, body, headers, raise_error=False)
+        assert response.code == 422
+        assert stored_package_path(hashlib.sha256(body).hexdigest()) is None
+
+
+async def test_submit_and_import_unknown_package(jp_fetch, kfp_configured):
+    for endpoint, extra in (("submit", {}), ("pipelines/import", {"pipeline_name": "p"})):
+        response = await jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "kfp",
+            *endpoint.split("/"),
+            method="POST",
+            body=json.dumps({"package_id": "0" * 64, **extra}),
+            raise_error=False,
+        )
+        assert response.code == 404
+        assert "package_id" in json.loads(response.body)["error"]
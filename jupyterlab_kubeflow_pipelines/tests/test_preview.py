@@ -0,0 +1,407 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+import yaml
+
+from jupyterlab_kubeflow_pipelines import preview
+from jupyterlab_kubeflow_pipelines.preview import (
+    DAG_LAYOUT_MIME,
+    DAG_REF_MIME,
+    MERMAID_MIME,
+    analyze_dag,
+    build_dag_layout,
+    build_dag_preview,
+    build_run_dag,
+    diff_node_states,
+    display_dag_preview,
+    iter_dag_preview_lines,
+)
+from jupyterlab_kubeflow_pipelines.server.packages import compiled_package_dir
+
+PIPELINE_SPEC = {
+    "root": {
+        "dag": {
+            "tasks": {
+                "load": {"taskInfo": {"name": "load"}, "componentRef": {"name": "comp-load"}},
+                "train": {
+                    "taskInfo": {"name": "train"},
+                    "componentRef": {"name": "comp-train"},
+                    "dependentTasks": ["load"],
+                },
+                "report-2": {
+                    "taskInfo": {"name": "report-2"},
+                    "componentRef": {"name": "comp-report"},
+                    "dependentTasks": ["train"],
+                },
+            }
+        }
+    }
+}
+
+
+
+def _task(name, component, *deps, **extra):
+    task = {"taskInfo": {"name": name}, "componentRef": {"name": component}, **extra}
+    if deps:
+        task["dependentTasks"] = list(deps)
+    return task
+
+
+# prepare -> ParallelFor(shard -> Condition(publish)), prepare -> 5x score.
+NESTED_SPEC = {
+    "components": {
+        "comp-for-loop-2": {
+            "dag": {
+                "tasks": {
+                    "shard": _task("shard", "comp-shard"),
+                    "condition-3": _task(
+                        "condition-3",
+                        "comp-condition-3",
+                        "shard",
+                        triggerPolicy={"condition": "inputs.parameter_values['x'] == 'a'"},
+                    ),
+                }
+            }
+        },
+        "comp-condition-3": {"dag": {"tasks": {"publish": _task("publish", "comp-publish")}}},
+        "comp-shard": {"executorLabel": "exec-shard"},
+    },
+    "root": {
+        "dag": {
+            "tasks": {
+                "prepare": _task("prepare", "comp-prepare"),
+                "for-loop-2": _task(
+                    "for-loop-2",
+                    "comp-for-loop-2",
+                    "prepare",
+                    parameterIterator={"items": {"raw": '["a", "b"]'}},
+                ),
+                **{
+                    f"score-{i}": _task(f"score-{i}", f"comp-score-{i}", "prepare")
+                    for i in range(2, 7)
+                },
+            }
+        }
+    },
+}
+
+
+def test_preview_expands_sub_dags_and_groups_fan_out():
+    lines = list(iter_dag_preview_lines(NESTED_SPEC))
+
+    assert lines[0] == "graph TD"
+    assert '  subgraph for_loop_2["for-loop-2 (ParallelFor)"]' in lines
+    assert '    subgraph for_loop_2__condition_3["condition-3 (Condition)"]' in lines
+    assert '      for_loop_2__condition_3__publish["publish\\\\n(comp-publish)"]' in lines
+    assert "    for_loop_2__shard --> for_loop_2__condition_3" in lines
+    assert '  score_2_group["score ×5\\\\n(comp-score, 5 tasks)"]' in lines
+    assert "  prepare --> for_loop_2" in lines
+    assert "  prepare --> score_2_group" in lines
+
+
+def test_preview_level_of_detail_and_node_budget():
+    collapsed = list(iter_dag_preview_lines(NESTED_SPEC, max_depth=0, group_threshold=10))
+    assert '  for_loop_2["for-loop-2\\\\n(ParallelFor, 2 tasks)"]' in collapsed
+    assert sum(line.startswith("  score_") for line in collapsed) == 5
+
+    # Over budget, the most detailed rendering that fits wins.
+    fitted = list(iter_dag_preview_lines(NESTED_SPEC, group_threshold=10, max_nodes=6))
+    assert '  score_2_group["score ×5\\\\n(comp-score, 5 tasks)"]' in fitted
+    assert any(line.startswith("  subgraph for_loop_2") for line in fitted)
+
+    truncated = list(iter_dag_preview_lines(NESTED_SPEC, max_nodes=2))
+    assert truncated[1:] == [
+        '  prepare["prepare\\\\n(comp-prepare)"]',
+        '  more_nodes["… 2 more nodes"]',
+    ]
+
+
+def _chain_spec(length, fan_in=3):
+    """A chain where each task depends on the `fan_in` tasks before it."""
+    return {
+        "root": {
+            "dag": {
+                "tasks": {
+                    f"t{i}": {
+                        "taskInfo": {"name": f"t{i}"},
+                        "componentRef": {"name": f"comp-t{i}"},
+                        "dependentTasks": [f"t{j}" for j in range(max(0, i - fan_in), i)],
+                    }
+                    for i in range(length)
+                }
+            }
+        }
+    }
+
+
+def test_preview_planning_scales_to_thousands_of_tasks():
+    start = time.monotonic()
+    preview = build_dag_preview(_chain_spec(6000), max_nodes=3000)
+    assert time.monotonic() - start < 5
+    assert preview.truncated and preview.node_count == 3000
+    assert '\n  t0["t0' in preview.mermaid
+    assert "  t2998 --> t2999" not in preview.mermaid
+    assert "  t2997 --> t2998" in preview.mermaid
+
+
+def _run(*task_states):
+    return {
+        "run_id": "run-dag",
+        "state": "RUNNING",
+        "pipeline_spec": PIPELINE_SPEC,
+        "run_details": {
+            "task_details": [
+                {"display_name": name, "state": state} for name, state in task_states
+            ]
+        },
+    }
+
+
+def test_build_run_dag_annotates_task_states():
+    # Two executions of `train` (a retry): the failure wins; `root` is no task.
+    dag = build_run_dag(
+        _run(
+            ("load", "SUCCEEDED"),
+            ("train", "FAILED"),
+            ("train", "SUCCEEDED"),
+            ("root", "RUNNING"),
+        )
+    )
+
+    assert dag.node_states == {"load": "SUCCEEDED", "train": "FAILED", "report_2": "PENDING"}
+    assert "  load --> train\n" in dag.mermaid
+    assert "  class train kfp_failed\n" in dag.mermaid
+    assert "classDef kfp_running" in dag.mermaid
+
+
+def test_run_dag_payload_lists_changed_nodes_only():
+    before = build_run_dag(_run(("load", "RUNNING")))
+    after = build_run_dag(_run(("load", "SUCCEEDED"), ("train", "RUNNING")))
+
+    assert before.graph_id == after.graph_id
+    assert diff_node_states(before.node_states, after.node_states) == {
+        "load": "SUCCEEDED",
+        "train": "RUNNING",
+    }
+    payload = after.to_payload(previous=before)
+    assert payload["changed"] == {"load": "SUCCEEDED", "train": "RUNNING"}
+    assert payload["states"]["report_2"] == "PENDING"
+
+
+async def test_run_dag_endpoint(jp_fetch, kfp_configured):
+    kfp_configured["runs"].append(_run(("load", "SUCCEEDED"), ("train", "RUNNING")))
+    response = await jp_fetch("jupyterlab-kubeflow-pipelines", "runs", "run-dag", "dag")
+
+    payload = json.loads(response.body)
+    assert payload["run_id"] == "run-dag"
+    assert payload["states"] == {"load": "SUCCEEDED", "train": "RUNNING", "report_2": "PENDING"}
+    assert response.headers["Etag"]
+
+
+def test_layout_positions_nodes_by_rank_and_caches_by_digest():
+    class Pipeline:
+        pipeline_spec = NESTED_SPEC
+
+    layout = build_dag_layout(Pipeline, group_threshold=10)
+    payload = layout.to_payload(title="nested")
+    nodes = {node[0]: node for node in payload["nodes"]}
+
+    # Every edge points down at least one rank; no two boxes of a rank overlap.
+    for src, dst, points in payload["edges"]:
+        assert payload["nodes"][src][3] < payload["nodes"][dst][3]
+        assert points[:2] == [payload["nodes"][src][2], payload["nodes"][src][3] + 20]
+    by_rank = {}
+    for _, _, x, y, width in payload["nodes"]:
+        by_rank.setdefault(y, []).append((x - width / 2, x + width / 2))
+    for boxes in by_rank.values():
+        boxes.sort()
+        assert all(a[1] < b[0] for a, b in zip(boxes, boxes[1:]))
+
+    assert len([n for n in nodes if n.startswith("score_")]) == 5
+    frames = {group[0]: group[2:] for group in payload["groups"]}
+    outer, inner = frames["for_loop_2"], frames["for_loop_2__condition_3"]
+    assert outer[0] < inner[0] and outer[1] < inner[1] and inner[3] < outer[3]
+    publish = nodes["for_loop_2__condition_3__publish"]
+    assert inner[0] < publish[2] < inner[2]
+    assert payload["title"] == "nested" and payload["task_count"] == 8
+
+    assert build_dag_layout(Pipeline, group_threshold=10) is layout
+
+
+def test_layout_scales_to_thousands_of_ranks():
+    start = time.monotonic()
+    layout = build_dag_layout(_chain_spec(2000), max_nodes=5000)
+    assert time.monotonic() - start < 5
+    assert layout.node_count == 2000
+    ys = [node[3] for node in layout.payload["nodes"]]
+    assert len(set(ys)) == 2000
+
+
+def test_analyze_dag_levels_width_and_critical_path(tmp_path):
+    analysis = analyze_dag(NESTED_SPEC)
+
+    assert analysis.task_count == 8
+    # prepare, 2 x shard and publish (literal items), 5 x score.
+    assert analysis.execution_count == 10
+    assert analysis.loops == {"for-loop-2": 2}
+    assert analysis.level_widths == [1, 7, 2]
+    assert analysis.max_width == 7
+    assert analysis.critical_path == [
+        "prepare",
+        "for-loop-2/shard",
+        "for-loop-2/condition-3/publish",
+    ]
+
+    package = tmp_path / "pipeline.yaml"
+    package.write_text(yaml.safe_dump(NESTED_SPEC) + "---\nplatforms: {}\n")
+    assert analyze_dag(str(package)) == analysis
+    assert analyze_dag(package.read_text()).to_dict()["critical_path_length"] == 3
+
+
+def test_analyze_dag_dynamic_loops_and_parallelism():
+    spec = json.loads(json.dumps(NESTED_SPEC))
+    loop = spec["root"]["dag"]["tasks"]["for-loop-2"]
+    loop["parameterIterator"] = {"items": {"inputParameter": "pipelinechannel--shards"}}
+    assert analyze_dag(spec).loops == {"for-loop-2": None}
+    assert "1 dynamic loop counted once" in analyze_dag(spec).summary()
+
+    loop["parameterIterator"] = {"items": {"raw": json.dumps(list(range(10)))}}
+    loop["iteratorPolicy"] = {"parallelismLimit": 3}
+    analysis = analyze_dag(spec)
+    assert analysis.execution_count == 1 + 10 + 10 + 5
+    assert analysis.level_widths == [1, 8, 3]
+
+
+def test_build_dag_preview_from_compiled_spec(tmp_path):
+    package = tmp_path / "pipeline.yaml"
+    package.write_text(yaml.safe_dump(PIPELINE_SPEC))
+
+    from_dict = build_dag_preview(PIPELINE_SPEC)
+    assert build_dag_preview(str(package)) is from_dict
+    assert build_dag_preview(package.read_text()) is from_dict
+    assert "  load --> train" in from_dict.mermaid
+    assert len(from_dict.digest) == 64
+
+
+async def test_preview_endpoint_for_package_and_pipeline_version(
+    jp_fetch, jp_root_dir, kfp_configured
+):
+    (jp_root_dir / "nested.yaml").write_text(yaml.safe_dump(NESTED_SPEC))
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "kfp", "preview", params={"package_path": "nested.yaml"}
+    )
+    payload = json.loads(response.body)
+    assert payload["mermaid"].startswith("graph TD\n")
+    assert payload["analysis"]["max_width"] == 7
+
+    for created_at, version_id, spec in (("1", "v1", NESTED_SPEC), ("2", "v2", PIPELINE_SPEC)):
+        kfp_configured["pipeline_versions"].append(
+            {
+                "pipeline_id": "p1",
+                "pipeline_version_id": version_id,
+                "created_at": created_at,
+                "pipeline_spec": spec,
+            }
+        )
+    latest = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "preview",
+        params={"pipeline_id": "p1", "format": "layout"},
+    )
+    assert [node[0] for node in json.loads(latest.body)["nodes"]] == ["load", "train", "report_2"]
+
+    params = {"pipeline_id": "p1", "version_id": "v1", "max_depth": "0"}
+    first = await jp_fetch("jupyterlab-kubeflow-pipelines", "kfp", "preview", params=params)
+    again = await jp_fetch("jupyterlab-kubeflow-pipelines", "kfp", "preview", params=params)
+    assert first.body == again.body
+    assert "(ParallelFor, 2 tasks)" in json.loads(first.body)["mermaid"]
+    # The registered version is immutable: fetched once.
+    fetched = [r for r in kfp_configured["requests"] if r["path"].endswith("/versions/v1")]
+    assert len(fetched) == 1
+
+    outside = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "kfp",
+        "preview",
+        params={"package_path": "/etc/passwd"},
+        raise_error=False,
+    )
+    assert outside.code == 403
+
+    # Only packages written by kfp/compile are readable outside the root.
+    os.makedirs(compiled_package_dir(), exist_ok=True)
+    for directory, code in ((compiled_package_dir(), 200), (tempfile.gettempdir(), 403)):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".yaml", dir=directory, delete=False
+        ) as package:
+            package.write(yaml.safe_dump(NESTED_SPEC))
+        try:
+            response = await jp_fetch(
+                "jupyterlab-kubeflow-pipelines",
+                "kfp",
+                "preview",
+                params={"package_path": package.name},
+                raise_error=False,
+            )
+        finally:
+            os.unlink(package.name)
+        assert response.code == code
+
+
+def test_display_dag_preview_lays_out_only_graphs_too_large_for_mermaid(monkeypatch):
+    import IPython.display
+
+    shown = []
+    monkeypatch.setattr(IPython.display, "display", lambda obj, **kw: shown.append(obj))
+    monkeypatch.setattr(preview, "_LAYOUT_CACHE", OrderedDict())
+    layouts = []
+    layout_plan = preview._layout_plan
+    monkeypatch.setattr(
+        preview, "_layout_plan", lambda plan: layouts.append(plan) or layout_plan(plan)
+    )
+
+    display_dag_preview(NESTED_SPEC, max_depth=3)
+    assert MERMAID_MIME in shown[-1] and layouts == []
+
+    display_dag_preview(NESTED_SPEC, max_depth=3, max_nodes=2)
+    assert DAG_LAYOUT_MIME in shown[-1] and len(layouts) == 1
+
+
+async def test_compact_preview_references_stored_payload(jp_fetch, monkeypatch):
+    import IPython.display
+
+    shown = []
+    monkeypatch.setattr(IPython.display, "display", lambda obj, **kw: shown.append(obj))
+    display_dag_preview(NESTED_SPEC, title="nested", compact=True)
+
+    (bundle,) = shown
+    reference = bundle[DAG_REF_MIME]
+    assert MERMAID_MIME not in bundle
+    assert reference["summary"] == analyze_dag(NESTED_SPEC).summary()
+    assert "graph TD" not in bundle["text/plain"]
+
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "previews",
+        reference["ref"],
+        headers={"Accept-Encoding": "gzip"},
+        decompress_response=False,
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    stored = json.loads(gzip.decompress(response.body))
+    assert stored["mime"] == MERMAID_MIME
+    assert stored["payload"]["title"] == "nested"
+
+    plain = await jp_fetch("jupyterlab-kubeflow-pipelines", "previews", reference["ref"])
+    assert json.loads(plain.body) == stored
+
+    missing = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "previews", "0" * 64, raise_error=False
+    )
+    assert missing.code == 404
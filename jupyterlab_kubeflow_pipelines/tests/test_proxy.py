@@ -0,0 +1,256 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from jupyterlab_kubeflow_pipelines.config import KfpServerOptions
+from jupyterlab_kubeflow_pipelines.server import upstream
+from jupyterlab_kubeflow_pipelines.server.cache import invalidator, response_cache
+from jupyterlab_kubeflow_pipelines.server.hedging import (
+    hedged_fetch,
+    latency_tracker,
+    reset_hedging,
+    route_of,
+)
+from jupyterlab_kubeflow_pipelines.server.resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    call_resilient,
+)
+
+
+async def test_proxy_streams_upstream_response(jp_fetch, kfp_configured):
+    response = await jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "experiments")
+
+    assert response.code == 200
+    assert response.headers["X-Upstream"] == "fake"
+    payload = json.loads(response.body)
+    assert payload["path"] == "apis/v2beta1/experiments"
+    assert payload["query"] == "namespace=team-a"
+
+
+async def test_proxy_streams_large_request_body(jp_fetch, kfp_configured):
+    body = b"x" * (3 * 1024 * 1024)
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "proxy", "pipelines/upload", method="POST", body=body
+    )
+
+    assert response.code == 200
+    assert json.loads(response.body)["size"] == len(body)
+    assert kfp_configured["requests"][-1]["body"] == body
+
+
+async def test_proxy_relays_redirects(jp_fetch, jp_web_app, kfp_configured):
+    for streaming in (True, False):
+        jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"proxy_streaming": streaming}
+        response = await jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "proxy",
+            "experiments",
+            params={"redirect": "/login"},
+            follow_redirects=False,
+            raise_error=False,
+        )
+        assert response.code == 302
+        assert response.headers["Location"] == "/login"
+    assert len(kfp_configured["requests"]) == 2
+
+
+async def test_proxy_cache_coalesces_and_invalidates(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"proxy_cache_ttl": 30}
+    upstream = kfp_configured["requests"]
+
+    first, second = await asyncio.gather(
+        jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "experiments"),
+        jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "experiments"),
+    )
+    assert first.body == second.body
+    assert {first.headers["X-Kfp-Proxy-Cache"], second.headers["X-Kfp-Proxy-Cache"]} == {
+        "MISS",
+        "COALESCED",
+    }
+    hit = await jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "experiments")
+    assert hit.headers["X-Kfp-Proxy-Cache"] == "HIT"
+    assert len(upstream) == 1
+
+    await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "proxy", "experiments", method="POST", body="{}"
+    )
+    refreshed = await jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "experiments")
+    assert refreshed.headers["X-Kfp-Proxy-Cache"] == "MISS"
+    assert len(upstream) == 3
+
+
+async def test_cache_invalidator_runs_on_the_loop(jp_fetch, jp_web_app, kfp_configured):
+    # Submit/import work runs on job threads and invalidates through this.
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"proxy_cache_ttl": 30}
+    await jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "pipelines")
+    user = next(key[0] for key in response_cache()._entries if key[3] == "pipelines")
+
+    await asyncio.to_thread(invalidator(user, "pipelines"))
+    await asyncio.sleep(0)
+
+    refreshed = await jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "pipelines")
+    assert refreshed.headers["X-Kfp-Proxy-Cache"] == "MISS"
+
+
+async def test_proxy_projects_list_fields(jp_fetch, kfp_configured):
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy",
+        "runs",
+        params={"fields": "run_id,state", "page_size": "2"},
+    )
+
+    payload = json.loads(response.body)
+    assert payload["runs"] == [
+        {"run_id": "run-0", "state": "FAILED"},
+        {"run_id": "run-1", "state": "SUCCEEDED"},
+    ]
+    assert payload["next_page_token"] == "2"
+    assert "fields" not in kfp_configured["requests"][-1]["query"]
+
+
+async def test_proxy_limits_concurrency_per_user(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "upstream_max_concurrency": 1,
+        "upstream_max_queue": 1,
+        "upstream_retry_after": 3,
+    }
+
+    responses = await asyncio.gather(
+        *(
+            jp_fetch(
+                "jupyterlab-kubeflow-pipelines",
+                "proxy",
+                "experiments",
+                params={"delay": "0.2", "i": str(i)},
+                raise_error=False,
+            )
+            for i in range(3)
+        )
+    )
+
+    codes = sorted(r.code for r in responses)
+    assert codes == [200, 200, 429]
+    rejected = next(r for r in responses if r.code == 429)
+    assert rejected.headers["Retry-After"] == "3"
+    assert len(kfp_configured["requests"]) == 2
+
+
+async def test_proxy_retries_idempotent_requests(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "upstream_retry_base_delay": 0,
+    }
+
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy",
+        "experiments",
+        params={"fail_times": "2"},
+    )
+
+    assert response.code == 200
+    assert len(kfp_configured["requests"]) == 3
+
+
+async def test_proxy_circuit_breaker_fails_fast(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "upstream_retry_attempts": 1,
+        "breaker_failure_threshold": 2,
+        "breaker_reset_timeout": 60,
+    }
+    upstream = kfp_configured["requests"]
+
+    for _ in range(2):
+        response = await jp_fetch(
+            "jupyterlab-kubeflow-pipelines",
+            "proxy",
+            "experiments",
+            params={"fail_times": "10"},
+            raise_error=False,
+        )
+        assert response.code == 503
+    assert len(upstream) == 2
+
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines", "proxy", "experiments", raise_error=False
+    )
+    assert response.code == 503
+    assert int(response.headers["Retry-After"]) > 0
+    assert len(upstream) == 2
+
+    debug = await jp_fetch("jupyterlab-kubeflow-pipelines", "debug", raise_error=False)
+    breakers = json.loads(debug.body)["circuit_breakers"]
+    assert any(b["state"] == "open" for b in breakers)
+
+
+async def test_proxy_hedges_slow_reads(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "hedge_percentile": 50,
+        "hedge_min_samples": 1,
+        "hedge_min_delay": 0,
+        "hedge_max_rate": 1.0,
+    }
+    # Seed the latency window of the route with a fast response.
+    await jp_fetch("jupyterlab-kubeflow-pipelines", "proxy", "experiments")
+
+    start = time.monotonic()
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "proxy",
+        "experiments",
+        params={"delay_once": "2"},
+    )
+
+    assert response.code == 200
+    assert time.monotonic() - start < 1.5
+    assert len(kfp_configured["requests"]) == 3
+
+
+async def test_sdk_calls_refuse_to_block_the_event_loop():
+    options = KfpServerOptions()
+    kwargs = dict(
+        idempotent=True,
+        breaker=CircuitBreaker("kfp.example"),
+        policy=RetryPolicy.from_options(options),
+    )
+
+    with pytest.raises(RuntimeError, match="worker thread"):
+        call_resilient(lambda: "ok", **kwargs)
+    assert await asyncio.to_thread(call_resilient, lambda: "ok", **kwargs) == "ok"
+
+
+def test_upstream_reads_are_flow_controlled():
+    # Flags a Tornado release whose internals the flow control no longer fits.
+    assert upstream._can_flow_control()
+    assert upstream._UpstreamHTTPClient is not upstream.SimpleAsyncHTTPClient
+
+
+def test_hedging_samples_the_primary_latency():
+    url = "http://kfp.example/apis/v2beta1/runs/run-1"
+    options = KfpServerOptions(
+        hedge_percentile=50, hedge_min_samples=1, hedge_min_delay=0, hedge_max_rate=1.0
+    )
+    tracker = latency_tracker()
+    tracker.observe(route_of(url), 0.05)
+    delays = [0.5, 0.0]
+
+    async def fetch():
+        await asyncio.sleep(delays.pop(0))
+        return "ok"
+
+    async def main():
+        result = await hedged_fetch(fetch, url=url, options=options)
+        # The hedge answered at once; the primary is sampled when it ends.
+        assert tracker.percentile(route_of(url), 100, min_samples=2) is None
+        await asyncio.sleep(0.6)
+        return result
+
+    try:
+        assert asyncio.run(main()) == "ok"
+        assert tracker.percentile(route_of(url), 0, min_samples=2) == 0.05
+        assert tracker.percentile(route_of(url), 100, min_samples=2) >= 0.5
+    finally:
+        reset_hedging()
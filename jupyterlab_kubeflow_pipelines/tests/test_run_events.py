@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+from jupyterlab_kubeflow_pipelines.config import KfpConfig, KfpServerOptions
+from jupyterlab_kubeflow_pipelines.server.events import RunStatusPoller, run_event_hub
+
+
+class _EventStream:
+    """Collect the events of a runs/events response as it streams in."""
+
+    def __init__(self):
+        self.events = []
+        self._buffer = b""
+
+    def __call__(self, chunk):
+        self._buffer += chunk
+        while b"\n\n" in self._buffer:
+            block, self._buffer = self._buffer.split(b"\n\n", 1)
+            fields = dict(
+                line.split(": ", 1) for line in block.decode().splitlines() if ": " in line
+            )
+            if "event" in fields:
+                self.events.append((fields["event"], json.loads(fields["data"])))
+
+    def of(self, kind):
+        return [data for event, data in self.events if event == kind]
+
+    async def wait_for(self, predicate, timeout=5.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not predicate(self):
+            assert asyncio.get_running_loop().time() < deadline, self.events
+            await asyncio.sleep(0.02)
+
+
+async def test_run_events_share_one_poller(jp_fetch, jp_web_app, kfp_configured):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "run_events_poll_interval": 0.05
+    }
+    runs = kfp_configured["runs"]
+    for i, run in enumerate(runs):
+        run["created_at"] = f"2026-01-01T00:00:0{i}Z"
+    runs[1]["state"] = "RUNNING"
+
+    streams = [_EventStream(), _EventStream()]
+    fetches = [
+        asyncio.ensure_future(
+            jp_fetch(
+                "jupyterlab-kubeflow-pipelines",
+                "runs",
+                "events",
+                streaming_callback=stream,
+                request_timeout=0,
+            )
+        )
+        for stream in streams
+    ]
+    watched = _EventStream()
+    fetches.append(
+        asyncio.ensure_future(
+            jp_fetch(
+                "jupyterlab-kubeflow-pipelines",
+                "runs",
+                "events",
+                params={"run_id": "run-4"},
+                streaming_callback=watched,
+                request_timeout=0,
+            )
+        )
+    )
+    for stream in (*streams, watched):
+        await stream.wait_for(lambda s: s.of("snapshot"))
+    snapshot = {r["run_id"]: r["state"] for r in streams[0].of("snapshot")[0]["runs"]}
+    assert snapshot["run-1"] == "RUNNING"
+    assert [r["run_id"] for r in watched.of("snapshot")[0]["runs"]] == ["run-4"]
+
+    runs[1]["state"] = "SUCCEEDED"
+    runs.append({"run_id": "run-7", "state": "PENDING", "created_at": "2026-01-02T00:00:00Z"})
+    for stream in streams:
+        await stream.wait_for(lambda s: len(s.of("run")) == 2)
+        changes = {e["run_id"]: (e["previous_state"], e["state"]) for e in stream.of("run")}
+        assert changes == {"run-1": ("RUNNING", "SUCCEEDED"), "run-7": (None, "PENDING")}
+    assert watched.of("run") == []
+
+    # One poller serves every stream of the namespace.
+    (poller,) = run_event_hub().snapshot("default")
+    assert poller["subscribers"] == 3
+    run_event_hub().close()
+    await asyncio.gather(*fetches)
+
+
+async def test_pinned_run_lookup_quotes_the_run_id(fake_kfp):
+    endpoint = fake_kfp["endpoint"]
+    poller = RunStatusPoller(
+        ("user", endpoint, "team-a"),
+        config=KfpConfig(endpoint=endpoint, namespace="team-a"),
+        endpoint=endpoint,
+        namespace="team-a",
+        options=KfpServerOptions(),
+    )
+    # The fake echoes unknown paths: the ID arrives as one path segment.
+    echoed = await poller._get_run("run-1/../pipelines?x=1")
+    assert echoed == {"path": "apis/v2beta1/runs/run-1/../pipelines?x=1", "query": ""}
@@ -0,0 +1,171 @@
+import json
+from urllib.parse import parse_qs
+
+from jupyterlab_kubeflow_pipelines.server import run_index
+from jupyterlab_kubeflow_pipelines.server.listing import UpstreamListError
+from jupyterlab_kubeflow_pipelines.server.run_index import RunIndex, fts_query
+
+
+async def _search(jp_fetch, **params):
+    response = await jp_fetch(
+        "jupyterlab-kubeflow-pipelines",
+        "runs",
+        "search",
+        params=params,
+        raise_error=False,
+    )
+    return response.code, json.loads(response.body)
+
+
+def test_fts_query_takes_syntax_literally(tmp_path):
+    assert fts_query('lr "0.1 OR') == '"lr"* """0.1"* "OR"*'
+    index = RunIndex(str(tmp_path / "runs.sqlite"), user="u", endpoint="e", namespace="n")
+    index.upsert(
+        [
+            {"run_id": "a", "display_name": "train OR eval", "created_at": "1"},
+            {"run_id": "b", "display_name": "train-lr", "created_at": "2"},
+        ]
+    )
+    index.upsert([{"run_id": "a", "display_name": "renamed", "created_at": "1"}])
+    assert [r["run_id"] for r in index.search(text="train")] == ["b"]
+    assert [r["run_id"] for r in index.search(text="rena")] == ["a"]
+    assert index.search(text='OR ("') == []
+    index.close()
+
+
+async def test_search_syncs_incrementally(jp_fetch, jp_web_app, kfp_configured, tmp_path):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "run_index_dir": str(tmp_path),
+        "run_index_sync_interval": 0,
+    }
+    runs = kfp_configured["runs"]
+    for i, run in enumerate(runs):
+        run["created_at"] = f"2026-01-01T00:00:0{i}Z"
+        run["experiment_id"] = "exp-a" if i < 4 else "exp-b"
+    runs[1]["state"] = "RUNNING"
+    runs[2]["runtime_config"] = {
+        "parameters": {"dataset": "mnist-large", "learning_rate": 0.01}
+    }
+
+    code, found = await _search(jp_fetch, q="mnist")
+    assert code == 200
+    assert [r["run_id"] for r in found["runs"]] == ["run-2"]
+    assert found["runs"][0]["parameters"]["learning_rate"] == 0.01
+    assert found["total_indexed"] == 7 and found["synced_at"]
+
+    _, failed = await _search(jp_fetch, state="FAILED", experiment_id="exp-a")
+    assert [r["run_id"] for r in failed["runs"]] == ["run-3", "run-0"]
+
+    runs[1].update(state="SUCCEEDED", finished_at="2026-01-01T00:01:00Z")
+    runs.append(
+        {
+            "run_id": "run-7",
+            "display_name": "Run 7",
+            "state": "PENDING",
+            "created_at": "2026-01-01T00:00:07Z",
+        }
+    )
+    requests = kfp_configured["requests"]
+    del requests[:]
+    _, latest = await _search(jp_fetch, limit="2")
+    assert [r["run_id"] for r in latest["runs"]] == ["run-1", "run-7"]
+    assert latest["runs"][0]["state"] == "SUCCEEDED"
+    assert latest["total_indexed"] == 8
+
+    filters = [
+        json.loads(parse_qs(r["query"])["filter"][0])["predicates"][0]
+        for r in requests
+        if r["path"] == "/apis/v2beta1/runs"
+    ]
+    assert {p["operation"] for p in filters} == {"GREATER_THAN_EQUALS", "IN"}
+    assert next(p for p in filters if p["operation"] == "GREATER_THAN_EQUALS") == {
+        "key": "created_at",
+        "operation": "GREATER_THAN_EQUALS",
+        "timestamp_value": "2026-01-01T00:00:06Z",
+    }
+    assert [r["path"] for r in requests if r["path"] != "/apis/v2beta1/runs"] == [
+        "/apis/v2beta1/runs/run-1"
+    ]
+
+
+async def test_search_serves_stale_results(
+    jp_fetch, jp_web_app, kfp_configured, tmp_path, monkeypatch
+):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "run_index_dir": str(tmp_path),
+        "run_index_sync_interval": 0,
+    }
+    _, fresh = await _search(jp_fetch, q="run 5")
+    assert [r["run_id"] for r in fresh["runs"]] == ["run-5"]
+
+    async def unreachable(self, **kwargs):
+        raise ConnectionError("KFP is down")
+
+    monkeypatch.setattr(RunIndex, "sync_once", unreachable)
+    code, stale = await _search(jp_fetch, q="run 5")
+    assert code == 200
+    assert stale["stale"] is True and stale["sync_error"] == "KFP is down"
+    assert stale["runs"] == fresh["runs"]
+
+
+async def test_failed_initial_walk_is_started_over(
+    jp_fetch, jp_web_app, kfp_configured, tmp_path, monkeypatch
+):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "run_index_dir": str(tmp_path),
+        "run_index_sync_interval": 0,
+    }
+    for i, run in enumerate(kfp_configured["runs"]):
+        run["created_at"] = f"2026-01-01T00:00:0{i}Z"
+
+    walk_list = run_index.walk_list
+
+    async def first_page_only(**kwargs):
+        async for page in walk_list(**kwargs):
+            yield page
+            raise UpstreamListError(503, "unavailable")
+
+    monkeypatch.setattr(run_index, "walk_list", first_page_only)
+    code, _ = await _search(jp_fetch)
+    assert code == 503
+
+    monkeypatch.setattr(run_index, "walk_list", walk_list)
+    requests = kfp_configured["requests"]
+    del requests[:]
+    _, found = await _search(jp_fetch)
+    assert found["total_indexed"] == 7
+    assert all("filter" not in parse_qs(r["query"]) for r in requests)
+
+
+async def test_same_second_runs_and_full_sweeps(
+    jp_fetch, jp_web_app, kfp_configured, tmp_path
+):
+    settings = {"run_index_dir": str(tmp_path), "run_index_sync_interval": 0}
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = settings
+    runs = kfp_configured["runs"]
+    for i, run in enumerate(runs):
+        run["created_at"] = f"2026-01-01T00:00:0{i}Z"
+    await _search(jp_fetch)
+
+    # Created in the same second as the newest indexed run, already finished.
+    runs.append(
+        {
+            "run_id": "run-7",
+            "display_name": "Run 7",
+            "state": "SUCCEEDED",
+            "created_at": runs[-1]["created_at"],
+        }
+    )
+    _, found = await _search(jp_fetch, q="7")
+    assert [r["run_id"] for r in found["runs"]] == ["run-7"]
+
+    # Deleted and archived finished runs are reconciled by full walks.
+    del runs[3]
+    runs[4]["storage_state"] = "ARCHIVED"
+    _, before = await _search(jp_fetch)
+    assert before["total_indexed"] == 8
+    settings["run_index_full_sync_interval"] = 0
+    _, after = await _search(jp_fetch)
+    assert after["total_indexed"] == 7
+    by_id = {r["run_id"]: r for r in after["runs"]}
+    assert "run-3" not in by_id and by_id["run-5"]["storage_state"] == "ARCHIVED"
@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+
+from conftest import FAKE_ARTIFACT
+
+from jupyterlab_kubeflow_pipelines.server.upstream import streaming_client, upstream_client
+
+ASSET = "static/js/main.0123abcd.js"
+
+
+@pytest.fixture
+def asset_cache_dir(jp_web_app, tmp_path):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "ui_asset_cache_dir": str(tmp_path / "ui-assets"),
+    }
+    return tmp_path / "ui-assets"
+
+
+async def test_ui_proxy_caches_fingerprinted_assets(jp_fetch, kfp_configured, asset_cache_dir):
+    first = await jp_fetch("kfp-ui", ASSET)
+    second = await jp_fetch("kfp-ui", ASSET)
+
+    assert first.headers["X-Kfp-Ui-Asset-Cache"] == "MISS"
+    assert second.headers["X-Kfp-Ui-Asset-Cache"] == "HIT"
+    assert second.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert first.body == second.body
+    assert len(kfp_configured["requests"]) == 1
+    assert any(asset_cache_dir.iterdir())
+
+    not_modified = await jp_fetch(
+        "kfp-ui",
+        ASSET,
+        headers={"If-None-Match": second.headers["ETag"]},
+        raise_error=False,
+    )
+    assert not_modified.code == 304
+
+
+async def test_ui_proxy_revalidates_expired_assets(
+    jp_fetch, jp_web_app, kfp_configured, asset_cache_dir
+):
+    await jp_fetch("kfp-ui", ASSET)
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"]["ui_asset_revalidate_after"] = 0
+
+    response = await jp_fetch("kfp-ui", ASSET)
+
+    assert response.headers["X-Kfp-Ui-Asset-Cache"] == "REVALIDATED"
+    assert "If-None-Match" in kfp_configured["requests"][-1]["headers"]
+
+
+async def test_ui_proxy_does_not_cache_html_fallbacks_or_redirects(
+    jp_fetch, kfp_configured, asset_cache_dir
+):
+    fallback = await jp_fetch("kfp-ui", ASSET, params={"spa": "1"})
+    assert fallback.headers["Content-Type"].startswith("text/html")
+    assert fallback.headers["Cache-Control"] == "no-store, max-age=0"
+    assert "X-Kfp-Ui-Asset-Cache" not in fallback.headers
+
+    moved = await jp_fetch(
+        "kfp-ui",
+        ASSET,
+        params={"redirect": "/static/js/main.4567cdef.js"},
+        follow_redirects=False,
+        raise_error=False,
+    )
+    assert moved.code == 302
+    assert moved.headers["Location"].endswith("/kfp-ui/static/js/main.4567cdef.js")
+
+    # Neither response was stored; the asset itself is still a MISS.
+    asset = await jp_fetch("kfp-ui", ASSET)
+    assert asset.headers["X-Kfp-Ui-Asset-Cache"] == "MISS"
+
+
+async def test_ui_proxy_keeps_no_store_for_shell_and_api(jp_fetch, kfp_configured):
+    shell = await jp_fetch("kfp-ui", "index.html")
+    api = await jp_fetch("kfp-ui", "apis", "v2beta1", "experiments")
+    unversioned = await jp_fetch("kfp-ui", "static", "favicon.ico")
+
+    assert shell.headers["Cache-Control"] == "no-store, max-age=0"
+    assert api.headers["Cache-Control"] == "no-store, max-age=0"
+    assert unversioned.headers["Cache-Control"] == "no-cache"
+
+
+async def test_ui_proxy_memoizes_rewritten_shell(jp_fetch, kfp_configured):
+    first = await jp_fetch("kfp-ui", "index.html")
+    second = await jp_fetch("kfp-ui", "index.html")
+
+    assert first.headers["X-Kfp-Ui-Rewrite"] == "1"
+    assert b"jlkfp-path-rewrite" in first.body
+    assert second.headers["X-Kfp-Ui-Shell-Cache"] == "HIT"
+    assert second.body == first.body
+    assert "If-None-Match" in kfp_configured["requests"][-1]["headers"]
+
+
+async def test_path_rewrite_script_supports_conditional_requests(jp_fetch):
+    first = await jp_fetch("kfp-ui", "_jlkfp_path_rewrite.js")
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    second = await jp_fetch(
+        "kfp-ui",
+        "_jlkfp_path_rewrite.js",
+        headers={"If-None-Match": first.headers["ETag"]},
+        raise_error=False,
+    )
+    assert second.code == 304
+    assert not second.body
+
+
+async def test_ui_proxy_streams_artifact_ranges(jp_fetch, kfp_configured):
+    full = await jp_fetch("kfp-ui", "artifacts", "get", params={"key": "model.bin"})
+    assert full.code == 200
+    assert full.body == FAKE_ARTIFACT
+
+    partial = await jp_fetch(
+        "kfp-ui",
+        "artifacts",
+        "get",
+        params={"key": "model.bin"},
+        headers={"Range": "bytes=100-199"},
+    )
+    assert partial.code == 206
+    assert partial.headers["Content-Range"] == f"bytes 100-199/{len(FAKE_ARTIFACT)}"
+    assert partial.body == FAKE_ARTIFACT[100:200]
+    assert kfp_configured["requests"][-1]["headers"]["Range"] == "bytes=100-199"
+
+
+async def test_ui_proxy_download_timeout_of_zero_or_less_means_none(
+    jp_fetch, jp_web_app, kfp_configured
+):
+    for timeout in (0, -1):
+        jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {"ui_download_timeout": timeout}
+        response = await jp_fetch("kfp-ui", "artifacts", "get", params={"key": "model.bin"})
+        assert response.code == 200
+        assert response.body == FAKE_ARTIFACT
+
+
+async def test_ui_proxy_relays_downloads_over_100mb(
+    http_server_client, jp_base_url, jp_auth_header, kfp_configured
+):
+    # The test client has Tornado's 100 MB default too; count bytes instead.
+    http_server_client.max_body_size = 2**40
+    received = 0
+
+    def count(chunk):
+        nonlocal received
+        received += len(chunk)
+
+    repeat = 150
+    response = await http_server_client.fetch(
+        f"{jp_base_url}kfp-ui/artifacts/get?key=model.bin&repeat={repeat}",
+        headers=dict(jp_auth_header),
+        streaming_callback=count,
+        request_timeout=120,
+    )
+    assert response.code == 200
+    assert received == repeat * len(FAKE_ARTIFACT) > 100 * 1024 * 1024
+
+
+async def test_buffered_upstream_fetches_keep_the_body_limit():
+    # Only the streaming client lifts the cap; buffered fetches hold bodies in memory.
+    assert upstream_client() is not streaming_client()
+    buffered = upstream_client()
+    assert (buffered.max_body_size or buffered.max_buffer_size) == 100 * 1024 * 1024
+    assert streaming_client().max_body_size > 2**40
+
+
+async def test_ui_proxy_download_gives_back_its_slot(
+    http_server_client, jp_base_url, jp_auth_header, jp_fetch, jp_web_app, kfp_configured
+):
+    jp_web_app.settings["jupyterlab_kubeflow_pipelines"] = {
+        "upstream_max_concurrency": 1,
+        "upstream_queue_timeout": 0.5,
+    }
+    started = asyncio.Event()
+    download = asyncio.ensure_future(
+        http_server_client.fetch(
+            f"{jp_base_url}kfp-ui/artifacts/get?key=model.bin&repeat=2&pause=1",
+            headers=dict(jp_auth_header),
+            streaming_callback=lambda chunk: started.set(),
+        )
+    )
+    await asyncio.wait_for(started.wait(), 5)
+
+    # The slow body no longer holds the user's only upstream slot.
+    other = await jp_fetch("kfp-ui", "artifacts", "get", params={"key": "other.bin"})
+    assert other.code == 200
+    assert (await download).code == 200
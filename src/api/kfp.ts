@@ -1,8 +1,18 @@
+import { ServerConnection } from '@jupyterlab/services';
+import { UUID } from '@lumino/coreutils';
 import type { KfpConfig } from './config';
+import { baseUrl } from './base';
 import { requestAPI } from '../request';
 
 type ExperimentListResponse = {
-  experiments?: Array<{ id: string; name?: string }>;
+  experiments?: Array<{
+    id?: string;
+    name?: string;
+    experiment_id?: string;
+    display_name?: string;
+  }>;
+  count?: number;
+  truncated?: boolean;
   next_page_token?: string;
 };
 
@@ -21,6 +31,7 @@ type PipelineDescriptor = {
 
 type CompileResult = {
   pipelines?: PipelineDescriptor[];
+  notebook?: { path: string; last_modified: string; checksum: string };
   status?: 'compiled';
   pipeline_name?: string;
   package_path?: string;
@@ -34,6 +45,39 @@ type SubmitResult = {
   url?: string;
 };
 
+type PackageUploadResult = {
+  package_id: string;
+  size: number;
+  filename: string | null;
+};
+
+export type ExperimentSummary = {
+  experiment_id: string;
+  total: number;
+  truncated: boolean;
+  generated_at: number;
+  states: Record<string, number>;
+  duration_seconds: {
+    count: number;
+    p50?: number;
+    p90?: number;
+    p95?: number;
+    p99?: number;
+    mean?: number;
+    max?: number;
+  };
+  failure_rate: {
+    bucket_seconds: number | null;
+    buckets: Array<{
+      start: number;
+      runs: number;
+      failed: number;
+      rate: number | null;
+    }>;
+  };
+  top_failing_components: Array<{ name: string; failed_runs: number }>;
+};
+
 type ImportPipelineResult = {
   pipeline_id?: string;
   pipeline_name?: string;
@@ -41,30 +85,136 @@ type ImportPipelineResult = {
   error?: string;
 };
 
+export type RunStatus = {
+  run_id: string;
+  display_name?: string;
+  experiment_id?: string;
+  state: string;
+  created_at?: string;
+  finished_at?: string;
+};
+
+export type RunStateChange = RunStatus & {
+  namespace: string;
+  previous_state: string | null;
+};
+
+type RunEventHandlers = {
+  onSnapshot?: (runs: RunStatus[]) => void;
+  onChange?: (change: RunStateChange) => void;
+  onError?: (error: string) => void;
+};
+
+export type JobStage = 'executing' | 'compiling' | 'uploading' | 'creating_run';
+
+type Job<T> = {
+  job_id: string;
+  kind: string;
+  state: 'pending' | 'running' | 'succeeded' | 'failed';
+  stage: JobStage | null;
+  status: number | null;
+  result: T | null;
+};
+
 const JSON_HEADERS = { 'Content-Type': 'application/json' };
 
+/**
+ * POST to `endPoint` as a background job and resolve with its result.
+ *
+ * The server answers at once and reports the job's stages over
+ * `jobs/{id}/events`, so slow clusters do not hit ingress timeouts. The
+ * idempotency key makes a retried request rejoin the same job. Failed jobs
+ * reject like `requestAPI` does for error responses.
+ */
+const runJob = async <T>(
+  endPoint: string,
+  body: unknown,
+  onStage: (stage: JobStage) => void
+): Promise<T> => {
+  const job = await requestAPI<Job<T>>(endPoint, {
+    method: 'POST',
+    headers: {
+      ...JSON_HEADERS,
+      Prefer: 'respond-async',
+      'Idempotency-Key': UUID.uuid4()
+    },
+    body: JSON.stringify(body)
+  });
+  const finished = await new Promise<Job<T>>((resolve, reject) => {
+    const source = new EventSource(
+      `${baseUrl}jupyterlab-kubeflow-pipelines/jobs/${job.job_id}/events`
+    );
+    source.addEventListener('stage', event => {
+      onStage(JSON.parse((event as MessageEvent).data).stage);
+    });
+    source.addEventListener('done', event => {
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('error', () => {
+      // EventSource reconnects (resuming after the last event) unless the
+      // server refused the stream, e.g. because the job expired.
+      if (source.readyState === EventSource.CLOSED) {
+        reject(new Error(`Lost track of job ${job.job_id}.`));
+      }
+    });
+  });
+  const status = finished.status ?? 500;
+  if (status >= 400) {
+    const result = (finished.result ?? {}) as { error?: string };
+    throw new ServerConnection.ResponseError(
+      new Response(JSON.stringify(finished.result), { status }),
+      result.error ?? `Job ${job.job_id} failed.`
+    );
+  }
+  return finished.result as T;
+};
+
+const postJSON = async <T>(
+  endPoint: string,
+  body: unknown,
+  onStage?: (stage: JobStage) => void
+): Promise<T> => {
+  if (onStage) {
+    return runJob<T>(endPoint, body, onStage);
+  }
+  return requestAPI<T>(endPoint, {
+    method: 'POST',
+    headers: JSON_HEADERS,
+    body: JSON.stringify(body)
+  });
+};
+
 export const getExperiments = async (config: KfpConfig) => {
+  // All pages are walked server-side, so this is a single round trip.
   const query = new URLSearchParams({ namespace: config.namespace });
   return requestAPI<ExperimentListResponse>(
-    `proxy/experiments?${query.toString()}`
+    `proxy-aggregate/experiments?${query.toString()}`
   );
 };
 
+/**
+ * Code to compile: the source itself, or the path (relative to the server
+ * root) of a saved notebook whose code cells the server reads.
+ */
+export type PipelineSource = string | { notebookPath: string };
+
 export const compilePipeline = async (
   _config: KfpConfig,
-  sourceCode: string,
+  source: PipelineSource,
   action: 'inspect' | 'compile' = 'inspect',
-  pipelineName?: string
+  pipelineName?: string,
+  onStage?: (stage: JobStage) => void
 ) => {
-  return requestAPI<CompileResult>('kfp/compile', {
-    method: 'POST',
-    headers: JSON_HEADERS,
-    body: JSON.stringify({
-      source_code: sourceCode,
-      action,
-      pipeline_name: pipelineName
-    })
-  });
+  const code =
+    typeof source === 'string'
+      ? { source_code: source }
+      : { notebook_path: source.notebookPath };
+  return postJSON<CompileResult>(
+    'kfp/compile',
+    { ...code, action, pipeline_name: pipelineName },
+    onStage
+  );
 };
 
 export const submitPipeline = async (
@@ -73,19 +223,20 @@ export const submitPipeline = async (
   pipelineYaml: string | undefined,
   params: Record<string, unknown>,
   runName?: string,
-  experimentId?: string
+  experimentId?: string,
+  onStage?: (stage: JobStage) => void
 ) => {
-  return requestAPI<SubmitResult>('kfp/submit', {
-    method: 'POST',
-    headers: JSON_HEADERS,
-    body: JSON.stringify({
+  return postJSON<SubmitResult>(
+    'kfp/submit',
+    {
       package_path: packagePath,
       pipeline_yaml: pipelineYaml,
       params,
       run_name: runName,
       experiment_id: experimentId
-    })
-  });
+    },
+    onStage
+  );
 };
 
 export const terminateRun = async (runId: string) => {
@@ -102,15 +253,88 @@ export const terminateRun = async (runId: string) => {
 export const importPipelineFromYaml = async (
   pipelineName: string,
   pipelineYaml: string,
-  description?: string
+  description?: string,
+  onStage?: (stage: JobStage) => void
 ) => {
-  return requestAPI<ImportPipelineResult>('kfp/pipelines/import', {
-    method: 'POST',
-    headers: JSON_HEADERS,
-    body: JSON.stringify({
+  return postJSON<ImportPipelineResult>(
+    'kfp/pipelines/import',
+    {
       pipeline_name: pipelineName,
       pipeline_yaml: pipelineYaml,
       description: description ?? null
-    })
+    },
+    onStage
+  );
+};
+
+/**
+ * Stream a pipeline package file into the server's package store.
+ *
+ * The file is sent as-is rather than embedded in a JSON body, so large
+ * packages are not held as strings; pass the returned `package_id` to
+ * `kfp/submit` or `kfp/pipelines/import`.
+ */
+export const uploadPipelinePackage = async (file: Blob, filename?: string) => {
+  const query = new URLSearchParams();
+  const name = filename ?? (file instanceof File ? file.name : undefined);
+  if (name) {
+    query.set('filename', name);
+  }
+  return requestAPI<PackageUploadResult>(`kfp/packages?${query.toString()}`, {
+    method: 'POST',
+    headers: { 'Content-Type': file.type || 'application/yaml' },
+    body: file
+  });
+};
+
+/**
+ * Run aggregates of an experiment for the dashboard, computed server-side
+ * (and briefly cached) instead of loading every run into the browser.
+ */
+export const getExperimentSummary = async (
+  experimentId: string,
+  buckets?: number
+) => {
+  const query = buckets ? `?buckets=${buckets}` : '';
+  return requestAPI<ExperimentSummary>(
+    `experiments/${encodeURIComponent(experimentId)}/summary${query}`
+  );
+};
+
+/**
+ * Subscribe to run state changes pushed by the server (`runs/events`).
+ *
+ * All subscribers of a namespace share one upstream poller, so prefer this
+ * over polling `runs/{id}`. Pass `runIds` to only hear about those runs.
+ * Returns a function that closes the stream.
+ */
+export const subscribeRunEvents = (
+  handlers: RunEventHandlers,
+  options: { namespace?: string; runIds?: string[] } = {}
+): (() => void) => {
+  const query = new URLSearchParams();
+  if (options.namespace) {
+    query.set('namespace', options.namespace);
+  }
+  for (const runId of options.runIds ?? []) {
+    query.append('run_id', runId);
+  }
+  const source = new EventSource(
+    `${baseUrl}jupyterlab-kubeflow-pipelines/runs/events?${query.toString()}`
+  );
+  source.addEventListener('snapshot', event => {
+    handlers.onSnapshot?.(JSON.parse((event as MessageEvent).data).runs);
+  });
+  source.addEventListener('run', event => {
+    handlers.onChange?.(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener('error', event => {
+    // Server-sent `error` events carry data; connection errors do not and
+    // are retried by EventSource itself.
+    const data = (event as MessageEvent).data;
+    if (data) {
+      handlers.onError?.(JSON.parse(data).error);
+    }
   });
+  return () => source.close();
 };
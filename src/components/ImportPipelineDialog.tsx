@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { importPipelineFromYaml } from '../api';
+import { importPipelineFromYaml, JobStage } from '../api';
 
 type ImportPipelineDialogProps = {
   onClose: () => void;
@@ -14,6 +14,7 @@ export const ImportPipelineDialog: React.FC<ImportPipelineDialogProps> = ({
   const [description, setDescription] = useState('');
   const [pipelineYaml, setPipelineYaml] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
+  const [stage, setStage] = useState<JobStage | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [created, setCreated] = useState<{
     pipelineId: string;
@@ -40,13 +41,15 @@ export const ImportPipelineDialog: React.FC<ImportPipelineDialogProps> = ({
     }
 
     setIsSubmitting(true);
+    setStage(null);
     setError(null);
     setCreated(null);
     try {
       const res = await importPipelineFromYaml(
         pipelineName.trim(),
         pipelineYaml.trim(),
-        description.trim() || undefined
+        description.trim() || undefined,
+        setStage
       );
 
       const pipelineId = String(res?.pipeline_id || '');
@@ -192,7 +195,11 @@ export const ImportPipelineDialog: React.FC<ImportPipelineDialogProps> = ({
           onClick={() => void handleImport()}
           disabled={isSubmitting}
         >
-          {isSubmitting ? 'Importing…' : 'Import'}
+          {isSubmitting
+            ? stage === 'uploading'
+              ? 'Uploading…'
+              : 'Importing…'
+            : 'Import'}
         </button>
         <button
           className="jp-mod-styled jp-KfpCancelButton"
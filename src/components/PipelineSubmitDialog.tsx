@@ -3,14 +3,22 @@ import PipelinePreview from './PipelinePreview';
 import {
   compilePipeline,
   getExperiments,
+  JobStage,
   kfpUiProxyUrl,
   submitPipeline,
   terminateRun
 } from '../api';
 
+const STAGE_MESSAGES: Record<JobStage, string> = {
+  executing: 'Running notebook code...',
+  compiling: 'Compiling pipeline...',
+  uploading: 'Uploading pipeline...',
+  creating_run: 'Creating run...'
+};
+
 export const PipelineSubmitDialog = ({
   config,
-  sourceCode,
+  source,
   inspectedPipelines,
   onClose,
   onOpenRunDetails
@@ -57,12 +65,17 @@ export const PipelineSubmitDialog = ({
       .then(data => {
         setExperiments(data.experiments || []);
         if (data.experiments && data.experiments.length > 0) {
-          setSelectedExperimentId(data.experiments[0].id);
+          const first = data.experiments[0];
+          setSelectedExperimentId(first.experiment_id || first.id || '');
         }
       })
       .catch(console.error);
   }, [selectedPipeline, config]); // Dependencies for this combined effect
 
+  const showStage = (stage: JobStage) => {
+    setStatus(STAGE_MESSAGES[stage] ?? `${stage}...`);
+  };
+
   const handleSubmit = async () => {
     setSubmitting(true);
     setStatus('Processing...');
@@ -73,9 +86,10 @@ export const PipelineSubmitDialog = ({
       setStatus('Compiling pipeline...');
       const compileRes = await compilePipeline(
         config,
-        sourceCode,
+        source,
         'compile',
-        selectedPipeline.name
+        selectedPipeline.name,
+        showStage
       );
       if (!compileRes.package_path) {
         throw new Error('Compilation did not return a package path.');
@@ -88,7 +102,8 @@ export const PipelineSubmitDialog = ({
         undefined,
         params,
         runName,
-        selectedExperimentId
+        selectedExperimentId,
+        showStage
       );
       setSubmittedRunId(result.run_id);
       setStatus(`Run submitted successfully! Run ID: ${result.run_id}`);
@@ -0,0 +1,217 @@
+import { JupyterFrontEndPlugin } from '@jupyterlab/application';
+import { IRenderMimeRegistry } from '@jupyterlab/rendermime';
+import { IRenderMime } from '@jupyterlab/rendermime-interfaces';
+import { Widget } from '@lumino/widgets';
+
+export const MIME_TYPE =
+  'application/vnd.jupyterlab-kubeflow-pipelines.dag-layout+json';
+
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+// [id, label, center x, center y, width]
+type LayoutNode = [string, string, number, number, number];
+// [source node index, target node index, flat x/y polyline]
+type LayoutEdge = [number, number, number[]];
+// [id, label, x0, y0, x1, y1]
+type LayoutGroup = [string, string, number, number, number, number];
+
+type DagLayoutPayload = {
+  title?: string | null;
+  summary?: string;
+  digest: string;
+  width: number;
+  height: number;
+  node_height: number;
+  nodes: LayoutNode[];
+  edges: LayoutEdge[];
+  groups: LayoutGroup[];
+  node_count: number;
+  task_count: number;
+  collapsed: boolean;
+  truncated: boolean;
+};
+
+function svgElement<K extends keyof SVGElementTagNameMap>(
+  tag: K,
+  attributes: Record<string, string | number>
+): SVGElementTagNameMap[K] {
+  const element = document.createElementNS(SVG_NS, tag);
+  for (const [name, value] of Object.entries(attributes)) {
+    element.setAttribute(name, String(value));
+  }
+  return element;
+}
+
+function appendLabel(
+  parent: SVGElement,
+  label: string,
+  x: number,
+  y: number,
+  anchor: 'middle' | 'start'
+): void {
+  const lines = label.split('\n');
+  const text = svgElement('text', {
+    x,
+    y: y - ((lines.length - 1) * 14) / 2,
+    'text-anchor': anchor,
+    'dominant-baseline': 'middle',
+    'font-size': 12,
+    fill: 'var(--jp-ui-font-color1)'
+  });
+  lines.forEach((line, i) => {
+    const tspan = svgElement('tspan', { x, dy: i === 0 ? 0 : 14 });
+    tspan.textContent = line;
+    text.appendChild(tspan);
+  });
+  parent.appendChild(text);
+}
+
+/**
+ * Draw a DAG laid out by the server extension (`build_dag_layout`).
+ *
+ * Positions are final; this only emits SVG primitives, so graphs with
+ * thousands of nodes render without a client-side layout pass.
+ */
+export class DagLayoutMimeRenderer
+  extends Widget
+  implements IRenderMime.IRenderer
+{
+  constructor() {
+    super();
+    this.addClass('jp-KfpMermaidPreview');
+    this.node.style.overflow = 'auto';
+    this.node.style.padding = '8px';
+    this.node.style.border = '1px solid var(--jp-border-color2)';
+    this.node.style.borderRadius = '4px';
+    this.node.style.background = 'var(--jp-layout-color1)';
+  }
+
+  async renderModel(model: IRenderMime.IMimeModel): Promise<void> {
+    const payload = model.data[MIME_TYPE] as unknown as
+      | DagLayoutPayload
+      | undefined;
+    this.node.textContent = '';
+
+    if (!payload || !Array.isArray(payload.nodes)) {
+      const pre = document.createElement('pre');
+      pre.textContent = String(model.data['text/plain'] ?? '');
+      this.node.appendChild(pre);
+      return;
+    }
+
+    if (payload.title) {
+      const heading = document.createElement('div');
+      heading.textContent = payload.title;
+      heading.style.fontWeight = '600';
+      heading.style.marginBottom = '8px';
+      this.node.appendChild(heading);
+    }
+
+    if (payload.summary) {
+      const summary = document.createElement('div');
+      summary.textContent = payload.summary;
+      summary.style.color = 'var(--jp-ui-font-color2)';
+      summary.style.fontSize = 'var(--jp-ui-font-size0)';
+      summary.style.marginBottom = '8px';
+      this.node.appendChild(summary);
+    }
+
+    const svg = svgElement('svg', {
+      width: payload.width,
+      height: payload.height,
+      viewBox: `0 0 ${payload.width} ${payload.height}`
+    });
+    const defs = svgElement('defs', {});
+    const marker = svgElement('marker', {
+      id: `kfp-arrow-${payload.digest.slice(0, 12)}`,
+      viewBox: '0 0 10 10',
+      refX: 10,
+      refY: 5,
+      markerWidth: 6,
+      markerHeight: 6,
+      orient: 'auto-start-reverse'
+    });
+    marker.appendChild(
+      svgElement('path', {
+        d: 'M 0 0 L 10 5 L 0 10 z',
+        fill: 'var(--jp-ui-font-color2)'
+      })
+    );
+    defs.appendChild(marker);
+    svg.appendChild(defs);
+
+    for (const [, label, x0, y0, x1, y1] of payload.groups) {
+      svg.appendChild(
+        svgElement('rect', {
+          x: x0,
+          y: y0,
+          width: x1 - x0,
+          height: y1 - y0,
+          rx: 6,
+          fill: 'var(--jp-layout-color2)',
+          'fill-opacity': 0.5,
+          stroke: 'var(--jp-border-color1)',
+          'stroke-dasharray': '4 3'
+        })
+      );
+      appendLabel(svg, label.split('\n')[0], x0 + 8, y0 + 12, 'start');
+    }
+
+    const edges = svgElement('g', {
+      fill: 'none',
+      stroke: 'var(--jp-ui-font-color2)',
+      'stroke-width': 1.2
+    });
+    for (const [, , points] of payload.edges) {
+      const coords: string[] = [];
+      for (let i = 0; i + 1 < points.length; i += 2) {
+        coords.push(`${points[i]},${points[i + 1]}`);
+      }
+      edges.appendChild(
+        svgElement('polyline', {
+          points: coords.join(' '),
+          'marker-end': `url(#${marker.id})`
+        })
+      );
+    }
+    svg.appendChild(edges);
+
+    const half = payload.node_height / 2;
+    for (const [id, label, x, y, width] of payload.nodes) {
+      const node = svgElement('g', { 'data-node-id': id });
+      node.appendChild(
+        svgElement('rect', {
+          x: x - width / 2,
+          y: y - half,
+          width,
+          height: payload.node_height,
+          rx: 4,
+          fill: 'var(--jp-layout-color1)',
+          stroke: 'var(--jp-brand-color1)'
+        })
+      );
+      appendLabel(node, label, x, y, 'middle');
+      svg.appendChild(node);
+    }
+
+    this.node.appendChild(svg);
+  }
+}
+
+const rendererFactory: IRenderMime.IRendererFactory = {
+  safe: true,
+  mimeTypes: [MIME_TYPE],
+  createRenderer: () => new DagLayoutMimeRenderer()
+};
+
+const dagLayoutMimeRendererPlugin: JupyterFrontEndPlugin<void> = {
+  id: 'jupyterlab-kubeflow-pipelines:dag-layout-mime-renderer',
+  autoStart: true,
+  requires: [IRenderMimeRegistry],
+  activate: (app, registry) => {
+    void app;
+    registry.addFactory(rendererFactory, 0);
+  }
+};
+
+export default dagLayoutMimeRendererPlugin;
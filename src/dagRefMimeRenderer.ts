@@ -0,0 +1,135 @@
+import { JupyterFrontEndPlugin } from '@jupyterlab/application';
+import { IRenderMimeRegistry, MimeModel } from '@jupyterlab/rendermime';
+import { IRenderMime } from '@jupyterlab/rendermime-interfaces';
+import { Widget } from '@lumino/widgets';
+
+import {
+  DagLayoutMimeRenderer,
+  MIME_TYPE as DAG_LAYOUT_MIME_TYPE
+} from './dagLayoutMimeRenderer';
+import {
+  MermaidMimeRenderer,
+  MIME_TYPE as MERMAID_MIME_TYPE
+} from './mermaidMimeRenderer';
+import { requestAPI } from './request';
+
+const MIME_TYPE = 'application/vnd.jupyterlab-kubeflow-pipelines.dag-ref+json';
+
+type DagRefPayload = {
+  ref: string;
+  title?: string | null;
+  summary?: string;
+  node_count?: number;
+};
+
+type StoredPreview = {
+  mime: string;
+  payload: Record<string, unknown>;
+};
+
+/**
+ * A compact DAG preview: the notebook only holds a reference, the graph is
+ * fetched from the server extension once the output scrolls into view.
+ */
+class DagRefMimeRenderer extends Widget implements IRenderMime.IRenderer {
+  constructor() {
+    super();
+    this.addClass('jp-KfpMermaidPreview');
+  }
+
+  private _observer: IntersectionObserver | null = null;
+  private _inner: Widget | null = null;
+
+  async renderModel(model: IRenderMime.IMimeModel): Promise<void> {
+    const payload = model.data[MIME_TYPE] as unknown as
+      | DagRefPayload
+      | undefined;
+    this._reset();
+
+    const placeholder = document.createElement('div');
+    placeholder.style.padding = '8px';
+    placeholder.style.border = '1px dashed var(--jp-border-color2)';
+    placeholder.style.borderRadius = '4px';
+    placeholder.style.color = 'var(--jp-ui-font-color2)';
+    placeholder.textContent = [payload?.title, payload?.summary]
+      .filter(Boolean)
+      .join(' — ');
+    this.node.appendChild(placeholder);
+    if (!payload?.ref) {
+      placeholder.textContent = String(model.data['text/plain'] ?? '');
+      return;
+    }
+
+    const ref = payload.ref;
+    this._observer = new IntersectionObserver(entries => {
+      if (!entries.some(entry => entry.isIntersecting)) {
+        return;
+      }
+      this._observer?.disconnect();
+      this._observer = null;
+      void this._load(ref, placeholder);
+    });
+    this._observer.observe(this.node);
+  }
+
+  private async _load(ref: string, placeholder: HTMLElement): Promise<void> {
+    let stored: StoredPreview;
+    try {
+      stored = await requestAPI<StoredPreview>(`previews/${ref}`);
+    } catch (err) {
+      console.warn('Failed to load DAG preview', err);
+      placeholder.textContent +=
+        ' (preview no longer available; re-run the cell)';
+      return;
+    }
+
+    let inner: Widget & IRenderMime.IRenderer;
+    if (stored.mime === DAG_LAYOUT_MIME_TYPE) {
+      inner = new DagLayoutMimeRenderer();
+    } else if (stored.mime === MERMAID_MIME_TYPE) {
+      inner = new MermaidMimeRenderer();
+    } else {
+      return;
+    }
+    placeholder.remove();
+    this._inner = inner;
+    Widget.attach(inner, this.node);
+    await inner.renderModel(
+      new MimeModel({ data: { [stored.mime]: stored.payload as any } })
+    );
+  }
+
+  private _reset(): void {
+    this._observer?.disconnect();
+    this._observer = null;
+    this._inner?.dispose();
+    this._inner = null;
+    this.node.textContent = '';
+  }
+
+  dispose(): void {
+    if (this.isDisposed) {
+      return;
+    }
+    this._reset();
+    super.dispose();
+  }
+}
+
+const rendererFactory: IRenderMime.IRendererFactory = {
+  safe: true,
+  mimeTypes: [MIME_TYPE],
+  createRenderer: () => new DagRefMimeRenderer()
+};
+
+const dagRefMimeRendererPlugin: JupyterFrontEndPlugin<void> = {
+  id: 'jupyterlab-kubeflow-pipelines:dag-ref-mime-renderer',
+  autoStart: true,
+  requires: [IRenderMimeRegistry],
+  activate: (app, registry) => {
+    void app;
+    registry.addFactory(rendererFactory, 0);
+  }
+};
+
+export default dagRefMimeRendererPlugin;
@@ -7,6 +7,8 @@ import { ILauncher } from '@jupyterlab/launcher';
 import { INotebookTracker } from '@jupyterlab/notebook';
 import { ISettingRegistry } from '@jupyterlab/settingregistry';
 
+import dagLayoutMimeRendererPlugin from './dagLayoutMimeRenderer';
+import dagRefMimeRendererPlugin from './dagRefMimeRenderer';
 import mermaidMimeRendererPlugin from './mermaidMimeRenderer';
 import { activateKfpPlugin } from './plugin/activate';
 import { initializeSettings, syncBackendConfigFromSettings } from './api';
@@ -39,4 +41,9 @@ const plugin: JupyterFrontEndPlugin<void> = {
   }
 };
 
-export default [plugin, mermaidMimeRendererPlugin];
+export default [
+  plugin,
+  mermaidMimeRendererPlugin,
+  dagLayoutMimeRendererPlugin,
+  dagRefMimeRendererPlugin
+];
@@ -4,13 +4,22 @@ import { IRenderMime } from '@jupyterlab/rendermime-interfaces';
 import { Widget } from '@lumino/widgets';
 import mermaid from 'mermaid';
 
-const MIME_TYPE = 'application/vnd.jupyterlab-kubeflow-pipelines.mermaid+json';
+export const MIME_TYPE =
+  'application/vnd.jupyterlab-kubeflow-pipelines.mermaid+json';
 
 type MermaidPayload = {
   title?: string | null;
   mermaid: string;
+  // Pipeline previews: fan-out and critical path (`analyze_dag`).
+  summary?: string;
+  // Set for run DAGs: same graph_id means only node states changed.
+  graph_id?: string;
+  states?: Record<string, string>;
+  changed?: Record<string, string>;
 };
 
+const stateClass = (state: string): string => `kfp_${state.toLowerCase()}`;
+
 let mermaidInitialized = false;
 
 function ensureMermaidInitialized(): void {
@@ -30,7 +39,10 @@ function ensureMermaidInitialized(): void {
   });
 }
 
-class MermaidMimeRenderer extends Widget implements IRenderMime.IRenderer {
+export class MermaidMimeRenderer
+  extends Widget
+  implements IRenderMime.IRenderer
+{
   constructor() {
     super();
     this.addClass('jp-KfpMermaidPreview');
@@ -41,6 +53,32 @@ class MermaidMimeRenderer extends Widget implements IRenderMime.IRenderer {
     this.node.style.background = 'var(--jp-layout-color1)';
   }
 
+  private _graphId: string | null = null;
+  private _states: Record<string, string> = {};
+
+  /**
+   * Restyle the nodes listed in `changed` on the SVG already rendered for
+   * the same graph. Returns false when a full render is needed.
+   */
+  private _patchStates(payload: MermaidPayload): boolean {
+    if (!payload.graph_id || payload.graph_id !== this._graphId) {
+      return false;
+    }
+    for (const [nodeId, state] of Object.entries(payload.changed ?? {})) {
+      const node = this.node.querySelector(`g.node[id^="flowchart-${nodeId}-"]`);
+      if (!node) {
+        return false;
+      }
+      const previous = this._states[nodeId];
+      if (previous) {
+        node.classList.remove(stateClass(previous));
+      }
+      node.classList.add(stateClass(state));
+      this._states[nodeId] = state;
+    }
+    return true;
+  }
+
   async renderModel(model: IRenderMime.IMimeModel): Promise<void> {
     ensureMermaidInitialized();
 
@@ -50,6 +88,10 @@ class MermaidMimeRenderer extends Widget implements IRenderMime.IRenderer {
     const mermaidSource = payload?.mermaid;
     const title = payload?.title ?? null;
 
+    if (payload && this._patchStates(payload)) {
+      return;
+    }
+    this._graphId = null;
     this.node.textContent = '';
 
     if (!mermaidSource || typeof mermaidSource !== 'string') {
@@ -67,6 +109,15 @@ class MermaidMimeRenderer extends Widget implements IRenderMime.IRenderer {
       this.node.appendChild(heading);
     }
 
+    if (payload?.summary) {
+      const summary = document.createElement('div');
+      summary.textContent = payload?.summary;
+      summary.style.color = 'var(--jp-ui-font-color2)';
+      summary.style.fontSize = 'var(--jp-ui-font-size0)';
+      summary.style.marginBottom = '8px';
+      this.node.appendChild(summary);
+    }
+
     const container = document.createElement('div');
     container.style.width = '100%';
     this.node.appendChild(container);
@@ -75,6 +126,8 @@ class MermaidMimeRenderer extends Widget implements IRenderMime.IRenderer {
       const id = `kfp-mermaid-${Date.now()}-${Math.random().toString(16).slice(2)}`;
       const { svg } = await mermaid.render(id, mermaidSource);
       container.innerHTML = svg;
+      this._graphId = payload?.graph_id ?? null;
+      this._states = { ...(payload?.states ?? {}) };
     } catch (err) {
       console.error('Failed to render Mermaid DAG preview', err);
       const pre = document.createElement('pre');
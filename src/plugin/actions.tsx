@@ -5,7 +5,7 @@ import type { INotebookTracker } from '@jupyterlab/notebook';
 
 import { ImportPipelineDialog } from '../components/ImportPipelineDialog';
 import { PipelineSubmitDialog } from '../components/PipelineSubmitDialog';
-import { compilePipeline, getConfig } from '../api';
+import { compilePipeline, getConfig, PipelineSource } from '../api';
 import { kfpPipelinesIcon } from '../kfpIcons';
 import {
   IMPORT_PIPELINE_YAML_COMMAND_ID,
@@ -67,6 +67,14 @@ export function registerSubmitPipelineAction(
       const notebookPanel = notebookTracker.currentWidget;
       const notebook = notebookPanel.content;
 
+      // Saved notebooks are read by the server; only unsaved edits (or
+      // notebooks on other drives) are sent as source.
+      const path = notebookPanel.context.path;
+      const sendSource =
+        notebookPanel.context.model.dirty ||
+        app.serviceManager.contents.driveName(path) !== '';
+
+      let hasCode = false;
       let sourceCode = '';
       if (notebook.model) {
         for (let i = 0; i < notebook.model.cells.length; i++) {
@@ -84,11 +92,14 @@ export function registerSubmitPipelineAction(
             const source = cell.toJSON().source;
             text = Array.isArray(source) ? source.join('') : (source as string);
           }
-          sourceCode += `${text}\n\n`;
+          hasCode = hasCode || text.trim() !== '';
+          if (sendSource) {
+            sourceCode += `${text}\n\n`;
+          }
         }
       }
 
-      if (!sourceCode.trim()) {
+      if (!hasCode) {
         await showDialog({
           title: 'Empty Notebook',
           body: 'Please add some code to your notebook before submitting.',
@@ -96,10 +107,13 @@ export function registerSubmitPipelineAction(
         });
         return;
       }
+      const source: PipelineSource = sendSource
+        ? sourceCode
+        : { notebookPath: path };
 
       try {
         const config = await getConfig();
-        const inspection = await compilePipeline(config, sourceCode, 'inspect');
+        const inspection = await compilePipeline(config, source, 'inspect');
 
         if (!inspection.pipelines || inspection.pipelines.length === 0) {
           await showDialog({
@@ -115,7 +129,7 @@ export function registerSubmitPipelineAction(
         const body = ReactWidget.create(
           <PipelineSubmitDialog
             config={config}
-            sourceCode={sourceCode}
+            source={source}
             inspectedPipelines={inspection.pipelines}
             onClose={() => {
               if (dialogRef.current) {